@@ -0,0 +1,58 @@
+"""add partial indexes for the userbot follow-up sweep
+
+Revision ID: 20261019_add_userbot_followup_sweep_indexes
+Revises: 20260614_add_userbot_notification_tracking
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision: str = "20261019_add_userbot_followup_sweep_indexes"
+down_revision: Union[str, Sequence[str], None] = (
+    "20260614_add_userbot_notification_tracking"
+)
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+DUE_FOLLOWUP_WHERE = (
+    "requires_response AND response_deadline_at IS NOT NULL "
+    "AND status NOT IN ('replied', 'dismissed', 'closed')"
+)
+RECONCILE_WHERE = (
+    "status IN ('open', 'reminded') AND message_id IS NOT NULL "
+    "AND (notification_message_id IS NOT NULL OR pending_key IS NOT NULL)"
+)
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_userbot_threads_due_followup",
+        "userbot_threads",
+        [sa.text("importance DESC"), "response_deadline_at", "id"],
+        postgresql_where=sa.text(DUE_FOLLOWUP_WHERE),
+        postgresql_include=["reminded_at", "user_id"],
+    )
+    op.create_index(
+        "ix_userbot_threads_user_due_followup",
+        "userbot_threads",
+        ["user_id", sa.text("importance DESC"), "response_deadline_at", "id"],
+        postgresql_where=sa.text(DUE_FOLLOWUP_WHERE),
+        postgresql_include=["reminded_at"],
+    )
+    op.create_index(
+        "ix_userbot_threads_reconcile_open",
+        "userbot_threads",
+        ["id"],
+        postgresql_where=sa.text(RECONCILE_WHERE),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_userbot_threads_reconcile_open", table_name="userbot_threads")
+    op.drop_index("ix_userbot_threads_user_due_followup", table_name="userbot_threads")
+    op.drop_index("ix_userbot_threads_due_followup", table_name="userbot_threads")
@@ -0,0 +1,51 @@
+"""add next_fire_utc columns for the recurring dispatcher
+
+Revision ID: 20261020_add_recurring_next_fire_columns
+Revises: 20261019_add_userbot_followup_sweep_indexes
+Create Date: 2026-10-20
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision: str = "20261020_add_recurring_next_fire_columns"
+down_revision: Union[str, Sequence[str], None] = (
+    "20261019_add_userbot_followup_sweep_indexes"
+)
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+COLUMNS = (
+    ("habits", "next_fire_utc", "ix_habits_next_fire_utc"),
+    ("user_triggers", "next_fire_utc", "ix_user_triggers_next_fire_utc"),
+    ("user_settings", "planner_next_fire_utc", "ix_user_settings_planner_next_fire_utc"),
+    (
+        "user_settings",
+        "news_digest_next_fire_utc",
+        "ix_user_settings_news_digest_next_fire_utc",
+    ),
+)
+
+
+def upgrade() -> None:
+    for table, column, index in COLUMNS:
+        op.add_column(
+            table,
+            sa.Column(column, sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index(
+            index,
+            table,
+            [column],
+            postgresql_where=sa.text(f"{column} IS NOT NULL"),
+        )
+
+
+def downgrade() -> None:
+    for table, column, index in reversed(COLUMNS):
+        op.drop_index(index, table_name=table)
+        op.drop_column(table, column)
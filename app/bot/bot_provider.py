@@ -1,6 +1,10 @@
 from __future__ import annotations
 
 from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+
+from ..config import settings
 
 _bot_instance: Bot | None = None
 
@@ -16,3 +20,15 @@ def get_bot_instance() -> Bot:
     if _bot_instance is None:
         raise RuntimeError("Bot instance is not initialized")
     return _bot_instance
+
+
+def create_bot() -> Bot:
+    """Standalone Bot for worker processes (no dispatcher)."""
+    session = None
+    if settings.TELEGRAM_API_PROXY:
+        session = AiohttpSession(proxy=settings.TELEGRAM_API_PROXY)
+    return Bot(
+        token=settings.TELEGRAM_BOT_TOKEN,
+        default=DefaultBotProperties(parse_mode="HTML"),
+        session=session,
+    )
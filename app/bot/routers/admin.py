@@ -9,6 +9,7 @@ from loguru import logger
 from ...models.users import User
 from ...models.episode import Episode
 from ...config import settings
+from ...services.broadcast_service import start_broadcast
 
 
 router = Router(name="admin")
@@ -53,7 +54,7 @@ async def admin_stats(message: Message, session):
     logger.info("Admin {} viewed stats", message.from_user.id)
 
 @router.message(F.text.startswith("/admin_broadcast"))
-async def admin_broadcast(message: Message, session, bot: Bot):
+async def admin_broadcast(message: Message, bot: Bot):
     """Broadcast message to all users (admin only)."""
     if not is_admin(message.from_user.id):
         return
@@ -64,20 +65,14 @@ async def admin_broadcast(message: Message, session, bot: Bot):
         return
     
     broadcast_msg = parts[1]
+    text = f"📢 <b>Объявление:</b>\n\n{html.escape(broadcast_msg)}"
     
-    result = await session.execute(select(User))
-    users = result.scalars().all()
-    
-    sent = 0
-    failed = 0
-    
-    for user in users:
-        try:
-            await bot.send_message(user.tg_chat_id, f"📢 <b>Объявление:</b>\n\n{html.escape(broadcast_msg)}")
-            sent += 1
-        except Exception as e:
-            logger.error("Broadcast failed for user {}: {}", user.id, e)
-            failed += 1
-    
-    await message.answer(f"✅ Объявление отправлено {sent} пользователям. Ошибок: {failed}")
-    logger.warning("Admin {} broadcast to {} users", message.from_user.id, sent)
\ No newline at end of file
+    # Sent in the background; this message is edited with progress.
+    status = await message.answer("📢 Рассылка запускается…")
+    broadcast_id = await start_broadcast(
+        bot,
+        admin_chat_id=message.chat.id,
+        status_message_id=status.message_id,
+        text=text,
+    )
+    logger.warning("Admin {} started broadcast {}", message.from_user.id, broadcast_id)
@@ -48,6 +48,7 @@ COMMAND_GROUPS: list[tuple[str, list[tuple[str, str]]]] = [
             ("/disconnect_userbot", "отключить юзербот"),
             ("/userbot_interests", "настроить интересы для каналов"),
             ("/userbot_pending", "очередь ожидающих reply suggestions"),
+            ("/userbot_group", "фильтр сообщений для отдельной группы"),
         ],
     ),
     (
@@ -234,7 +234,7 @@ async def finalize_onboarding(message: Message, state: FSMContext, session):
 
     await session.commit()
 
-    JobManager.schedule_user_jobs(user, user_settings)
+    await JobManager.schedule_user_jobs(session, user, user_settings)
 
     summary = (
         "Вот что я записала:\n"
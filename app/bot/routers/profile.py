@@ -110,7 +110,7 @@ async def save_timezone(message: Message, state: FSMContext, session):
     from ...scheduler.job_manager import JobManager
     
     settings = await SettingsService.get_or_create(session, user.id)
-    JobManager.schedule_user_jobs(user, settings)
+    await JobManager.schedule_user_jobs(session, user, settings)
     
     await message.answer(f"✅ Часовой пояс обновлён на <b>{html.escape(tz)}</b>. Расписанные задания перенастроены.")
     await state.clear()
@@ -154,7 +154,7 @@ async def save_bed_time(message: Message, state: FSMContext, session):
     from ...scheduler.job_manager import JobManager
     
     settings = await SettingsService.get_or_create(session, user.id)
-    JobManager.schedule_user_jobs(user, settings)
+    await JobManager.schedule_user_jobs(session, user, settings)
     
     await message.answer(f"✅ Время обновлено: Подъём <b>{html.escape(str(wake))}</b>, Сон <b>{html.escape(str(bed))}</b>. Задания перенастроены.")
     await state.clear()
@@ -167,7 +167,7 @@ async def toggle_setting(callback: CallbackQuery, session):
     session.add(user_settings)
     await session.commit()
 
-    JobManager.schedule_user_jobs(user, user_settings)
+    await JobManager.schedule_user_jobs(session, user, user_settings)
 
     await callback.answer("Setting updated")
     await settings_cmd(callback.message, session)
@@ -184,7 +184,7 @@ async def cycle_proactive_max(callback: CallbackQuery, session):
     session.add(user_settings)
     await session.commit()
 
-    JobManager.schedule_user_jobs(user, user_settings)
+    await JobManager.schedule_user_jobs(session, user, user_settings)
 
     await callback.answer("Setting updated")
     await settings_cmd(callback.message, session)
@@ -111,15 +111,6 @@ async def del_trigger_callback(callback: CallbackQuery, session):
 
     await session.commit()
 
-    # Remove the APScheduler job
-    try:
-        from ...scheduler.scheduler_instance import scheduler
-        job_id = f"trigger_{user.id}_{trigger_id}"
-        if scheduler.get_job(job_id):
-            scheduler.remove_job(job_id)
-    except Exception as e:
-        logger.warning("Failed to remove scheduler job for trigger {}: {}", trigger_id, e)
-
     await callback.answer("🗑 Триггер удалён.")
     await callback.message.edit_text("🗑 <i>Триггер удалён.</i>", reply_markup=None)
 
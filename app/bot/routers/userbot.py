@@ -66,6 +66,7 @@ from ...services.userbot_monitor import (
     mark_bot_sent_reply,
     save_pending_action_plan,
 )
+from ...services.userbot_sharding import send_command, sharding_enabled
 from ...services.profile_services import get_or_create_user
 from ...utils.telegram_mtproto import build_telethon_proxy
 from ..states import UserBotSetup, UserBotReplyEdit, UserBotActionStepEdit
@@ -147,11 +148,13 @@ async def cb_approve_reply(callback: CallbackQuery, session, bot: Bot):
         await callback.message.edit_text(
             callback.message.text + "\n\n✅ <b>Sent:</b> " + _esc(reply_text),
             parse_mode="HTML",
-            reply_markup=None,
+            reply_markup=_markup_without_pending(callback, pending_key),
         )
     else:
         await callback.answer("❌ Failed to send. Session may be expired.", show_alert=True)
-        await callback.message.edit_reply_markup(reply_markup=None)
+        await callback.message.edit_reply_markup(
+            reply_markup=_markup_without_pending(callback, pending_key)
+        )
 
 
 @router.callback_query(F.data.startswith("ub_edit:"))
@@ -180,7 +183,9 @@ async def cb_edit_reply(callback: CallbackQuery, state: FSMContext, session):
     await state.update_data(pending_key=pending_key, notification_msg_id=callback.message.message_id)
 
     await callback.answer()
-    await callback.message.edit_reply_markup(reply_markup=None)
+    await callback.message.edit_reply_markup(
+        reply_markup=_markup_without_pending(callback, pending_key)
+    )
     await callback.message.answer(
         f"✏️ Type your reply to <b>{_esc(pending['sender_name'])}</b>.\n"
         "Send /cancel_reply to abort.",
@@ -210,7 +215,7 @@ async def cb_dismiss_reply(callback: CallbackQuery, session):
     await callback.message.edit_text(
         callback.message.text + "\n\n🚫 <i>Dismissed</i>",
         parse_mode="HTML",
-        reply_markup=None,
+        reply_markup=_markup_without_pending(callback, pending_key),
     )
 
 
@@ -540,6 +545,32 @@ async def _send_message_with_human_simulation(
     chat_id: int,
     text: str,
     reply_to_msg_id: int | None = None,
+) -> bool:
+    if UserBotManager.get_client(user_id) is None and sharding_enabled():
+        # The account is connected in a userbot worker process.
+        result = await send_command(
+            user_id,
+            "send_message",
+            {"chat_id": chat_id, "text": text, "reply_to_msg_id": reply_to_msg_id},
+            timeout=app_settings.USERBOT_COMMAND_TIMEOUT_SECONDS
+            + app_settings.USERBOT_TYPING_DELAY_MAX
+            + 5,
+        )
+        return bool(result)
+    return await _send_message_locally(
+        user_id=user_id,
+        chat_id=chat_id,
+        text=text,
+        reply_to_msg_id=reply_to_msg_id,
+    )
+
+
+async def _send_message_locally(
+    *,
+    user_id: int,
+    chat_id: int,
+    text: str,
+    reply_to_msg_id: int | None = None,
 ) -> bool:
     client = UserBotManager.get_client(user_id)
     if not client:
@@ -618,13 +649,7 @@ async def cmd_connect_userbot(message: Message, state: FSMContext, session, bot:
     existing = result.scalar_one_or_none()
 
     if existing:
-        client = UserBotManager.get_client(user.id)
-        is_alive = False
-        if client:
-            try:
-                is_alive = await client.is_connected()
-            except Exception:
-                pass
+        is_alive = await UserBotManager.is_running(user.id)
 
         if is_alive:
             await message.answer(
@@ -634,16 +659,9 @@ async def cmd_connect_userbot(message: Message, state: FSMContext, session, bot:
             return
 
         restart_msg = await message.answer("🔴 Session saved but client not running. Restarting…")
-        await UserBotManager.stop_client(user.id)
-        await UserBotManager.start_client(user.id, existing.session_string or "", bot)
-
-        restarted = UserBotManager.get_client(user.id)
-        restarted_alive = False
-        if restarted:
-            try:
-                restarted_alive = await restarted.is_connected()
-            except Exception:
-                pass
+        restarted_alive = await UserBotManager.request_start(
+            user.id, existing.session_string or "", bot
+        )
 
         if restarted_alive:
             await restart_msg.edit_text("✅ Userbot restarted and monitoring.")
@@ -849,7 +867,7 @@ async def cmd_disconnect_userbot(message: Message, state: FSMContext, session, b
         await message.answer("You don't have a connected Telegram account.")
         return
 
-    await UserBotManager.stop_client(user.id)
+    await UserBotManager.request_stop(user.id)
 
     ubot_session.is_active = False
     ubot_session.session_string = None
@@ -890,6 +908,10 @@ async def cmd_userbot_interests(message: Message, session):
     session.add(user_settings)
     await session.commit()
 
+    from ...services.userbot_group_filter import invalidate_group_prefilter
+
+    invalidate_group_prefilter(user.id)
+
     await message.answer(
         f"✅ Interests saved: <i>{text[:200]}</i>\n\n"
         "I'll use this to filter which channel posts to notify you about.",
@@ -897,6 +919,55 @@ async def cmd_userbot_interests(message: Message, session):
     )
 
 
+# ---------------------------------------------------------------------------
+# /userbot_group — per-group prefilter overrides
+# ---------------------------------------------------------------------------
+
+@router.message(Command("userbot_group"))
+async def cmd_userbot_group(message: Message, session):
+    from ...services.userbot_group_filter import (
+        GROUP_MODES,
+        list_group_overrides,
+        set_group_override,
+    )
+
+    user = await get_or_create_user(session, message.from_user.id, message.chat.id)
+    args = (message.text or "").split()[1:]
+
+    if not args:
+        overrides = await list_group_overrides(user.id)
+        lines = ["<b>Group filter overrides</b>"]
+        if overrides:
+            lines.extend(
+                f"<code>{chat_id}</code>: {mode}" for chat_id, mode in sorted(overrides.items())
+            )
+        else:
+            lines.append("None. Groups use mentions, replies and your interests.")
+        lines.append(
+            "\nUsage: <code>/userbot_group &lt;group_id&gt; all|mentions|off|default</code>"
+        )
+        await message.answer("\n".join(lines), parse_mode="HTML")
+        return
+
+    mode = args[1].lower() if len(args) > 1 else ""
+    try:
+        chat_id = int(args[0])
+    except ValueError:
+        chat_id = None
+    if chat_id is None or (mode not in GROUP_MODES and mode != "default"):
+        await message.answer(
+            "Usage: <code>/userbot_group &lt;group_id&gt; all|mentions|off|default</code>",
+            parse_mode="HTML",
+        )
+        return
+
+    await set_group_override(user.id, chat_id, None if mode == "default" else mode)
+    await message.answer(
+        f"✅ Group <code>{chat_id}</code> filter set to <b>{mode}</b>.",
+        parse_mode="HTML",
+    )
+
+
 # ---------------------------------------------------------------------------
 # /userbot_pending — durable open reply queue
 # ---------------------------------------------------------------------------
@@ -1343,7 +1414,7 @@ async def _finalize_connection(
     except Exception:
         pass
 
-    await UserBotManager.start_client(user_id=user_id, session_string=session_string, bot=bot)
+    await UserBotManager.request_start(user_id, session_string, bot)
 
     await state.clear()
     await bot.send_message(
@@ -1361,6 +1432,28 @@ async def _finalize_connection(
     logger.info("User {} successfully connected userbot", user_id)
 
 
+def _markup_without_pending(
+    callback: CallbackQuery, pending_key: str
+) -> InlineKeyboardMarkup | None:
+    """
+    Drop the buttons that belong to ``pending_key``. Combined follow-up
+    reminders carry one row per thread; the other threads keep theirs.
+    """
+    markup = getattr(callback.message, "reply_markup", None)
+    if not markup:
+        return None
+    rows = []
+    for row in markup.inline_keyboard:
+        kept = [
+            button
+            for button in row
+            if pending_key not in (button.callback_data or "").split(":")
+        ]
+        if kept:
+            rows.append(kept)
+    return InlineKeyboardMarkup(inline_keyboard=rows) if rows else None
+
+
 async def _mark_message_expired(callback: CallbackQuery) -> None:
     """Update the notification message to show it's expired."""
     try:
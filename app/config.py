@@ -103,6 +103,81 @@ class Settings(BaseSettings):
     # Minutes after the user's wake_time at which the news digest fires
     NEWS_DIGEST_OFFSET_MINUTES: int = 30
 
+    # --- Recurring dispatcher (habit reminders, triggers, planner, news digest) ---
+    # Max recurring jobs running at once in this process
+    RECURRING_DISPATCH_CONCURRENCY: int = 16
+    # Due rows claimed per transaction
+    RECURRING_DISPATCH_BATCH_SIZE: int = 500
+    # Rows overdue by more than this are advanced without running (seconds)
+    RECURRING_DISPATCH_GRACE_SECONDS: int = 300
+    # Rows streamed / written per batch by the startup schedule reconciler
+    RECURRING_RECONCILE_BATCH_SIZE: int = 1000
+
+    # --- Bulk sends from scheduled jobs ---
+    # Users (with settings) prefetched per query by bulk notification jobs
+    SCHEDULED_SEND_PREFETCH_CHUNK: int = 1000
+
+    # --- Telegram delivery (shared Bot API rate limit + durable outbox) ---
+    # Bot-wide and per-chat send rates (messages/second)
+    DELIVERY_GLOBAL_RATE: float = 30.0
+    DELIVERY_CHAT_RATE: float = 1.0
+    # Burst above the global rate usable by interactive sends (reminders get half, broadcasts none)
+    DELIVERY_GLOBAL_BURST_SECONDS: float = 1.0
+    # Parallel sends and idle poll interval of the outbox worker
+    DELIVERY_CONCURRENCY: int = 16
+    DELIVERY_POLL_SECONDS: float = 0.25
+    # A claimed message returns to the outbox if not acked within this (seconds)
+    DELIVERY_LEASE_SECONDS: int = 120
+    # Transient send failures before a queued message is dropped
+    DELIVERY_MAX_ATTEMPTS: int = 5
+    # Queued messages older than this are discarded unsent (seconds)
+    DELIVERY_MESSAGE_TTL_SECONDS: int = 86400
+
+    # --- Admin broadcast ---
+    # Parallel sends (pacing is the shared delivery limit)
+    BROADCAST_CONCURRENCY: int = 8
+    # Users sent between two progress checkpoints
+    BROADCAST_CHUNK_SIZE: int = 200
+    # Max wait for a send slot before a broadcast send is retried later in its chunk (seconds)
+    BROADCAST_SEND_TIMEOUT_SECONDS: int = 30
+    # Rows read per server-side cursor before it is reopened
+    BROADCAST_CURSOR_WINDOW: int = 5000
+    # Interval between progress edits of the admin's status message (seconds)
+    BROADCAST_PROGRESS_SECONDS: int = 15
+    # Runner lease; an unrenewed broadcast is resumed elsewhere after this (seconds)
+    BROADCAST_LEASE_SECONDS: int = 120
+
+    # --- Proactive planner fan-out ---
+    # Daily planner runs are spread over this window after the wake time (seconds)
+    PLANNER_SPREAD_WINDOW_SECONDS: int = 1800
+    # Max planner runs (memory assembly + LLM call) at once
+    PLANNER_MAX_CONCURRENCY: int = 4
+
+    # --- Planner refresh debounce ---
+    # Skip a chat-triggered planner refresh whose due time moves by less than this
+    PLANNER_REFRESH_MIN_SHIFT_SECONDS: int = 300
+    # Buffer refresh requests this long, then write them in one batch
+    PLANNER_REFRESH_FLUSH_SECONDS: float = 2.0
+
+    # --- Scheduler process ---
+    # Don't run jobs in the web process (APScheduler is started paused so
+    # handlers can still add jobs). Start `python -m app.scheduler_worker`
+    # instead. With USERBOT_RUN_IN_APP=True the web process health-checks its
+    # own userbot clients, since the worker cannot see them.
+    DISABLE_SCHEDULER: bool = False
+    # Scheduler worker leader lease TTL and renew interval (seconds)
+    SCHEDULER_LEADER_LEASE_SECONDS: int = 30
+    SCHEDULER_LEADER_RENEW_SECONDS: int = 10
+
+    # --- Delayed job queue (one-off reminders, proactive touches) ---
+    # Poll interval and max jobs claimed per poll
+    DELAYED_QUEUE_POLL_SECONDS: float = 1.0
+    DELAYED_QUEUE_CLAIM_BATCH: int = 50
+    # A claimed job not acked within this many seconds is delivered again
+    DELAYED_QUEUE_LEASE_SECONDS: int = 300
+    # How long a completed job id blocks re-enqueueing (idempotency window)
+    DELAYED_QUEUE_DONE_TTL_SECONDS: int = 2 * 86_400
+
     # --- Telegram User Bot (MTProto via Telethon) ---
     # Get these from https://my.telegram.org/apps
     TELEGRAM_API_ID: int = 0
@@ -113,6 +188,24 @@ class Settings(BaseSettings):
     USERBOT_MAX_GROUP_NOTIFS_PER_DAY: int = 5
     # Safety cap for active Telethon clients in one process.
     USERBOT_MAX_ACTIVE_CLIENTS: int = 100
+    # Run Telethon clients inside the web process. Set to False and start one or
+    # more `python -m app.userbot_worker` processes to shard accounts across them.
+    USERBOT_RUN_IN_APP: bool = True
+    # Shard worker heartbeat / account lease timing (seconds)
+    USERBOT_WORKER_HEARTBEAT_SECONDS: int = 15
+    USERBOT_WORKER_LEASE_TTL_SECONDS: int = 45
+    # Virtual nodes per worker on the consistent-hash ring
+    USERBOT_SHARD_VNODES: int = 64
+    # How long the web process waits for a shard worker to answer a command
+    USERBOT_COMMAND_TIMEOUT_SECONDS: int = 20
+    # Client (re)start shaping: parallel connects, random spread before each connect
+    USERBOT_START_CONCURRENCY: int = 8
+    USERBOT_START_JITTER_SECONDS: float = 1.5
+    # Per-user exponential backoff after failed starts, then quarantine
+    USERBOT_RESTART_BACKOFF_BASE_SECONDS: int = 30
+    USERBOT_RESTART_BACKOFF_MAX_SECONDS: int = 1800
+    USERBOT_QUARANTINE_FAILURES: int = 5
+    USERBOT_QUARANTINE_SECONDS: int = 6 * 3600
     # Pending reply approval timeout in seconds (after this, buttons expire)
     USERBOT_REPLY_TIMEOUT: int = 600  # 10 minutes
     # Max approved replies per user per day (anti-abuse)
@@ -122,10 +215,21 @@ class Settings(BaseSettings):
     USERBOT_TYPING_DELAY_MAX: float = 4.0
     # How many outgoing message samples to keep per user for style learning
     USERBOT_STYLE_SAMPLES_MAX: int = 30
+    # Rebuild the compiled style profile after this many new samples
+    USERBOT_STYLE_PROFILE_REFRESH_EVERY: int = 5
+    # Short example messages kept in the compiled style profile
+    USERBOT_STYLE_PROFILE_EXEMPLARS: int = 4
     # How many messages to fetch from chat for conversation context
     USERBOT_THREAD_FETCH_LIMIT: int = 8
     # TTL for sender relationship cache in Redis (seconds); default 30 days
     USERBOT_SENDER_CACHE_TTL: int = 30 * 86_400
+    # Lease held by the one worker inferring a sender relationship (seconds)
+    USERBOT_SENDER_INFER_LEASE_SECONDS: int = 120
+    # How long a failed/empty relationship inference suppresses retries (seconds)
+    USERBOT_SENDER_NEGATIVE_CACHE_TTL: int = 1800
+    # In-process Telethon entity cache per client (sender names for thread fetches)
+    USERBOT_ENTITY_CACHE_TTL_SECONDS: int = 6 * 3600
+    USERBOT_ENTITY_CACHE_MAX_SIZE: int = 2000
     # --- Channel intelligence ---
     # Relevance score thresholds (1-5 scale from LLM):
     #   >= HIGH  → send immediately with detail
@@ -135,17 +239,47 @@ class Settings(BaseSettings):
     USERBOT_CHANNEL_MEDIUM_THRESHOLD: int = 2
     # Max posts in the medium-relevance batch before auto-flush
     USERBOT_CHANNEL_BATCH_MAX: int = 7
-    # Interval (hours) for the periodic batch digest flush job
+    # Batch digests go out on local */N-hour boundaries
     USERBOT_CHANNEL_BATCH_FLUSH_HOURS: int = 4
+    # How often the global sweeper checks pending channel batches
+    USERBOT_CHANNEL_SWEEP_INTERVAL_MINUTES: int = 5
+    # Max channel digests delivered per second by the sweeper
+    USERBOT_CHANNEL_DIGEST_SEND_RATE: float = 20.0
+    # Near-duplicate channel posts: max SimHash distance (bits of 64; unrelated
+    # posts differ in ~32) and look-back window
+    USERBOT_CHANNEL_DEDUPE_MAX_DISTANCE: int = 10
+    USERBOT_CHANNEL_DEDUPE_WINDOW_HOURS: int = 24
+    # Recent post signatures kept per user for near-duplicate checks
+    USERBOT_CHANNEL_DEDUPE_MAX_SIGNATURES: int = 300
+    # Also pass group messages matching the owner's names or interest terms
+    # to the classifier (off: only mentions and replies to the owner, as before)
+    USERBOT_GROUP_PREFILTER_KEYWORDS: bool = False
+    # Share of group messages that fail the local prefilter but are still
+    # classified (never notified), to measure how much the prefilter misses
+    USERBOT_GROUP_PREFILTER_SAMPLE_RATE: float = 0.02
+    # How long a user's group keyword automaton and overrides are cached
+    USERBOT_GROUP_PREFILTER_TTL_SECONDS: int = 300
+    # Ingestion stages slower than this are logged as warnings
+    USERBOT_SLOW_STAGE_SECONDS: float = 10.0
     # Persistent DM/group follow-up reminder checks
     USERBOT_FOLLOWUP_CHECK_INTERVAL_MINUTES: int = 15
     USERBOT_MAX_FOLLOWUPS_PER_DAY: int = 5
     USERBOT_FOLLOWUP_REMINDER_COOLDOWN_HOURS: int = 24
+    # Follow-up sweep: rows per keyset page (one commit per page)
+    USERBOT_FOLLOWUP_SWEEP_PAGE_SIZE: int = 200
+    # Follow-up sweep: time budget per run; leftovers go to the next run
+    USERBOT_FOLLOWUP_SWEEP_MAX_SECONDS: int = 300
+    # Follow-up reminders: concurrent users (pacing is the shared delivery limit)
+    USERBOT_FOLLOWUP_SEND_CONCURRENCY: int = 8
     USERBOT_DEFAULT_FOLLOWUP_MINUTES: int = 120
+    # Users probed in parallel while reconciling open follow-up threads
+    USERBOT_RECONCILE_USER_CONCURRENCY: int = 4
     # Generate optional multi-step action drafts for incoming DM/group messages.
     USERBOT_ACTION_PLAN_ENABLED: bool = True
     # How many recent private dialogs may be offered to the LLM as safe target candidates.
     USERBOT_ACTION_TARGET_DIALOG_LIMIT: int = 20
+    # Background refresh interval for the cached recent-dialog snapshot (seconds).
+    USERBOT_DIALOG_CACHE_TTL_SECONDS: int = 6 * 3600
     # Hard cap for action-plan steps shown in one notification.
     USERBOT_ACTION_PLAN_MAX_STEPS: int = 5
     # Delay before processing DM/group messages to avoid suggesting replies
@@ -154,6 +288,16 @@ class Settings(BaseSettings):
     # Quiet window for grouping bursty DM/group messages from the same sender
     # before generating one reply suggestion notification.
     USERBOT_REPLY_DEBOUNCE_SECONDS: int = 45
+    # Poll interval and claim size for the durable reply-batch due queue
+    USERBOT_REPLY_TIMER_POLL_SECONDS: float = 1.0
+    USERBOT_REPLY_TIMER_CLAIM_BATCH: int = 50
+    # Max due-queue pages scanned per poll looking for this process's batches
+    USERBOT_REPLY_TIMER_MAX_SCAN_PAGES: int = 20
+    # LLM pipeline scheduling: concurrent pipelines per account / per process,
+    # and how many may wait before the oldest lowest-priority one is dropped
+    USERBOT_WORK_PER_USER_CONCURRENCY: int = 1
+    USERBOT_WORK_GLOBAL_CONCURRENCY: int = 16
+    USERBOT_WORK_QUEUE_MAX: int = 1000
 
     # ── Feature Flags ─────────────────────────────────────────
     # JSON string or comma-separated "KEY=true,KEY2=false".
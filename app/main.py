@@ -14,9 +14,16 @@ from .config import settings
 from .db import init_db
 from .bot.dispatcher import create_bot_and_dispatcher
 from .bot.bot_provider import set_bot_instance
+from .scheduler.delayed_queue import start_delayed_job_poller, stop_delayed_job_poller
+from .scheduler.planner_refresh import get_planner_refresh_debouncer
 from .scheduler.scheduler_instance import start_scheduler, shutdown_scheduler, scheduler
 
+from .services.broadcast_service import start_broadcast_supervisor, stop_broadcast_supervisor
 from .services.oauth_state_service import OAuthStateService
+from .services.telegram_delivery import delivery_snapshot, start_delivery_worker, stop_delivery_worker
+from .services.userbot_manager import UserBotManager
+from .services.userbot_metrics import get_ingest_metrics
+from .services.userbot_work_queue import get_work_scheduler
 from .integrations.google_calendar import GoogleCalendarService
 from .db import get_session
 
@@ -27,6 +34,9 @@ from .models.episode import Episode
 bot, dp = create_bot_and_dispatcher()
 set_bot_instance(bot)
 polling_task: asyncio.Task[None] | None = None
+userbot_health_task: asyncio.Task[None] | None = None
+# Same cadence as the scheduler's userbot_health_check job.
+_USERBOT_HEALTH_CHECK_SECONDS = 600
 
 
 async def _process_telegram_update(update: Update) -> None:
@@ -40,37 +50,55 @@ async def _process_telegram_update(update: Update) -> None:
         )
 
 
+async def _userbot_health_loop() -> None:
+    """Restart disconnected in-app userbot clients while jobs run in the scheduler worker."""
+    from .scheduler.jobs import userbot_health_check_job
+
+    while True:
+        await asyncio.sleep(_USERBOT_HEALTH_CHECK_SECONDS)
+        await userbot_health_check_job()
+
+
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
-    global polling_task
+    global polling_task, userbot_health_task
 
     # --- startup ---
     logger.remove()
     logger.add(lambda msg: print(msg, end=""), level=settings.LOG_LEVEL)
     
     await init_db()
-    start_scheduler()
-    try:
-        from .scheduler.job_manager import JobManager
-        async with get_session() as session:
-            await JobManager.reschedule_all_user_jobs(session)
-    except Exception as exc:
-        logger.exception("Failed to reschedule user jobs on startup: {}", exc)
+    if settings.DISABLE_SCHEDULER:
+        # Jobs run in `python -m app.scheduler_worker`; the job store stays
+        # writable here for reminders and one-off jobs created by handlers.
+        start_scheduler(paused=True)
+    else:
+        start_scheduler()
+        try:
+            from .scheduler.job_manager import JobManager
+            async with get_session() as session:
+                await JobManager.reschedule_all_user_jobs(session)
+        except Exception as exc:
+            logger.exception("Failed to reschedule user jobs on startup: {}", exc)
+        start_delayed_job_poller()
+
+    # Every replica drains the shared outbox; claims are atomic in Redis.
+    start_delivery_worker(bot)
+    # Resumes admin broadcasts interrupted by a restart.
+    start_broadcast_supervisor(bot)
 
     # ── Register gamification event listeners ──
-    from .services.event_bus import event_bus
-    from .services.analytics_service import persist_event
-    event_bus.on_all(persist_event)  # Analytics sink — logs all events to DB
-
-    # Import gamification modules to wire their event bus listeners
-    import app.services.gamification.xp_service  # noqa: F401
-    import app.services.gamification.badge_service  # noqa: F401
-    import app.services.gamification.reward_service  # noqa: F401
-    import app.services.gamification.leaderboard_service  # noqa: F401
-    logger.info("Gamification event listeners registered")
+    from .services.event_bus import register_app_listeners
+    register_app_listeners()
 
     # Start MTProto userbot clients (read-only monitoring of connected accounts)
-    from .services.userbot_manager import UserBotManager
-    await UserBotManager.start_all(bot)
+    if settings.USERBOT_RUN_IN_APP:
+        await UserBotManager.start_all(bot)
+        if settings.DISABLE_SCHEDULER:
+            # The scheduler worker cannot see clients living in this process,
+            # so their health check runs here instead.
+            userbot_health_task = asyncio.create_task(_userbot_health_loop())
+    else:
+        logger.info("Userbot clients are served by dedicated userbot workers")
 
     if settings.TELEGRAM_USE_POLLING:
         await bot.delete_webhook(drop_pending_updates=False)
@@ -86,14 +114,22 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     yield
 
     # --- shutdown ---
-    from .services.userbot_manager import UserBotManager as _UBM
     if polling_task is not None:
         polling_task.cancel()
         with suppress(asyncio.CancelledError):
             await polling_task
         polling_task = None
-    await _UBM.stop_all()
+    if userbot_health_task is not None:
+        userbot_health_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await userbot_health_task
+        userbot_health_task = None
+    await UserBotManager.stop_all()
+    await get_planner_refresh_debouncer().flush()
+    await stop_delayed_job_poller()
     shutdown_scheduler()
+    await stop_broadcast_supervisor()
+    await stop_delivery_worker()
     try:
         await bot.delete_webhook()
     except Exception:
@@ -167,6 +203,7 @@ async def health():
         "timestamp": datetime.now(timezone.utc).isoformat(),
         "scheduler_running": scheduler.running if scheduler else False,
         "jobs_count": len(scheduler.get_jobs()) if scheduler and scheduler.running else 0,
+        "userbot": UserBotManager.startup_progress(),
     }
 
 
@@ -184,6 +221,9 @@ async def metrics(session: AsyncSession = Depends(get_session)):
     return {
         "total_users": user_count,
         "total_episodes": episode_count,
+        "userbot_work_queue": get_work_scheduler().snapshot(),
+        "userbot_ingest": get_ingest_metrics().snapshot(),
+        "telegram_delivery": await delivery_snapshot(),
         "timestamp": datetime.now(timezone.utc).isoformat(),
     }
 
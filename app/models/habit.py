@@ -1,7 +1,7 @@
 from typing import Optional, TYPE_CHECKING
 from datetime import datetime, timezone, date, time
 from sqlmodel import SQLModel, Field, Relationship
-from sqlalchemy import Column, DateTime, String
+from sqlalchemy import Column, DateTime, Index, String, text
 
 from ..security.encrypted_types import EncryptedTextType
 
@@ -37,6 +37,11 @@ class Habit(SQLModel, table=True):
     # Reminder
     reminder_time: Optional[time] = None
     reminder_enabled: bool = Field(default=True)
+    # Next reminder instant (UTC); advanced by the recurring dispatcher
+    next_fire_utc: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), nullable=True),
+    )
     
     # Streak tracking
     current_streak: int = Field(default=0)
@@ -58,6 +63,13 @@ class Habit(SQLModel, table=True):
         self.updated_at = datetime.now(timezone.utc)
 
 
+Index(
+    "ix_habits_next_fire_utc",
+    Habit.__table__.c.next_fire_utc,
+    postgresql_where=text("next_fire_utc IS NOT NULL"),
+)
+
+
 class HabitLog(SQLModel, table=True):
     """
     Logs of habit completions.
@@ -1,7 +1,7 @@
 from typing import Optional, TYPE_CHECKING
 from datetime import datetime, timezone, time
 from sqlmodel import SQLModel, Field, UniqueConstraint, Relationship
-from sqlalchemy import Boolean, DateTime, Column, Integer, String
+from sqlalchemy import Boolean, DateTime, Column, Index, Integer, String, text
 
 from ..security.encrypted_types import EncryptedJSONType
 
@@ -50,6 +50,15 @@ class UserSettings(SQLModel, table=True):
     enable_monthly_plan: bool = Field(default=False)
     # News digest: opt-in, fires NEWS_DIGEST_OFFSET_MINUTES after wake_time
     enable_news_digest: bool = Field(default=False)
+    # Next planner / news digest instants (UTC); advanced by the recurring dispatcher
+    planner_next_fire_utc: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), nullable=True),
+    )
+    news_digest_next_fire_utc: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), nullable=True),
+    )
 
     # --- User Bot (MTProto monitoring) ---
     # Whether to send a notification when an interesting channel post arrives
@@ -117,3 +126,15 @@ class UserSettings(SQLModel, table=True):
 
     def touch(self) -> None:
         self.updated_at = datetime.now(timezone.utc)
+
+
+Index(
+    "ix_user_settings_planner_next_fire_utc",
+    UserSettings.__table__.c.planner_next_fire_utc,
+    postgresql_where=text("planner_next_fire_utc IS NOT NULL"),
+)
+Index(
+    "ix_user_settings_news_digest_next_fire_utc",
+    UserSettings.__table__.c.news_digest_next_fire_utc,
+    postgresql_where=text("news_digest_next_fire_utc IS NOT NULL"),
+)
@@ -2,7 +2,7 @@ from __future__ import annotations
 from typing import Optional
 from datetime import datetime, timezone
 from sqlmodel import SQLModel, Field
-from sqlalchemy import Column, DateTime, Text
+from sqlalchemy import Column, DateTime, Index, Text, text
 
 
 class UserTrigger(SQLModel, table=True):
@@ -24,6 +24,11 @@ class UserTrigger(SQLModel, table=True):
     cron_weekdays: Optional[str] = Field(default=None, max_length=50)
 
     active: bool = Field(default=True)
+    # Next fire instant (UTC); advanced by the recurring dispatcher
+    next_fire_utc: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), nullable=True),
+    )
 
     created_at: datetime = Field(
         default_factory=lambda: datetime.now(timezone.utc),
@@ -36,3 +41,10 @@ class UserTrigger(SQLModel, table=True):
 
     def touch(self) -> None:
         self.updated_at = datetime.now(timezone.utc)
+
+
+Index(
+    "ix_user_triggers_next_fire_utc",
+    UserTrigger.__table__.c.next_fire_utc,
+    postgresql_where=text("next_fire_utc IS NOT NULL"),
+)
@@ -3,7 +3,7 @@ from __future__ import annotations
 from datetime import datetime, timezone
 from typing import Optional
 
-from sqlalchemy import BigInteger, Boolean, Column, DateTime, Integer, String
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, Index, Integer, String, text
 from sqlmodel import Field, SQLModel
 
 from ..security.encrypted_types import EncryptedJSONType, EncryptedTextType
@@ -116,3 +116,38 @@ class UserBotThread(SQLModel, table=True):
 
     def touch(self) -> None:
         self.updated_at = datetime.now(timezone.utc)
+
+
+# Partial indexes matching the follow-up sweep predicates exactly, so the
+# keyset-paginated queries in UserBotThreadService never touch closed rows.
+DUE_FOLLOWUP_INDEX_WHERE = (
+    "requires_response AND response_deadline_at IS NOT NULL "
+    "AND status NOT IN ('replied', 'dismissed', 'closed')"
+)
+RECONCILE_INDEX_WHERE = (
+    "status IN ('open', 'reminded') AND message_id IS NOT NULL "
+    "AND (notification_message_id IS NOT NULL OR pending_key IS NOT NULL)"
+)
+
+Index(
+    "ix_userbot_threads_due_followup",
+    UserBotThread.__table__.c.importance.desc(),
+    UserBotThread.__table__.c.response_deadline_at,
+    UserBotThread.__table__.c.id,
+    postgresql_where=text(DUE_FOLLOWUP_INDEX_WHERE),
+    postgresql_include=["reminded_at", "user_id"],
+)
+Index(
+    "ix_userbot_threads_user_due_followup",
+    UserBotThread.__table__.c.user_id,
+    UserBotThread.__table__.c.importance.desc(),
+    UserBotThread.__table__.c.response_deadline_at,
+    UserBotThread.__table__.c.id,
+    postgresql_where=text(DUE_FOLLOWUP_INDEX_WHERE),
+    postgresql_include=["reminded_at"],
+)
+Index(
+    "ix_userbot_threads_reconcile_open",
+    UserBotThread.__table__.c.id,
+    postgresql_where=text(RECONCILE_INDEX_WHERE),
+)
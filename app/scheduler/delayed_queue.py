@@ -0,0 +1,352 @@
+"""
+Redis delayed-job queue for one-off reminders, proactive touches and
+debounced planner refreshes.
+
+One-off DateTrigger jobs used to be pickled rows in the SQL job store. They
+now live in Redis:
+
+* ``dq_job:{job_id}`` — JSON payload (kind, user id, due time, job args);
+* ``dq_due`` — sorted set of job ids scored by due time;
+* ``dq_user:{user_id}:{kind}`` — per-user secondary index scored by due time,
+  so listing and cancelling a user's jobs is O(log n) plus the result size;
+* ``dq_processing`` — claimed job ids scored by lease expiry;
+* ``dq_done:{job_id}`` — short-lived idempotency marker written on ack.
+
+Job ids double as idempotency keys: enqueueing an id that is pending or was
+recently completed is a no-op. Reusable per-user jobs (planner refresh) go
+through ``debounce_jobs`` instead, which moves a pending job only when its due
+time shifts by more than a threshold. The process running the scheduler polls
+the queue; claiming is atomic (Lua), so several workers can consume it. A job
+is acked only after its handler returns, and a claim whose lease expires
+without an ack goes back to ``dq_due`` — delivery is at-least-once.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+
+from loguru import logger
+
+from ..config import settings as app_settings
+
+DUE_KEY = "dq_due"
+PROCESSING_KEY = "dq_processing"
+
+# KEYS[1] = job, KEYS[2] = due zset, KEYS[3] = user index, KEYS[4] = done marker;
+# ARGV[1] = job id, ARGV[2] = due ts, ARGV[3] = payload.
+_ENQUEUE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 or redis.call('EXISTS', KEYS[4]) == 1 then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[3])
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+redis.call('ZADD', KEYS[3], ARGV[2], ARGV[1])
+return 1
+"""
+
+# KEYS[1] = due zset, KEYS[2] = processing zset;
+# ARGV[1] = now, ARGV[2] = lease expiry, ARGV[3] = max jobs.
+# Returns a flat list of (job id, payload) for every claimed job.
+_CLAIM_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, ARGV[3])
+for _, id in ipairs(expired) do
+    redis.call('ZREM', KEYS[2], id)
+    redis.call('ZADD', KEYS[1], ARGV[1], id)
+end
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[3])
+local claimed = {}
+for _, id in ipairs(ids) do
+    redis.call('ZREM', KEYS[1], id)
+    local payload = redis.call('GET', 'dq_job:' .. id)
+    if payload and redis.call('EXISTS', 'dq_done:' .. id) == 0 then
+        redis.call('ZADD', KEYS[2], ARGV[2], id)
+        table.insert(claimed, id)
+        table.insert(claimed, payload)
+    end
+end
+return claimed
+"""
+
+# KEYS[1] = user index, KEYS[2] = due zset, KEYS[3] = job; ARGV[1] = job id.
+_CANCEL_SCRIPT = """
+if not redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+    return 0
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('DEL', KEYS[3])
+return 1
+"""
+
+# KEYS[1] = due zset, KEYS[2] = processing zset; ARGV[1] = min shift (seconds),
+# ARGV[2] = kind, then (job id, user id, due ts, payload) per job.
+# Creates or moves each job unless its due time would shift by <= min shift;
+# a job that is running already covers the request. Returns jobs written.
+_DEBOUNCE_SCRIPT = """
+local written = 0
+for i = 3, #ARGV, 4 do
+    local id, due = ARGV[i], tonumber(ARGV[i + 2])
+    if not redis.call('ZSCORE', KEYS[2], id) then
+        local current = redis.call('ZSCORE', KEYS[1], id)
+        if not current or math.abs(tonumber(current) - due) > tonumber(ARGV[1]) then
+            redis.call('SET', 'dq_job:' .. id, ARGV[i + 3])
+            redis.call('DEL', 'dq_done:' .. id)
+            redis.call('ZADD', KEYS[1], due, id)
+            redis.call('ZADD', 'dq_user:' .. ARGV[i + 1] .. ':' .. ARGV[2], due, id)
+            written = written + 1
+        end
+    end
+end
+return written
+"""
+
+_poller_task: asyncio.Task | None = None
+
+
+def job_key(job_id: str) -> str:
+    return f"dq_job:{job_id}"
+
+
+def done_key(job_id: str) -> str:
+    return f"dq_done:{job_id}"
+
+
+def user_index_key(user_id: int, kind: str) -> str:
+    return f"dq_user:{user_id}:{kind}"
+
+
+async def enqueue(
+    kind: str, user_id: int, job_id: str, due_at: datetime, args: dict
+) -> bool:
+    """Queue a job; returns False if the id is already pending or recently done."""
+    due_ts = due_at.timestamp()
+    payload = json.dumps(
+        {"kind": kind, "user_id": user_id, "due": due_ts, "args": args},
+        ensure_ascii=False,
+    )
+    redis = await _get_redis()
+    try:
+        added = await redis.eval(
+            _ENQUEUE_SCRIPT,
+            4,
+            job_key(job_id),
+            DUE_KEY,
+            user_index_key(user_id, kind),
+            done_key(job_id),
+            job_id,
+            due_ts,
+            payload,
+        )
+    finally:
+        await redis.aclose()
+    return bool(added)
+
+
+async def debounce_jobs(
+    kind: str,
+    jobs: list[tuple[int, str, datetime, dict]],
+    min_shift_seconds: float,
+) -> int:
+    """
+    Upsert reusable per-user jobs ``(user_id, job_id, due_at, args)`` in one
+    round trip. Unlike ``enqueue`` an existing job is moved, but only when its
+    due time changes by more than *min_shift_seconds*. Returns jobs written.
+    """
+    if not jobs:
+        return 0
+    argv: list = [min_shift_seconds, kind]
+    for user_id, job_id, due_at, args in jobs:
+        due_ts = due_at.timestamp()
+        argv += [
+            job_id,
+            user_id,
+            due_ts,
+            json.dumps(
+                {"kind": kind, "user_id": user_id, "due": due_ts, "args": args},
+                ensure_ascii=False,
+            ),
+        ]
+    redis = await _get_redis()
+    try:
+        written = await redis.eval(_DEBOUNCE_SCRIPT, 2, DUE_KEY, PROCESSING_KEY, *argv)
+    finally:
+        await redis.aclose()
+    return int(written or 0)
+
+
+async def list_user_jobs(user_id: int, kind: str) -> list[dict]:
+    """Pending jobs of one user, soonest first."""
+    redis = await _get_redis()
+    try:
+        members = await redis.zrange(user_index_key(user_id, kind), 0, -1, withscores=True)
+        if not members:
+            return []
+        payloads = await redis.mget([job_key(job_id) for job_id, _ in members])
+    finally:
+        await redis.aclose()
+
+    jobs = []
+    for (job_id, score), raw in zip(members, payloads):
+        try:
+            args = json.loads(raw)["args"] if raw else {}
+        except (json.JSONDecodeError, KeyError, TypeError):
+            args = {}
+        jobs.append(
+            {
+                "job_id": job_id,
+                "due_at": datetime.fromtimestamp(float(score), tz=timezone.utc),
+                "args": args,
+            }
+        )
+    return jobs
+
+
+async def cancel_job(user_id: int, kind: str, job_id: str) -> bool:
+    """Cancel one pending job; False if the user has no such job."""
+    redis = await _get_redis()
+    try:
+        removed = await redis.eval(
+            _CANCEL_SCRIPT,
+            3,
+            user_index_key(user_id, kind),
+            DUE_KEY,
+            job_key(job_id),
+            job_id,
+        )
+    finally:
+        await redis.aclose()
+    return bool(removed)
+
+
+async def cancel_user_jobs(user_id: int, kind: str) -> int:
+    """Cancel every pending job of one kind for a user."""
+    redis = await _get_redis()
+    try:
+        index_key = user_index_key(user_id, kind)
+        job_ids = await redis.zrange(index_key, 0, -1)
+        cancelled = 0
+        for job_id in job_ids:
+            cancelled += int(
+                await redis.eval(
+                    _CANCEL_SCRIPT, 3, index_key, DUE_KEY, job_key(job_id), job_id
+                )
+                or 0
+            )
+        return cancelled
+    finally:
+        await redis.aclose()
+
+
+async def _ack(redis, job_id: str, user_id: int, kind: str) -> None:
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.zrem(PROCESSING_KEY, job_id)
+        pipe.zrem(user_index_key(user_id, kind), job_id)
+        pipe.delete(job_key(job_id))
+        pipe.set(done_key(job_id), "1", ex=app_settings.DELAYED_QUEUE_DONE_TTL_SECONDS)
+        await pipe.execute()
+
+
+async def _run_job(kind: str, user_id: int, args: dict) -> None:
+    from . import jobs
+
+    if kind == "reminder":
+        await jobs.send_one_off_reminder_job(
+            user_id, args["chat_id"], args["message_text"]
+        )
+    elif kind == "proactive_touch":
+        await jobs.proactive_touch_job(
+            user_id, args["touch_type"], args["prompt"], args.get("reason", "")
+        )
+    elif kind == "planner_refresh":
+        from .planner_fanout import get_planner_fanout
+
+        # Requested by a chat message: the user is active right now.
+        await get_planner_fanout().submit(user_id, 0)
+    else:
+        logger.warning("Delayed queue: unknown job kind {}", kind)
+
+
+class DelayedJobPoller:
+    """Claims due jobs and runs them; one per scheduler process."""
+
+    def __init__(self) -> None:
+        self._tasks: set[asyncio.Task] = set()
+
+    async def run(self) -> None:
+        redis = await _get_redis()
+        try:
+            while True:
+                try:
+                    await self.tick(redis)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as exc:
+                    logger.error("Delayed queue poll failed: {}", exc)
+                await asyncio.sleep(max(0.2, app_settings.DELAYED_QUEUE_POLL_SECONDS))
+        finally:
+            await redis.aclose()
+
+    async def tick(self, redis, now: float | None = None) -> int:
+        now = time.time() if now is None else now
+        raw = await redis.eval(
+            _CLAIM_SCRIPT,
+            2,
+            DUE_KEY,
+            PROCESSING_KEY,
+            now,
+            now + app_settings.DELAYED_QUEUE_LEASE_SECONDS,
+            max(1, app_settings.DELAYED_QUEUE_CLAIM_BATCH),
+        )
+        claimed = 0
+        for index in range(0, len(raw or []), 2):
+            job_id, payload = raw[index:index + 2]
+            try:
+                job = json.loads(payload)
+            except (TypeError, json.JSONDecodeError):
+                await redis.zrem(PROCESSING_KEY, job_id)
+                continue
+            task = asyncio.create_task(self._execute(redis, job_id, job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            claimed += 1
+        return claimed
+
+    async def _execute(self, redis, job_id: str, job: dict) -> None:
+        kind = job.get("kind", "")
+        user_id = int(job.get("user_id", 0))
+        try:
+            await _run_job(kind, user_id, job.get("args") or {})
+        except Exception as exc:
+            # Left unacked: the lease expires and the job is claimed again.
+            logger.exception("Delayed job {} failed: {}", job_id, exc)
+            return
+        await _ack(redis, job_id, user_id, kind)
+
+
+def start_delayed_job_poller() -> asyncio.Task:
+    """Start the process-wide poller once; later calls return the running task."""
+    global _poller_task
+    if _poller_task is None or _poller_task.done():
+        _poller_task = asyncio.create_task(DelayedJobPoller().run())
+        logger.info("Delayed job poller started")
+    return _poller_task
+
+
+async def stop_delayed_job_poller() -> None:
+    global _poller_task
+    task, _poller_task = _poller_task, None
+    if task is None or task.done():
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+async def _get_redis():
+    from redis.asyncio import Redis
+
+    return Redis.from_url(app_settings.REDIS_URL, decode_responses=True)
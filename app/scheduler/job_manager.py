@@ -1,18 +1,40 @@
 from __future__ import annotations
-from datetime import datetime, timedelta, timezone
-from zoneinfo import ZoneInfo
+import time
+from datetime import timezone
 from loguru import logger
 from apscheduler.triggers.cron import CronTrigger
-from apscheduler.triggers.date import DateTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
 from ..models.users import User
 from ..models.settings import UserSettings
+from .delayed_queue import cancel_user_jobs
+from .job_registry import (
+    parse_job_id,
+    reconcile_job_registry,
+    remove_user_jobs_by_prefix,
+)
+from .planner_refresh import get_planner_refresh_debouncer
+from .recurring_dispatcher import reconcile_recurring_schedules, refresh_user_schedule
 from .scheduler_instance import scheduler
 from ..config import settings as app_settings
 
+# Per-user cron jobs replaced by the recurring dispatcher (removed on startup).
+LEGACY_RECURRING_PREFIXES = frozenset(
+    {
+        "morning",
+        "evening",
+        "weekly",
+        "monthly",
+        "news_digest",
+        "channel_batch",
+        "proactive_planner",
+        "trigger",
+    }
+)
+
+
 class JobManager:
     """
     Manages per-user scheduled jobs.
@@ -31,20 +53,28 @@ class JobManager:
 
     GLOBAL_JOB_IDS = [
         "userbot_followup_check",
+        "userbot_channel_batch_sweep",
+        "job_registry_reconcile",
+        "recurring_dispatch",
     ]
 
     @staticmethod
-    def schedule_user_jobs(user: User, settings: UserSettings):
+    async def schedule_user_jobs(
+        session: AsyncSession, user: User, settings: UserSettings
+    ) -> None:
         """
-        Schedule or reschedule all jobs for a user based on their timezone and preferences.
+        Refresh a user's recurring schedule after a timezone or preference change.
+
+        Planner, news digest, habit reminders and custom triggers are fired by
+        the minute-bucket dispatcher from their next_fire_utc columns, so this
+        only recomputes those columns (and commits) and drops any per-user
+        job store entries left from the cron-job era.
         """
         if not user.user_timezone:
-            logger.warning("User {} has no timezone; skipping job scheduling", user.id)
-            return
+            # Every next_fire_utc column resolves to None without a timezone,
+            # so the refresh below clears the user's recurring schedule.
+            logger.warning("User {} has no timezone; clearing recurring schedule", user.id)
 
-        tz = ZoneInfo(user.user_timezone)
-        
-        # Remove existing deterministic jobs for this user before rescheduling.
         # Legacy morning/evening/weekly/monthly jobs are intentionally removed:
         # smart proactive planning schedules one-off touches instead.
         for prefix in JobManager.USER_JOB_PREFIXES:
@@ -52,249 +82,182 @@ class JobManager:
             if scheduler.get_job(job_id):
                 scheduler.remove_job(job_id)
                 logger.debug("Removed existing job {} before rescheduling", job_id)
-        for job in scheduler.get_jobs():
-            if job.id.startswith(f"proactive_touch_{user.id}_"):
-                scheduler.remove_job(job.id)
-                logger.debug("Removed existing job {} before rescheduling", job.id)
-
-        # Daily smart proactive planner. The LLM decides whether anything should
-        # actually be sent today/tomorrow; this cron only gives it a chance to plan.
-        planner_job_id = f"proactive_planner_{user.id}"
-        if getattr(settings, "enable_smart_proactivity", True):
-            planner_time = user.wake_time or getattr(settings, "morning_window_start", None)
-            planner_hour = planner_time.hour if planner_time else 9
-            planner_minute = planner_time.minute if planner_time else 0
-            scheduler.add_job(
-                func="app.scheduler.jobs:proactive_planner_job",
-                trigger=CronTrigger(hour=planner_hour, minute=planner_minute, timezone=tz),
-                id=planner_job_id,
-                args=[user.id],
-                replace_existing=True,
-            )
-            logger.info(
-                "Scheduled smart proactive planner for user {} at {:02d}:{:02d}",
-                user.id,
-                planner_hour,
-                planner_minute,
-            )
-        else:
-            logger.info("Smart proactive planner not scheduled for user {} (disabled)", user.id)
-
-        # News digest (wake_time + NEWS_DIGEST_OFFSET_MINUTES, if enabled and wake_time is set)
-        job_id = f"news_digest_{user.id}"
-        if settings.enable_news_digest and user.wake_time:
-            from datetime import datetime, timedelta
+        for job_id in remove_user_jobs_by_prefix(scheduler, user.id, "proactive_touch"):
+            logger.debug("Removed existing job {} before rescheduling", job_id)
+        await cancel_user_jobs(user.id, "proactive_touch")
 
-            wake_dt = datetime.combine(datetime.today(), user.wake_time)
-            digest_dt = wake_dt + timedelta(
-                minutes=app_settings.NEWS_DIGEST_OFFSET_MINUTES
-            )
-            scheduler.add_job(
-                func="app.scheduler.jobs:news_digest_job",
-                trigger=CronTrigger(
-                    hour=digest_dt.hour,
-                    minute=digest_dt.minute,
-                    timezone=tz,
-                ),
-                id=job_id,
-                args=[user.id],
-                replace_existing=True,
-            )
-            logger.info(
-                "Scheduled news digest for user {} at {:02d}:{:02d} ({}m after wake at {})",
-                user.id,
-                digest_dt.hour,
-                digest_dt.minute,
-                app_settings.NEWS_DIGEST_OFFSET_MINUTES,
-                user.wake_time,
-            )
-        else:
-            logger.info(
-                "News digest not scheduled for user {} (disabled or wake_time not set)",
-                user.id,
-            )
-
-        # Channel batch digest flush (periodic, if channel monitoring is enabled)
-        job_id = f"channel_batch_{user.id}"
-        if getattr(settings, "enable_channel_monitoring", False):
-            flush_hours = app_settings.USERBOT_CHANNEL_BATCH_FLUSH_HOURS
-            scheduler.add_job(
-                func="app.scheduler.jobs:channel_batch_flush_job",
-                trigger=CronTrigger(
-                    hour=f"*/{flush_hours}",
-                    minute=0,
-                    timezone=tz,
-                ),
-                id=job_id,
-                args=[user.id],
-                replace_existing=True,
-            )
-            logger.info(
-                "Scheduled channel batch flush for user {} every {}h",
-                user.id, flush_hours,
-            )
-        else:
-            logger.info(
-                "Channel batch flush not scheduled for user {} (channel monitoring disabled)",
-                user.id,
-            )
+        await refresh_user_schedule(session, user, settings)
+        await session.commit()
+        logger.info(
+            "Refreshed recurring schedule for user {} (planner {}, news digest {})",
+            user.id,
+            settings.planner_next_fire_utc,
+            settings.news_digest_next_fire_utc,
+        )
 
     @staticmethod
     def schedule_planner_refresh(user_id: int, delay_minutes: int = 15) -> None:
-        """Schedule a near-future planner run after meaningful user interaction."""
-        job_id = f"proactive_planner_refresh_{user_id}"
-        run_at = datetime.now(timezone.utc) + timedelta(minutes=delay_minutes)
-        scheduler.add_job(
-            func="app.scheduler.jobs:proactive_planner_job",
-            trigger=DateTrigger(run_date=run_at, timezone=timezone.utc),
-            id=job_id,
-            args=[user_id],
-            replace_existing=True,
-        )
-        logger.debug("Scheduled proactive planner refresh for user {} at {}", user_id, run_at)
+        """Request a near-future planner run after meaningful user interaction (debounced)."""
+        if get_planner_refresh_debouncer().request(user_id, delay_minutes * 60):
+            logger.debug("Requested proactive planner refresh for user {} in {} min", user_id, delay_minutes)
 
     @staticmethod
-    def remove_user_jobs(user_id: int):
+    async def remove_user_jobs(user_id: int):
         """Remove all jobs for a user."""
         for prefix in JobManager.USER_JOB_PREFIXES:
             job_id = f"{prefix}_{user_id}"
             if scheduler.get_job(job_id):
                 scheduler.remove_job(job_id)
                 logger.info("Removed job {}", job_id)
-        for job in scheduler.get_jobs():
-            if job.id.startswith(f"proactive_touch_{user_id}_"):
-                scheduler.remove_job(job.id)
-                logger.info("Removed job {}", job.id)
+        for kind in ("proactive_touch", "reminder", "planner_refresh"):
+            cancelled = await cancel_user_jobs(user_id, kind)
+            for job_id in remove_user_jobs_by_prefix(scheduler, user_id, kind):
+                logger.info("Removed job {}", job_id)
+            if cancelled:
+                logger.info("Cancelled {} queued {} job(s) for user {}", cancelled, kind, user_id)
 
     @staticmethod
-    async def reschedule_all_user_jobs(session: AsyncSession) -> int:
-        """Rebuild per-user jobs on startup and remove legacy fixed proactive jobs."""
-        from sqlmodel import select
+    async def reschedule_all_user_jobs(session: AsyncSession) -> dict[str, int]:
+        """
+        Startup reconcile: diff global jobs, legacy job store entries and every
+        user's recurring schedule against the desired state and write only what
+        changed. Returns the per-outcome counts of the recurring schedule.
+        """
+        started = time.monotonic()
+        # One job store scan serves the global-job diff, the legacy cleanup and
+        # the registry repair.
+        jobs = scheduler.get_jobs()
+        global_counts = JobManager.schedule_global_jobs(
+            existing={job.id: job for job in jobs}
+        )
+        removed = JobManager.remove_legacy_recurring_jobs(jobs)
+        if removed:
+            removed_ids = set(removed)
+            jobs = [job for job in jobs if job.id not in removed_ids]
+        try:
+            reconcile_job_registry(scheduler, jobs)
+        except Exception as exc:
+            logger.warning("Job registry reconcile failed on startup: {}", exc)
 
-        JobManager.schedule_global_jobs()
+        counts = await reconcile_recurring_schedules(session)
+        await session.commit()
+        logger.info(
+            "Startup reschedule in {:.2f}s: schedules added={} removed={} moved={} "
+            "unchanged={}; global jobs written={} unchanged={}; {} legacy job(s) removed",
+            time.monotonic() - started,
+            counts["added"],
+            counts["removed"],
+            counts["moved"],
+            counts["unchanged"],
+            global_counts["written"],
+            global_counts["unchanged"],
+            len(removed),
+        )
+        return counts
 
-        result = await session.execute(select(User))
-        users = list(result.scalars().all())
-        count = 0
-        for user in users:
-            result = await session.execute(
-                select(UserSettings).where(UserSettings.user_id == user.id)
+    @staticmethod
+    def remove_legacy_recurring_jobs(jobs: list | None = None) -> list[str]:
+        """Drop per-user cron jobs now served by the recurring dispatcher."""
+        removed = []
+        for job in scheduler.get_jobs() if jobs is None else jobs:
+            parsed = parse_job_id(job.id)
+            legacy = job.id.startswith("habit_reminder_") or (
+                parsed is not None and parsed[0] in LEGACY_RECURRING_PREFIXES
             )
-            user_settings = result.scalar_one_or_none()
-            if not user_settings:
+            if not legacy:
+                continue
+            try:
+                scheduler.remove_job(job.id)
+                removed.append(job.id)
+            except Exception:
                 continue
-            JobManager.schedule_user_jobs(user, user_settings)
-            count += 1
-        logger.info("Rescheduled jobs for {} user(s)", count)
-        return count
+        return removed
+
+    @staticmethod
+    def _ensure_global_job(func: str, trigger, job_id: str, existing: dict | None) -> bool:
+        """Add or replace a global job unless an identical one is stored; True if written."""
+        job = existing.get(job_id) if existing is not None else scheduler.get_job(job_id)
+        if job is not None and job.func_ref == func and str(job.trigger) == str(trigger):
+            return False
+        scheduler.add_job(func=func, trigger=trigger, id=job_id, replace_existing=True)
+        return True
 
     @staticmethod
-    def schedule_global_jobs() -> None:
-        """Schedule global periodic jobs owned by JobManager."""
-        job_id = "userbot_followup_check"
-        scheduler.add_job(
-            func="app.scheduler.jobs:userbot_followup_check_job",
-            trigger=IntervalTrigger(
+    def schedule_global_jobs(existing: dict | None = None) -> dict[str, int]:
+        """
+        Schedule global periodic jobs owned by JobManager. Jobs already stored
+        with the same function and trigger are left untouched; *existing* maps
+        job id to job from a scan the caller already made.
+        """
+        counts = {"written": 0, "unchanged": 0}
+
+        def ensure(func: str, trigger, job_id: str, description: str) -> None:
+            if JobManager._ensure_global_job(func, trigger, job_id, existing):
+                counts["written"] += 1
+                logger.info("Scheduled {}", description)
+            else:
+                counts["unchanged"] += 1
+
+        ensure(
+            "app.scheduler.jobs:userbot_followup_check_job",
+            IntervalTrigger(
                 minutes=app_settings.USERBOT_FOLLOWUP_CHECK_INTERVAL_MINUTES,
                 timezone=timezone.utc,
             ),
-            id=job_id,
-            replace_existing=True,
+            "userbot_followup_check",
+            f"userbot follow-up check every "
+            f"{app_settings.USERBOT_FOLLOWUP_CHECK_INTERVAL_MINUTES} minute(s)",
         )
-        logger.info(
-            "Scheduled userbot follow-up check every {} minute(s)",
-            app_settings.USERBOT_FOLLOWUP_CHECK_INTERVAL_MINUTES,
+        ensure(
+            "app.scheduler.jobs:channel_batch_sweep_job",
+            IntervalTrigger(
+                minutes=app_settings.USERBOT_CHANNEL_SWEEP_INTERVAL_MINUTES,
+                timezone=timezone.utc,
+            ),
+            "userbot_channel_batch_sweep",
+            f"channel batch sweep every "
+            f"{app_settings.USERBOT_CHANNEL_SWEEP_INTERVAL_MINUTES} minute(s)",
         )
-
-        scheduler.add_job(
-            func="app.scheduler.jobs:userbot_health_check_job",
-            trigger=IntervalTrigger(minutes=10, timezone=timezone.utc),
-            id="userbot_health_check",
-            replace_existing=True,
+        ensure(
+            "app.scheduler.jobs:userbot_health_check_job",
+            IntervalTrigger(minutes=10, timezone=timezone.utc),
+            "userbot_health_check",
+            "userbot health check every 10 minute(s)",
+        )
+        ensure(
+            "app.scheduler.jobs:job_registry_reconcile_job",
+            CronTrigger(hour=3, minute=15, timezone=timezone.utc),
+            "job_registry_reconcile",
+            "job registry reconcile at 03:15 UTC",
         )
-        logger.info("Scheduled userbot health check every 10 minute(s)")
+        ensure(
+            "app.scheduler.jobs:recurring_dispatch_job",
+            CronTrigger(minute="*", timezone=timezone.utc),
+            "recurring_dispatch",
+            "recurring dispatcher every minute",
+        )
+        return counts
 
     @staticmethod
     async def schedule_user_triggers(session: AsyncSession, user: User):
-        """Schedule or reschedule all active custom triggers for a user."""
-        from ..models.user_trigger import UserTrigger
-        from sqlmodel import select
-
+        """Refresh next_fire_utc of the user's custom triggers (commits)."""
         if not user.user_timezone:
             logger.warning("User {} has no timezone; skipping trigger scheduling", user.id)
             return
 
-        tz = ZoneInfo(user.user_timezone)
-
-        # Remove all existing trigger jobs for this user
-        for job in scheduler.get_jobs():
-            if job.id.startswith(f"trigger_{user.id}_"):
-                scheduler.remove_job(job.id)
-
-        # Schedule active triggers
-        result = await session.execute(
-            select(UserTrigger).where(
-                UserTrigger.user_id == user.id,
-                UserTrigger.active == True,  # noqa: E712
-            )
-        )
-        triggers = list(result.scalars().all())
-
-        for trigger in triggers:
-            job_id = f"trigger_{user.id}_{trigger.id}"
-            cron_kwargs: dict = dict(
-                hour=trigger.cron_hour,
-                minute=trigger.cron_minute,
-                timezone=tz,
-            )
-            if trigger.cron_weekdays:
-                cron_kwargs["day_of_week"] = trigger.cron_weekdays
-
-            scheduler.add_job(
-                func="app.scheduler.jobs:custom_trigger_job",
-                trigger=CronTrigger(**cron_kwargs),
-                id=job_id,
-                args=[user.id, trigger.id],
-                replace_existing=True,
-            )
-            logger.info(
-                "Scheduled custom trigger {} for user {} at {:02d}:{:02d}",
-                trigger.id, user.id, trigger.cron_hour, trigger.cron_minute,
-            )
+        # Custom triggers are fired by the recurring dispatcher; drop legacy jobs.
+        remove_user_jobs_by_prefix(scheduler, user.id, "trigger")
+        await refresh_user_schedule(session, user, None)
+        await session.commit()
+        logger.info("Refreshed custom trigger schedule for user {}", user.id)
 
     @staticmethod
     async def schedule_habit_reminders(session: AsyncSession, user_id: int):
-        """
-        Schedule daily reminders for user's active habits with reminder_time set.
-        """
-        from ..services.habit_service import HabitService
-        from ..models.users import User
-        
+        """Refresh next_fire_utc of the user's habit reminders (commits)."""
         user = await session.get(User, user_id)
         if not user or not user.user_timezone:
             return
-        
-        habits = await HabitService.list_habits(session, user_id, active_only=True)
-        
-        from zoneinfo import ZoneInfo
-        tz = ZoneInfo(user.user_timezone)
-        
-        for habit in habits:
-            if habit.reminder_enabled and habit.reminder_time:
-                job_id = f"habit_reminder_{habit.id}"
-                
-                if scheduler.get_job(job_id):
-                    scheduler.remove_job(job_id)
-                
-                scheduler.add_job(
-                    func="app.scheduler.jobs:habit_reminder_job",
-                    trigger=CronTrigger(
-                        hour=habit.reminder_time.hour,
-                        minute=habit.reminder_time.minute,
-                        timezone=tz
-                    ),
-                    id=job_id,
-                    args=[habit.id],
-                    replace_existing=True,
-                )
-                logger.info("Scheduled reminder for habit {} at {}", habit.id, habit.reminder_time)
+
+        await refresh_user_schedule(session, user, None)
+        await session.commit()
+        logger.info("Refreshed habit reminder schedule for user {}", user_id)
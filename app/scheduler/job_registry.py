@@ -0,0 +1,178 @@
+"""
+Per-user index of APScheduler job ids.
+
+With the SQLAlchemy job store, ``scheduler.get_jobs()`` loads and unpickles
+every job in the table, so filtering it by id prefix costs O(all jobs) per
+call. Instead, user-scoped job ids (``{prefix}_{user_id}[_...]``) are kept in
+the ``sched_user_jobs:{user_id}`` Redis set:
+
+* a scheduler listener adds ids on EVENT_JOB_ADDED and drops them on
+  EVENT_JOB_REMOVED (explicit removals and finished date jobs alike);
+* prefix lookups read that one set and fetch only the listed jobs, pruning ids
+  whose job is gone;
+* ``reconcile_job_registry`` rebuilds every set from one full scan and is run
+  at startup and daily to repair drift.
+
+The job store itself is synchronous, so the index uses the synchronous Redis
+client too. If Redis is unavailable, lookups fall back to the full scan.
+"""
+from __future__ import annotations
+
+import re
+
+from apscheduler.events import EVENT_JOB_ADDED, EVENT_JOB_REMOVED
+from loguru import logger
+
+from ..config import settings as app_settings
+
+# Prefixes of job ids that belong to one user and are looked up per user.
+INDEXED_PREFIXES = frozenset(
+    {
+        "morning",
+        "evening",
+        "weekly",
+        "monthly",
+        "news_digest",
+        "channel_batch",
+        "proactive_planner",
+        "proactive_planner_refresh",
+        "proactive_touch",
+        "reminder",
+        "trigger",
+        "insight",
+        "premium_taste",
+    }
+)
+
+_KEY_PREFIX = "sched_user_jobs:"
+_JOB_ID_RE = re.compile(r"^(?P<prefix>[a-z_]+?)_(?P<user_id>\d+)(?:_|$)")
+
+_redis = None
+
+
+def user_jobs_key(user_id: int) -> str:
+    return f"{_KEY_PREFIX}{user_id}"
+
+
+def parse_job_id(job_id: str) -> tuple[str, int] | None:
+    """Return ``(prefix, user_id)`` for an indexed job id, else None."""
+    match = _JOB_ID_RE.match(job_id or "")
+    if not match or match.group("prefix") not in INDEXED_PREFIXES:
+        return None
+    return match.group("prefix"), int(match.group("user_id"))
+
+
+def _get_redis():
+    """Lazy synchronous Redis connection."""
+    global _redis
+    if _redis is None:
+        from redis import Redis
+
+        _redis = Redis.from_url(
+            app_settings.REDIS_URL, decode_responses=True, socket_timeout=2
+        )
+    return _redis
+
+
+def on_job_event(event) -> None:
+    """APScheduler listener keeping the index in step with the job store."""
+    parsed = parse_job_id(event.job_id)
+    if parsed is None:
+        return
+    _, user_id = parsed
+    try:
+        if event.code == EVENT_JOB_ADDED:
+            _get_redis().sadd(user_jobs_key(user_id), event.job_id)
+        elif event.code == EVENT_JOB_REMOVED:
+            _get_redis().srem(user_jobs_key(user_id), event.job_id)
+    except Exception as exc:
+        logger.warning("Job registry update failed for {}: {}", event.job_id, exc)
+
+
+def get_user_jobs(scheduler, user_id: int, prefix: str) -> list:
+    """Jobs of one user whose id starts with ``{prefix}_{user_id}``."""
+    try:
+        job_ids = _get_redis().smembers(user_jobs_key(user_id))
+    except Exception as exc:
+        logger.warning("Job registry unavailable, scanning all jobs: {}", exc)
+        return [
+            job
+            for job in scheduler.get_jobs()
+            if parse_job_id(job.id) == (prefix, user_id)
+        ]
+
+    jobs = []
+    stale = []
+    for job_id in sorted(job_ids):
+        if parse_job_id(job_id) != (prefix, user_id):
+            continue
+        job = scheduler.get_job(job_id)
+        if job is None:
+            stale.append(job_id)
+        else:
+            jobs.append(job)
+    if stale:
+        try:
+            _get_redis().srem(user_jobs_key(user_id), *stale)
+        except Exception as exc:
+            logger.debug("Could not prune stale job ids for user {}: {}", user_id, exc)
+    return jobs
+
+
+def remove_user_jobs_by_prefix(scheduler, user_id: int, prefix: str) -> list[str]:
+    """Remove every job of one user with the given prefix; returns removed ids."""
+    removed = []
+    for job in get_user_jobs(scheduler, user_id, prefix):
+        try:
+            scheduler.remove_job(job.id)
+        except Exception:
+            # Already fired or removed concurrently.
+            continue
+        removed.append(job.id)
+    return removed
+
+
+def reconcile_job_registry(scheduler, jobs: list | None = None) -> dict[str, int]:
+    """
+    Rebuild the index from one full job scan (or the already scanned *jobs*);
+    returns repair counts.
+    """
+    expected: dict[int, set[str]] = {}
+    for job in scheduler.get_jobs() if jobs is None else jobs:
+        parsed = parse_job_id(job.id)
+        if parsed is not None:
+            expected.setdefault(parsed[1], set()).add(job.id)
+
+    redis = _get_redis()
+    indexed_users = {
+        int(key[len(_KEY_PREFIX):])
+        for key in redis.scan_iter(match=f"{_KEY_PREFIX}*", count=500)
+        if key[len(_KEY_PREFIX):].isdigit()
+    }
+
+    user_ids = sorted(indexed_users | set(expected))
+    with redis.pipeline(transaction=False) as pipe:
+        for user_id in user_ids:
+            pipe.smembers(user_jobs_key(user_id))
+        current = pipe.execute()
+
+    repaired = 0
+    with redis.pipeline(transaction=False) as pipe:
+        for user_id, members in zip(user_ids, current):
+            key = user_jobs_key(user_id)
+            wanted = expected.get(user_id, set())
+            if set(members) == wanted:
+                continue
+            repaired += 1
+            pipe.delete(key)
+            if wanted:
+                pipe.sadd(key, *wanted)
+        pipe.execute()
+
+    if repaired:
+        logger.warning("Job registry repaired for {} user(s)", repaired)
+    return {"users": len(expected), "repaired": repaired}
+
+
+def register_job_listener(scheduler) -> None:
+    scheduler.add_listener(on_job_event, EVENT_JOB_ADDED | EVENT_JOB_REMOVED)
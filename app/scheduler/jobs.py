@@ -1,7 +1,5 @@
 from __future__ import annotations
 from datetime import datetime, timedelta, timezone
-from aiogram import Bot
-from aiogram.client.default import DefaultBotProperties
 from loguru import logger
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select, delete
@@ -16,6 +14,7 @@ from ..models.working_memory import WorkingMemory, WorkingEmbedding
 from ..services.proactive_flows import ProactiveFlows
 from ..models.user_trigger import UserTrigger
 from ..config import settings
+from ..services.telegram_delivery import deliver, deliver_many
 from ..utils.telegram_topics import topic_kwargs_for_user
 
 
@@ -165,9 +164,8 @@ async def send_one_off_reminder_job(user_id: int, chat_id: int, message_text: st
         if not user:
             logger.warning("User {} not found for one-off reminder", user_id)
             return
-        bot = get_bot_instance()
-        await bot.send_message(chat_id, message_text, **topic_kwargs_for_user(user))
-        logger.info("Sent one-off reminder to user {} in chat {}", user_id, chat_id)
+        await deliver(chat_id, message_text, **topic_kwargs_for_user(user))
+        logger.info("Queued one-off reminder for user {} in chat {}", user_id, chat_id)
     except Exception as e:
         logger.exception("Error in send_one_off_reminder_job for user {}: {}", user_id, e)
         await session.rollback()
@@ -175,15 +173,28 @@ async def send_one_off_reminder_job(user_id: int, chat_id: int, message_text: st
         await session.close()
 
 
+def _break_mode_until(user_settings: UserSettings | None) -> datetime | None:
+    until = user_settings.break_mode_until if user_settings else None
+    if until and until.tzinfo is None:
+        until = until.replace(tzinfo=timezone.utc)
+    return until
+
+
+def _in_break_mode(user_settings: UserSettings | None, now: datetime) -> bool:
+    """Break mode check on prefetched settings (an expired break counts as off)."""
+    if not user_settings or not user_settings.break_mode_active:
+        return False
+    until = _break_mode_until(user_settings)
+    return until is None or until > now
+
+
 async def _is_break_mode_active(session: AsyncSession, user_id: int) -> bool:
     """Check if user is in break mode."""
     result = await session.execute(select(UserSettings).where(UserSettings.user_id == user_id))
     user_settings = result.scalar_one_or_none()
     if not user_settings or not user_settings.break_mode_active:
         return False
-    until = user_settings.break_mode_until
-    if until and until.tzinfo is None:
-        until = until.replace(tzinfo=timezone.utc)
+    until = _break_mode_until(user_settings)
     now = datetime.now(timezone.utc)
     if until and until > now:
         return True
@@ -216,18 +227,13 @@ async def habit_reminder_job(habit_id: int):
         user = await session.get(User, habit.user_id)
         if not user:
             return
-        bot = get_bot_instance()
         message = (
             f"\u23f0 Habit Reminder: <b>{habit.name}</b>\n\n"
             f"Don't forget! Current streak: {habit.current_streak} \U0001f525\n"
             f"Reply with /log_habit {habit.id} to mark as done."
         )
-        await bot.send_message(
-            user.tg_chat_id,
-            message,
-            **topic_kwargs_for_user(user),
-        )
-        logger.info("Sent habit reminder for habit {} to user {}", habit_id, user.id)
+        await deliver(user.tg_chat_id, message, **topic_kwargs_for_user(user))
+        logger.info("Queued habit reminder for habit {} to user {}", habit_id, user.id)
     except Exception as e:
         logger.exception("Error in habit_reminder_job for habit {}: {}", habit_id, e)
         await session.rollback()
@@ -235,8 +241,21 @@ async def habit_reminder_job(habit_id: int):
         await session.close()
 
 
+async def channel_batch_sweep_job():
+    """Flush every pending channel batch whose local flush boundary has passed."""
+    try:
+        from ..services.userbot_channel_batch import sweep_channel_batches
+
+        await sweep_channel_batches(get_bot_instance())
+    except Exception as e:
+        logger.exception("Error in channel_batch_sweep_job: {}", e)
+
+
 async def channel_batch_flush_job(user_id: int):
-    """Flush accumulated medium-priority channel posts as a compact digest."""
+    """
+    Legacy per-user flush job. Kept so jobs persisted before the global sweeper
+    still resolve until schedule_user_jobs removes them.
+    """
     logger.info("Running channel batch flush for user {}", user_id)
     session = AsyncSessionLocal()
     try:
@@ -370,6 +389,22 @@ async def premium_taste_job(user_id: int):
         logger.exception("Error in premium_taste_job for user {}: {}", user_id, e)
 
 
+async def _load_users_with_settings(
+    session: AsyncSession, user_ids: list[int]
+) -> list[tuple[User, UserSettings | None]]:
+    """Users and their settings in one query per chunk of ids."""
+    rows: list[tuple[User, UserSettings | None]] = []
+    chunk = max(1, settings.SCHEDULED_SEND_PREFETCH_CHUNK)
+    for start in range(0, len(user_ids), chunk):
+        result = await session.execute(
+            select(User, UserSettings)
+            .outerjoin(UserSettings, UserSettings.user_id == User.id)
+            .where(User.id.in_(user_ids[start:start + chunk]))
+        )
+        rows.extend(result.all())
+    return rows
+
+
 async def memory_decay_warning_job():
     """Check for decaying working memories and send gentle notifications."""
     from ..config import settings as app_settings
@@ -378,38 +413,33 @@ async def memory_decay_warning_job():
     logger.info("Running memory decay warning job")
     session = AsyncSessionLocal()
     try:
-        warning_cutoff = (datetime.now(timezone.utc) + timedelta(days=2)).date()
-        today = datetime.now(timezone.utc).date()
+        now = datetime.now(timezone.utc)
+        warning_cutoff = (now + timedelta(days=2)).date()
+        today = now.date()
         result = await session.execute(
-            select(WorkingMemory).where(
+            select(WorkingMemory.user_id)
+            .where(
                 WorkingMemory.decay_date.is_not(None),
                 WorkingMemory.decay_date <= warning_cutoff,
                 WorkingMemory.decay_date > today,
                 WorkingMemory.working_memory_text.is_not(None),
             )
+            .distinct()
+        )
+        user_ids = sorted(result.scalars().all())
+        text = (
+            "🧠 Some of your recent context is fading from my working memory. "
+            "Chat with me today to keep it fresh!"
+        )
+        messages = [
+            (user.tg_chat_id, text, topic_kwargs_for_user(user))
+            for user, user_settings in await _load_users_with_settings(session, user_ids)
+            if not _in_break_mode(user_settings, now)
+        ]
+        queued = await deliver_many(messages)
+        logger.info(
+            "Memory decay warnings: {} user(s) due, {} queued", len(user_ids), len(queued)
         )
-        entries = result.scalars().all()
-        warned_users = set()
-        for entry in entries:
-            if entry.user_id in warned_users:
-                continue
-            if await _is_break_mode_active(session, entry.user_id):
-                continue
-            user = await session.get(User, entry.user_id)
-            if not user:
-                continue
-            bot = Bot(token=settings.TELEGRAM_BOT_TOKEN, default=DefaultBotProperties(parse_mode="HTML"))
-            try:
-                await bot.send_message(
-                    user.tg_chat_id,
-                    "🧠 Some of your recent context is fading from my working memory. "
-                    "Chat with me today to keep it fresh!",
-                    **topic_kwargs_for_user(user),
-                )
-            finally:
-                await bot.session.close()
-            warned_users.add(entry.user_id)
-            logger.info("Sent memory decay warning to user {}", entry.user_id)
     except Exception as e:
         logger.exception("Error in memory_decay_warning_job: {}", e)
     finally:
@@ -423,6 +453,14 @@ async def userbot_health_check_job():
     from ..models.userbot_session import UserBotSession
     from sqlmodel import select
 
+    if not settings.USERBOT_RUN_IN_APP:
+        # Shard workers restart their own clients on every rebalance.
+        return
+    if UserBotManager.startup_progress().get("state") in ("idle", "starting"):
+        # "idle": clients run in another process (e.g. this is the scheduler
+        # worker), so there is nothing local to restart.
+        return
+
     bot = get_bot_instance()
     try:
         async with get_session() as session:
@@ -436,41 +474,56 @@ async def userbot_health_check_job():
                 for row in rows
             ]
 
-        restarted = 0
+        down: list[tuple[int, str]] = []
         for data in sessions_data:
             user_id = data["user_id"]
-            session_string = data["session_string"]
-            client = UserBotManager.get_client(user_id)
-            is_connected = False
-            if client:
-                try:
-                    is_connected = await client.is_connected()
-                except Exception:
-                    pass
-
-            if not is_connected:
-                logger.warning(
-                    "Userbot health check: user {} client is down, restarting", user_id
-                )
-                await UserBotManager.stop_client(user_id)
-                try:
-                    await UserBotManager.start_client(
-                        user_id=user_id,
-                        session_string=session_string,
-                        bot=bot,
-                    )
-                    restarted += 1
-                except Exception as exc:
-                    logger.error(
-                        "Userbot health check: failed to restart user {}: {}", user_id, exc
-                    )
-
-        if restarted:
-            logger.info("Userbot health check: restarted {} client(s)", restarted)
+            if await UserBotManager.is_client_connected(user_id):
+                continue
+            logger.warning(
+                "Userbot health check: user {} client is down, restarting", user_id
+            )
+            down.append((user_id, data["session_string"]))
+
+        if down:
+            counts = await UserBotManager.start_many(down, bot, restart=True)
+            logger.info(
+                "Userbot health check: restarted {} client(s), {} failed, {} in backoff",
+                counts["started"],
+                counts["failed"],
+                counts["deferred"],
+            )
     except Exception as exc:
         logger.exception("Error in userbot_health_check_job: {}", exc)
 
 
+async def recurring_dispatch_job():
+    """Start every habit reminder, trigger, planner and news digest due this minute."""
+    from .recurring_dispatcher import dispatch_due_recurring
+
+    try:
+        counts = await dispatch_due_recurring()
+        if counts:
+            logger.info("Recurring dispatch: {}", counts)
+    except Exception as exc:
+        logger.exception("Error in recurring_dispatch_job: {}", exc)
+
+
+async def job_registry_reconcile_job():
+    """Repair drift between the per-user job index and the job store."""
+    from .job_registry import reconcile_job_registry
+    from .scheduler_instance import scheduler
+
+    try:
+        counts = reconcile_job_registry(scheduler)
+        logger.info(
+            "Job registry reconciled: {} user(s) indexed, {} repaired",
+            counts["users"],
+            counts["repaired"],
+        )
+    except Exception as exc:
+        logger.exception("Error in job_registry_reconcile_job: {}", exc)
+
+
 async def archive_raw_conversations_job():
     """Archive raw conversation history from Redis to Episodes."""
     logger.info("Running archive_raw_conversations_job")
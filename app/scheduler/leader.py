@@ -0,0 +1,147 @@
+"""
+Leader election for the standalone scheduler worker.
+
+Any number of ``python -m app.scheduler_worker`` processes may run; only the
+one holding the ``sched_leader`` Redis lease (SET NX EX, renewed every
+SCHEDULER_LEADER_RENEW_SECONDS) starts APScheduler, the recurring dispatcher
+and the delayed-job poller. Standbys keep trying to take the lease, so one of
+them takes over within SCHEDULER_LEADER_LEASE_SECONDS after the leader dies.
+
+A leader that finds its lease taken, or cannot renew it before it would have
+expired (Redis unreachable), stops running jobs at once: at most one process
+acts on the shared job store at a time.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import suppress
+
+from loguru import logger
+
+from ..config import settings as app_settings
+
+LEADER_KEY = "sched_leader"
+
+_RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+async def _start_jobs() -> None:
+    from ..db import get_session
+    from .delayed_queue import start_delayed_job_poller
+    from .job_manager import JobManager
+    from .scheduler_instance import start_scheduler
+
+    start_scheduler()
+    try:
+        async with get_session() as session:
+            await JobManager.reschedule_all_user_jobs(session)
+    except Exception as exc:
+        logger.exception("Failed to reschedule user jobs after election: {}", exc)
+    start_delayed_job_poller()
+
+
+async def _stop_jobs() -> None:
+    from .delayed_queue import stop_delayed_job_poller
+    from .scheduler_instance import shutdown_scheduler
+
+    await stop_delayed_job_poller()
+    shutdown_scheduler(wait=False)
+
+
+class SchedulerLeader:
+    """Runs scheduled jobs while this process holds the leader lease."""
+
+    def __init__(self, worker_id: str, *, on_elected=None, on_demoted=None) -> None:
+        self.worker_id = worker_id
+        self.is_leader = False
+        self._on_elected = on_elected or _start_jobs
+        self._on_demoted = on_demoted or _stop_jobs
+        self._lease_deadline = 0.0
+        self._startup: asyncio.Task | None = None
+        self._stopping = asyncio.Event()
+
+    async def run(self) -> None:
+        redis = await _get_redis()
+        logger.info("Scheduler worker {} waiting for leadership", self.worker_id)
+        try:
+            while not self._stopping.is_set():
+                await self.tick(redis)
+                try:
+                    await asyncio.wait_for(
+                        self._stopping.wait(),
+                        timeout=max(1, app_settings.SCHEDULER_LEADER_RENEW_SECONDS),
+                    )
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if self.is_leader:
+                await self._demote("shutting down")
+                try:
+                    await redis.eval(_RELEASE_SCRIPT, 1, LEADER_KEY, self.worker_id)
+                except Exception as exc:
+                    logger.warning("Could not release scheduler leader lease: {}", exc)
+            await redis.aclose()
+            logger.info("Scheduler worker {} stopped", self.worker_id)
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def tick(self, redis, now: float | None = None) -> None:
+        """Take or renew the lease, then start or stop jobs to match."""
+        now = time.monotonic() if now is None else now
+        ttl = app_settings.SCHEDULER_LEADER_LEASE_SECONDS
+        try:
+            if self.is_leader:
+                held = bool(
+                    await redis.eval(_RENEW_SCRIPT, 1, LEADER_KEY, self.worker_id, ttl)
+                )
+            else:
+                held = bool(await redis.set(LEADER_KEY, self.worker_id, nx=True, ex=ttl))
+        except Exception as exc:
+            logger.warning("Scheduler leader lease check failed: {}", exc)
+            if self.is_leader and now >= self._lease_deadline:
+                await self._demote("lease could not be renewed")
+            return
+
+        if held:
+            self._lease_deadline = now + ttl
+            if not self.is_leader:
+                self.is_leader = True
+                logger.info("Scheduler worker {} elected leader", self.worker_id)
+                # Startup (job store rescan, backfill) may outlast the lease, so
+                # it runs beside the renew loop instead of blocking it.
+                self._startup = asyncio.create_task(self._on_elected())
+        elif self.is_leader:
+            await self._demote("lease taken by another worker")
+
+    async def _demote(self, reason: str) -> None:
+        self.is_leader = False
+        logger.warning("Scheduler worker {} stepping down: {}", self.worker_id, reason)
+        startup, self._startup = self._startup, None
+        if startup is not None and not startup.done():
+            startup.cancel()
+            with suppress(asyncio.CancelledError):
+                await startup
+        try:
+            await self._on_demoted()
+        except Exception as exc:
+            logger.exception("Failed to stop scheduled jobs: {}", exc)
+
+
+async def _get_redis():
+    from redis.asyncio import Redis
+
+    return Redis.from_url(app_settings.REDIS_URL, decode_responses=True)
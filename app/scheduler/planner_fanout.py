@@ -0,0 +1,111 @@
+"""
+Load-spread fan-out for proactive planner runs.
+
+Wake times cluster on round hours, so planner runs (memory assembly plus an
+LLM call each) used to start in bursts. Two measures flatten them:
+
+* every user's daily planner fire time is shifted by a deterministic jitter in
+  ``[0, PLANNER_SPREAD_WINDOW_SECONDS)`` derived from the user id (stable
+  across restarts, so the user sees the same daily rhythm);
+* runs go through one priority queue drained by PLANNER_MAX_CONCURRENCY
+  workers — the scheduler process has a single leader, so this caps planner
+  runs globally. Recently active users are served first; a user already
+  queued or running is not queued twice.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import itertools
+from datetime import date
+
+from loguru import logger
+
+from ..config import settings as app_settings
+
+# Priority of users with no recorded activity (served last).
+_INACTIVE_PRIORITY = 10**6
+
+_fanout: "PlannerFanout | None" = None
+
+
+def planner_jitter_seconds(user_id: int) -> int:
+    """Stable per-user offset of the daily planner run within the spread window."""
+    window = max(0, app_settings.PLANNER_SPREAD_WINDOW_SECONDS)
+    if window == 0:
+        return 0
+    digest = hashlib.blake2b(f"planner:{user_id}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % window
+
+
+def activity_priority(last_active_date: date | None, today: date | None = None) -> int:
+    """Days since the user was last active; lower runs first."""
+    if last_active_date is None:
+        return _INACTIVE_PRIORITY
+    today = today or date.today()
+    return max(0, (today - last_active_date).days)
+
+
+class PlannerFanout:
+    """Bounded, activity-ordered executor for proactive planner runs."""
+
+    def __init__(self, runner=None) -> None:
+        self._runner = runner
+        self._queue: asyncio.PriorityQueue | None = None
+        self._workers: list[asyncio.Task] = []
+        self._pending: dict[int, asyncio.Future] = {}
+        self._seq = itertools.count()
+
+    def submit(self, user_id: int, priority: int = 0) -> asyncio.Future:
+        """Queue a planner run; the future resolves when it has finished."""
+        future = self._pending.get(user_id)
+        if future is not None:
+            return future
+        self._ensure_workers()
+        future = asyncio.get_running_loop().create_future()
+        self._pending[user_id] = future
+        self._queue.put_nowait((priority, next(self._seq), user_id))
+        return future
+
+    def snapshot(self) -> dict[str, int]:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "pending": len(self._pending),
+        }
+
+    def _ensure_workers(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+        self._workers = [task for task in self._workers if not task.done()]
+        wanted = max(1, app_settings.PLANNER_MAX_CONCURRENCY)
+        while len(self._workers) < wanted:
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, user_id = await self._queue.get()
+            future = self._pending.get(user_id)
+            try:
+                await self._run(user_id)
+            except Exception as exc:
+                logger.exception("Planner run failed for user {}: {}", user_id, exc)
+            finally:
+                self._pending.pop(user_id, None)
+                if future is not None and not future.done():
+                    future.set_result(None)
+                self._queue.task_done()
+
+    async def _run(self, user_id: int) -> None:
+        if self._runner is not None:
+            await self._runner(user_id)
+            return
+        from .jobs import proactive_planner_job
+
+        await proactive_planner_job(user_id)
+
+
+def get_planner_fanout() -> PlannerFanout:
+    global _fanout
+    if _fanout is None:
+        _fanout = PlannerFanout()
+    return _fanout
@@ -0,0 +1,101 @@
+"""
+Debounced, batched planner refresh requests.
+
+Every chat message asks for a proactive planner run ~15 minutes later. Rather
+than rewriting a job per message, requests are debounced twice:
+
+* in memory — a request whose due time is within PLANNER_REFRESH_MIN_SHIFT_SECONDS
+  of the one already pending or written for that user is dropped outright;
+* in Redis — the remaining requests are buffered for
+  PLANNER_REFRESH_FLUSH_SECONDS and written to the delayed queue in one
+  ``debounce_jobs`` call, which again only moves a user's job when its due
+  time shifts by more than the threshold (other web replicas may have
+  written it).
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from loguru import logger
+
+from ..config import settings as app_settings
+from .delayed_queue import debounce_jobs
+
+KIND = "planner_refresh"
+
+_debouncer: "PlannerRefreshDebouncer | None" = None
+
+
+def refresh_job_id(user_id: int) -> str:
+    return f"proactive_planner_refresh_{user_id}"
+
+
+class PlannerRefreshDebouncer:
+    """Coalesces planner refresh requests in this process."""
+
+    def __init__(self) -> None:
+        # user id -> due timestamp waiting for the next flush
+        self._pending: dict[int, float] = {}
+        # user id -> due timestamp last written by this process
+        self._written: dict[int, float] = {}
+        self._flush_task: asyncio.Task | None = None
+
+    def request(self, user_id: int, delay_seconds: float, now: float | None = None) -> bool:
+        """Ask for a refresh; returns False if an equivalent one is already set."""
+        now = time.time() if now is None else now
+        due = now + delay_seconds
+        known = self._pending.get(user_id, self._written.get(user_id))
+        if (
+            known is not None
+            and known > now
+            and abs(due - known) <= app_settings.PLANNER_REFRESH_MIN_SHIFT_SECONDS
+        ):
+            return False
+        self._pending[user_id] = due
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+        return True
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(app_settings.PLANNER_REFRESH_FLUSH_SECONDS)
+        await self.flush()
+
+    async def flush(self) -> int:
+        """Write every buffered request in one batch; returns jobs written."""
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+        try:
+            written = await debounce_jobs(
+                KIND,
+                [
+                    (
+                        user_id,
+                        refresh_job_id(user_id),
+                        datetime.fromtimestamp(due, tz=timezone.utc),
+                        {},
+                    )
+                    for user_id, due in batch.items()
+                ],
+                app_settings.PLANNER_REFRESH_MIN_SHIFT_SECONDS,
+            )
+        except Exception as exc:
+            logger.warning("Planner refresh flush failed for {} user(s): {}", len(batch), exc)
+            return 0
+
+        now = time.time()
+        self._written = {uid: due for uid, due in self._written.items() if due > now}
+        self._written.update(batch)
+        logger.debug(
+            "Planner refresh flush: {} requested, {} written", len(batch), written
+        )
+        return written
+
+
+def get_planner_refresh_debouncer() -> PlannerRefreshDebouncer:
+    global _debouncer
+    if _debouncer is None:
+        _debouncer = PlannerRefreshDebouncer()
+    return _debouncer
@@ -0,0 +1,344 @@
+"""
+Minute-bucket dispatcher for recurring per-user work.
+
+Habit reminders, custom triggers, the daily proactive planner and the news
+digest used to be one APScheduler cron job each. Instead, every schedulable
+row stores its next fire instant in UTC (``habits.next_fire_utc``,
+``user_triggers.next_fire_utc``, ``user_settings.planner_next_fire_utc`` and
+``user_settings.news_digest_next_fire_utc``, each with a partial index).
+
+Once a minute ``dispatch_due_recurring`` claims the due rows with
+``FOR UPDATE SKIP LOCKED``, advances each one to its next local-time
+occurrence (DST-aware, via CronTrigger in the user's timezone), commits, and
+hands the work to a bounded pool of RECURRING_DISPATCH_CONCURRENCY tasks
+(planner runs go to the jittered, activity-ordered pool in ``planner_fanout``).
+Rows overdue by more than RECURRING_DISPATCH_GRACE_SECONDS are advanced
+without running, like APScheduler's misfire grace.
+
+Settings/profile/habit/trigger changes call ``refresh_user_schedule`` so the
+columns follow the user's timezone and preferences; on startup
+``reconcile_recurring_schedules`` repairs any drift, writing only changed rows.
+"""
+from __future__ import annotations
+
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+from typing import Awaitable, Callable
+from zoneinfo import ZoneInfo
+
+from apscheduler.triggers.cron import CronTrigger
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import update
+from sqlmodel import select
+
+from ..config import settings as app_settings
+from ..models.habit import Habit
+from ..models.settings import UserSettings
+from ..models.user_trigger import UserTrigger
+from ..models.users import User
+from .planner_fanout import activity_priority, get_planner_fanout, planner_jitter_seconds
+
+_semaphore: asyncio.Semaphore | None = None
+_inflight: set[asyncio.Task] = set()
+
+
+def next_cron_fire(
+    tz_name: str | None,
+    hour: int,
+    minute: int,
+    after: datetime,
+    day_of_week: str | None = None,
+) -> datetime | None:
+    """First local ``hour:minute`` strictly after *after*, in UTC."""
+    if not tz_name:
+        return None
+    try:
+        tz = ZoneInfo(tz_name)
+        trigger = CronTrigger(
+            hour=hour, minute=minute, day_of_week=day_of_week, timezone=tz
+        )
+    except Exception as exc:
+        logger.warning("Invalid recurring schedule ({}, {}): {}", tz_name, day_of_week, exc)
+        return None
+    fire = trigger.get_next_fire_time(None, after + timedelta(seconds=1))
+    return fire.astimezone(timezone.utc) if fire else None
+
+
+def habit_next_fire(habit: Habit, user: User, after: datetime) -> datetime | None:
+    if not (habit.active and habit.reminder_enabled and habit.reminder_time):
+        return None
+    return next_cron_fire(
+        user.user_timezone, habit.reminder_time.hour, habit.reminder_time.minute, after
+    )
+
+
+def trigger_next_fire(trigger: UserTrigger, user: User, after: datetime) -> datetime | None:
+    if not trigger.active:
+        return None
+    return next_cron_fire(
+        user.user_timezone,
+        trigger.cron_hour,
+        trigger.cron_minute,
+        after,
+        day_of_week=trigger.cron_weekdays or None,
+    )
+
+
+def planner_next_fire(
+    user: User, user_settings: UserSettings, after: datetime
+) -> datetime | None:
+    if not getattr(user_settings, "enable_smart_proactivity", True):
+        return None
+    planner_time = user.wake_time or getattr(user_settings, "morning_window_start", None)
+    # Spread runs behind the wake time; searching from ``after - jitter`` keeps
+    # today's slot when *after* falls between the wake time and the jittered fire.
+    jitter = timedelta(seconds=planner_jitter_seconds(user.id))
+    fire = next_cron_fire(
+        user.user_timezone,
+        planner_time.hour if planner_time else 9,
+        planner_time.minute if planner_time else 0,
+        after - jitter,
+    )
+    return fire + jitter if fire else None
+
+
+def news_digest_next_fire(
+    user: User, user_settings: UserSettings, after: datetime
+) -> datetime | None:
+    if not user_settings.enable_news_digest or not user.wake_time:
+        return None
+    digest_dt = datetime.combine(date.today(), user.wake_time) + timedelta(
+        minutes=app_settings.NEWS_DIGEST_OFFSET_MINUTES
+    )
+    return next_cron_fire(user.user_timezone, digest_dt.hour, digest_dt.minute, after)
+
+
+async def refresh_user_schedule(
+    session: AsyncSession,
+    user: User,
+    user_settings: UserSettings | None,
+    *,
+    now: datetime | None = None,
+) -> None:
+    """Recompute every next_fire_utc column of one user; the caller commits."""
+    now = now or datetime.now(timezone.utc)
+    if user_settings is not None:
+        user_settings.planner_next_fire_utc = planner_next_fire(user, user_settings, now)
+        user_settings.news_digest_next_fire_utc = news_digest_next_fire(
+            user, user_settings, now
+        )
+        session.add(user_settings)
+
+    habits = await session.execute(select(Habit).where(Habit.user_id == user.id))
+    for habit in habits.scalars().all():
+        habit.next_fire_utc = habit_next_fire(habit, user, now)
+        session.add(habit)
+
+    triggers = await session.execute(
+        select(UserTrigger).where(UserTrigger.user_id == user.id)
+    )
+    for trigger in triggers.scalars().all():
+        trigger.next_fire_utc = trigger_next_fire(trigger, user, now)
+        session.add(trigger)
+
+
+def diff_next_fire(
+    stored: datetime | None, desired: datetime | None, now: datetime
+) -> str:
+    """Classify one column against its desired value: added/removed/moved/unchanged."""
+    if stored is not None and stored.tzinfo is None:
+        stored = stored.replace(tzinfo=timezone.utc)
+    if desired is None:
+        return "unchanged" if stored is None else "removed"
+    if stored is None:
+        return "added"
+    # A due value belongs to the dispatcher; leave it for the next tick.
+    if stored <= now or stored == desired:
+        return "unchanged"
+    return "moved"
+
+
+async def reconcile_recurring_schedules(
+    session: AsyncSession, *, now: datetime | None = None
+) -> dict[str, int]:
+    """
+    Startup reconciler: stream every schedulable row joined with its user,
+    compute the desired next_fire_utc and write only the rows that differ,
+    in batches of RECURRING_RECONCILE_BATCH_SIZE. The caller commits.
+    Returns ``{"added", "removed", "moved", "unchanged"}`` counts.
+    """
+    now = now or datetime.now(timezone.utc)
+    batch = max(1, app_settings.RECURRING_RECONCILE_BATCH_SIZE)
+    counts = {"added": 0, "removed": 0, "moved": 0, "unchanged": 0}
+
+    async def reconcile(model, statement, columns) -> None:
+        updates: list[dict] = []
+        result = await session.stream(statement.execution_options(yield_per=batch))
+        async for partition in result.partitions():
+            for item, user in partition:
+                changes = {}
+                for column, compute in columns:
+                    desired = compute(item, user)
+                    outcome = diff_next_fire(getattr(item, column), desired, now)
+                    counts[outcome] += 1
+                    if outcome != "unchanged":
+                        changes[column] = desired
+                if changes:
+                    updates.append({"id": item.id, **changes})
+        for start in range(0, len(updates), batch):
+            await session.execute(update(model), updates[start:start + batch])
+
+    await reconcile(
+        UserSettings,
+        select(UserSettings, User).join(User, User.id == UserSettings.user_id),
+        (
+            (
+                "planner_next_fire_utc",
+                lambda item, user: planner_next_fire(user, item, now),
+            ),
+            (
+                "news_digest_next_fire_utc",
+                lambda item, user: news_digest_next_fire(user, item, now),
+            ),
+        ),
+    )
+    await reconcile(
+        Habit,
+        select(Habit, User).join(User, User.id == Habit.user_id),
+        (("next_fire_utc", lambda item, user: habit_next_fire(item, user, now)),),
+    )
+    await reconcile(
+        UserTrigger,
+        select(UserTrigger, User).join(User, User.id == UserTrigger.user_id),
+        (("next_fire_utc", lambda item, user: trigger_next_fire(item, user, now)),),
+    )
+    return counts
+
+
+async def dispatch_due_recurring(now: datetime | None = None) -> dict[str, int]:
+    """Claim, advance and start everything due in this minute."""
+    from . import jobs
+
+    now = now or datetime.now(timezone.utc)
+    counts: dict[str, int] = {}
+
+    async def claim(kind: str, statement, advance) -> None:
+        from ..db import AsyncSessionLocal
+
+        batch = max(1, app_settings.RECURRING_DISPATCH_BATCH_SIZE)
+        grace = timedelta(seconds=app_settings.RECURRING_DISPATCH_GRACE_SECONDS)
+        while True:
+            work: list[Callable[[], object]] = []
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(statement.limit(batch))
+                rows = result.all()
+                for row in rows:
+                    fire_at = advance(row)
+                    if fire_at.tzinfo is None:
+                        fire_at = fire_at.replace(tzinfo=timezone.utc)
+                    if now - fire_at <= grace:
+                        work.append(_work_for(kind, row, jobs))
+                    else:
+                        counts["missed"] = counts.get("missed", 0) + 1
+                    session.add(row[0])
+                await session.commit()
+            for start in work:
+                start()
+            if work:
+                counts[kind] = counts.get(kind, 0) + len(work)
+            if len(rows) < batch:
+                return
+
+    def advance_habit(row) -> datetime:
+        habit, user = row
+        fire_at = habit.next_fire_utc
+        habit.next_fire_utc = habit_next_fire(habit, user, now)
+        return fire_at
+
+    def advance_trigger(row) -> datetime:
+        trigger, user = row
+        fire_at = trigger.next_fire_utc
+        trigger.next_fire_utc = trigger_next_fire(trigger, user, now)
+        return fire_at
+
+    def advance_planner(row) -> datetime:
+        user_settings, user = row
+        fire_at = user_settings.planner_next_fire_utc
+        user_settings.planner_next_fire_utc = planner_next_fire(user, user_settings, now)
+        return fire_at
+
+    def advance_news(row) -> datetime:
+        user_settings, user = row
+        fire_at = user_settings.news_digest_next_fire_utc
+        user_settings.news_digest_next_fire_utc = news_digest_next_fire(
+            user, user_settings, now
+        )
+        return fire_at
+
+    await claim(
+        "habit_reminder",
+        select(Habit, User)
+        .join(User, User.id == Habit.user_id)
+        .where(Habit.next_fire_utc <= now)
+        .order_by(Habit.next_fire_utc)
+        .with_for_update(skip_locked=True, of=Habit),
+        advance_habit,
+    )
+    await claim(
+        "custom_trigger",
+        select(UserTrigger, User)
+        .join(User, User.id == UserTrigger.user_id)
+        .where(UserTrigger.next_fire_utc <= now)
+        .order_by(UserTrigger.next_fire_utc)
+        .with_for_update(skip_locked=True, of=UserTrigger),
+        advance_trigger,
+    )
+    await claim(
+        "proactive_planner",
+        select(UserSettings, User)
+        .join(User, User.id == UserSettings.user_id)
+        .where(UserSettings.planner_next_fire_utc <= now)
+        .order_by(UserSettings.planner_next_fire_utc)
+        .with_for_update(skip_locked=True, of=UserSettings),
+        advance_planner,
+    )
+    await claim(
+        "news_digest",
+        select(UserSettings, User)
+        .join(User, User.id == UserSettings.user_id)
+        .where(UserSettings.news_digest_next_fire_utc <= now)
+        .order_by(UserSettings.news_digest_next_fire_utc)
+        .with_for_update(skip_locked=True, of=UserSettings),
+        advance_news,
+    )
+    return counts
+
+
+def _work_for(kind: str, row, jobs) -> Callable[[], object]:
+    """Return a callable that starts the row's work once its claim is committed."""
+    item, user = row
+    if kind == "habit_reminder":
+        return lambda: _submit(lambda: jobs.habit_reminder_job(item.id))
+    if kind == "custom_trigger":
+        return lambda: _submit(lambda: jobs.custom_trigger_job(user.id, item.id))
+    if kind == "proactive_planner":
+        # Planner runs have their own bounded, activity-ordered pool.
+        priority = activity_priority(getattr(user, "last_active_date", None))
+        return lambda: get_planner_fanout().submit(user.id, priority)
+    return lambda: _submit(lambda: jobs.news_digest_job(user.id))
+
+
+def _submit(factory: Callable[[], Awaitable[None]]) -> None:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(max(1, app_settings.RECURRING_DISPATCH_CONCURRENCY))
+    semaphore = _semaphore
+
+    async def run() -> None:
+        async with semaphore:
+            await factory()
+
+    task = asyncio.create_task(run())
+    _inflight.add(task)
+    task.add_done_callback(_inflight.discard)
@@ -6,6 +6,7 @@ from pytz import utc
 from loguru import logger
 
 from ..config import settings
+from .job_registry import register_job_listener
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 
@@ -32,10 +33,19 @@ scheduler = AsyncIOScheduler(
     job_defaults=job_defaults,
     timezone=utc,
 )
+register_job_listener(scheduler)
 
-def start_scheduler():
+def start_scheduler(paused: bool = False):
+    """
+    Start APScheduler. ``paused=True`` opens the job store without running
+    jobs: web replicas with DISABLE_SCHEDULER still add and remove jobs there
+    while the scheduler worker executes them.
+    """
     if not scheduler.running:
-        scheduler.start()
+        scheduler.start(paused=paused)
+        if paused:
+            logger.info("APScheduler started paused; jobs run in the scheduler worker")
+            return
         
         # Schedule daily cleanup at 03:00 UTC
         try:
@@ -86,7 +96,7 @@ def start_scheduler():
         
         logger.info("APScheduler started")
 
-def shutdown_scheduler():
+def shutdown_scheduler(wait: bool = True):
     if scheduler.running:
-        scheduler.shutdown()
+        scheduler.shutdown(wait=wait)
         logger.info("APScheduler shut down")
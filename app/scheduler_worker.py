@@ -0,0 +1,51 @@
+"""
+Dedicated scheduler worker process.
+
+Run with ``python -m app.scheduler_worker`` together with DISABLE_SCHEDULER=True
+on the web replicas. Several workers may run for failover; a Redis lease elects
+the one that executes jobs — see ``app.scheduler.leader``.
+"""
+from __future__ import annotations
+
+import asyncio
+import signal
+from contextlib import suppress
+
+from loguru import logger
+
+from .bot.bot_provider import create_bot, set_bot_instance
+from .config import settings
+from .db import init_db
+from .scheduler.leader import SchedulerLeader
+from .services.event_bus import register_app_listeners
+from .services.telegram_delivery import start_delivery_worker, stop_delivery_worker
+from .utils.worker_id import default_worker_id
+
+
+async def main() -> None:
+    logger.remove()
+    logger.add(lambda msg: print(msg, end=""), level=settings.LOG_LEVEL)
+
+    await init_db()
+    register_app_listeners()
+    bot = create_bot()
+    set_bot_instance(bot)
+    start_delivery_worker(bot)
+    leader = SchedulerLeader(default_worker_id())
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with suppress(NotImplementedError):
+            loop.add_signal_handler(sig, leader.stop)
+
+    try:
+        await leader.run()
+    finally:
+        await stop_delivery_worker()
+        set_bot_instance(None)
+        with suppress(Exception):
+            await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
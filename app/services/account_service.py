@@ -202,7 +202,7 @@ class AccountService:
         """
         Permanently delete user and all associated data.
         """
-        JobManager.remove_user_jobs(user_id)
+        await JobManager.remove_user_jobs(user_id)
 
         await session.execute(
             delete(EpisodeEmbedding).where(
@@ -0,0 +1,391 @@
+"""
+Background, resumable admin broadcasts.
+
+``/admin_broadcast`` only records the broadcast in Redis and returns; a
+runner does the sending:
+
+* recipients are streamed as ``(User.id, User.tg_chat_id)`` pairs in id order
+  through a server-side cursor — no User rows, so no decryption or integrity
+  checks. The cursor is reopened every BROADCAST_CURSOR_WINDOW rows so no
+  transaction stays open for the whole broadcast;
+* each chunk of BROADCAST_CHUNK_SIZE users is sent with at most
+  BROADCAST_CONCURRENCY sends in flight. Pacing comes from the shared
+  delivery rate limit (broadcast priority); a send that gets no slot within
+  BROADCAST_SEND_TIMEOUT_SECONDS frees its place and is retried later in the
+  chunk. After the chunk, the last user id and the sent/failed counts are
+  checkpointed in ``broadcast:{id}``;
+* the admin's status message is edited every BROADCAST_PROGRESS_SECONDS
+  with sent, failed, remaining and ETA.
+
+A runner holds the ``broadcast:{id}:owner`` lease, renewed by a heartbeat
+every third of BROADCAST_LEASE_SECONDS; the run is cancelled as soon as the
+lease cannot be renewed. The
+BroadcastSupervisor in every web replica picks up active broadcasts whose
+lease has lapsed. A broadcast therefore resumes after a restart from its
+last checkpoint, sending at most one chunk twice.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from contextlib import aclosing, suppress
+from datetime import datetime, timezone
+from typing import AsyncIterator
+
+from aiogram import Bot
+from loguru import logger
+from redis.asyncio import Redis
+from sqlmodel import func, select
+
+from ..config import settings as app_settings
+from ..db import AsyncSessionLocal
+from ..models.users import User
+from ..utils.worker_id import default_worker_id
+from . import telegram_delivery
+
+ACTIVE_KEY = "broadcast:active"
+# Finished broadcasts stay inspectable for a week.
+_FINISHED_TTL_SECONDS = 7 * 24 * 3600
+
+_RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_supervisor: "BroadcastSupervisor | None" = None
+_supervisor_task: asyncio.Task | None = None
+
+
+def state_key(broadcast_id: str) -> str:
+    return f"broadcast:{broadcast_id}"
+
+
+def owner_key(broadcast_id: str) -> str:
+    return f"broadcast:{broadcast_id}:owner"
+
+
+async def _get_redis() -> Redis:
+    return Redis.from_url(app_settings.REDIS_URL, decode_responses=True)
+
+
+async def _stream_recipients(after_id: int) -> AsyncIterator[list[tuple[int, int]]]:
+    """Yield ``(user_id, chat_id)`` chunks with ids above ``after_id``, in id order."""
+    chunk = max(1, app_settings.BROADCAST_CHUNK_SIZE)
+    window = max(chunk, app_settings.BROADCAST_CURSOR_WINDOW)
+    while True:
+        seen = 0
+        async with AsyncSessionLocal() as session:
+            result = await session.stream(
+                select(User.id, User.tg_chat_id)
+                .where(User.id > after_id)
+                .order_by(User.id)
+                .limit(window)
+                .execution_options(yield_per=chunk)
+            )
+            async for partition in result.partitions():
+                rows = [(int(user_id), int(chat_id)) for user_id, chat_id in partition]
+                seen += len(rows)
+                after_id = rows[-1][0]
+                yield rows
+        if seen < window:
+            return
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(max(0, seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}ч {minutes:02d}м"
+    return f"{minutes}м {seconds:02d}с"
+
+
+async def start_broadcast(
+    bot: Bot,
+    *,
+    admin_chat_id: int,
+    status_message_id: int,
+    text: str,
+) -> str:
+    """Record a broadcast and hand it to this process's supervisor; returns its id."""
+    broadcast_id = uuid.uuid4().hex[:12]
+    async with AsyncSessionLocal() as session:
+        total = (await session.execute(select(func.count(User.id)))).scalar_one()
+    redis = await _get_redis()
+    try:
+        await redis.hset(
+            state_key(broadcast_id),
+            mapping={
+                "text": text,
+                "admin_chat_id": admin_chat_id,
+                "status_message_id": status_message_id,
+                "total": total,
+                "cursor": 0,
+                "sent": 0,
+                "failed": 0,
+                "status": "running",
+                "created_at": datetime.now(timezone.utc).isoformat(),
+            },
+        )
+        await redis.sadd(ACTIVE_KEY, broadcast_id)
+        await get_broadcast_supervisor(bot).tick(redis)
+    finally:
+        await redis.aclose()
+    logger.info("Broadcast {} queued for {} user(s)", broadcast_id, total)
+    return broadcast_id
+
+
+class BroadcastRun:
+    """Sends one broadcast from its last checkpoint to the end."""
+
+    def __init__(self, bot: Bot, redis: Redis, broadcast_id: str, owner: str) -> None:
+        self.bot = bot
+        self.redis = redis
+        self.broadcast_id = broadcast_id
+        self.owner = owner
+
+    async def run(self) -> None:
+        # The lease is renewed independently of chunk progress: a chunk can
+        # take longer than the lease when broadcast sends queue behind others.
+        heartbeat = asyncio.create_task(self._heartbeat(asyncio.current_task()))
+        try:
+            await self._send_all()
+        finally:
+            heartbeat.cancel()
+            with suppress(asyncio.CancelledError):
+                await heartbeat
+
+    async def _heartbeat(self, run_task: asyncio.Task) -> None:
+        """Renew the owner lease; cancel the run once it can no longer be held."""
+        lease = app_settings.BROADCAST_LEASE_SECONDS
+        renewed_at = time.monotonic()
+        while True:
+            await asyncio.sleep(max(0.1, lease / 3))
+            try:
+                owned = await self.redis.eval(
+                    _RENEW_SCRIPT, 1, owner_key(self.broadcast_id), self.owner, lease
+                )
+            except Exception as exc:
+                logger.warning("Broadcast {} lease renewal failed: {}", self.broadcast_id, exc)
+                # Stop before the lease can lapse while we are still sending.
+                owned = time.monotonic() - renewed_at < lease * 2 / 3
+            else:
+                renewed_at = time.monotonic()
+            if not owned:
+                logger.warning(
+                    "Broadcast {} lease lost; stopping so another runner can resume it",
+                    self.broadcast_id,
+                )
+                run_task.cancel()
+                return
+
+    async def _send_all(self) -> None:
+        state = await self.redis.hgetall(state_key(self.broadcast_id))
+        if not state or state.get("status") != "running":
+            await self.redis.srem(ACTIVE_KEY, self.broadcast_id)
+            return
+        text = state["text"]
+        cursor = int(state.get("cursor", 0))
+        sent = int(state.get("sent", 0))
+        failed = int(state.get("failed", 0))
+        total = int(state.get("total", 0))
+        if cursor:
+            logger.info("Resuming broadcast {} after user {}", self.broadcast_id, cursor)
+
+        semaphore = asyncio.Semaphore(max(1, app_settings.BROADCAST_CONCURRENCY))
+
+        async def send_one(chat_id: int) -> bool | None:
+            """True if sent, False if failed, None if no slot came up in time."""
+            async with semaphore:
+                try:
+                    await telegram_delivery.send_message(
+                        self.bot,
+                        chat_id,
+                        text,
+                        priority=telegram_delivery.Priority.BROADCAST,
+                        slot_timeout=app_settings.BROADCAST_SEND_TIMEOUT_SECONDS,
+                    )
+                    return True
+                except telegram_delivery.DeliveryDeferred:
+                    return None
+                except Exception as exc:
+                    logger.debug("Broadcast {} to chat {} failed: {}", self.broadcast_id, chat_id, exc)
+                    return False
+
+        started = time.monotonic()
+        done_at_start = sent + failed
+        last_report = started
+        async with aclosing(_stream_recipients(cursor)) as chunks:
+            async for chunk in chunks:
+                pending = [chat_id for _, chat_id in chunk]
+                while pending:
+                    results = await asyncio.gather(*(send_one(chat_id) for chat_id in pending))
+                    sent += sum(1 for result in results if result is True)
+                    failed += sum(1 for result in results if result is False)
+                    # Deferred sends freed their slot; retry them once the backlog moves.
+                    pending = [
+                        chat_id for chat_id, result in zip(pending, results) if result is None
+                    ]
+                cursor = chunk[-1][0]
+                if not await self._checkpoint(cursor, sent, failed):
+                    logger.warning(
+                        "Broadcast {} lease lost at user {}; another runner continues",
+                        self.broadcast_id, cursor,
+                    )
+                    return
+                now = time.monotonic()
+                if now - last_report >= app_settings.BROADCAST_PROGRESS_SECONDS:
+                    last_report = now
+                    remaining = max(0, total - sent - failed)
+                    rate = (sent + failed - done_at_start) / max(now - started, 1e-6)
+                    eta = _format_duration(remaining / rate) if rate > 0 else "—"
+                    await self._report(
+                        state,
+                        f"📢 Рассылка {self.broadcast_id}\n"
+                        f"Отправлено: {sent}, ошибок: {failed}, осталось: {remaining}\n"
+                        f"Осталось времени: ~{eta}",
+                    )
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(
+                state_key(self.broadcast_id),
+                mapping={"status": "done", "finished_at": datetime.now(timezone.utc).isoformat()},
+            )
+            pipe.expire(state_key(self.broadcast_id), _FINISHED_TTL_SECONDS)
+            pipe.srem(ACTIVE_KEY, self.broadcast_id)
+            await pipe.execute()
+        await self._report(
+            state,
+            f"✅ Рассылка {self.broadcast_id} завершена.\n"
+            f"Отправлено: {sent}, ошибок: {failed}",
+        )
+        logger.warning(
+            "Broadcast {} finished: {} sent, {} failed", self.broadcast_id, sent, failed
+        )
+
+    async def _checkpoint(self, cursor: int, sent: int, failed: int) -> bool:
+        """Save progress if this runner still owns the broadcast."""
+        renewed = await self.redis.eval(
+            _RENEW_SCRIPT, 1, owner_key(self.broadcast_id), self.owner,
+            app_settings.BROADCAST_LEASE_SECONDS,
+        )
+        if not renewed:
+            return False
+        await self.redis.hset(
+            state_key(self.broadcast_id),
+            mapping={"cursor": cursor, "sent": sent, "failed": failed},
+        )
+        return True
+
+    async def _report(self, state: dict[str, str], text: str) -> None:
+        try:
+            await self.bot.edit_message_text(
+                text,
+                chat_id=int(state["admin_chat_id"]),
+                message_id=int(state["status_message_id"]),
+            )
+        except Exception as exc:
+            logger.debug("Broadcast {} progress edit failed: {}", self.broadcast_id, exc)
+
+
+class BroadcastSupervisor:
+    """Runs active broadcasts whose owner lease is free."""
+
+    def __init__(self, bot: Bot, owner: str | None = None) -> None:
+        self.bot = bot
+        self.owner = owner or default_worker_id()
+        self._runs: dict[str, asyncio.Task] = {}
+        self._stopping = asyncio.Event()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                redis = await _get_redis()
+                try:
+                    await self.tick(redis)
+                finally:
+                    await redis.aclose()
+            except Exception as exc:
+                logger.warning("Broadcast supervisor poll failed: {}", exc)
+            try:
+                await asyncio.wait_for(
+                    self._stopping.wait(),
+                    timeout=max(1, app_settings.BROADCAST_LEASE_SECONDS / 2),
+                )
+            except asyncio.TimeoutError:
+                pass
+        # Interrupted runs resume from their checkpoint in another process.
+        for task in self._runs.values():
+            task.cancel()
+        if self._runs:
+            await asyncio.gather(*self._runs.values(), return_exceptions=True)
+
+    async def tick(self, redis: Redis) -> int:
+        """Start a runner for every active broadcast nobody owns; returns how many."""
+        started = 0
+        for broadcast_id in await redis.smembers(ACTIVE_KEY):
+            task = self._runs.get(broadcast_id)
+            if task is not None and not task.done():
+                continue
+            acquired = await redis.set(
+                owner_key(broadcast_id), self.owner,
+                nx=True, ex=app_settings.BROADCAST_LEASE_SECONDS,
+            )
+            if not acquired:
+                continue
+            self._runs[broadcast_id] = asyncio.create_task(self._run(broadcast_id))
+            started += 1
+        return started
+
+    async def _run(self, broadcast_id: str) -> None:
+        redis = await _get_redis()
+        try:
+            await BroadcastRun(self.bot, redis, broadcast_id, self.owner).run()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.exception("Broadcast {} runner failed: {}", broadcast_id, exc)
+        finally:
+            with suppress(Exception):
+                await redis.eval(_RELEASE_SCRIPT, 1, owner_key(broadcast_id), self.owner)
+            await redis.aclose()
+            self._runs.pop(broadcast_id, None)
+
+
+def get_broadcast_supervisor(bot: Bot) -> BroadcastSupervisor:
+    global _supervisor
+    if _supervisor is None:
+        _supervisor = BroadcastSupervisor(bot)
+    return _supervisor
+
+
+def start_broadcast_supervisor(bot: Bot) -> asyncio.Task:
+    """Start the process-wide supervisor once; later calls return its task."""
+    global _supervisor_task
+    if _supervisor_task is None or _supervisor_task.done():
+        _supervisor_task = asyncio.create_task(get_broadcast_supervisor(bot).run())
+    return _supervisor_task
+
+
+async def stop_broadcast_supervisor() -> None:
+    global _supervisor, _supervisor_task
+    supervisor, task = _supervisor, _supervisor_task
+    _supervisor, _supervisor_task = None, None
+    if supervisor is None:
+        return
+    supervisor.stop()
+    if task is not None and not task.done():
+        await task
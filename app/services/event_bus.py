@@ -86,3 +86,17 @@ class EventBus:
 
 # Module-level singleton — import this everywhere.
 event_bus = EventBus()
+
+
+def register_app_listeners() -> None:
+    """Wire the analytics sink and gamification listeners (once per process)."""
+    from app.services.analytics_service import persist_event
+
+    event_bus.on_all(persist_event)  # Analytics sink — logs all events to DB
+
+    # Import gamification modules to wire their event bus listeners
+    import app.services.gamification.xp_service  # noqa: F401
+    import app.services.gamification.badge_service  # noqa: F401
+    import app.services.gamification.reward_service  # noqa: F401
+    import app.services.gamification.leaderboard_service  # noqa: F401
+    logger.info("Gamification event listeners registered")
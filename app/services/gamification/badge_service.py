@@ -12,9 +12,6 @@ from loguru import logger
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
-from aiogram import Bot
-from aiogram.client.default import DefaultBotProperties
-
 from app.config import settings
 from app.db import AsyncSessionLocal
 from app.models.gamification import UserBadge
@@ -26,6 +23,7 @@ from app.services.gamification.schemas import (
     GameEvent,
     GameEventType,
 )
+from app.services.telegram_delivery import deliver
 from app.utils.telegram_topics import topic_kwargs_for_user
 
 # ── Badge Definitions (data-driven) ──────────────────────────────
@@ -206,18 +204,7 @@ async def _send_badge_celebration(user_id: int, badge: BadgeDefinition) -> None:
             f"{badge.description}\n\n"
             f"Congratulations! Keep going! 🎉"
         )
-        bot = Bot(
-            token=settings.TELEGRAM_BOT_TOKEN,
-            default=DefaultBotProperties(parse_mode="HTML"),
-        )
-        try:
-            await bot.send_message(
-                user.tg_chat_id,
-                message,
-                **topic_kwargs_for_user(user),
-            )
-        finally:
-            await bot.session.close()
+        await deliver(user.tg_chat_id, message, **topic_kwargs_for_user(user))
     except Exception:
         logger.exception("Failed to send badge celebration for user {}", user_id)
 
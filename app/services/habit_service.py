@@ -241,6 +241,7 @@ class HabitService:
         habit = await session.get(Habit, habit_id)
         if habit:
             habit.active = False
+            habit.next_fire_utc = None
             habit.touch()
             session.add(habit)
             await session.flush()
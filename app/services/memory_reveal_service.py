@@ -11,15 +11,13 @@ from loguru import logger
 from sqlalchemy import func
 from sqlmodel import select
 
-from aiogram import Bot
-from aiogram.client.default import DefaultBotProperties
-
 from app.config import settings
 from app.db import AsyncSessionLocal
 from app.models.core_memory import CoreFact, CoreMemory
 from app.models.users import User
 from app.services.event_bus import event_bus
 from app.services.gamification.schemas import GameEvent, GameEventType
+from app.services.telegram_delivery import deliver
 from app.utils.telegram_topics import topic_kwargs_for_user
 
 
@@ -142,24 +140,13 @@ class MemoryRevealService:
                     f"what I know about you."
                 )
 
-            bot = Bot(
-                token=settings.TELEGRAM_BOT_TOKEN,
-                default=DefaultBotProperties(parse_mode="HTML"),
+            await deliver(user.tg_chat_id, message, **topic_kwargs_for_user(user))
+            logger.info(
+                "Sent day {} memory reveal to user {} ({} facts)",
+                day,
+                user_id,
+                fact_count,
             )
-            try:
-                await bot.send_message(
-                    user.tg_chat_id,
-                    message,
-                    **topic_kwargs_for_user(user),
-                )
-                logger.info(
-                    "Sent day {} memory reveal to user {} ({} facts)",
-                    day,
-                    user_id,
-                    fact_count,
-                )
-            finally:
-                await bot.session.close()
 
         except Exception:
             logger.exception(
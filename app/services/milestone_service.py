@@ -13,9 +13,6 @@ from sqlalchemy import func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
-from aiogram import Bot
-from aiogram.client.default import DefaultBotProperties
-
 from app.config import settings
 from app.models.core_memory import CoreFact, CoreMemory
 from app.models.episode import Episode
@@ -26,6 +23,7 @@ from app.services.gamification.schemas import (
     GameEventType,
     MEMORY_MILESTONES,
 )
+from app.services.telegram_delivery import deliver
 from app.utils.telegram_topics import topic_kwargs_for_user
 
 
@@ -106,14 +104,7 @@ class MilestoneService:
                 f"Every conversation makes me understand you better."
             )
 
-            bot = Bot(
-                token=settings.TELEGRAM_BOT_TOKEN,
-                default=DefaultBotProperties(parse_mode="HTML"),
-            )
-            try:
-                await bot.send_message(chat_id, message, **topic_kwargs_for_user(user))
-            finally:
-                await bot.session.close()
+            await deliver(chat_id, message, **topic_kwargs_for_user(user))
 
             # Update milestone marker
             user.last_memory_milestone = new_milestone
@@ -9,13 +9,12 @@ from datetime import datetime, timedelta, timezone
 
 from loguru import logger
 
-from aiogram import Bot
-from aiogram.client.default import DefaultBotProperties
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
 from app.config import settings
 from app.db import AsyncSessionLocal
 from app.models.users import User
+from app.services.telegram_delivery import deliver
 from app.utils.telegram_topics import topic_kwargs_for_user
 
 
@@ -138,20 +137,13 @@ class PremiumTasteService:
                 ]
             )
 
-            bot = Bot(
-                token=settings.TELEGRAM_BOT_TOKEN,
-                default=DefaultBotProperties(parse_mode="HTML"),
+            await deliver(
+                user.tg_chat_id,
+                message,
+                reply_markup=keyboard,
+                **topic_kwargs_for_user(user),
             )
-            try:
-                await bot.send_message(
-                    user.tg_chat_id,
-                    message,
-                    reply_markup=keyboard,
-                    **topic_kwargs_for_user(user),
-                )
-                logger.info("Sent premium taste to user {}", user_id)
-            finally:
-                await bot.session.close()
+            logger.info("Sent premium taste to user {}", user_id)
 
         except Exception:
             logger.exception("Failed to send premium taste to user {}", user_id)
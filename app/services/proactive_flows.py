@@ -16,6 +16,7 @@ from ..llm.conversation_service import ConversationService
 from ..services.tool_executor import ToolExecutor
 from ..services.conversation_history_service import ConversationHistoryService
 from ..services.extractor_service import ExtractorService
+from ..services.telegram_delivery import deliver
 from ..utils.telegram_topics import topic_kwargs_for_user
 
 # Singleton embeddings shared across all ProactiveFlows instances
@@ -60,11 +61,11 @@ class ProactiveFlows:
         )
         # Build final message: skip leading newlines if greeting is empty
         message_text = f"{greeting}\n\n{response}" if greeting else response
-        # Persist history and send message concurrently.
-        # Use return_exceptions so a Redis failure doesn't prevent message delivery.
+        # Persist history and queue the message concurrently.
+        # Use return_exceptions so a history failure doesn't prevent message delivery.
         results = await asyncio.gather(
             ConversationHistoryService.save_history(user.tg_chat_id, updated_history),
-            self.bot.send_message(
+            deliver(
                 user.tg_chat_id,
                 message_text,
                 **topic_kwargs_for_user(user),
@@ -73,7 +74,7 @@ class ProactiveFlows:
         )
         for i, result in enumerate(results):
             if isinstance(result, Exception):
-                task_name = "save_history" if i == 0 else "send_message"
+                task_name = "save_history" if i == 0 else "deliver"
                 logger.error("Proactive flow {} failed for user {}: {}", task_name, user.id, result)
         # Extract and store important info — non-fatal if it fails
         try:
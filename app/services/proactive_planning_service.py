@@ -7,7 +7,6 @@ from datetime import datetime, time, timedelta, timezone
 from typing import Any
 from zoneinfo import ZoneInfo
 
-from apscheduler.triggers.date import DateTrigger
 from loguru import logger
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -16,7 +15,9 @@ from ..embeddings.gemini_embedding_client import GeminiEmbeddings
 from ..llm.client import async_client
 from ..models.settings import UserSettings
 from ..models.users import User
-from ..scheduler.scheduler_instance import scheduler, start_scheduler
+from ..scheduler.delayed_queue import cancel_user_jobs, enqueue
+from ..scheduler.job_registry import remove_user_jobs_by_prefix
+from ..scheduler.scheduler_instance import scheduler
 from .conversation_history_service import ConversationHistoryService
 from .core_memory_service import CoreMemoryService
 from .episodic_memory_service import EpisodicMemoryService
@@ -59,7 +60,7 @@ class ProactivePlanningService:
     async def plan_and_schedule(self, user: User, user_settings: UserSettings) -> list[str]:
         if not getattr(user_settings, "enable_smart_proactivity", True):
             logger.info("Smart proactivity disabled for user {}", user.id)
-            self.remove_pending_touches(user.id)
+            await self.remove_pending_touches(user.id)
             return []
         if not user.user_timezone:
             logger.info("User {} has no timezone; skipping proactive planning", user.id)
@@ -86,7 +87,7 @@ class ProactivePlanningService:
             now_local=now_local,
         )
         touches = self._parse_touches(decision, now_local)
-        scheduled_ids = self.schedule_touches(
+        scheduled_ids = await self.schedule_touches(
             user=user,
             user_settings=user_settings,
             touches=touches,
@@ -207,7 +208,7 @@ class ProactivePlanningService:
             )
         return sorted(touches, key=lambda touch: touch.send_at_local)
 
-    def schedule_touches(
+    async def schedule_touches(
         self,
         *,
         user: User,
@@ -217,15 +218,10 @@ class ProactivePlanningService:
     ) -> list[str]:
         max_per_day = max(0, min(int(getattr(user_settings, "proactive_max_messages_per_day", 1) or 1), 3))
         if max_per_day == 0:
-            self.remove_pending_touches(user.id)
+            await self.remove_pending_touches(user.id)
             return []
 
-        self.remove_pending_touches(user.id)
-        try:
-            if not scheduler.running:
-                start_scheduler()
-        except Exception:
-            logger.debug("Could not ensure scheduler was running before proactive scheduling")
+        await self.remove_pending_touches(user.id)
 
         scheduled_ids: list[str] = []
         per_day: dict[str, int] = {}
@@ -238,16 +234,20 @@ class ProactivePlanningService:
             per_day[day_key] = per_day.get(day_key, 0) + 1
             slot = len(scheduled_ids) + 1
             job_id = f"{TOUCH_JOB_PREFIX}_{user.id}_{touch.send_at_local:%Y%m%d%H%M}_{slot}"
-            scheduler.add_job(
-                func="app.scheduler.jobs:proactive_touch_job",
-                trigger=DateTrigger(
-                    run_date=touch.send_at_local.astimezone(timezone.utc),
-                    timezone=timezone.utc,
-                ),
-                id=job_id,
-                args=[user.id, touch.touch_type, touch.prompt, touch.reason],
-                replace_existing=True,
+            queued = await enqueue(
+                TOUCH_JOB_PREFIX,
+                user.id,
+                job_id,
+                touch.send_at_local.astimezone(timezone.utc),
+                {
+                    "touch_type": touch.touch_type,
+                    "prompt": touch.prompt,
+                    "reason": touch.reason,
+                },
             )
+            if not queued:
+                # Same slot already delivered (idempotency key still live).
+                continue
             scheduled_ids.append(job_id)
             logger.info(
                 "Scheduled proactive touch {} for user {} at {} ({})",
@@ -274,9 +274,8 @@ class ProactivePlanningService:
         return current < default_start or current >= default_end
 
     @staticmethod
-    def remove_pending_touches(user_id: int) -> None:
-        prefix = f"{TOUCH_JOB_PREFIX}_{user_id}_"
-        for job in scheduler.get_jobs():
-            if job.id.startswith(prefix):
-                scheduler.remove_job(job.id)
+    async def remove_pending_touches(user_id: int) -> None:
+        await cancel_user_jobs(user_id, TOUCH_JOB_PREFIX)
+        # Touches planned before the delayed queue are APScheduler jobs.
+        remove_user_jobs_by_prefix(scheduler, user_id, TOUCH_JOB_PREFIX)
 
@@ -0,0 +1,517 @@
+"""
+Rate-limited, prioritised delivery of bot messages.
+
+Every outgoing notification shares one Bot API budget, so sends go through
+a pair of GCRA token buckets kept in Redis (shared by the web replicas, the
+scheduler worker and the userbot workers):
+
+* ``tg_rate:global`` — DELIVERY_GLOBAL_RATE messages/second for the bot;
+* ``tg_rate:chat:{id}`` — DELIVERY_CHAT_RATE messages/second per chat.
+
+Priority classes share the global bucket but not its burst allowance:
+interactive sends may use all of DELIVERY_GLOBAL_BURST_SECONDS, reminders
+half of it and broadcasts none, so a broadcast can never starve a reply.
+A 429 (``retry_after``) pauses both buckets for everyone.
+
+Two entry points:
+
+* ``deliver()`` / ``deliver_many()`` — fire-and-forget. The message is
+  stored in Redis (``tg_msg:{id}`` plus one list per priority) and sent by
+  the DeliveryWorker; a claimed message is leased in ``tg_out:inflight`` and
+  goes back to its list if the process dies, so the backlog survives
+  restarts.
+* ``send_message()`` — direct send behind the same buckets, for callers that
+  need the resulting Message (follow-ups, digests).
+
+Queue depth and send latency are exported via ``delivery_snapshot()``.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+import uuid
+from collections import Counter, deque
+from contextlib import suppress
+from enum import IntEnum
+from typing import Any
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramRetryAfter,
+)
+from aiogram.types import InlineKeyboardMarkup, Message
+from loguru import logger
+from redis.asyncio import Redis
+
+from ..config import settings as app_settings
+
+GLOBAL_BUCKET_KEY = "tg_rate:global"
+INFLIGHT_KEY = "tg_out:inflight"
+# Claimed messages per worker tick are capped by free send slots; this caps
+# the expired leases returned to the queues per tick.
+_REQUEUE_LIMIT = 100
+# Latency samples kept for the percentile estimates.
+_LATENCY_SAMPLES = 1000
+
+
+class DeliveryDeferred(Exception):
+    """No send slot within the caller's deadline; nothing was sent."""
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    REMINDER = 1
+    BROADCAST = 2
+
+
+# Both buckets are checked first and only consumed together, so a message
+# blocked by its chat does not use up global capacity. Returns the wait in ms.
+_ACQUIRE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local wait = 0
+local tats = {}
+for i = 1, 2 do
+    local interval = tonumber(ARGV[i * 2 - 1])
+    local burst = tonumber(ARGV[i * 2])
+    local tat = tonumber(redis.call('GET', KEYS[i]) or now)
+    if tat < now then tat = now end
+    if tat - burst > now + wait then wait = tat - burst - now end
+    tats[i] = tat + interval
+end
+if wait > 0 then return math.ceil(wait) end
+for i = 1, 2 do
+    redis.call('SET', KEYS[i], tats[i], 'PX', math.ceil(tats[i] - now) + 1000)
+end
+return 0
+"""
+
+# Push the theoretical arrival time of each bucket past the flood wait.
+_PAUSE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local resume = now + tonumber(ARGV[1])
+for i = 1, #KEYS do
+    local tat = resume + tonumber(ARGV[i + 1])
+    local current = tonumber(redis.call('GET', KEYS[i]) or 0)
+    if tat > current then
+        redis.call('SET', KEYS[i], tat, 'PX', math.ceil(tat - now) + 1000)
+    end
+end
+return 1
+"""
+
+# Return expired leases to the front of their queues, then pop up to ARGV[3]
+# messages, highest priority first, and lease them until ARGV[2].
+_CLAIM_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[4], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[4]))
+for _, id in ipairs(expired) do
+    redis.call('ZREM', KEYS[4], id)
+    redis.call('LPUSH', KEYS[tonumber(string.sub(id, 1, 1)) + 1], id)
+end
+local claimed = {}
+local limit = tonumber(ARGV[3])
+for k = 1, 3 do
+    while #claimed < limit * 2 do
+        local id = redis.call('LPOP', KEYS[k])
+        if not id then break end
+        local payload = redis.call('GET', 'tg_msg:' .. id)
+        if payload then
+            redis.call('ZADD', KEYS[4], ARGV[2], id)
+            table.insert(claimed, id)
+            table.insert(claimed, payload)
+        end
+    end
+end
+return claimed
+"""
+
+_worker: "DeliveryWorker | None" = None
+_worker_task: asyncio.Task | None = None
+_metrics: "DeliveryMetrics | None" = None
+# One pooled client per process: every send touches the buckets.
+_redis_client: Redis | None = None
+
+
+def queue_key(priority: Priority) -> str:
+    return f"tg_out:{int(priority)}"
+
+
+def message_key(message_id: str) -> str:
+    return f"tg_msg:{message_id}"
+
+
+def chat_bucket_key(chat_id: int) -> str:
+    return f"tg_rate:chat:{chat_id}"
+
+
+def _get_redis_client() -> Redis:
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = Redis.from_url(app_settings.REDIS_URL, decode_responses=True)
+    return _redis_client
+
+
+def _bucket_args(priority: Priority) -> list[float]:
+    global_interval = 1000.0 / max(0.1, app_settings.DELIVERY_GLOBAL_RATE)
+    global_burst = max(0.0, app_settings.DELIVERY_GLOBAL_BURST_SECONDS) * 1000.0
+    global_burst *= {Priority.INTERACTIVE: 1.0, Priority.REMINDER: 0.5}.get(priority, 0.0)
+    chat_interval = 1000.0 / max(0.01, app_settings.DELIVERY_CHAT_RATE)
+    return [global_interval, global_burst, chat_interval, 0]
+
+
+async def _acquire(redis: Redis, chat_id: int, priority: Priority) -> float:
+    """Take a send slot; returns seconds to wait before trying again (0 = go)."""
+    wait_ms = await redis.eval(
+        _ACQUIRE_SCRIPT, 2, GLOBAL_BUCKET_KEY, chat_bucket_key(chat_id), *_bucket_args(priority)
+    )
+    return int(wait_ms) / 1000.0
+
+
+async def _wait_for_slot(
+    redis: Redis, chat_id: int, priority: Priority, deadline: float | None
+) -> None:
+    while True:
+        try:
+            wait = await _acquire(redis, chat_id, priority)
+        except Exception as exc:
+            # Redis trouble must not block user-facing sends.
+            logger.debug("Delivery bucket unavailable, sending unpaced: {}", exc)
+            return
+        if wait <= 0:
+            return
+        if deadline is not None and time.monotonic() + wait > deadline:
+            await asyncio.sleep(max(0.0, deadline - time.monotonic()))
+            raise DeliveryDeferred(f"no send slot for chat {chat_id} before the deadline")
+        await asyncio.sleep(wait)
+
+
+async def _pause(redis: Redis, chat_id: int, retry_after: float) -> None:
+    """Apply a flood wait to the global and the chat bucket."""
+    burst = max(0.0, app_settings.DELIVERY_GLOBAL_BURST_SECONDS) * 1000.0
+    await redis.eval(
+        _PAUSE_SCRIPT, 2, GLOBAL_BUCKET_KEY, chat_bucket_key(chat_id),
+        int(retry_after * 1000), burst, 0,
+    )
+
+
+class DeliveryMetrics:
+    """Send outcomes per priority plus queue-wait and send-call latency."""
+
+    def __init__(self) -> None:
+        self._counts: Counter[tuple[str, str]] = Counter()
+        self._queue_wait: dict[str, deque[float]] = {}
+        self._send: deque[float] = deque(maxlen=_LATENCY_SAMPLES)
+
+    def count(self, priority: Priority, outcome: str, n: int = 1) -> None:
+        self._counts[(priority.name.lower(), outcome)] += n
+
+    def sent(self, priority: Priority, send_seconds: float, queued_seconds: float | None = None) -> None:
+        self.count(priority, "sent")
+        self._send.append(send_seconds)
+        if queued_seconds is not None:
+            samples = self._queue_wait.setdefault(
+                priority.name.lower(), deque(maxlen=_LATENCY_SAMPLES)
+            )
+            samples.append(max(0.0, queued_seconds))
+
+    @staticmethod
+    def _percentiles(samples: deque[float]) -> dict[str, float]:
+        if not samples:
+            return {"count": 0}
+        ordered = sorted(samples)
+
+        def pick(q: float) -> float:
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+        return {"count": len(ordered), "p50_ms": pick(0.5), "p99_ms": pick(0.99)}
+
+    def snapshot(self) -> dict:
+        counts: dict[str, dict[str, int]] = {}
+        for (priority, outcome), value in sorted(self._counts.items()):
+            counts.setdefault(priority, {})[outcome] = value
+        return {
+            "counts": counts,
+            "send_latency": self._percentiles(self._send),
+            "queue_wait": {
+                priority: self._percentiles(samples)
+                for priority, samples in sorted(self._queue_wait.items())
+            },
+        }
+
+
+def get_delivery_metrics() -> DeliveryMetrics:
+    global _metrics
+    if _metrics is None:
+        _metrics = DeliveryMetrics()
+    return _metrics
+
+
+async def queue_depths(redis: Redis | None = None) -> dict[str, int]:
+    redis = redis or _get_redis_client()
+    depths = {
+        priority.name.lower(): int(await redis.llen(queue_key(priority)))
+        for priority in Priority
+    }
+    depths["inflight"] = int(await redis.zcard(INFLIGHT_KEY))
+    return depths
+
+
+async def delivery_snapshot() -> dict:
+    """Metrics for /metrics: this process's counters plus the shared backlog."""
+    snapshot = get_delivery_metrics().snapshot()
+    try:
+        snapshot["queue_depth"] = await queue_depths()
+    except Exception as exc:
+        snapshot["queue_depth"] = {"error": str(exc)}
+    return snapshot
+
+
+def _encode(chat_id: int, text: str, priority: Priority, kwargs: dict[str, Any]) -> tuple[str, str]:
+    kwargs = dict(kwargs)
+    markup = kwargs.pop("reply_markup", None)
+    if markup is not None and not isinstance(markup, InlineKeyboardMarkup):
+        raise TypeError("Only inline keyboards can be queued for delivery")
+    message_id = f"{int(priority)}{uuid.uuid4().hex}"
+    payload = {
+        "chat_id": chat_id,
+        "text": text,
+        "kwargs": kwargs,
+        "reply_markup": markup.model_dump(mode="json", exclude_none=True) if markup else None,
+        "enqueued_at": time.time(),
+        "attempts": 0,
+    }
+    return message_id, json.dumps(payload)
+
+
+def _send_kwargs(payload: dict[str, Any]) -> dict[str, Any]:
+    kwargs = dict(payload.get("kwargs") or {})
+    if payload.get("reply_markup"):
+        kwargs["reply_markup"] = InlineKeyboardMarkup.model_validate(payload["reply_markup"])
+    return kwargs
+
+
+async def deliver_many(
+    messages: list[tuple[int, str, dict[str, Any]]],
+    *,
+    priority: Priority = Priority.REMINDER,
+) -> list[str]:
+    """Queue ``(chat_id, text, send_kwargs)`` messages; returns their ids."""
+    if not messages:
+        return []
+    encoded = [_encode(chat_id, text, priority, kwargs) for chat_id, text, kwargs in messages]
+    async with _get_redis_client().pipeline(transaction=True) as pipe:
+        for message_id, payload in encoded:
+            pipe.set(message_key(message_id), payload, ex=app_settings.DELIVERY_MESSAGE_TTL_SECONDS)
+        pipe.rpush(queue_key(priority), *(message_id for message_id, _ in encoded))
+        await pipe.execute()
+    get_delivery_metrics().count(priority, "queued", len(encoded))
+    return [message_id for message_id, _ in encoded]
+
+
+async def deliver(
+    chat_id: int,
+    text: str,
+    *,
+    priority: Priority = Priority.REMINDER,
+    **kwargs: Any,
+) -> str:
+    """Queue one message for the DeliveryWorker; returns its id."""
+    ids = await deliver_many([(chat_id, text, kwargs)], priority=priority)
+    return ids[0]
+
+
+async def send_message(
+    bot: Bot,
+    chat_id: int,
+    text: str,
+    *,
+    priority: Priority = Priority.INTERACTIVE,
+    slot_timeout: float | None = None,
+    **kwargs: Any,
+) -> Message:
+    """
+    Send right away behind the shared buckets (one retry after a flood wait).
+
+    With ``slot_timeout``, raises DeliveryDeferred instead of waiting longer
+    than that many seconds for a send slot.
+    """
+    metrics = get_delivery_metrics()
+    redis = _get_redis_client()
+
+    async def paced_send() -> Message:
+        deadline = None if slot_timeout is None else time.monotonic() + slot_timeout
+        try:
+            await _wait_for_slot(redis, chat_id, priority, deadline)
+        except DeliveryDeferred:
+            metrics.count(priority, "deferred")
+            raise
+        started = time.monotonic()
+        try:
+            result = await bot.send_message(chat_id, text, **kwargs)
+        except TelegramRetryAfter:
+            metrics.count(priority, "retry_after")
+            raise
+        except Exception:
+            metrics.count(priority, "failed")
+            raise
+        metrics.sent(priority, time.monotonic() - started)
+        return result
+
+    try:
+        return await paced_send()
+    except TelegramRetryAfter as exc:
+        logger.warning("Bot API flood wait {}s for chat {}; retrying once", exc.retry_after, chat_id)
+        with suppress(Exception):
+            await _pause(redis, chat_id, exc.retry_after)
+        await asyncio.sleep(exc.retry_after)
+        return await paced_send()
+
+
+class DeliveryWorker:
+    """Drains the durable queues into the Bot API, highest priority first."""
+
+    def __init__(self, bot: Bot) -> None:
+        self.bot = bot
+        self._stopping = asyncio.Event()
+        self._tasks: set[asyncio.Task] = set()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def run(self) -> None:
+        logger.info("Telegram delivery worker started")
+        while not self._stopping.is_set():
+            claimed = 0
+            try:
+                claimed = await self.tick(_get_redis_client())
+            except Exception as exc:
+                logger.warning("Delivery queue poll failed: {}", exc)
+            if claimed:
+                continue
+            try:
+                await asyncio.wait_for(
+                    self._stopping.wait(), timeout=app_settings.DELIVERY_POLL_SECONDS
+                )
+            except asyncio.TimeoutError:
+                pass
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        logger.info("Telegram delivery worker stopped")
+
+    async def tick(self, redis: Redis, now: float | None = None) -> int:
+        """Claim as many messages as there are free send slots."""
+        now = time.time() if now is None else now
+        free = max(1, app_settings.DELIVERY_CONCURRENCY) - len(self._tasks)
+        if free <= 0:
+            await asyncio.sleep(0.05)
+            return 0
+        raw = await redis.eval(
+            _CLAIM_SCRIPT,
+            4,
+            *(queue_key(priority) for priority in Priority),
+            INFLIGHT_KEY,
+            now,
+            now + app_settings.DELIVERY_LEASE_SECONDS,
+            free,
+            _REQUEUE_LIMIT,
+        )
+        for index in range(0, len(raw), 2):
+            task = asyncio.create_task(self._process(raw[index], raw[index + 1]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return len(raw) // 2
+
+    async def _process(self, message_id: str, raw_payload: str) -> None:
+        priority = Priority(int(message_id[0]))
+        metrics = get_delivery_metrics()
+        payload = json.loads(raw_payload)
+        chat_id = int(payload["chat_id"])
+        redis = _get_redis_client()
+        try:
+            # Give the message back before its lease runs out rather than
+            # let another worker pick it up while this one still waits.
+            deadline = time.monotonic() + app_settings.DELIVERY_LEASE_SECONDS / 2
+            while (wait := await _acquire(redis, chat_id, priority)) > 0:
+                if time.monotonic() + wait > deadline:
+                    await self._requeue(redis, message_id, priority, payload)
+                    return
+                await asyncio.sleep(wait)
+
+            started = time.monotonic()
+            try:
+                await self.bot.send_message(chat_id, payload["text"], **_send_kwargs(payload))
+            except TelegramRetryAfter as exc:
+                metrics.count(priority, "retry_after")
+                logger.warning("Bot API flood wait {}s for chat {}", exc.retry_after, chat_id)
+                await _pause(redis, chat_id, exc.retry_after)
+                await self._requeue(redis, message_id, priority, payload)
+                return
+            except (TelegramForbiddenError, TelegramBadRequest) as exc:
+                # Blocked bot, deleted chat, bad markup: retrying cannot help.
+                metrics.count(priority, "rejected")
+                logger.info("Dropping message {} for chat {}: {}", message_id, chat_id, exc)
+                await self._ack(redis, message_id)
+                return
+            except Exception as exc:
+                payload["attempts"] = int(payload.get("attempts", 0)) + 1
+                if payload["attempts"] >= app_settings.DELIVERY_MAX_ATTEMPTS:
+                    metrics.count(priority, "failed")
+                    logger.error(
+                        "Giving up on message {} for chat {} after {} attempts: {}",
+                        message_id, chat_id, payload["attempts"], exc,
+                    )
+                    await self._ack(redis, message_id)
+                else:
+                    metrics.count(priority, "retried")
+                    logger.warning("Send to chat {} failed, will retry: {}", chat_id, exc)
+                    await self._requeue(redis, message_id, priority, payload)
+                return
+
+            metrics.sent(
+                priority,
+                time.monotonic() - started,
+                time.time() - float(payload.get("enqueued_at", time.time())),
+            )
+            await self._ack(redis, message_id)
+        except Exception as exc:
+            # The lease stays; the message is redelivered once it expires.
+            logger.exception("Delivery of message {} failed: {}", message_id, exc)
+
+    @staticmethod
+    async def _ack(redis: Redis, message_id: str) -> None:
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(INFLIGHT_KEY, message_id)
+            pipe.delete(message_key(message_id))
+            await pipe.execute()
+
+    @staticmethod
+    async def _requeue(redis: Redis, message_id: str, priority: Priority, payload: dict) -> None:
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.set(message_key(message_id), json.dumps(payload), keepttl=True)
+            pipe.zrem(INFLIGHT_KEY, message_id)
+            pipe.lpush(queue_key(priority), message_id)
+            await pipe.execute()
+
+
+def start_delivery_worker(bot: Bot) -> asyncio.Task:
+    """Start the process-wide delivery worker once; later calls return its task."""
+    global _worker, _worker_task
+    if _worker_task is None or _worker_task.done():
+        _worker = DeliveryWorker(bot)
+        _worker_task = asyncio.create_task(_worker.run())
+    return _worker_task
+
+
+async def stop_delivery_worker() -> None:
+    """Stop claiming and let sends already in progress finish."""
+    global _worker, _worker_task
+    worker, task = _worker, _worker_task
+    _worker, _worker_task = None, None
+    if worker is None or task is None or task.done():
+        return
+    worker.stop()
+    await task
@@ -98,11 +98,11 @@ class ToolExecutor:
         return {"success": True, "available": available}
 
     async def _schedule_reminder(self, args: Dict, chat_id: int, user_id: int) -> Dict:
-        """Schedule a one-off Telegram reminder for the user via APScheduler."""
+        """Schedule a one-off Telegram reminder for the user via the delayed queue."""
         import uuid
         from datetime import datetime
         from pytz import utc as _utc
-        from ..scheduler.scheduler_instance import scheduler, start_scheduler
+        from ..scheduler.delayed_queue import enqueue
         from ..models.users import User
         from zoneinfo import ZoneInfo
 
@@ -152,30 +152,16 @@ class ToolExecutor:
             logger.warning("Attempted to schedule reminder in the past: {} UTC (now={})", reminder_dt_utc, now_utc)
             return {"success": False, "error": "Cannot schedule a reminder in the past. Please provide a future time."}
         
-        # Generate unique job_id
+        # Generate unique job_id (also the queue's idempotency key)
         unique_id = str(uuid.uuid4())[:8]
         job_id = f"reminder_{user_id}_{unique_id}"
         
-        # Check if job already exists and remove it
-        if scheduler.get_job(job_id):
-            scheduler.remove_job(job_id)
-        
-        from apscheduler.triggers.date import DateTrigger
-        # Ensure the scheduler is running
-        try:
-            if not scheduler.running:
-                start_scheduler()
-        except Exception:
-            logger.debug("Could not ensure scheduler was running when scheduling reminder")
-        
-        trigger = DateTrigger(run_date=reminder_dt_utc, timezone=_utc)
-        
-        scheduler.add_job(
-            func="app.scheduler.jobs:send_one_off_reminder_job",
-            trigger=trigger,
-            id=job_id,
-            args=[user_id, chat_id, args["message_text"]],
-            replace_existing=True,
+        await enqueue(
+            "reminder",
+            user_id,
+            job_id,
+            reminder_dt_utc,
+            {"chat_id": chat_id, "message_text": args["message_text"]},
         )
         
         # Build human-friendly time info
@@ -195,6 +181,7 @@ class ToolExecutor:
 
     async def _cancel_reminder(self, args: Dict, user_id: int) -> Dict:
         """Cancel a scheduled reminder by job_id."""
+        from ..scheduler.delayed_queue import cancel_job
         from ..scheduler.scheduler_instance import scheduler
         
         job_id = args["job_id"]
@@ -204,52 +191,52 @@ class ToolExecutor:
             logger.warning("User {} attempted to cancel reminder from different user: {}", user_id, job_id)
             return {"success": False, "error": "Cannot cancel reminder from another user"}
         
-        job = scheduler.get_job(job_id)
-        if not job:
-            logger.warning("Attempted to cancel non-existent reminder: {}", job_id)
-            return {"success": False, "error": "Reminder not found"}
-        
-        scheduler.remove_job(job_id)
+        if not await cancel_job(user_id, "reminder", job_id):
+            # Reminders created before the delayed queue are APScheduler jobs.
+            if not scheduler.get_job(job_id):
+                logger.warning("Attempted to cancel non-existent reminder: {}", job_id)
+                return {"success": False, "error": "Reminder not found"}
+            scheduler.remove_job(job_id)
         logger.info("Cancelled reminder for user {} (job_id={})", user_id, job_id)
         return {"success": True}
 
     async def _list_reminders(self, user_id: int) -> Dict:
         """List all active reminders for the user."""
+        from ..scheduler.delayed_queue import list_user_jobs
+        from ..scheduler.job_registry import get_user_jobs
         from ..scheduler.scheduler_instance import scheduler
-        from datetime import datetime
-        from pytz import utc
-        
-        # Get all jobs for this user
-        prefix = f"reminder_{user_id}_"
-        user_jobs = [job for job in scheduler.get_jobs() if job.id.startswith(prefix)]
+        from datetime import datetime, timezone as _dt_timezone
         
+        # (job_id, run_date, message_text) from the delayed queue, plus any
+        # reminders still stored as APScheduler jobs from before it
+        entries = [
+            (job["job_id"], job["due_at"], job["args"].get("message_text", "No message"))
+            for job in await list_user_jobs(user_id, "reminder")
+        ]
+        for job in get_user_jobs(scheduler, user_id, "reminder"):
+            run_date = getattr(job.trigger, "run_date", None)
+            # Job args format: [user_id, chat_id, message_text]
+            message_text = job.args[2] if len(job.args) > 2 else "No message"
+            entries.append((job.id, run_date, message_text))
+
+        # Fetch user's configured timezone (falls back to UTC)
+        user_tz = None
+        try:
+            from ..models.users import User
+            user_obj = await self.session.get(User, user_id)
+            user_tz = getattr(user_obj, "user_timezone", None)
+        except Exception:
+            user_tz = None
+
         reminders = []
-        from datetime import timezone as _dt_timezone
-        for job in user_jobs:
-            # Extract reminder details from job
-            if job.trigger and hasattr(job.trigger, 'run_date'):
-                run_date = job.trigger.run_date
-                # Convert to ISO format if it's a datetime
-                if isinstance(run_date, datetime):
-                    try:
-                        run_date_iso = run_date.astimezone(_dt_timezone.utc).isoformat()
-                    except Exception:
-                        run_date_iso = run_date.isoformat()
-                else:
-                    run_date_iso = str(run_date)
+        for job_id, run_date, message_text in entries:
+            if isinstance(run_date, datetime):
+                try:
+                    run_date_iso = run_date.astimezone(_dt_timezone.utc).isoformat()
+                except Exception:
+                    run_date_iso = run_date.isoformat()
             else:
                 run_date_iso = "Unknown"
-            
-            # Extract message text from job args (format: [user_id, chat_id, message_text])
-            message_text = job.args[2] if len(job.args) > 2 else "No message"
-            # Fetch user's configured timezone (falls back to UTC)
-            user_tz = None
-            try:
-                from ..models.users import User
-                user_obj = await self.session.get(User, user_id)
-                user_tz = getattr(user_obj, "user_timezone", None)
-            except Exception:
-                user_tz = None
 
             scheduled_for_local = None
             if isinstance(run_date, datetime):
@@ -263,7 +250,7 @@ class ToolExecutor:
                     scheduled_for_local = run_date_iso
 
             reminders.append({
-                "job_id": job.id,
+                "job_id": job_id,
                 "message": message_text,
                 "scheduled_for": run_date_iso,
                 "scheduled_for_local": scheduled_for_local,
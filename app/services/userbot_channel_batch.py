@@ -0,0 +1,191 @@
+"""
+Medium-relevance channel post batches and the global digest sweeper.
+
+Posts are appended to ``ub_channel_batch:{user_id}`` and the user id is added
+to the ``ub_channel_batch_pending`` sorted set (score = time of the oldest
+pending post). A single periodic sweep walks that set instead of running one
+APScheduler cron job per user:
+
+* only users with something to flush are looked at — no keyspace scans;
+* each user's digest still goes out on their local ``*/USERBOT_CHANNEL_BATCH_FLUSH_HOURS``
+  boundaries: a batch is due once its oldest post predates the latest boundary
+  in the user's timezone;
+* draining is atomic (Lua): the list is read, deleted and untracked in one step,
+  so a post arriving mid-sweep lands in a fresh batch;
+* digests are delivered at most USERBOT_CHANNEL_DIGEST_SEND_RATE per second.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+from zoneinfo import ZoneInfo
+
+from loguru import logger
+
+from ..config import settings as app_settings
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+CHANNEL_BATCH_PENDING_KEY = "ub_channel_batch_pending"
+# Lists expire as a safety net if they are never flushed.
+CHANNEL_BATCH_TTL_SECONDS = 86_400
+
+# KEYS[1] = batch list, KEYS[2] = pending zset; ARGV[1] = user id.
+_DRAIN_SCRIPT = """
+local items = redis.call('LRANGE', KEYS[1], 0, -1)
+redis.call('DEL', KEYS[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+return items
+"""
+
+
+def channel_batch_key(user_id: int) -> str:
+    return f"ub_channel_batch:{user_id}"
+
+
+async def add_to_channel_batch(user_id: int, entry: dict) -> int:
+    """Append a post to the user's batch; returns the new batch size."""
+    payload = json.dumps(entry, ensure_ascii=False)
+    list_key = channel_batch_key(user_id)
+    redis = await _get_redis()
+    try:
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.rpush(list_key, payload)
+            pipe.expire(list_key, CHANNEL_BATCH_TTL_SECONDS)
+            pipe.zadd(CHANNEL_BATCH_PENDING_KEY, {str(user_id): time.time()}, nx=True)
+            result = await pipe.execute()
+        return int(result[0])
+    finally:
+        await redis.aclose()
+
+
+async def drain_channel_batch(user_id: int, redis=None) -> list[dict]:
+    """Atomically take every pending post of the user's batch."""
+    own_redis = redis is None
+    if own_redis:
+        redis = await _get_redis()
+    try:
+        raw_items = await redis.eval(
+            _DRAIN_SCRIPT,
+            2,
+            channel_batch_key(user_id),
+            CHANNEL_BATCH_PENDING_KEY,
+            str(user_id),
+        )
+    finally:
+        if own_redis:
+            await redis.aclose()
+
+    items: list[dict] = []
+    for raw in raw_items or []:
+        try:
+            items.append(json.loads(raw))
+        except (json.JSONDecodeError, TypeError):
+            continue
+    return items
+
+
+def latest_flush_boundary(now: datetime, tz_name: str | None, flush_hours: int) -> float:
+    """Epoch seconds of the most recent local ``*/flush_hours`` boundary."""
+    try:
+        tz = ZoneInfo(tz_name) if tz_name else timezone.utc
+    except Exception:
+        tz = timezone.utc
+    hours = max(1, flush_hours)
+    local = now.astimezone(tz)
+    boundary = local.replace(
+        hour=(local.hour // hours) * hours, minute=0, second=0, microsecond=0
+    )
+    return boundary.timestamp()
+
+
+async def sweep_channel_batches(bot: "Bot", now: datetime | None = None) -> int:
+    """Flush every pending batch whose local flush boundary has passed."""
+    now = now or datetime.now(timezone.utc)
+    redis = await _get_redis()
+    try:
+        pending = await redis.zrange(CHANNEL_BATCH_PENDING_KEY, 0, -1, withscores=True)
+        if not pending:
+            return 0
+        oldest = {int(member): float(score) for member, score in pending}
+        targets = await _load_sweep_targets(list(oldest))
+
+        stale: list[str] = []
+        due: list[int] = []
+        for user_id, first_ts in oldest.items():
+            target = targets.get(user_id)
+            if target is None or not target["monitoring"]:
+                stale.append(str(user_id))
+                continue
+            if target["break_mode"]:
+                continue
+            boundary = latest_flush_boundary(
+                now, target["timezone"], app_settings.USERBOT_CHANNEL_BATCH_FLUSH_HOURS
+            )
+            if first_ts <= boundary:
+                due.append(user_id)
+        if stale:
+            # Monitoring is off; the list itself expires via its TTL.
+            await redis.zrem(CHANNEL_BATCH_PENDING_KEY, *stale)
+
+        from .userbot_monitor import deliver_channel_digest
+
+        interval = 1.0 / max(0.1, app_settings.USERBOT_CHANNEL_DIGEST_SEND_RATE)
+        flushed = 0
+        for user_id in due:
+            started = time.monotonic()
+            try:
+                items = await drain_channel_batch(user_id, redis=redis)
+                if items and await deliver_channel_digest(
+                    user_id, bot, items, tg=targets[user_id]["delivery"]
+                ):
+                    flushed += 1
+            except Exception as exc:
+                logger.error("Channel digest sweep failed for user {}: {}", user_id, exc)
+            remaining = interval - (time.monotonic() - started)
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+        if flushed:
+            logger.info("Channel digest sweep flushed {} batch(es)", flushed)
+        return flushed
+    finally:
+        await redis.aclose()
+
+
+async def _load_sweep_targets(user_ids: list[int]) -> dict[int, dict]:
+    """Timezone, delivery target and channel settings for many users in one query."""
+    from sqlmodel import select
+
+    from ..db import get_session
+    from ..models.settings import UserSettings
+    from ..models.users import User
+    from ..utils.telegram_topics import topic_kwargs_for_user
+    from .userbot_monitor import _is_break_mode_active
+
+    async with get_session() as session:
+        result = await session.execute(
+            select(User, UserSettings)
+            .join(UserSettings, UserSettings.user_id == User.id)
+            .where(User.id.in_(user_ids))
+        )
+        rows = result.all()
+
+    return {
+        user.id: {
+            "timezone": user.user_timezone,
+            "monitoring": bool(getattr(user_settings, "enable_channel_monitoring", False)),
+            "break_mode": _is_break_mode_active(user_settings),
+            "delivery": (user.tg_chat_id, topic_kwargs_for_user(user)),
+        }
+        for user, user_settings in rows
+    }
+
+
+async def _get_redis():
+    from redis.asyncio import Redis
+
+    return Redis.from_url(app_settings.REDIS_URL, decode_responses=True)
@@ -0,0 +1,159 @@
+"""
+Near-duplicate suppression for channel posts.
+
+Channels cross-post and lightly edit the same news. Before a post is
+classified, its normalized text (lowercased, links / mentions / punctuation
+stripped) is reduced to a 64-bit SimHash over word bigrams. The user's recent
+signatures live in the ``ub_channel_sigs:{user_id}`` sorted set (score = time
+seen), trimmed to USERBOT_CHANNEL_DEDUPE_WINDOW_HOURS and
+USERBOT_CHANNEL_DEDUPE_MAX_SIGNATURES.
+
+A post within USERBOT_CHANNEL_DEDUPE_MAX_DISTANCE bits of a recent signature
+skips classification. If the original is still waiting in the user's channel
+batch, the duplicate's link is attached to that batch item instead.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+import time
+
+from ..config import settings as app_settings
+from .userbot_channel_batch import channel_batch_key
+
+_URL_RE = re.compile(r"(?:https?://|www\.|t\.me/)\S+", re.IGNORECASE)
+_MENTION_RE = re.compile(r"[@#]\w+")
+_NON_WORD_RE = re.compile(r"[\W_]+")
+
+_SHINGLE_SIZE = 2
+_MAX_EXTRA_LINKS = 5
+
+# Find-and-update in one step: LSET by an index read in an earlier round trip
+# could overwrite a post pushed after the batch was drained.
+# KEYS[1] = batch list; ARGV = signature, channel name, post link, max extra links.
+_MERGE_SCRIPT = """
+local items = redis.call('LRANGE', KEYS[1], 0, -1)
+for index, raw in ipairs(items) do
+    local ok, item = pcall(cjson.decode, raw)
+    if ok and type(item) == 'table' and item['sig'] == ARGV[1] then
+        local extra = item['extra_links']
+        if type(extra) ~= 'table' then extra = {} end
+        if item['post_link'] == ARGV[3] or #extra >= tonumber(ARGV[4]) then
+            return 1
+        end
+        for _, link in ipairs(extra) do
+            if link['post_link'] == ARGV[3] then return 1 end
+        end
+        table.insert(extra, {channel_name = ARGV[2], post_link = ARGV[3]})
+        item['extra_links'] = extra
+        redis.call('LSET', KEYS[1], index - 1, cjson.encode(item))
+        return 1
+    end
+end
+return 0
+"""
+
+
+def channel_signatures_key(user_id: int) -> str:
+    return f"ub_channel_sigs:{user_id}"
+
+
+def normalize_post_text(text: str) -> str:
+    text = _URL_RE.sub(" ", text.casefold())
+    text = _MENTION_RE.sub(" ", text)
+    return _NON_WORD_RE.sub(" ", text).strip()
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash of the normalized text's word shingles."""
+    words = normalize_post_text(text).split()
+    if len(words) >= _SHINGLE_SIZE:
+        features = [
+            " ".join(words[i : i + _SHINGLE_SIZE])
+            for i in range(len(words) - _SHINGLE_SIZE + 1)
+        ]
+    else:
+        features = words
+
+    weights = [0] * 64
+    for feature in features:
+        digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+        value = int.from_bytes(digest, "big")
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+
+    signature = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            signature |= 1 << bit
+    return signature
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+async def find_near_duplicate(user_id: int, signature: int) -> str | None:
+    """
+    Return the hex signature of a recent near-duplicate, or remember this one.
+
+    Check and insert are two round trips, so two copies handled at the same
+    instant may both pass; the window only has to catch the common case of
+    reposts arriving seconds to hours apart.
+    """
+    key = channel_signatures_key(user_id)
+    now = time.time()
+    window = app_settings.USERBOT_CHANNEL_DEDUPE_WINDOW_HOURS * 3600
+    max_distance = app_settings.USERBOT_CHANNEL_DEDUPE_MAX_DISTANCE
+    redis = await _get_redis()
+    try:
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.zremrangebyscore(key, "-inf", now - window)
+            pipe.zrange(key, 0, -1)
+            result = await pipe.execute()
+
+        for member in result[1] or []:
+            try:
+                if hamming_distance(signature, int(member, 16)) <= max_distance:
+                    return member
+            except (TypeError, ValueError):
+                continue
+
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.zadd(key, {f"{signature:016x}": now})
+            pipe.zremrangebyrank(
+                key, 0, -app_settings.USERBOT_CHANNEL_DEDUPE_MAX_SIGNATURES - 1
+            )
+            pipe.expire(key, window)
+            await pipe.execute()
+        return None
+    finally:
+        await redis.aclose()
+
+
+async def merge_into_batch(
+    user_id: int, signature: str, *, channel_name: str, post_link: str
+) -> bool:
+    """Attach a duplicate's link to the pending batch item with *signature*."""
+    if not post_link:
+        return False
+    redis = await _get_redis()
+    try:
+        merged = await redis.eval(
+            _MERGE_SCRIPT,
+            1,
+            channel_batch_key(user_id),
+            signature,
+            channel_name,
+            post_link,
+            _MAX_EXTRA_LINKS,
+        )
+        return bool(merged)
+    finally:
+        await redis.aclose()
+
+
+async def _get_redis():
+    from redis.asyncio import Redis
+
+    return Redis.from_url(app_settings.REDIS_URL, decode_responses=True)
@@ -0,0 +1,170 @@
+"""
+Per-client snapshot of recent private dialogs for action-plan targets.
+
+``_fetch_action_target_candidates`` needs a short allowlist of recent private
+chats. Listing dialogs is a heavy MTProto call that is also subject to
+flood-wait, so instead of calling ``iter_dialogs`` on every action plan we keep
+a snapshot per connected client:
+
+* The snapshot is loaded in the background when the client starts and
+  refreshed in the background once it is older than
+  USERBOT_DIALOG_CACHE_TTL_SECONDS.
+* Incoming and outgoing private messages move the chat to the front of the
+  snapshot, so recency stays accurate between refreshes.
+* Readers never wait for the network; a cold snapshot simply yields fewer
+  candidates until the first refresh completes.
+* A failed refresh is retried after one minute, doubling on each further
+  failure up to the TTL.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any
+
+from loguru import logger
+
+from ..config import settings as app_settings
+from .userbot_entity_cache import display_name
+
+# First retry delay after a failed refresh; doubles per failure, capped at the TTL.
+_RETRY_BASE_SECONDS = 60.0
+
+
+class UserBotDialogCache:
+    """Most-recent-first snapshot of private dialogs for one client."""
+
+    def __init__(self, *, ttl_seconds: float, max_size: int) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max(1, max_size)
+        self.refreshed_at: float | None = None
+        self.retry_at: float | None = None
+        self._failures = 0
+        self._entries: OrderedDict[int, dict] = OrderedDict()
+        self._refresh_task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def is_stale(self) -> bool:
+        now = time.monotonic()
+        if self.retry_at is not None:
+            return now >= self.retry_at
+        return self.refreshed_at is None or now - self.refreshed_at >= self.ttl_seconds
+
+    def touch(self, entity: Any, chat_id: int | None = None) -> None:
+        """Record activity in a private chat and move it to the front."""
+        entry = _dialog_entry(entity, chat_id)
+        if entry is None:
+            return
+        self._entries[entry["chat_id"]] = entry
+        self._entries.move_to_end(entry["chat_id"], last=False)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=True)
+
+    def snapshot(self, limit: int) -> list[dict]:
+        return [dict(entry) for entry in list(self._entries.values())[: max(0, limit)]]
+
+    def replace(self, entries: list[dict]) -> None:
+        fresh: OrderedDict[int, dict] = OrderedDict()
+        for entry in entries[: self.max_size]:
+            fresh.setdefault(entry["chat_id"], entry)
+        self._entries = fresh
+        self.refreshed_at = time.monotonic()
+        self.retry_at = None
+        self._failures = 0
+
+    async def refresh(self, client) -> None:
+        entries: list[dict] = []
+        async for dialog in client.iter_dialogs(limit=self.max_size):
+            if not getattr(dialog, "is_user", False):
+                continue
+            entry = _dialog_entry(
+                getattr(dialog, "entity", None),
+                getattr(dialog, "id", None),
+                fallback_name=getattr(dialog, "name", None),
+            )
+            if entry is not None:
+                entries.append(entry)
+        self.replace(entries)
+
+    def schedule_refresh(self, client) -> None:
+        """Start a background refresh unless one is already running."""
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.create_task(self._safe_refresh(client))
+
+    async def _safe_refresh(self, client) -> None:
+        try:
+            await self.refresh(client)
+            logger.debug("Userbot dialog snapshot refreshed ({} chats)", len(self))
+        except Exception as exc:
+            # Back off instead of retrying on every action plan.
+            self._failures += 1
+            delay = min(self.ttl_seconds, _RETRY_BASE_SECONDS * 2 ** (self._failures - 1))
+            self.retry_at = time.monotonic() + delay
+            logger.warning(
+                "Userbot dialog snapshot refresh failed ({} in a row), retrying in {:.0f}s: {}",
+                self._failures,
+                delay,
+                exc,
+            )
+
+
+_caches: "weakref.WeakKeyDictionary[Any, UserBotDialogCache]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_dialog_cache(client) -> UserBotDialogCache:
+    cache = _caches.get(client)
+    if cache is None:
+        cache = UserBotDialogCache(
+            ttl_seconds=app_settings.USERBOT_DIALOG_CACHE_TTL_SECONDS,
+            max_size=max(1, app_settings.USERBOT_ACTION_TARGET_DIALOG_LIMIT),
+        )
+        _caches[client] = cache
+    return cache
+
+
+def drop_dialog_cache(client) -> None:
+    cache = _caches.pop(client, None)
+    if cache is not None and cache._refresh_task is not None:
+        cache._refresh_task.cancel()
+
+
+def recent_private_dialogs(client, limit: int) -> list[dict]:
+    """Return cached recent private dialogs, refreshing in the background if stale."""
+    cache = get_dialog_cache(client)
+    if cache.is_stale():
+        cache.schedule_refresh(client)
+    return cache.snapshot(limit)
+
+
+def _dialog_entry(
+    entity: Any,
+    chat_id: int | None,
+    *,
+    fallback_name: str | None = None,
+) -> dict | None:
+    if entity is None or getattr(entity, "bot", False):
+        return None
+    resolved_id = _coerce_int(chat_id) or _coerce_int(getattr(entity, "id", None))
+    if not resolved_id:
+        return None
+    return {
+        "chat_id": resolved_id,
+        "label": display_name(entity, fallback_name or f"user {resolved_id}"),
+        "username": getattr(entity, "username", None),
+    }
+
+
+def _coerce_int(value) -> int | None:
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
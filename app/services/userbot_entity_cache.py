@@ -0,0 +1,147 @@
+"""
+Per-client entity cache for Telethon sender lookups.
+
+Thread fetches and event handlers used to call ``client.get_me()`` and
+``msg.get_sender()`` for every message, which can cost one MTProto round-trip
+per message. Telethon already returns the sender entities together with
+``get_messages`` results and most update events, so we remember them here and
+answer later lookups locally.
+
+* One cache per TelegramClient, dropped automatically with the client.
+* Entries expire after USERBOT_ENTITY_CACHE_TTL_SECONDS and the cache is
+  bounded to USERBOT_ENTITY_CACHE_MAX_SIZE entries (least recently used first).
+* ``me`` is cached for the lifetime of the client.
+"""
+from __future__ import annotations
+
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any
+
+from loguru import logger
+
+from ..config import settings as app_settings
+
+
+class UserBotEntityCache:
+    """Bounded TTL cache of Telethon entities keyed by sender id."""
+
+    def __init__(self, *, ttl_seconds: float, max_size: int) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max(1, max_size)
+        self.me: Any = None
+        self._entries: OrderedDict[int, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, entity_id: int | None) -> Any:
+        entity_id = _coerce_int(entity_id)
+        if entity_id is None:
+            return None
+        entry = self._entries.get(entity_id)
+        if entry is None:
+            return None
+        expires_at, entity = entry
+        if expires_at <= time.monotonic():
+            self._entries.pop(entity_id, None)
+            return None
+        self._entries.move_to_end(entity_id)
+        return entity
+
+    def remember(self, entity: Any) -> None:
+        entity_id = _coerce_int(getattr(entity, "id", None))
+        if entity is None or entity_id is None:
+            return
+        self._entries[entity_id] = (time.monotonic() + self.ttl_seconds, entity)
+        self._entries.move_to_end(entity_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def remember_message_senders(self, messages) -> None:
+        """Store the sender entities Telethon attached to fetched messages."""
+        for message in messages or []:
+            self.remember(getattr(message, "sender", None))
+
+    def clear(self) -> None:
+        self.me = None
+        self._entries.clear()
+
+
+_caches: "weakref.WeakKeyDictionary[Any, UserBotEntityCache]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_entity_cache(client) -> UserBotEntityCache:
+    """Return the entity cache bound to *client*, creating it on first use."""
+    cache = _caches.get(client)
+    if cache is None:
+        cache = UserBotEntityCache(
+            ttl_seconds=app_settings.USERBOT_ENTITY_CACHE_TTL_SECONDS,
+            max_size=app_settings.USERBOT_ENTITY_CACHE_MAX_SIZE,
+        )
+        _caches[client] = cache
+    return cache
+
+
+def drop_entity_cache(client) -> None:
+    cache = _caches.pop(client, None)
+    if cache is not None:
+        cache.clear()
+
+
+async def get_cached_me(client):
+    """Return the connected account's own user, fetched once per client."""
+    cache = get_entity_cache(client)
+    if cache.me is None:
+        cache.me = await client.get_me()
+        cache.remember(cache.me)
+    return cache.me
+
+
+async def resolve_event_sender(client, event):
+    """
+    Resolve the sender of an incoming event, preferring entities already
+    attached to the update or cached from earlier fetches.
+    """
+    cache = get_entity_cache(client)
+    sender = getattr(event, "sender", None)
+    if sender is None:
+        sender = cache.get(_event_sender_id(event))
+    if sender is None:
+        try:
+            sender = await event.get_sender()
+        except Exception as exc:
+            logger.debug("Could not resolve event sender: {}", exc)
+            return None
+    cache.remember(sender)
+    return sender
+
+
+def display_name(entity, default: str = "?") -> str:
+    first = getattr(entity, "first_name", None) or ""
+    last = getattr(entity, "last_name", None) or ""
+    return (
+        f"{first} {last}".strip()
+        or getattr(entity, "username", None)
+        or getattr(entity, "title", None)
+        or default
+    )
+
+
+def _event_sender_id(event) -> int | None:
+    sender_id = getattr(event, "sender_id", None)
+    if sender_id is None:
+        sender_id = getattr(getattr(event, "message", None), "sender_id", None)
+    return _coerce_int(sender_id)
+
+
+def _coerce_int(value) -> int | None:
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
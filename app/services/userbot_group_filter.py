@@ -0,0 +1,166 @@
+"""
+Local prefilter for incoming group messages.
+
+Only group messages that pass this filter enter the debounce + LLM pipeline.
+Checks run cheapest first:
+
+1. a direct mention of the owner (text or mention entity);
+2. a reply to one of the owner's messages;
+3. a match in the owner's keyword automaton — one compiled, case-insensitive
+   alternation of the owner's name, username and interest terms. This widens
+   intake beyond mentions and replies, so it is opt-in through
+   USERBOT_GROUP_PREFILTER_KEYWORDS;
+4. a random USERBOT_GROUP_PREFILTER_SAMPLE_RATE sample, so the classifier's
+   verdict on otherwise-dropped traffic shows how much the filter misses.
+   Sampled messages are only classified and counted, never persisted or
+   notified.
+
+Per-group overrides live in the ``ub_group_mode:{user_id}`` hash:
+``all`` sends every message to the pipeline, ``mentions`` skips steps 3-4,
+``off`` ignores the group. The automaton and overrides are cached per user for
+USERBOT_GROUP_PREFILTER_TTL_SECONDS.
+"""
+from __future__ import annotations
+
+import random
+import re
+import time
+from dataclasses import dataclass, field
+
+from ..config import settings as app_settings
+
+GROUP_MODES = ("all", "mentions", "off")
+
+_MIN_TERM_LENGTH = 3
+_MAX_INTEREST_TERMS = 50
+_TERM_SPLIT_RE = re.compile(r"[,;\n/|]+")
+
+_prefilters: dict[int, "GroupPrefilter"] = {}
+
+
+def group_mode_key(user_id: int) -> str:
+    return f"ub_group_mode:{user_id}"
+
+
+@dataclass
+class GroupPrefilter:
+    """Keyword automaton and per-group modes for one account owner."""
+
+    pattern: re.Pattern | None
+    overrides: dict[int, str] = field(default_factory=dict)
+    built_at: float = field(default_factory=time.monotonic)
+
+    def mode(self, chat_id: int | None) -> str | None:
+        return self.overrides.get(chat_id) if chat_id is not None else None
+
+    def keyword_match(self, text: str) -> str | None:
+        if self.pattern is None or not text:
+            return None
+        match = self.pattern.search(text)
+        return match.group(0) if match else None
+
+    def is_stale(self) -> bool:
+        ttl = max(1, app_settings.USERBOT_GROUP_PREFILTER_TTL_SECONDS)
+        return time.monotonic() - self.built_at > ttl
+
+
+def keyword_alternatives(me, interests: str | None) -> list[str]:
+    """
+    Regex fragments for the owner's aliases and interests. Names accept a
+    two-letter ending and interest terms of six or more characters lose their
+    last two letters for a short suffix, to cover inflected forms (e.g.
+    Russian case endings); usernames must match exactly.
+    """
+    fragments: dict[str, str] = {}
+
+    def add(term: str, fragment: str) -> None:
+        if len(term) >= _MIN_TERM_LENGTH:
+            fragments.setdefault(term.casefold(), fragment)
+
+    username = getattr(me, "username", None)
+    if username:
+        add(username, re.escape(username.lstrip("@")))
+    for name in (getattr(me, "first_name", None), getattr(me, "last_name", None)):
+        if name:
+            add(name, re.escape(name) + r"\w{0,2}")
+    if interests:
+        parts = [part.strip() for part in _TERM_SPLIT_RE.split(interests)]
+        for term in parts[:_MAX_INTEREST_TERMS]:
+            if len(term) >= 6 and term[-2:].isalpha():
+                add(term, re.escape(term[:-2]) + r"\w{0,4}")
+            elif term:
+                add(term, re.escape(term))
+    return list(fragments.values())
+
+
+def build_keyword_pattern(fragments: list[str]) -> re.Pattern | None:
+    """Compile all fragments into one case-insensitive alternation, longest first."""
+    if not fragments:
+        return None
+    alternation = "|".join(sorted(fragments, key=len, reverse=True))
+    return re.compile(rf"(?<!\w)(?:{alternation})(?!\w)", re.IGNORECASE)
+
+
+def should_sample() -> bool:
+    return random.random() < app_settings.USERBOT_GROUP_PREFILTER_SAMPLE_RATE
+
+
+async def get_group_prefilter(user_id: int, me) -> GroupPrefilter:
+    cached = _prefilters.get(user_id)
+    if cached is not None and not cached.is_stale():
+        return cached
+
+    pattern = None
+    if app_settings.USERBOT_GROUP_PREFILTER_KEYWORDS:
+        from .userbot_monitor import _get_user_settings
+
+        user_settings = await _get_user_settings(user_id)
+        interests = getattr(user_settings, "userbot_channel_interests", None)
+        pattern = build_keyword_pattern(keyword_alternatives(me, interests))
+    prefilter = GroupPrefilter(
+        pattern=pattern,
+        overrides=await list_group_overrides(user_id),
+    )
+    _prefilters[user_id] = prefilter
+    return prefilter
+
+
+def invalidate_group_prefilter(user_id: int) -> None:
+    _prefilters.pop(user_id, None)
+
+
+async def list_group_overrides(user_id: int) -> dict[int, str]:
+    redis = await _get_redis()
+    try:
+        raw = await redis.hgetall(group_mode_key(user_id))
+    finally:
+        await redis.aclose()
+    overrides: dict[int, str] = {}
+    for chat_id, mode in (raw or {}).items():
+        try:
+            if mode in GROUP_MODES:
+                overrides[int(chat_id)] = mode
+        except (TypeError, ValueError):
+            continue
+    return overrides
+
+
+async def set_group_override(user_id: int, chat_id: int, mode: str | None) -> None:
+    """Set a group's mode; ``None`` restores the default prefilter."""
+    if mode is not None and mode not in GROUP_MODES:
+        raise ValueError(f"Unknown group mode: {mode}")
+    redis = await _get_redis()
+    try:
+        if mode is None:
+            await redis.hdel(group_mode_key(user_id), str(chat_id))
+        else:
+            await redis.hset(group_mode_key(user_id), str(chat_id), mode)
+    finally:
+        await redis.aclose()
+    invalidate_group_prefilter(user_id)
+
+
+async def _get_redis():
+    from redis.asyncio import Redis
+
+    return Redis.from_url(app_settings.REDIS_URL, decode_responses=True)
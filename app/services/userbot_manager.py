@@ -17,6 +17,11 @@ Design decisions
 from __future__ import annotations
 
 import asyncio
+import inspect
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
 from typing import Optional
 
 from loguru import logger
@@ -25,9 +30,29 @@ from telethon.sessions import StringSession
 
 from ..config import settings as app_settings
 from ..utils.telegram_mtproto import build_telethon_proxy
+from .userbot_dialog_cache import drop_dialog_cache, get_dialog_cache
+from .userbot_entity_cache import drop_entity_cache
+from .userbot_reply_timer import stop_reply_timer_poller
+from .userbot_sharding import send_command, sharding_enabled
 
 # ── Active clients: bot user_id → TelegramClient ──────────────────────────────
 _clients: dict[int, TelegramClient] = {}
+# Users whose client is connecting; they hold a slot under the active-client cap.
+_starting: set[int] = set()
+
+# ── Restart backoff / quarantine per bot user_id ──────────────────────────────
+@dataclass
+class _RestartState:
+    failures: int = 0
+    retry_at: float = 0.0  # time.monotonic() before which no start is attempted
+    quarantined: bool = False
+
+
+_restart_state: dict[int, _RestartState] = {}
+
+# ── Startup progress (exposed on /health) ─────────────────────────────────────
+_startup_progress: dict = {"state": "idle"}
+_startup_task: asyncio.Task | None = None
 
 # ── Pending auth clients (not yet fully signed-in) ────────────────────────────
 # Structure: {user_id: {"client": TelegramClient, "phone": str, "phone_code_hash": str}}
@@ -43,8 +68,12 @@ class UserBotManager:
     async def start_all(bot) -> None:
         """
         Called once during application startup.
-        Loads every active UserBotSession from the DB and starts a client.
+        Loads every active UserBotSession from the DB and starts the clients in
+        a background task, so the app becomes ready before every client is
+        connected. Progress is reported by ``startup_progress()``.
         """
+        global _startup_task
+
         if not app_settings.TELEGRAM_API_ID or not app_settings.TELEGRAM_API_HASH:
             logger.warning(
                 "TELEGRAM_API_ID / TELEGRAM_API_HASH not configured — userbot disabled"
@@ -60,29 +89,146 @@ class UserBotManager:
                 result = await session.execute(
                     select(UserBotSession).where(UserBotSession.is_active == True)  # noqa: E712
                 )
-                rows = result.scalars().all()
-
-            for row in rows:
-                try:
-                    await UserBotManager.start_client(
-                        user_id=row.user_id,
-                        session_string=row.session_string or "",
-                        bot=bot,
-                    )
-                except Exception as exc:
-                    logger.error(
-                        "Failed to start userbot for user {}: {}", row.user_id, exc
-                    )
-
-            logger.info("UserBotManager: {} client(s) started", len(_clients))
+                sessions = [
+                    (row.user_id, row.session_string or "")
+                    for row in result.scalars().all()
+                ]
         except Exception as exc:
             logger.error("UserBotManager.start_all failed: {}", exc)
+            _startup_progress["state"] = "failed"
+            return
+
+        _startup_progress.clear()
+        _startup_progress.update(
+            {
+                "state": "starting",
+                "total": len(sessions),
+                "started": 0,
+                "failed": 0,
+                "deferred": 0,
+                "started_at": datetime.now(timezone.utc).isoformat(),
+                "finished_at": None,
+            }
+        )
+        _startup_task = asyncio.create_task(
+            UserBotManager._run_startup(sessions, bot)
+        )
+
+    @staticmethod
+    async def _run_startup(sessions: list[tuple[int, str]], bot) -> None:
+        started_at = time.monotonic()
+        try:
+            await UserBotManager.start_many(sessions, bot, progress=_startup_progress)
+            _startup_progress["state"] = "ready"
+        except asyncio.CancelledError:
+            _startup_progress["state"] = "cancelled"
+            raise
+        except Exception as exc:
+            _startup_progress["state"] = "failed"
+            logger.error("UserBotManager startup failed: {}", exc)
+        finally:
+            _startup_progress["finished_at"] = datetime.now(timezone.utc).isoformat()
+            _startup_progress["duration_seconds"] = round(
+                time.monotonic() - started_at, 1
+            )
+        logger.info(
+            "UserBotManager: {} client(s) started, {} failed, {} deferred in {}s",
+            _startup_progress["started"],
+            _startup_progress["failed"],
+            _startup_progress["deferred"],
+            _startup_progress["duration_seconds"],
+        )
+
+    @staticmethod
+    def startup_progress() -> dict:
+        return {**_startup_progress, "active_clients": len(_clients)}
+
+    @staticmethod
+    async def start_many(
+        sessions: list[tuple[int, str]],
+        bot,
+        *,
+        restart: bool = False,
+        progress: dict | None = None,
+    ) -> dict[str, int]:
+        """
+        Start (or restart) many clients with bounded concurrency and jitter.
+        Users still in backoff or quarantine are deferred rather than retried.
+        """
+        counts = progress if progress is not None else {}
+        for key in ("started", "failed", "deferred"):
+            counts.setdefault(key, 0)
+        semaphore = asyncio.Semaphore(max(1, app_settings.USERBOT_START_CONCURRENCY))
+
+        async def run_one(user_id: int, session_string: str) -> None:
+            if not UserBotManager.can_attempt_start(user_id):
+                counts["deferred"] += 1
+                return
+            async with semaphore:
+                jitter = max(0.0, app_settings.USERBOT_START_JITTER_SECONDS)
+                if jitter:
+                    await asyncio.sleep(random.uniform(0, jitter))
+                if restart:
+                    await UserBotManager.stop_client(user_id)
+                ok = await UserBotManager.start_with_backoff(
+                    user_id, session_string, bot
+                )
+            counts["started" if ok else "failed"] += 1
+
+        await asyncio.gather(*(run_one(uid, s) for uid, s in sessions))
+        return {key: counts[key] for key in ("started", "failed", "deferred")}
+
+    @staticmethod
+    def can_attempt_start(user_id: int) -> bool:
+        state = _restart_state.get(user_id)
+        return state is None or state.retry_at <= time.monotonic()
+
+    @staticmethod
+    async def start_with_backoff(user_id: int, session_string: str, bot) -> bool:
+        """Start one client and record the outcome for backoff/quarantine."""
+        ok = False
+        try:
+            ok = await UserBotManager.start_client(
+                user_id=user_id, session_string=session_string, bot=bot
+            )
+        except Exception as exc:
+            logger.error("Failed to start userbot for user {}: {}", user_id, exc)
+        if ok:
+            _restart_state.pop(user_id, None)
+        elif len(_clients) + len(_starting) < app_settings.USERBOT_MAX_ACTIVE_CLIENTS:
+            UserBotManager._record_start_failure(user_id)
+        return ok
+
+    @staticmethod
+    def _record_start_failure(user_id: int) -> None:
+        state = _restart_state.setdefault(user_id, _RestartState())
+        state.failures += 1
+        if state.failures >= app_settings.USERBOT_QUARANTINE_FAILURES:
+            delay = float(app_settings.USERBOT_QUARANTINE_SECONDS)
+            if not state.quarantined:
+                logger.warning(
+                    "Userbot for user {} quarantined after {} failed starts",
+                    user_id,
+                    state.failures,
+                )
+            state.quarantined = True
+        else:
+            delay = min(
+                app_settings.USERBOT_RESTART_BACKOFF_BASE_SECONDS
+                * 2 ** (state.failures - 1),
+                app_settings.USERBOT_RESTART_BACKOFF_MAX_SECONDS,
+            )
+            delay *= random.uniform(0.8, 1.2)
+        state.retry_at = time.monotonic() + delay
 
     @staticmethod
     async def stop_all() -> None:
         """Disconnect every active Telethon client gracefully."""
+        if _startup_task is not None and not _startup_task.done():
+            _startup_task.cancel()
         for uid in list(_clients.keys()):
             await UserBotManager.stop_client(uid)
+        await stop_reply_timer_poller()
         logger.info("UserBotManager: all clients stopped")
 
     # ------------------------------------------------------------------ #
@@ -90,64 +236,72 @@ class UserBotManager:
     # ------------------------------------------------------------------ #
 
     @staticmethod
-    async def start_client(user_id: int, session_string: str, bot) -> None:
+    async def start_client(user_id: int, session_string: str, bot) -> bool:
         """
         Connect a Telethon client from an existing StringSession and register
         event handlers.  If the session is expired/invalid the DB record is
         deactivated and nothing is added to ``_clients``.
 
         If a client already exists for this user but is disconnected, it is
-        cleaned up and replaced.
+        cleaned up and replaced. Returns True when a client is running.
         """
         from .userbot_monitor import setup_handlers
 
         existing = _clients.get(user_id)
         if existing is not None:
-            try:
-                if await existing.is_connected():
-                    logger.info("Userbot client for user {} is already connected", user_id)
-                    return
-            except Exception:
-                pass
+            if await UserBotManager.is_client_connected(user_id):
+                logger.info("Userbot client for user {} is already connected", user_id)
+                return True
             logger.warning("Userbot client for user {} is disconnected; restarting", user_id)
             await UserBotManager.stop_client(user_id)
 
-        if len(_clients) >= app_settings.USERBOT_MAX_ACTIVE_CLIENTS:
+        if user_id in _starting:
+            logger.info("Userbot client for user {} is already starting", user_id)
+            return False
+        # Reserve the slot before connecting so concurrent starts cannot overshoot the cap.
+        if len(_clients) + len(_starting) >= app_settings.USERBOT_MAX_ACTIVE_CLIENTS:
             logger.warning(
-                "Userbot active client cap reached (%s). Skipping user %s",
+                "Userbot active client cap reached ({}). Skipping user {}",
                 app_settings.USERBOT_MAX_ACTIVE_CLIENTS,
                 user_id,
             )
-            return
-
-        client = TelegramClient(
-            StringSession(session_string),
-            app_settings.TELEGRAM_API_ID,
-            app_settings.TELEGRAM_API_HASH,
-            proxy=build_telethon_proxy(app_settings.TELEGRAM_API_PROXY),
-        )
-        await client.connect()
-
-        if not await client.is_user_authorized():
-            logger.warning(
-                "Userbot session for user {} is invalid/expired — deactivating", user_id
+            return False
+        _starting.add(user_id)
+        try:
+            client = TelegramClient(
+                StringSession(session_string),
+                app_settings.TELEGRAM_API_ID,
+                app_settings.TELEGRAM_API_HASH,
+                proxy=build_telethon_proxy(app_settings.TELEGRAM_API_PROXY),
             )
-            await UserBotManager._deactivate_session(user_id)
-            try:
-                await client.disconnect()
-            except Exception:
-                pass
-            return
+            await client.connect()
 
-        setup_handlers(client, user_id, bot)
-        _clients[user_id] = client
+            if not await client.is_user_authorized():
+                logger.warning(
+                    "Userbot session for user {} is invalid/expired — deactivating", user_id
+                )
+                await UserBotManager._deactivate_session(user_id)
+                try:
+                    await client.disconnect()
+                except Exception:
+                    pass
+                return False
+
+            setup_handlers(client, user_id, bot)
+            _clients[user_id] = client
+        finally:
+            _starting.discard(user_id)
+        get_dialog_cache(client).schedule_refresh(client)
         logger.info("Userbot client started for user {}", user_id)
+        return True
 
     @staticmethod
     async def stop_client(user_id: int) -> None:
         """Disconnect and remove a user's client from the registry."""
         client = _clients.pop(user_id, None)
         if client:
+            drop_entity_cache(client)
+            drop_dialog_cache(client)
             try:
                 await client.disconnect()
             except Exception as exc:
@@ -160,6 +314,46 @@ class UserBotManager:
     def get_client(user_id: int) -> Optional[TelegramClient]:
         return _clients.get(user_id)
 
+    @staticmethod
+    async def is_client_connected(user_id: int) -> bool:
+        """True when this process holds a connected client for the user."""
+        client = _clients.get(user_id)
+        if client is None:
+            return False
+        try:
+            connected = client.is_connected()
+            if inspect.isawaitable(connected):
+                connected = await connected
+            return bool(connected)
+        except Exception:
+            return False
+
+    # ------------------------------------------------------------------ #
+    # Bot-side entry points (route to the owning shard worker if sharded)  #
+    # ------------------------------------------------------------------ #
+
+    @staticmethod
+    async def is_running(user_id: int) -> bool:
+        if _clients.get(user_id) is None and sharding_enabled():
+            return bool(await send_command(user_id, "status"))
+        return await UserBotManager.is_client_connected(user_id)
+
+    @staticmethod
+    async def request_start(user_id: int, session_string: str, bot) -> bool:
+        """(Re)start the user's client here or on the worker that should own it."""
+        if sharding_enabled():
+            return bool(await send_command(user_id, "start"))
+        # An explicit reconnect from the user lifts any backoff or quarantine.
+        _restart_state.pop(user_id, None)
+        await UserBotManager.stop_client(user_id)
+        return await UserBotManager.start_with_backoff(user_id, session_string, bot)
+
+    @staticmethod
+    async def request_stop(user_id: int) -> None:
+        await UserBotManager.stop_client(user_id)
+        if sharding_enabled():
+            await send_command(user_id, "stop")
+
     # ------------------------------------------------------------------ #
     # Pending auth management (used by the FSM router)                     #
     # ------------------------------------------------------------------ #
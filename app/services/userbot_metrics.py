@@ -0,0 +1,150 @@
+"""
+In-process instrumentation for userbot event ingestion.
+
+Telethon handlers report into one IngestMetrics instance per process:
+
+* ``received(kind, user_id, event_date)`` — event counter, per-user event
+  rate (exponentially decayed, events/minute) and handler lag, i.e. how far
+  behind the event's own timestamp the handler started;
+* ``count(kind, outcome)`` — filtered / queued / classified / notified /
+  dropped / error, labelled by event kind (channel, dm, group, outgoing, read);
+* ``span(kind, stage)`` — wall time of one stage (redis, db, mtproto, llm,
+  bot_api, ...), with failures counted per stage and slow stages logged.
+
+``snapshot()`` is served from /metrics.
+"""
+from __future__ import annotations
+
+import math
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Iterator
+
+from loguru import logger
+
+from ..config import settings as app_settings
+
+# Half-life style window for per-user event rates.
+_RATE_WINDOW_SECONDS = 60.0
+
+
+@dataclass
+class _Timing:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    errors: int = 0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self, scale: float = 1.0, unit: str = "ms") -> dict:
+        avg = self.total / self.count if self.count else 0.0
+        data = {
+            "count": self.count,
+            f"avg_{unit}": round(avg * scale, 1),
+            f"max_{unit}": round(self.max * scale, 1),
+        }
+        if self.errors:
+            data["errors"] = self.errors
+        return data
+
+
+class IngestMetrics:
+    """Counters, stage timings, handler lag and per-user rates."""
+
+    def __init__(self) -> None:
+        self._events: Counter[tuple[str, str]] = Counter()
+        self._stages: dict[tuple[str, str], _Timing] = {}
+        self._lag: dict[str, _Timing] = {}
+        self._user_rates: dict[int, tuple[float, float]] = {}
+
+    def received(
+        self,
+        kind: str,
+        user_id: int,
+        event_date: datetime | None = None,
+    ) -> None:
+        self._events[(kind, "received")] += 1
+        now = time.time()
+
+        rate, last = self._user_rates.get(user_id, (0.0, now))
+        rate = rate * math.exp(-(now - last) / _RATE_WINDOW_SECONDS) + 1.0
+        self._user_rates[user_id] = (rate, now)
+
+        if event_date is not None:
+            if event_date.tzinfo is None:
+                event_date = event_date.replace(tzinfo=timezone.utc)
+            lag = max(0.0, now - event_date.timestamp())
+            self._lag.setdefault(kind, _Timing()).add(lag)
+
+    def count(self, kind: str, outcome: str) -> None:
+        self._events[(kind, outcome)] += 1
+
+    @contextmanager
+    def span(self, kind: str, stage: str, user_id: int | None = None) -> Iterator[None]:
+        timing = self._stages.setdefault((kind, stage), _Timing())
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            timing.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            timing.add(elapsed)
+            if elapsed >= app_settings.USERBOT_SLOW_STAGE_SECONDS:
+                logger.warning(
+                    "Userbot {} stage {} took {:.1f}s (user {})",
+                    kind,
+                    stage,
+                    elapsed,
+                    user_id,
+                )
+
+    def snapshot(self, top_users: int = 10) -> dict:
+        now = time.time()
+        events: dict[str, dict[str, int]] = {}
+        for (kind, outcome), value in sorted(self._events.items()):
+            events.setdefault(kind, {})[outcome] = value
+
+        rates = []
+        for user_id, (rate, last) in list(self._user_rates.items()):
+            current = rate * math.exp(-(now - last) / _RATE_WINDOW_SECONDS)
+            if current < 0.01:
+                # Quiet accounts fall out so the map stays bounded.
+                del self._user_rates[user_id]
+                continue
+            rates.append((current, user_id))
+        rates.sort(reverse=True)
+
+        return {
+            "events": events,
+            "stages": {
+                f"{kind}.{stage}": timing.as_dict(scale=1000.0)
+                for (kind, stage), timing in sorted(self._stages.items())
+            },
+            "lag_seconds": {
+                kind: timing.as_dict(unit="s")
+                for kind, timing in sorted(self._lag.items())
+            },
+            "top_users_events_per_minute": [
+                {"user_id": user_id, "rate": round(rate, 2)}
+                for rate, user_id in rates[:top_users]
+            ],
+        }
+
+
+_metrics: IngestMetrics | None = None
+
+
+def get_ingest_metrics() -> IngestMetrics:
+    global _metrics
+    if _metrics is None:
+        _metrics = IngestMetrics()
+    return _metrics
@@ -38,6 +38,7 @@ import json
 import re
 import time
 from datetime import date, datetime, timezone
+from types import SimpleNamespace
 from typing import TYPE_CHECKING
 
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
@@ -47,6 +48,23 @@ from telethon import TelegramClient, events
 from ..config import settings as app_settings
 from ..llm.client import async_client
 from ..utils.telegram_topics import topic_kwargs_for_user
+from . import telegram_delivery
+from .userbot_channel_batch import add_to_channel_batch, drain_channel_batch
+from .userbot_channel_dedupe import find_near_duplicate, merge_into_batch, simhash
+from .userbot_dialog_cache import get_dialog_cache, recent_private_dialogs
+from .userbot_entity_cache import (
+    display_name,
+    get_cached_me,
+    get_entity_cache,
+    resolve_event_sender,
+)
+from .userbot_group_filter import get_group_prefilter, should_sample
+from .userbot_metrics import get_ingest_metrics
+from .userbot_reply_timer import (
+    REPLY_DUE_KEY,
+    reply_meta_key,
+    start_reply_timer_poller,
+)
 from .userbot_state_probe import (
     cache_manual_outgoing,
     cache_read_marker,
@@ -54,6 +72,15 @@ from .userbot_state_probe import (
     get_read_inbox_max_id,
     has_cached_manual_outgoing_after,
 )
+from .userbot_style_profile import (
+    format_style_profile,
+    load_style_profile,
+    needs_refresh,
+    schedule_style_profile_refresh,
+    style_counter_key,
+    style_samples_key,
+)
+from .userbot_work_queue import get_work_scheduler
 
 if TYPE_CHECKING:
     from aiogram import Bot
@@ -67,6 +94,8 @@ if TYPE_CHECKING:
 def setup_handlers(client: TelegramClient, user_id: int, bot: "Bot") -> None:
     """Register all Telethon event handlers for *one* user's client."""
     assistant_bot_id: int | None = None
+    metrics = get_ingest_metrics()
+    _ensure_reply_timer_poller(bot)
 
     async def resolve_assistant_bot_id() -> int | None:
         nonlocal assistant_bot_id
@@ -84,10 +113,17 @@ def setup_handlers(client: TelegramClient, user_id: int, bot: "Bot") -> None:
         events.NewMessage(incoming=True, func=lambda e: e.is_channel and not e.is_group)
     )
     async def on_channel_post(event):
-        await _handle_channel_post(event, user_id, bot)
+        metrics.received("channel", user_id, _event_date(event))
+        if not get_work_scheduler().submit(
+            user_id,
+            "channel",
+            lambda: _handle_channel_post(event, user_id, bot),
+        ):
+            metrics.count("channel", "dropped")
 
     @client.on(events.NewMessage(incoming=True, func=lambda e: e.is_private))
     async def on_dm(event):
+        metrics.received("dm", user_id, _event_date(event))
         await _handle_dm(
             event,
             user_id,
@@ -98,6 +134,7 @@ def setup_handlers(client: TelegramClient, user_id: int, bot: "Bot") -> None:
 
     @client.on(events.NewMessage(incoming=True, func=lambda e: e.is_group))
     async def on_group(event):
+        metrics.received("group", user_id, _event_date(event))
         await _handle_group_message(
             event,
             user_id,
@@ -111,15 +148,18 @@ def setup_handlers(client: TelegramClient, user_id: int, bot: "Bot") -> None:
         events.NewMessage(outgoing=True, func=lambda e: e.is_private or e.is_group)
     )
     async def on_outgoing(event):
+        metrics.received("outgoing", user_id, _event_date(event))
         await _handle_outgoing_message(
             event,
             user_id,
             bot=bot,
+            client=client,
             assistant_bot_id=await resolve_assistant_bot_id(),
         )
 
     @client.on(events.MessageRead(inbox=True))
     async def on_message_read(event):
+        metrics.received("read", user_id)
         await _handle_message_read(event, user_id, bot)
 
 
@@ -139,22 +179,30 @@ def _is_break_mode_active(user_settings) -> bool:
 
 async def _handle_message_read(event, user_id: int, bot: Bot | None = None) -> None:
     """Track inbox read events so we can skip already-read messages."""
+    metrics = get_ingest_metrics()
+    outcome = "filtered"
     try:
         chat_id = getattr(event, "chat_id", None)
         max_read = getattr(event, "max_id", None) or getattr(event, "max_read", None)
         if not chat_id or not max_read:
             return
         max_read_id = int(max_read)
-        await cache_read_marker(user_id, chat_id, max_read_id)
+        with metrics.span("read", "redis", user_id):
+            await cache_read_marker(user_id, chat_id, max_read_id)
         if bot:
-            await _clear_read_thread_notifications(
-                user_id=user_id,
-                chat_id=chat_id,
-                max_read_message_id=max_read_id,
-                bot=bot,
-            )
+            with metrics.span("read", "db", user_id):
+                await _clear_read_thread_notifications(
+                    user_id=user_id,
+                    chat_id=chat_id,
+                    max_read_message_id=max_read_id,
+                    bot=bot,
+                )
+        outcome = "processed"
     except Exception as exc:
+        outcome = "error"
         logger.debug("MessageRead handler error (user {}): {}", user_id, exc)
+    finally:
+        metrics.count("read", outcome)
 
 
 async def _check_if_message_read(
@@ -179,8 +227,11 @@ async def _check_if_message_read(
 
 
 async def _handle_channel_post(event, user_id: int, bot: "Bot") -> None:
+    metrics = get_ingest_metrics()
+    outcome = "filtered"
     try:
-        user_settings = await _get_user_settings(user_id)
+        with metrics.span("channel", "db", user_id):
+            user_settings = await _get_user_settings(user_id)
         if user_settings and not user_settings.enable_channel_monitoring:
             return
         if user_settings and _is_break_mode_active(user_settings):
@@ -194,52 +245,74 @@ async def _handle_channel_post(event, user_id: int, bot: "Bot") -> None:
         if len(text) < 30:
             return
 
-        # Rate limit check BEFORE LLM call
+        # Extract channel metadata
         channel_id = event.chat_id
+        channel_name = (
+            getattr(chat, "title", None)
+            or getattr(chat, "username", None)
+            or f"channel {channel_id}"
+        )
+        channel_username = getattr(chat, "username", None)
+
+        post_link = ""
+        if channel_username and event.message.id:
+            post_link = f"https://t.me/{channel_username}/{event.message.id}"
+
+        # Cross-posts and light edits of a recent post skip classification;
+        # a still-batched original just gains this post's link.
+        signature = simhash(text)
+        with metrics.span("channel", "redis", user_id):
+            duplicate_of = await find_near_duplicate(user_id, signature)
+            if duplicate_of is not None:
+                await merge_into_batch(
+                    user_id,
+                    duplicate_of,
+                    channel_name=channel_name,
+                    post_link=post_link,
+                )
+        if duplicate_of is not None:
+            outcome = "duplicate"
+            return
+
+        # Rate limit check BEFORE LLM call
         today_str = date.today().isoformat()
         rate_key = f"userbot_notif:{user_id}:{channel_id}:{today_str}"
 
         redis = await _get_redis()
         try:
-            async with redis.pipeline(transaction=True) as pipe:
-                pipe.incr(rate_key)
-                pipe.execute_command("EXPIRE", rate_key, 90_000, "NX")
-                pipe_result = await pipe.execute()
+            with metrics.span("channel", "redis", user_id):
+                async with redis.pipeline(transaction=True) as pipe:
+                    pipe.incr(rate_key)
+                    pipe.execute_command("EXPIRE", rate_key, 90_000, "NX")
+                    pipe_result = await pipe.execute()
             count = int(pipe_result[0])
             if count > app_settings.USERBOT_MAX_CHANNEL_NOTIFS_PER_DAY:
+                outcome = "rate_limited"
                 return
         finally:
             await redis.aclose()
 
         # Classify with rich user context (core facts + interests + profile)
-        interests = await _get_channel_interests(user_id)
-        user_facts = await _get_user_core_facts(user_id)
+        with metrics.span("channel", "context", user_id):
+            interests = await _get_channel_interests(user_id)
+            user_facts = await _get_user_core_facts(user_id)
 
-        classification = await _classify_post_relevance(
-            text=text,
-            interests=interests,
-            user_facts=user_facts,
-        )
+        with metrics.span("channel", "llm", user_id):
+            classification = await _classify_post_relevance(
+                text=text,
+                interests=interests,
+                user_facts=user_facts,
+            )
+        metrics.count("channel", "classified")
 
         score = classification["score"]
         summary = classification["summary"]
 
         # LOW relevance → skip
         if score < app_settings.USERBOT_CHANNEL_MEDIUM_THRESHOLD:
+            outcome = "dropped"
             return
 
-        # Extract channel metadata
-        channel_name = (
-            getattr(chat, "title", None)
-            or getattr(chat, "username", None)
-            or f"channel {channel_id}"
-        )
-        channel_username = getattr(chat, "username", None)
-
-        post_link = ""
-        if channel_username and event.message.id:
-            post_link = f"https://t.me/{channel_username}/{event.message.id}"
-
         tg_id, topic_kwargs = await _get_tg_delivery(user_id)
         if not tg_id:
             return
@@ -253,13 +326,16 @@ async def _handle_channel_post(event, user_id: int, bot: "Bot") -> None:
                 reason=reason,
                 post_link=post_link,
             )
-            await bot.send_message(
-                tg_id,
-                notification,
-                parse_mode="HTML",
-                disable_web_page_preview=True,
-                **topic_kwargs,
-            )
+            with metrics.span("channel", "bot_api", user_id):
+                await telegram_delivery.send_message(
+                    bot,
+                    tg_id,
+                    notification,
+                    parse_mode="HTML",
+                    disable_web_page_preview=True,
+                    **topic_kwargs,
+                )
+            outcome = "notified"
             # Save to conversation history so LLM knows what user was notified about
             await _save_notification_to_history(
                 tg_chat_id=tg_id,
@@ -273,20 +349,26 @@ async def _handle_channel_post(event, user_id: int, bot: "Bot") -> None:
             )
         else:
             # MEDIUM relevance → accumulate in batch
-            await _add_to_channel_batch(
-                user_id=user_id,
-                channel_name=channel_name,
-                summary=summary,
-                post_link=post_link,
-                score=score,
-            )
+            with metrics.span("channel", "redis", user_id):
+                batch_size = await _add_to_channel_batch(
+                    user_id=user_id,
+                    channel_name=channel_name,
+                    summary=summary,
+                    post_link=post_link,
+                    score=score,
+                    signature=f"{signature:016x}",
+                )
+            outcome = "batched"
             # Auto-flush if batch is full
-            batch_size = await _get_channel_batch_size(user_id)
             if batch_size >= app_settings.USERBOT_CHANNEL_BATCH_MAX:
-                await flush_channel_batch(user_id, bot)
+                with metrics.span("channel", "bot_api", user_id):
+                    await flush_channel_batch(user_id, bot)
 
     except Exception as exc:
+        outcome = "error"
         logger.error("Userbot channel handler error (user {}): {}", user_id, exc)
+    finally:
+        metrics.count("channel", outcome)
 
 
 # ---------------------------------------------------------------------------
@@ -299,6 +381,7 @@ async def _handle_outgoing_message(
     user_id: int,
     *,
     bot: Bot | None = None,
+    client: TelegramClient | None = None,
     assistant_bot_id: int | None = None,
 ) -> None:
     """
@@ -306,6 +389,8 @@ async def _handle_outgoing_message(
     Stored in a Redis ring buffer (LPUSH + LTRIM).
     Bot-sent replies are filtered out via a short-lived skip marker.
     """
+    metrics = get_ingest_metrics()
+    outcome = "filtered"
     try:
         if _is_private_chat_with_telegram_id(event, assistant_bot_id):
             return
@@ -314,6 +399,10 @@ async def _handle_outgoing_message(
         if chat_id is None:
             return
 
+        if client is not None and getattr(event, "is_private", False):
+            chat = getattr(event, "chat", None) or get_entity_cache(client).get(chat_id)
+            get_dialog_cache(client).touch(chat, chat_id)
+
         text: str = event.message.message or ""
         if not text.strip():
             return
@@ -331,38 +420,48 @@ async def _handle_outgoing_message(
                     {"text": text[:500], "ts": int(time.time())},
                     ensure_ascii=False,
                 )
-                list_key = f"ub_style:{user_id}"
+                list_key = style_samples_key(user_id)
                 async with redis.pipeline(transaction=True) as pipe:
                     pipe.lpush(list_key, sample)
                     pipe.ltrim(list_key, 0, app_settings.USERBOT_STYLE_SAMPLES_MAX - 1)
-                    await pipe.execute()
+                    pipe.incr(style_counter_key(user_id))
+                    pipe_result = await pipe.execute()
+                if needs_refresh(int(pipe_result[2])):
+                    schedule_style_profile_refresh(user_id)
         finally:
             await redis.aclose()
 
         message_id = _coerce_int(getattr(event.message, "id", None))
-        await _record_manual_outgoing(
-            user_id=user_id,
-            chat_id=chat_id,
-            message_id=message_id,
-        )
+        with metrics.span("outgoing", "redis", user_id):
+            await _record_manual_outgoing(
+                user_id=user_id,
+                chat_id=chat_id,
+                message_id=message_id,
+            )
 
-        cleanup_target = await _mark_latest_thread_replied(
-            user_id=user_id,
-            chat_id=chat_id,
-            message_id=message_id,
-            chat_type="group" if getattr(event, "is_group", False) else "dm",
-            reply_to_message_id=_reply_to_message_id(event),
-            reply_text=text,
-        )
-        if cleanup_target:
-            await _cleanup_thread_notification(
-                bot=bot,
-                cleanup_target=cleanup_target,
-                reason="manual_reply",
+        with metrics.span("outgoing", "db", user_id):
+            cleanup_target = await _mark_latest_thread_replied(
+                user_id=user_id,
+                chat_id=chat_id,
+                message_id=message_id,
+                chat_type="group" if getattr(event, "is_group", False) else "dm",
+                reply_to_message_id=_reply_to_message_id(event),
+                reply_text=text,
             )
+        outcome = "processed"
+        if cleanup_target:
+            with metrics.span("outgoing", "bot_api", user_id):
+                await _cleanup_thread_notification(
+                    bot=bot,
+                    cleanup_target=cleanup_target,
+                    reason="manual_reply",
+                )
 
     except Exception as exc:
+        outcome = "error"
         logger.debug("Userbot outgoing handler error (user {}): {}", user_id, exc)
+    finally:
+        metrics.count("outgoing", outcome)
 
 
 # ---------------------------------------------------------------------------
@@ -379,6 +478,8 @@ async def _handle_dm(
     assistant_bot_id: int | None = None,
 ) -> None:
     """Fast path: enqueue delayed processing so we can skip already-read messages."""
+    metrics = get_ingest_metrics()
+    outcome = "filtered"
     try:
         if _is_outgoing_event(event) or _should_ignore_assistant_bot_event(
             event, assistant_bot_id
@@ -389,9 +490,11 @@ async def _handle_dm(
         if not text.strip():
             return
 
-        sender = await event.get_sender()
+        with metrics.span("dm", "mtproto", user_id):
+            sender = await resolve_event_sender(client, event)
         if _is_telegram_bot_sender(sender):
             return
+        get_dialog_cache(client).touch(sender, _event_chat_id(event))
 
         sender_tg_id = (
             _coerce_int(getattr(sender, "id", None))
@@ -399,29 +502,21 @@ async def _handle_dm(
             or _event_chat_id(event)
             or 0
         )
-        batch_key, batch_version = await _enqueue_reply_batch_message(
+        await _enqueue_reply_batch_message(
             user_id=user_id,
             chat_id=event.chat_id,
             sender_tg_id=sender_tg_id,
             chat_type="dm",
             message_id=event.message.id,
             text=text,
+            assistant_bot_id=assistant_bot_id,
         )
-        asyncio.create_task(
-            _process_dm_debounced(
-                event=event,
-                user_id=user_id,
-                bot=bot,
-                client=client,
-                assistant_bot_id=assistant_bot_id,
-                sender=sender,
-                sender_tg_id=sender_tg_id,
-                batch_key=batch_key,
-                expected_batch_version=batch_version,
-            )
-        )
+        outcome = "queued"
     except Exception as exc:
+        outcome = "error"
         logger.error("Userbot DM handler error (user {}): {}", user_id, exc)
+    finally:
+        metrics.count("dm", outcome)
 
 
 async def _process_dm_debounced(
@@ -436,10 +531,10 @@ async def _process_dm_debounced(
     batch_key: str,
     expected_batch_version: int,
 ) -> None:
-    """Wait for a quiet window, then process the DM batch if it is still current."""
+    """Process the DM batch once its quiet window has passed, if it is still current."""
+    metrics = get_ingest_metrics()
+    outcome = "skipped"
     try:
-        await asyncio.sleep(_reply_batch_delay_seconds())
-
         batch_messages = await _drain_reply_batch_if_current(
             batch_key=batch_key,
             expected_version=expected_batch_version,
@@ -484,30 +579,27 @@ async def _process_dm_debounced(
             return
 
         if sender is None:
-            sender = await event.get_sender()
+            sender = await resolve_event_sender(client, event)
         if _is_telegram_bot_sender(sender):
             return
 
-        first = getattr(sender, "first_name", None) or ""
-        last = getattr(sender, "last_name", None) or ""
-        sender_name = (
-            f"{first} {last}".strip() or getattr(sender, "username", None) or "Someone"
-        )
+        sender_name = display_name(sender, "Someone")
         sender_tg_id = sender_tg_id or getattr(sender, "id", 0)
 
         # Gather context in parallel for high-quality reply suggestions
         thread_coro = _fetch_conversation_thread(client, event.chat_id)
         facts_coro = _get_user_core_facts(user_id)
-        style_coro = _get_style_samples(user_id)
+        style_coro = _get_style_context(user_id)
         relationship_coro = _get_sender_relationship(user_id, sender_tg_id)
 
-        thread, facts, style_samples, relationship = await asyncio.gather(
-            thread_coro,
-            facts_coro,
-            style_coro,
-            relationship_coro,
-            return_exceptions=True,
-        )
+        with metrics.span("dm", "context", user_id):
+            thread, facts, style, relationship = await asyncio.gather(
+                thread_coro,
+                facts_coro,
+                style_coro,
+                relationship_coro,
+                return_exceptions=True,
+            )
         # Gracefully handle failures in context fetching
         if isinstance(thread, BaseException):
             logger.debug("Thread fetch failed for user {}: {}", user_id, thread)
@@ -515,22 +607,25 @@ async def _process_dm_debounced(
         if isinstance(facts, BaseException):
             logger.debug("Facts fetch failed for user {}: {}", user_id, facts)
             facts = []
-        if isinstance(style_samples, BaseException):
-            logger.debug("Style fetch failed for user {}: {}", user_id, style_samples)
-            style_samples = []
+        if isinstance(style, BaseException):
+            logger.debug("Style fetch failed for user {}: {}", user_id, style)
+            style = (None, [])
+        style_profile, style_samples = style
         if isinstance(relationship, BaseException):
             logger.debug(
                 "Relationship fetch failed for user {}: {}", user_id, relationship
             )
             relationship = None
 
-        classification = await _classify_incoming_message(
-            user_id=user_id,
-            text=text,
-            sender_name=sender_name,
-            chat_type="dm",
-            conversation_thread=thread,
-        )
+        with metrics.span("dm", "llm", user_id):
+            classification = await _classify_incoming_message(
+                user_id=user_id,
+                text=text,
+                sender_name=sender_name,
+                chat_type="dm",
+                conversation_thread=thread,
+            )
+        metrics.count("dm", "classified")
         summary = classification.get("summary") or _short_summary(text)
         if not _classification_requires_response(classification):
             await _persist_incoming_thread(
@@ -545,22 +640,25 @@ async def _process_dm_debounced(
                 classification=classification,
                 suggestions=[],
             )
+            outcome = "no_response"
             logger.info(
                 "Userbot: skipping DM notification for user {} - no response required",
                 user_id,
             )
             return
 
-        suggestions = await _generate_reply_suggestions(
-            user_id=user_id,
-            message_text=text,
-            sender_name=sender_name,
-            sender_tg_id=sender_tg_id,
-            conversation_thread=thread,
-            user_facts=facts,
-            style_samples=style_samples,
-            sender_relationship=relationship,
-        )
+        with metrics.span("dm", "llm", user_id):
+            suggestions = await _generate_reply_suggestions(
+                user_id=user_id,
+                message_text=text,
+                sender_name=sender_name,
+                sender_tg_id=sender_tg_id,
+                conversation_thread=thread,
+                user_facts=facts,
+                style_profile=style_profile,
+                style_samples=style_samples,
+                sender_relationship=relationship,
+            )
 
         thread_id = await _persist_incoming_thread(
             user_id=user_id,
@@ -599,23 +697,26 @@ async def _process_dm_debounced(
 
         action_plan = None
         if app_settings.USERBOT_ACTION_PLAN_ENABLED:
-            target_candidates = await _fetch_action_target_candidates(
-                client=client,
-                event=event,
-                sender=sender,
-                sender_name=sender_name,
-                assistant_bot_id=assistant_bot_id,
-            )
-            action_plan = await _generate_action_plan(
-                user_id=user_id,
-                message_text=text,
-                sender_name=sender_name,
-                chat_type="dm",
-                conversation_thread=thread,
-                user_facts=facts,
-                style_samples=style_samples,
-                target_candidates=target_candidates,
-            )
+            with metrics.span("dm", "mtproto", user_id):
+                target_candidates = await _fetch_action_target_candidates(
+                    client=client,
+                    event=event,
+                    sender=sender,
+                    sender_name=sender_name,
+                    assistant_bot_id=assistant_bot_id,
+                )
+            with metrics.span("dm", "llm", user_id):
+                action_plan = await _generate_action_plan(
+                    user_id=user_id,
+                    message_text=text,
+                    sender_name=sender_name,
+                    chat_type="dm",
+                    conversation_thread=thread,
+                    user_facts=facts,
+                    style_profile=style_profile,
+                    style_samples=style_samples,
+                    target_candidates=target_candidates,
+                )
 
         tg_id, topic_kwargs = await _get_tg_delivery(user_id)
         if not tg_id:
@@ -685,20 +786,25 @@ async def _process_dm_debounced(
                 len(suggestions),
                 action_plan=action_plan,
             )
-            sent_message = await bot.send_message(
-                tg_id,
-                notification,
-                parse_mode="HTML",
-                reply_markup=keyboard,
-                **topic_kwargs,
-            )
+            with metrics.span("dm", "bot_api", user_id):
+                sent_message = await telegram_delivery.send_message(
+                    bot,
+                    tg_id,
+                    notification,
+                    parse_mode="HTML",
+                    reply_markup=keyboard,
+                    **topic_kwargs,
+                )
         else:
-            sent_message = await bot.send_message(
-                tg_id,
-                notification,
-                parse_mode="HTML",
-                **topic_kwargs,
-            )
+            with metrics.span("dm", "bot_api", user_id):
+                sent_message = await telegram_delivery.send_message(
+                    bot,
+                    tg_id,
+                    notification,
+                    parse_mode="HTML",
+                    **topic_kwargs,
+                )
+        outcome = "notified"
 
         await _attach_thread_notification(
             user_id=user_id,
@@ -712,7 +818,10 @@ async def _process_dm_debounced(
             "Userbot: sent DM notification to user {} from {}", user_id, sender_name
         )
     except Exception as exc:
+        outcome = "error"
         logger.error("Userbot delayed DM handler error (user {}): {}", user_id, exc)
+    finally:
+        metrics.count("dm", outcome)
 
 
 # ---------------------------------------------------------------------------
@@ -732,6 +841,8 @@ async def _handle_group_message(
     Fast path: filter then enqueue delayed processing so we can skip
     already-read messages.
     """
+    metrics = get_ingest_metrics()
+    outcome = "filtered"
     try:
         if _is_outgoing_event(event) or _should_ignore_assistant_bot_event(
             event, assistant_bot_id
@@ -742,67 +853,110 @@ async def _handle_group_message(
         if not text.strip():
             return
 
-        # Only process messages that are relevant to the user:
-        # 1. Direct reply to user's message
-        # 2. Message mentions the user
-        me = await client.get_me()
+        with metrics.span("group", "mtproto", user_id):
+            me = await get_cached_me(client)
         if _ids_equal(_event_sender_id(event), getattr(me, "id", None)):
             return
 
-        sender = await event.get_sender()
-        if _is_telegram_bot_sender(sender):
+        # Local prefilter (see userbot_group_filter): mention, reply to the
+        # owner, keyword automaton, then a small quality-monitoring sample.
+        prefilter = await get_group_prefilter(user_id, me)
+        mode = prefilter.mode(event.chat_id)
+        if mode == "off":
             return
 
         is_reply_to_me = False
-        if event.message.reply_to:
+        is_mention = _mentions_owner(event, text, me)
+        if not is_mention and event.message.reply_to:
             try:
-                replied = await event.message.get_reply_message()
+                with metrics.span("group", "mtproto", user_id):
+                    replied = await event.message.get_reply_message()
                 if replied and replied.sender_id == me.id:
                     is_reply_to_me = True
             except Exception:
                 pass
 
-        is_mention = False
-        if me.username and f"@{me.username}" in text:
-            is_mention = True
-        if hasattr(event.message, "entities") and event.message.entities:
-            from telethon.tl.types import MessageEntityMentionName
-
-            for ent in event.message.entities:
-                if isinstance(ent, MessageEntityMentionName) and ent.user_id == me.id:
-                    is_mention = True
-                    break
+        if is_mention:
+            match_reason = "mention"
+        elif is_reply_to_me:
+            match_reason = "reply"
+        elif mode == "all":
+            match_reason = "group_override"
+        elif mode != "mentions" and prefilter.keyword_match(text):
+            match_reason = "keyword"
+        elif mode != "mentions" and should_sample():
+            match_reason = "sample"
+        else:
+            outcome = "prefilter_removed"
+            return
+        metrics.count("group", f"prefilter_{match_reason}")
 
-        if not is_reply_to_me and not is_mention:
+        with metrics.span("group", "mtproto", user_id):
+            sender = await resolve_event_sender(client, event)
+        if _is_telegram_bot_sender(sender):
             return
 
         sender_tg_id = (
             _coerce_int(getattr(sender, "id", None)) or _event_sender_id(event) or 0
         )
-        batch_key, batch_version = await _enqueue_reply_batch_message(
+        await _enqueue_reply_batch_message(
             user_id=user_id,
             chat_id=event.chat_id,
             sender_tg_id=sender_tg_id,
             chat_type="group",
             message_id=event.message.id,
             text=text,
+            assistant_bot_id=assistant_bot_id,
+            is_reply_to_me=is_reply_to_me,
+            match_reason=match_reason,
         )
-        asyncio.create_task(
-            _process_group_debounced(
-                event=event,
-                user_id=user_id,
-                bot=bot,
-                client=client,
-                assistant_bot_id=assistant_bot_id,
-                is_reply_to_me=is_reply_to_me,
-                sender=sender,
-                sender_tg_id=sender_tg_id,
-                batch_key=batch_key,
-                expected_batch_version=batch_version,
-            )
-        )
+        outcome = "queued"
     except Exception as exc:
+        outcome = "error"
         logger.error("Userbot group handler error (user {}): {}", user_id, exc)
+    finally:
+        metrics.count("group", outcome)
+
+
+async def _classify_prefilter_sample(
+    event,
+    user_id: int,
+    client: TelegramClient,
+    *,
+    batch_messages: list[dict],
+    sender=None,
+) -> None:
+    """
+    Classify a message that only passed the prefilter as a random sample.
+
+    The verdict is counted as ``prefilter_miss`` when it needed a reply, and
+    nothing else happens: no thread is persisted and the user is not notified.
+    """
+    metrics = get_ingest_metrics()
+    text = _batch_message_text(batch_messages) or event.message.message or ""
+    if not text.strip():
+        return
+    if sender is None:
+        sender = await resolve_event_sender(client, event)
+    if _is_telegram_bot_sender(sender):
+        return
+
+    try:
+        with metrics.span("group", "context", user_id):
+            thread = await _fetch_conversation_thread(client, event.chat_id)
+    except Exception:
+        thread = []
+    with metrics.span("group", "llm", user_id):
+        classification = await _classify_incoming_message(
+            user_id=user_id,
+            text=text,
+            sender_name=display_name(sender, "Someone"),
+            chat_type="group",
+            conversation_thread=thread,
+        )
+    metrics.count("group", "classified")
+    if _classification_requires_response(classification):
+        metrics.count("group", "prefilter_miss")
 
 
 async def _process_group_debounced(
@@ -813,15 +967,16 @@ async def _process_group_debounced(
     *,
     assistant_bot_id: int | None = None,
     is_reply_to_me: bool = False,
+    match_reason: str | None = None,
     sender=None,
     sender_tg_id: int = 0,
     batch_key: str,
     expected_batch_version: int,
 ) -> None:
-    """Wait for a quiet window, then process the group message batch if current."""
+    """Process the group message batch once its quiet window has passed, if current."""
+    metrics = get_ingest_metrics()
+    outcome = "skipped"
     try:
-        await asyncio.sleep(_reply_batch_delay_seconds())
-
         batch_messages = await _drain_reply_batch_if_current(
             batch_key=batch_key,
             expected_version=expected_batch_version,
@@ -859,6 +1014,13 @@ async def _process_group_debounced(
             )
             return
 
+        if match_reason == "sample":
+            await _classify_prefilter_sample(
+                event, user_id, client, batch_messages=batch_messages, sender=sender
+            )
+            outcome = "sampled"
+            return
+
         if not await _check_group_notification_rate_limit(user_id, event.chat_id):
             return
 
@@ -869,15 +1031,11 @@ async def _process_group_debounced(
             return
 
         if sender is None:
-            sender = await event.get_sender()
+            sender = await resolve_event_sender(client, event)
         if _is_telegram_bot_sender(sender):
             return
 
-        first = getattr(sender, "first_name", None) or ""
-        last = getattr(sender, "last_name", None) or ""
-        sender_name = (
-            f"{first} {last}".strip() or getattr(sender, "username", None) or "Someone"
-        )
+        sender_name = display_name(sender, "Someone")
         sender_tg_id = sender_tg_id or getattr(sender, "id", 0)
 
         chat = await event.get_chat()
@@ -886,32 +1044,36 @@ async def _process_group_debounced(
         # Gather context in parallel
         thread_coro = _fetch_conversation_thread(client, event.chat_id)
         facts_coro = _get_user_core_facts(user_id)
-        style_coro = _get_style_samples(user_id)
+        style_coro = _get_style_context(user_id)
         relationship_coro = _get_sender_relationship(user_id, sender_tg_id)
 
-        thread, facts, style_samples, relationship = await asyncio.gather(
-            thread_coro,
-            facts_coro,
-            style_coro,
-            relationship_coro,
-            return_exceptions=True,
-        )
+        with metrics.span("group", "context", user_id):
+            thread, facts, style, relationship = await asyncio.gather(
+                thread_coro,
+                facts_coro,
+                style_coro,
+                relationship_coro,
+                return_exceptions=True,
+            )
         if isinstance(thread, BaseException):
             thread = []
         if isinstance(facts, BaseException):
             facts = []
-        if isinstance(style_samples, BaseException):
-            style_samples = []
+        if isinstance(style, BaseException):
+            style = (None, [])
+        style_profile, style_samples = style
         if isinstance(relationship, BaseException):
             relationship = None
 
-        classification = await _classify_incoming_message(
-            user_id=user_id,
-            text=text,
-            sender_name=sender_name,
-            chat_type="group",
-            conversation_thread=thread,
-        )
+        with metrics.span("group", "llm", user_id):
+            classification = await _classify_incoming_message(
+                user_id=user_id,
+                text=text,
+                sender_name=sender_name,
+                chat_type="group",
+                conversation_thread=thread,
+            )
+        metrics.count("group", "classified")
         summary = classification.get("summary") or _short_summary(text)
         if not _classification_requires_response(classification):
             await _persist_incoming_thread(
@@ -926,22 +1088,25 @@ async def _process_group_debounced(
                 classification=classification,
                 suggestions=[],
             )
+            outcome = "no_response"
             logger.info(
                 "Userbot: skipping group notification for user {} - no response required",
                 user_id,
             )
             return
 
-        suggestions = await _generate_reply_suggestions(
-            user_id=user_id,
-            message_text=text,
-            sender_name=sender_name,
-            sender_tg_id=sender_tg_id,
-            conversation_thread=thread,
-            user_facts=facts,
-            style_samples=style_samples,
-            sender_relationship=relationship,
-        )
+        with metrics.span("group", "llm", user_id):
+            suggestions = await _generate_reply_suggestions(
+                user_id=user_id,
+                message_text=text,
+                sender_name=sender_name,
+                sender_tg_id=sender_tg_id,
+                conversation_thread=thread,
+                user_facts=facts,
+                style_profile=style_profile,
+                style_samples=style_samples,
+                sender_relationship=relationship,
+            )
 
         thread_id = await _persist_incoming_thread(
             user_id=user_id,
@@ -980,23 +1145,26 @@ async def _process_group_debounced(
 
         action_plan = None
         if app_settings.USERBOT_ACTION_PLAN_ENABLED:
-            target_candidates = await _fetch_action_target_candidates(
-                client=client,
-                event=event,
-                sender=sender,
-                sender_name=sender_name,
-                assistant_bot_id=assistant_bot_id,
-            )
-            action_plan = await _generate_action_plan(
-                user_id=user_id,
-                message_text=text,
-                sender_name=sender_name,
-                chat_type="group",
-                conversation_thread=thread,
-                user_facts=facts,
-                style_samples=style_samples,
-                target_candidates=target_candidates,
-            )
+            with metrics.span("group", "mtproto", user_id):
+                target_candidates = await _fetch_action_target_candidates(
+                    client=client,
+                    event=event,
+                    sender=sender,
+                    sender_name=sender_name,
+                    assistant_bot_id=assistant_bot_id,
+                )
+            with metrics.span("group", "llm", user_id):
+                action_plan = await _generate_action_plan(
+                    user_id=user_id,
+                    message_text=text,
+                    sender_name=sender_name,
+                    chat_type="group",
+                    conversation_thread=thread,
+                    user_facts=facts,
+                    style_profile=style_profile,
+                    style_samples=style_samples,
+                    target_candidates=target_candidates,
+                )
 
         tg_id, topic_kwargs = await _get_tg_delivery(user_id)
         if not tg_id:
@@ -1014,7 +1182,14 @@ async def _process_group_debounced(
 
         preview = _batch_preview(batch_messages, fallback=text)
 
-        trigger = "replied to you" if is_reply_to_me else "mentioned you"
+        if is_reply_to_me:
+            trigger = "replied to you"
+        elif match_reason in (None, "mention"):
+            trigger = "mentioned you"
+        elif match_reason == "keyword":
+            trigger = "mentioned something you follow"
+        else:
+            trigger = "wrote"
         notification = (
             f"👥 <b>{_esc(sender_name)}</b> {trigger} in <b>{_esc(chat_title)}</b>:\n"
             f"━━━━━━━━━━━━\n"
@@ -1064,20 +1239,25 @@ async def _process_group_debounced(
                 len(suggestions),
                 action_plan=action_plan,
             )
-            sent_message = await bot.send_message(
-                tg_id,
-                notification,
-                parse_mode="HTML",
-                reply_markup=keyboard,
-                **topic_kwargs,
-            )
+            with metrics.span("group", "bot_api", user_id):
+                sent_message = await telegram_delivery.send_message(
+                    bot,
+                    tg_id,
+                    notification,
+                    parse_mode="HTML",
+                    reply_markup=keyboard,
+                    **topic_kwargs,
+                )
         else:
-            sent_message = await bot.send_message(
-                tg_id,
-                notification,
-                parse_mode="HTML",
-                **topic_kwargs,
-            )
+            with metrics.span("group", "bot_api", user_id):
+                sent_message = await telegram_delivery.send_message(
+                    bot,
+                    tg_id,
+                    notification,
+                    parse_mode="HTML",
+                    **topic_kwargs,
+                )
+        outcome = "notified"
 
         await _attach_thread_notification(
             user_id=user_id,
@@ -1094,7 +1274,10 @@ async def _process_group_debounced(
             chat_title,
         )
     except Exception as exc:
+        outcome = "error"
         logger.error("Userbot delayed group handler error (user {}): {}", user_id, exc)
+    finally:
+        metrics.count("group", outcome)
 
 
 # ---------------------------------------------------------------------------
@@ -1223,7 +1406,14 @@ async def _enqueue_reply_batch_message(
     chat_type: str,
     message_id: int,
     text: str,
+    assistant_bot_id: int | None = None,
+    is_reply_to_me: bool = False,
+    match_reason: str | None = None,
 ) -> tuple[str, int]:
+    """
+    Append a message to its reply batch and push the batch's fire time out by
+    one quiet window in the durable due queue (see userbot_reply_timer).
+    """
     batch_key = _reply_batch_key(
         user_id=user_id,
         chat_id=chat_id,
@@ -1239,6 +1429,18 @@ async def _enqueue_reply_batch_message(
         },
         ensure_ascii=False,
     )
+    meta = json.dumps(
+        {
+            "user_id": user_id,
+            "chat_id": chat_id,
+            "sender_tg_id": sender_tg_id,
+            "chat_type": chat_type,
+            "message_id": message_id,
+            "assistant_bot_id": assistant_bot_id,
+            "is_reply_to_me": is_reply_to_me,
+            "match_reason": match_reason,
+        }
+    )
     redis = await _get_redis()
     try:
         ttl_seconds = max(
@@ -1250,6 +1452,11 @@ async def _enqueue_reply_batch_message(
             pipe.expire(batch_key, ttl_seconds)
             pipe.incr(version_key)
             pipe.expire(version_key, ttl_seconds)
+            pipe.set(reply_meta_key(batch_key), meta, ex=ttl_seconds)
+            pipe.zadd(
+                REPLY_DUE_KEY,
+                {batch_key: time.time() + _reply_batch_delay_seconds()},
+            )
             result = await pipe.execute()
         return batch_key, int(result[2])
     finally:
@@ -1265,7 +1472,7 @@ async def _drain_reply_batch_if_current(
     script = """
     if redis.call('GET', KEYS[2]) == ARGV[1] then
         local items = redis.call('LRANGE', KEYS[1], 0, -1)
-        redis.call('DEL', KEYS[1], KEYS[2])
+        redis.call('DEL', KEYS[1], KEYS[2], KEYS[3])
         return items
     end
     return nil
@@ -1273,7 +1480,12 @@ async def _drain_reply_batch_if_current(
     redis = await _get_redis()
     try:
         raw_items = await redis.eval(
-            script, 2, batch_key, version_key, str(expected_version)
+            script,
+            3,
+            batch_key,
+            version_key,
+            reply_meta_key(batch_key),
+            str(expected_version),
         )
     finally:
         await redis.aclose()
@@ -1300,6 +1512,85 @@ async def _drain_reply_batch_if_current(
     return messages
 
 
+class _StoredReplyEvent:
+    """
+    Stand-in for the Telethon event of a reply batch fired by the due queue.
+    Carries what the delayed processors read from the event; sender and chat
+    entities are resolved through the client (usually from its entity cache).
+    """
+
+    def __init__(self, client: TelegramClient, meta: dict) -> None:
+        self._client = client
+        self.chat_id = _coerce_int(meta.get("chat_id"))
+        self.sender_id = _coerce_int(meta.get("sender_tg_id")) or None
+        self.is_private = meta.get("chat_type") == "dm"
+        self.sender = None
+        self.message = SimpleNamespace(
+            id=_coerce_int(meta.get("message_id")) or 0,
+            message="",
+            sender_id=self.sender_id,
+        )
+
+    async def get_sender(self):
+        if self.sender_id is None:
+            return None
+        return await self._client.get_entity(self.sender_id)
+
+    async def get_chat(self):
+        return await self._client.get_entity(self.chat_id)
+
+
+def _ensure_reply_timer_poller(bot: "Bot") -> None:
+    from .userbot_manager import UserBotManager
+
+    async def fire(batch_key: str, version: int, meta: dict) -> None:
+        user_id = _coerce_int(meta.get("user_id"))
+        if user_id is None:
+            return
+        # A newer fired batch for the same chat/sender replaces a queued one.
+        get_work_scheduler().submit(
+            user_id,
+            "group" if meta.get("chat_type") == "group" else "dm",
+            lambda: _fire_reply_batch(bot, batch_key, version, meta),
+            key=batch_key,
+        )
+
+    start_reply_timer_poller(
+        fire,
+        is_local=lambda uid: UserBotManager.get_client(uid) is not None,
+    )
+
+
+async def _fire_reply_batch(bot: "Bot", batch_key: str, version: int, meta: dict) -> None:
+    """Run the delayed DM/group processing for a batch claimed from the due queue."""
+    from .userbot_manager import UserBotManager
+
+    user_id = _coerce_int(meta.get("user_id"))
+    client = UserBotManager.get_client(user_id) if user_id is not None else None
+    if client is None:
+        return
+
+    event = _StoredReplyEvent(client, meta)
+    common = {
+        "event": event,
+        "user_id": user_id,
+        "bot": bot,
+        "client": client,
+        "assistant_bot_id": _coerce_int(meta.get("assistant_bot_id")),
+        "sender_tg_id": _coerce_int(meta.get("sender_tg_id")) or 0,
+        "batch_key": batch_key,
+        "expected_batch_version": version,
+    }
+    if meta.get("chat_type") == "group":
+        await _process_group_debounced(
+            **common,
+            is_reply_to_me=bool(meta.get("is_reply_to_me")),
+            match_reason=meta.get("match_reason"),
+        )
+    else:
+        await _process_dm_debounced(**common)
+
+
 def _latest_batch_message_id(messages: list[dict], fallback: int) -> int:
     message_ids = [
         message_id
@@ -1813,23 +2104,26 @@ async def _fetch_conversation_thread(
     Fetch the last N messages from a chat via Telethon.
     Returns a list of dicts: [{sender_id, name, text, is_me}].
     Most recent message first → reversed to chronological order.
+
+    Sender names come from the entities Telethon returns together with
+    ``get_messages`` (or the per-client entity cache), so the whole fetch is a
+    single MTProto request once ``me`` is cached.
     """
     limit = app_settings.USERBOT_THREAD_FETCH_LIMIT
     try:
-        me = await client.get_me()
+        me = await get_cached_me(client)
         messages = await client.get_messages(chat_id, limit=limit)
+        cache = get_entity_cache(client)
+        cache.remember_message_senders(messages)
         thread = []
         for msg in reversed(messages):  # chronological order
             if not msg.message:
                 continue
-            sender = await msg.get_sender()
-            first = getattr(sender, "first_name", None) or ""
-            last = getattr(sender, "last_name", None) or ""
-            name = f"{first} {last}".strip() or getattr(sender, "username", None) or "?"
+            sender = getattr(msg, "sender", None) or cache.get(msg.sender_id)
             thread.append(
                 {
                     "sender_id": msg.sender_id,
-                    "name": name,
+                    "name": display_name(sender),
                     "text": msg.message[:300],
                     "is_me": msg.sender_id == me.id,
                 }
@@ -1880,11 +2174,25 @@ async def _get_user_core_facts(user_id: int) -> list[str]:
         return []
 
 
+async def _get_style_context(user_id: int) -> tuple[str | None, list[str]]:
+    """
+    Return ``(style_profile_text, raw_samples)`` for prompts.
+    Raw samples are only loaded while no compiled profile exists yet.
+    """
+    profile = await load_style_profile(user_id)
+    if profile:
+        return format_style_profile(profile), []
+    samples = await _get_style_samples(user_id)
+    if samples:
+        schedule_style_profile_refresh(user_id)
+    return None, samples
+
+
 async def _get_style_samples(user_id: int) -> list[str]:
     """Retrieve the user's outgoing message samples from Redis."""
     redis = await _get_redis()
     try:
-        raw_list = await redis.lrange(f"ub_style:{user_id}", 0, -1)
+        raw_list = await redis.lrange(style_samples_key(user_id), 0, -1)
         samples = []
         for raw in raw_list:
             try:
@@ -1975,38 +2283,15 @@ async def _fetch_action_target_candidates(
                 username=sender_username,
             )
 
-    try:
-        limit = max(0, app_settings.USERBOT_ACTION_TARGET_DIALOG_LIMIT)
-        index = 1
-        async for dialog in client.iter_dialogs(limit=limit):
-            if not getattr(dialog, "is_user", False):
-                continue
-            entity = getattr(dialog, "entity", None)
-            if not entity or _is_telegram_bot_sender(entity):
-                continue
-
-            chat_id = _coerce_int(
-                getattr(dialog, "id", None) or getattr(entity, "id", None)
-            )
-            if not chat_id:
-                continue
-            first = getattr(entity, "first_name", None) or ""
-            last = getattr(entity, "last_name", None) or ""
-            label = (
-                f"{first} {last}".strip()
-                or getattr(entity, "username", None)
-                or getattr(dialog, "name", None)
-                or f"user {chat_id}"
-            )
-            add_candidate(
-                ref=f"contact_{index}",
-                label=label,
-                chat_id=chat_id,
-                username=getattr(entity, "username", None),
-            )
-            index += 1
-    except Exception as exc:
-        logger.debug("Userbot action target fetch failed: {}", exc)
+    # Local snapshot only: the dialog list is refreshed in the background.
+    limit = max(0, app_settings.USERBOT_ACTION_TARGET_DIALOG_LIMIT)
+    for index, dialog in enumerate(recent_private_dialogs(client, limit), start=1):
+        add_candidate(
+            ref=f"contact_{index}",
+            label=dialog["label"],
+            chat_id=dialog["chat_id"],
+            username=dialog.get("username"),
+        )
 
     return candidates[: app_settings.USERBOT_ACTION_TARGET_DIALOG_LIMIT + 1]
 
@@ -2032,6 +2317,7 @@ async def _generate_action_plan(
     user_facts: list[str],
     style_samples: list[str],
     target_candidates: list[dict],
+    style_profile: str | None = None,
 ) -> dict | None:
     """
     Ask the LLM for an optional multi-step action draft and validate it.
@@ -2048,7 +2334,9 @@ async def _generate_action_plan(
             context_parts.append(
                 "User facts:\n" + "\n".join(f"- {f}" for f in user_facts[:12])
             )
-        if style_samples:
+        if style_profile:
+            context_parts.append("User writing style:\n" + style_profile)
+        elif style_samples:
             context_parts.append(
                 "Recent user writing style:\n"
                 + "\n".join(f"- {sample}" for sample in style_samples[:8])
@@ -2538,6 +2826,13 @@ def _format_batch_digest(items: list[dict]) -> str:
         line = f"• <b>{_esc(item['channel_name'])}</b>: {_esc(item['summary'])}"
         if item.get("post_link"):
             line += f" (<a href='{item['post_link']}'>link</a>)"
+        also = [
+            f"<a href='{extra['post_link']}'>{_esc(extra.get('channel_name') or 'link')}</a>"
+            for extra in item.get("extra_links") or []
+            if extra.get("post_link")
+        ]
+        if also:
+            line += f" · also: {', '.join(also)}"
         lines.append(line)
     return "\n".join(lines)
 
@@ -2549,91 +2844,73 @@ async def _add_to_channel_batch(
     summary: str,
     post_link: str,
     score: int,
-) -> None:
-    """Add a medium-relevance post to the user's batch digest in Redis."""
-    entry = json.dumps(
+    signature: str | None = None,
+) -> int:
+    """Add a medium-relevance post to the user's batch digest; returns its size."""
+    return await add_to_channel_batch(
+        user_id,
         {
             "channel_name": channel_name,
             "summary": summary,
             "post_link": post_link,
             "score": score,
             "ts": int(time.time()),
+            "sig": signature,
         },
-        ensure_ascii=False,
     )
-    redis = await _get_redis()
-    try:
-        list_key = f"ub_channel_batch:{user_id}"
-        await redis.rpush(list_key, entry)
-        # Auto-expire the list after 24 hours as a safety net
-        await redis.expire(list_key, 86_400)
-    finally:
-        await redis.aclose()
-
-
-async def _get_channel_batch_size(user_id: int) -> int:
-    redis = await _get_redis()
-    try:
-        return await redis.llen(f"ub_channel_batch:{user_id}")
-    finally:
-        await redis.aclose()
 
 
 async def flush_channel_batch(user_id: int, bot: "Bot") -> None:
     """
     Flush the accumulated medium-priority channel posts as a single digest.
-    Called by the auto-flush threshold in _handle_channel_post and by the
-    periodic scheduler job.
+    Called by the auto-flush threshold in _handle_channel_post; periodic
+    flushes go through userbot_channel_batch.sweep_channel_batches.
     """
     user_settings = await _get_user_settings(user_id)
     if user_settings and _is_break_mode_active(user_settings):
         return
 
-    redis = await _get_redis()
-    try:
-        list_key = f"ub_channel_batch:{user_id}"
-        raw_items = await redis.lrange(list_key, 0, -1)
-        if not raw_items:
-            return
-        # Atomically drain the list
-        await redis.delete(list_key)
-    finally:
-        await redis.aclose()
+    items = await drain_channel_batch(user_id)
+    if items:
+        await deliver_channel_digest(user_id, bot, items)
 
-    items = []
-    for raw in raw_items:
-        try:
-            items.append(json.loads(raw))
-        except (json.JSONDecodeError, TypeError):
-            continue
-
-    if not items:
-        return
 
+async def deliver_channel_digest(
+    user_id: int,
+    bot: "Bot",
+    items: list[dict],
+    *,
+    tg: tuple[int | None, dict[str, int]] | None = None,
+) -> bool:
+    """Send drained batch items as one digest; returns True if it was sent."""
     # Sort by score descending so more relevant items appear first
     items.sort(key=lambda x: x.get("score", 0), reverse=True)
 
     digest = _format_batch_digest(items)
-    tg_id, topic_kwargs = await _get_tg_delivery(user_id)
-    if tg_id and digest:
-        await bot.send_message(
-            tg_id,
-            digest,
-            parse_mode="HTML",
-            disable_web_page_preview=True,
-            **topic_kwargs,
-        )
-        # Save summarized digest to conversation history
-        summaries = "; ".join(f"{it['channel_name']}: {it['summary']}" for it in items)
-        await _save_notification_to_history(
-            tg_chat_id=tg_id,
-            text=f"[Channel digest — {len(items)} posts]: {summaries}",
-        )
-        logger.info(
-            "Userbot: flushed channel digest ({} posts) for user {}",
-            len(items),
-            user_id,
-        )
+    tg_id, topic_kwargs = tg if tg is not None else await _get_tg_delivery(user_id)
+    if not tg_id or not digest:
+        return False
+    await telegram_delivery.send_message(
+        bot,
+        tg_id,
+        digest,
+        priority=telegram_delivery.Priority.REMINDER,
+        parse_mode="HTML",
+        disable_web_page_preview=True,
+        **topic_kwargs,
+    )
+    # Save summarized digest to conversation history
+    summaries = "; ".join(f"{it['channel_name']}: {it['summary']}" for it in items)
+    await _save_notification_to_history(
+        tg_chat_id=tg_id,
+        text=f"[Channel digest — {len(items)} posts]: {summaries}",
+    )
+    logger.info(
+        "Userbot: flushed channel digest ({} posts) for user {}",
+        len(items),
+        user_id,
+    )
+    return True
 
 
 async def _save_notification_to_history(*, tg_chat_id: int, text: str) -> None:
@@ -2662,6 +2939,7 @@ async def _generate_reply_suggestions(
     user_facts: list[str],
     style_samples: list[str],
     sender_relationship: str | None,
+    style_profile: str | None = None,
 ) -> list[str]:
     """
     Generate 3 reply suggestions that sound like the user themselves would write.
@@ -2683,8 +2961,16 @@ async def _generate_reply_suggestions(
             facts_block = "\n".join(f"- {f}" for f in user_facts[:20])
             system_parts.append(f"\n<user_profile>\n{facts_block}\n</user_profile>")
 
-        # Communication style samples (few-shot examples of how the user writes)
-        if style_samples:
+        # Compiled style profile, or raw samples until one has been built
+        if style_profile:
+            system_parts.append(
+                "\n<communication_style>\n"
+                "How this person writes (compiled from their recent messages). "
+                "Mimic their language, length, tone, and quirks:\n"
+                f"{style_profile}\n"
+                "</communication_style>"
+            )
+        elif style_samples:
             # Show most recent 15 samples
             samples_block = "\n".join(f'- "{s}"' for s in style_samples[:15])
             system_parts.append(
@@ -2759,14 +3045,16 @@ async def _generate_reply_suggestions(
 
         # --- Infer sender relationship in background if not cached ---
         if not sender_relationship and conversation_thread:
-            asyncio.create_task(
-                _infer_and_cache_sender_relationship(
+            task = asyncio.create_task(
+                _ensure_sender_relationship(
                     user_id=user_id,
                     sender_tg_id=sender_tg_id,
                     sender_name=sender_name,
                     conversation_thread=conversation_thread,
                 )
             )
+            _relationship_tasks.add(task)
+            task.add_done_callback(_relationship_tasks.discard)
 
         return suggestions
 
@@ -2775,16 +3063,111 @@ async def _generate_reply_suggestions(
         return _fallback
 
 
+# In-flight relationship inferences in this process, keyed by (user, sender).
+_relationship_inflight: dict[tuple[int, int], asyncio.Future] = {}
+# Background inferences started from reply suggestions, kept referenced.
+_relationship_tasks: set[asyncio.Task] = set()
+
+
+def _sender_infer_lease_key(user_id: int, sender_tg_id: int) -> str:
+    return f"ub_sender_infer:{user_id}:{sender_tg_id}"
+
+
+async def _ensure_sender_relationship(
+    *,
+    user_id: int,
+    sender_tg_id: int,
+    sender_name: str,
+    conversation_thread: list[dict],
+) -> str | None:
+    """
+    Singleflight wrapper around _infer_and_cache_sender_relationship.
+
+    Concurrent callers in this process await one shared inference. Across
+    processes a Redis SET NX lease admits a single worker; when the inference
+    yields nothing the lease is kept for USERBOT_SENDER_NEGATIVE_CACHE_TTL so
+    the same sender is not retried on every message.
+    """
+    key = (user_id, sender_tg_id)
+    future = _relationship_inflight.get(key)
+    if future is None:
+        future = asyncio.ensure_future(
+            _run_sender_relationship_inference(
+                user_id=user_id,
+                sender_tg_id=sender_tg_id,
+                sender_name=sender_name,
+                conversation_thread=conversation_thread,
+            )
+        )
+        _relationship_inflight[key] = future
+        future.add_done_callback(lambda _f: _relationship_inflight.pop(key, None))
+    return await asyncio.shield(future)
+
+
+async def _run_sender_relationship_inference(
+    *,
+    user_id: int,
+    sender_tg_id: int,
+    sender_name: str,
+    conversation_thread: list[dict],
+) -> str | None:
+    lease_key = _sender_infer_lease_key(user_id, sender_tg_id)
+    try:
+        redis = await _get_redis()
+        try:
+            acquired = await redis.set(
+                lease_key, "1", nx=True, ex=app_settings.USERBOT_SENDER_INFER_LEASE_SECONDS
+            )
+        finally:
+            await redis.aclose()
+    except Exception as exc:
+        logger.warning(
+            "Sender relationship lease failed (user {}, sender {}): {}",
+            user_id, sender_tg_id, exc,
+        )
+        return None
+    if not acquired:
+        return None
+
+    description = None
+    try:
+        description = await _infer_and_cache_sender_relationship(
+            user_id=user_id,
+            sender_tg_id=sender_tg_id,
+            sender_name=sender_name,
+            conversation_thread=conversation_thread,
+        )
+    finally:
+        try:
+            redis = await _get_redis()
+            try:
+                if description:
+                    await redis.delete(lease_key)
+                else:
+                    await redis.expire(
+                        lease_key, app_settings.USERBOT_SENDER_NEGATIVE_CACHE_TTL
+                    )
+            finally:
+                await redis.aclose()
+        except Exception as exc:
+            # The lease then simply expires after USERBOT_SENDER_INFER_LEASE_SECONDS.
+            logger.warning(
+                "Sender relationship lease release failed (user {}, sender {}): {}",
+                user_id, sender_tg_id, exc,
+            )
+    return description
+
+
 async def _infer_and_cache_sender_relationship(
     *,
     user_id: int,
     sender_tg_id: int,
     sender_name: str,
     conversation_thread: list[dict],
-) -> None:
+) -> str | None:
     """
     Ask the LLM to infer the relationship between the user and sender
-    based on conversation context. Cache the result in Redis.
+    based on conversation context. Cache the result in Redis and return it.
     """
     try:
         # Build a short conversation summary for the LLM
@@ -2828,8 +3211,10 @@ async def _infer_and_cache_sender_relationship(
                 sender_name,
                 description,
             )
+            return description
     except Exception as exc:
         logger.debug("Sender relationship inference failed: {}", exc)
+    return None
 
 
 # ---------------------------------------------------------------------------
@@ -2907,6 +3292,13 @@ def _event_sender_id(event) -> int | None:
     return _coerce_int(sender_id)
 
 
+def _event_date(event) -> datetime | None:
+    date_value = getattr(getattr(event, "message", None), "date", None)
+    if date_value is None:
+        date_value = getattr(event, "date", None)
+    return date_value if isinstance(date_value, datetime) else None
+
+
 def _event_chat_id(event) -> int | None:
     return _coerce_int(getattr(event, "chat_id", None))
 
@@ -2953,6 +3345,20 @@ def _should_ignore_assistant_bot_event(event, assistant_bot_id: int | None) -> b
     ) or _is_private_chat_with_telegram_id(event, assistant_bot_id)
 
 
+def _mentions_owner(event, text: str, me) -> bool:
+    username = getattr(me, "username", None)
+    if username and f"@{username}".casefold() in text.casefold():
+        return True
+    entities = getattr(event.message, "entities", None) or []
+    if entities:
+        from telethon.tl.types import MessageEntityMentionName
+
+        for ent in entities:
+            if isinstance(ent, MessageEntityMentionName) and ent.user_id == me.id:
+                return True
+    return False
+
+
 def _is_telegram_bot_sender(sender) -> bool:
     return bool(getattr(sender, "bot", False))
 
@@ -0,0 +1,172 @@
+"""
+Durable due-time queue for DM/group reply batches.
+
+Each incoming DM/group message is appended to its reply batch
+(``ub_reply_batch:...``) and the batch key is (re)scored in the ``ub_reply_due``
+sorted set with the time its quiet window ends. A single poller per process
+claims due batch keys and hands them to the monitor, instead of one sleeping
+asyncio task per message:
+
+* Memory stays flat regardless of message volume.
+* Pending batches survive restarts and deploys — the batch list, its version
+  and its metadata all live in Redis until the poller claims them.
+* Claiming is atomic (Lua): a member is removed only if it is still due, and
+  the batch version is read in the same step, so a message arriving after the
+  claim bumps the version and gets its own fire time.
+* Only batches of accounts connected in this process are claimed; with
+  sharded userbot workers every worker drains its own accounts.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable
+
+from loguru import logger
+
+from ..config import settings as app_settings
+
+REPLY_DUE_KEY = "ub_reply_due"
+
+# KEYS[1] = due zset; ARGV[1] = now; ARGV[2..] = candidate batch keys.
+# Returns a flat list of (batch_key, version, meta) for every claimed key.
+_CLAIM_SCRIPT = """
+local claimed = {}
+for i = 2, #ARGV do
+    local member = ARGV[i]
+    local score = redis.call('ZSCORE', KEYS[1], member)
+    if score and tonumber(score) <= tonumber(ARGV[1]) then
+        redis.call('ZREM', KEYS[1], member)
+        table.insert(claimed, member)
+        table.insert(claimed, redis.call('GET', member .. ':version') or '')
+        table.insert(claimed, redis.call('GET', member .. ':meta') or '')
+    end
+end
+return claimed
+"""
+
+ReplyBatchHandler = Callable[[str, int, dict], Awaitable[None]]
+
+_poller_task: asyncio.Task | None = None
+
+
+def reply_meta_key(batch_key: str) -> str:
+    return f"{batch_key}:meta"
+
+
+def batch_user_id(batch_key: str) -> int | None:
+    """Extract the bot user id from ``ub_reply_batch:{user_id}:...``."""
+    parts = batch_key.split(":")
+    if len(parts) < 2:
+        return None
+    try:
+        return int(parts[1])
+    except ValueError:
+        return None
+
+
+class ReplyTimerPoller:
+    """Claims due reply batches for accounts connected in this process."""
+
+    def __init__(
+        self,
+        handler: ReplyBatchHandler,
+        *,
+        is_local: Callable[[int], bool],
+    ) -> None:
+        self.handler = handler
+        self.is_local = is_local
+        self._tasks: set[asyncio.Task] = set()
+
+    async def run(self) -> None:
+        redis = await _get_redis()
+        try:
+            while True:
+                try:
+                    await self.tick(redis)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as exc:
+                    logger.error("Userbot reply timer poll failed: {}", exc)
+                await asyncio.sleep(
+                    max(0.2, app_settings.USERBOT_REPLY_TIMER_POLL_SECONDS)
+                )
+        finally:
+            await redis.aclose()
+
+    async def tick(self, redis, now: float | None = None) -> int:
+        now = time.time() if now is None else now
+        batch_size = max(1, app_settings.USERBOT_REPLY_TIMER_CLAIM_BATCH)
+        page_size = batch_size * 4
+        mine: list[str] = []
+        expired: list[str] = []
+        # Entries of accounts served elsewhere stay due until they expire;
+        # page past them so they cannot hide this process's own batches.
+        offset = 0
+        for _ in range(app_settings.USERBOT_REPLY_TIMER_MAX_SCAN_PAGES):
+            due = await redis.zrangebyscore(
+                REPLY_DUE_KEY, "-inf", now, start=offset, num=page_size, withscores=True
+            )
+            for member, score in due:
+                user_id = batch_user_id(member)
+                if user_id is not None and self.is_local(user_id):
+                    mine.append(member)
+                elif now - float(score) > app_settings.USERBOT_REPLY_TIMEOUT:
+                    # The account is not connected anywhere; its batch list has expired.
+                    expired.append(member)
+            offset += len(due)
+            if len(due) < page_size or len(mine) >= batch_size:
+                break
+        if expired:
+            await redis.zrem(REPLY_DUE_KEY, *expired)
+        if not mine:
+            return 0
+
+        raw = await redis.eval(_CLAIM_SCRIPT, 1, REPLY_DUE_KEY, now, *mine[:batch_size])
+        claimed = 0
+        for index in range(0, len(raw or []), 3):
+            batch_key, version, meta = raw[index:index + 3]
+            try:
+                meta_dict = json.loads(meta) if meta else {}
+            except (TypeError, json.JSONDecodeError):
+                meta_dict = {}
+            if not version or not meta_dict:
+                continue
+            task = asyncio.create_task(self.handler(batch_key, int(version), meta_dict))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            claimed += 1
+        return claimed
+
+
+def start_reply_timer_poller(
+    handler: ReplyBatchHandler,
+    *,
+    is_local: Callable[[int], bool],
+) -> asyncio.Task:
+    """Start the process-wide poller once; later calls return the running task."""
+    global _poller_task
+    if _poller_task is None or _poller_task.done():
+        poller = ReplyTimerPoller(handler, is_local=is_local)
+        _poller_task = asyncio.create_task(poller.run())
+        logger.info("Userbot reply timer poller started")
+    return _poller_task
+
+
+async def stop_reply_timer_poller() -> None:
+    global _poller_task
+    task, _poller_task = _poller_task, None
+    if task is None or task.done():
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+async def _get_redis():
+    from redis.asyncio import Redis
+
+    return Redis.from_url(app_settings.REDIS_URL, decode_responses=True)
@@ -0,0 +1,442 @@
+"""
+Sharded userbot runtime — several worker processes share the Telethon clients.
+
+By default every client runs inside the web process (USERBOT_RUN_IN_APP=True).
+With USERBOT_RUN_IN_APP=False the web process starts no clients; instead one
+or more ``python -m app.userbot_worker`` processes each own a shard of the
+active ``UserBotSession`` rows:
+
+* Workers announce themselves with a heartbeat in the ``ub_workers`` sorted
+  set (score = expiry timestamp). Live workers form a consistent-hash ring,
+  so adding or removing a worker only moves ~1/N of the accounts.
+* A worker only connects an account after taking its lease
+  ``ub_lease:{user_id}`` (SET NX EX). Leases are renewed on every heartbeat
+  and released when the account moves to another worker, so two processes
+  never run the same session even while the ring is converging.
+* Bot-side operations (send an approved reply, start/stop after
+  /connect_userbot or /disconnect_userbot) are pushed to the lease owner's
+  command list ``ub_cmd:{worker_id}``; the answer comes back on a one-shot
+  reply list.
+"""
+from __future__ import annotations
+
+import asyncio
+import bisect
+import hashlib
+import json
+import time
+import uuid
+from typing import Any, Iterable
+
+from loguru import logger
+
+from ..config import settings as app_settings
+from ..utils.worker_id import default_worker_id
+from .userbot_reply_timer import stop_reply_timer_poller
+
+WORKERS_KEY = "ub_workers"
+
+_RENEW_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def lease_key(user_id: int) -> str:
+    return f"ub_lease:{user_id}"
+
+
+def command_key(worker_id: str) -> str:
+    return f"ub_cmd:{worker_id}"
+
+
+def reply_key(request_id: str) -> str:
+    return f"ub_cmd_reply:{request_id}"
+
+
+def sharding_enabled() -> bool:
+    return not app_settings.USERBOT_RUN_IN_APP
+
+
+# ---------------------------------------------------------------------------
+# Consistent hashing
+# ---------------------------------------------------------------------------
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent-hash ring of worker ids with virtual nodes."""
+
+    def __init__(self, workers: Iterable[str], *, vnodes: int | None = None) -> None:
+        self.vnodes = max(1, vnodes or app_settings.USERBOT_SHARD_VNODES)
+        self.workers = sorted(set(workers))
+        points = sorted(
+            (_hash(f"{worker}#{replica}"), worker)
+            for worker in self.workers
+            for replica in range(self.vnodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._owners = [worker for _, worker in points]
+
+    def owner(self, user_id: int) -> str | None:
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _hash(str(user_id))) % len(self._hashes)
+        return self._owners[index]
+
+
+def plan_rebalance(
+    *,
+    worker_id: str,
+    ring: HashRing,
+    active_user_ids: Iterable[int],
+    running_user_ids: Iterable[int],
+) -> tuple[list[int], list[int]]:
+    """
+    Return ``(to_start, to_stop)`` for this worker.
+    Accounts that are no longer active or hash to another worker are stopped.
+    """
+    active = set(active_user_ids)
+    running = set(running_user_ids)
+    owned = {uid for uid in active if ring.owner(uid) == worker_id}
+    return sorted(owned - running), sorted(running - owned)
+
+
+# ---------------------------------------------------------------------------
+# Redis primitives
+# ---------------------------------------------------------------------------
+
+
+async def _get_redis():
+    from redis.asyncio import Redis
+
+    return Redis.from_url(app_settings.REDIS_URL, decode_responses=True)
+
+
+async def heartbeat(redis, worker_id: str) -> None:
+    expires_at = time.time() + app_settings.USERBOT_WORKER_LEASE_TTL_SECONDS
+    await redis.zadd(WORKERS_KEY, {worker_id: expires_at})
+
+
+async def live_workers(redis) -> list[str]:
+    await redis.zremrangebyscore(WORKERS_KEY, "-inf", time.time())
+    return list(await redis.zrange(WORKERS_KEY, 0, -1))
+
+
+async def unregister_worker(redis, worker_id: str) -> None:
+    await redis.zrem(WORKERS_KEY, worker_id)
+
+
+async def acquire_lease(redis, user_id: int, worker_id: str) -> bool:
+    ttl = app_settings.USERBOT_WORKER_LEASE_TTL_SECONDS
+    if await redis.set(lease_key(user_id), worker_id, nx=True, ex=ttl):
+        return True
+    return await renew_lease(redis, user_id, worker_id)
+
+
+async def renew_lease(redis, user_id: int, worker_id: str) -> bool:
+    ttl = app_settings.USERBOT_WORKER_LEASE_TTL_SECONDS
+    return bool(
+        await redis.eval(_RENEW_LEASE_SCRIPT, 1, lease_key(user_id), worker_id, ttl)
+    )
+
+
+async def release_lease(redis, user_id: int, worker_id: str) -> None:
+    await redis.eval(_RELEASE_LEASE_SCRIPT, 1, lease_key(user_id), worker_id)
+
+
+async def lease_owner(user_id: int) -> str | None:
+    redis = await _get_redis()
+    try:
+        return await redis.get(lease_key(user_id))
+    finally:
+        await redis.aclose()
+
+
+# ---------------------------------------------------------------------------
+# Command channel (web process → owning worker)
+# ---------------------------------------------------------------------------
+
+
+async def send_command(
+    user_id: int,
+    op: str,
+    payload: dict | None = None,
+    *,
+    timeout: float | None = None,
+) -> Any:
+    """
+    Run *op* for *user_id* on the worker that owns the account.
+
+    ``start`` goes to the ring owner when nobody holds the lease yet; every
+    other op needs a lease owner. Returns the handler result, or None when no
+    worker answered in time.
+    """
+    timeout = timeout or app_settings.USERBOT_COMMAND_TIMEOUT_SECONDS
+    request_id = uuid.uuid4().hex
+    redis = await _get_redis()
+    try:
+        worker_id = await redis.get(lease_key(user_id))
+        if worker_id is None and op == "start":
+            worker_id = HashRing(await live_workers(redis)).owner(user_id)
+        if worker_id is None:
+            logger.warning(
+                "Userbot command {} for user {}: no owning worker", op, user_id
+            )
+            return None
+
+        command = json.dumps(
+            {
+                "id": request_id,
+                "op": op,
+                "user_id": user_id,
+                "payload": payload or {},
+            },
+            ensure_ascii=False,
+        )
+        await redis.rpush(command_key(worker_id), command)
+        reply = await redis.blpop(reply_key(request_id), timeout=max(1, int(timeout)))
+    finally:
+        await redis.aclose()
+
+    if reply is None:
+        logger.warning(
+            "Userbot command {} for user {} timed out on worker {}",
+            op,
+            user_id,
+            worker_id,
+        )
+        return None
+    try:
+        return json.loads(reply[1]).get("result")
+    except (TypeError, json.JSONDecodeError):
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Worker
+# ---------------------------------------------------------------------------
+
+
+class UserBotShardWorker:
+    """Owns a shard of userbot accounts inside one worker process."""
+
+    def __init__(self, bot, *, worker_id: str | None = None) -> None:
+        self.bot = bot
+        self.worker_id = worker_id or default_worker_id()
+        self._redis = None
+        self._stopping = asyncio.Event()
+        self._tasks: set[asyncio.Task] = set()
+
+    async def run(self) -> None:
+        self._redis = await _get_redis()
+        logger.info("Userbot shard worker {} starting", self.worker_id)
+        commands = asyncio.create_task(self._command_loop())
+        try:
+            while not self._stopping.is_set():
+                try:
+                    await self.rebalance()
+                except Exception as exc:
+                    logger.error(
+                        "Userbot shard worker {} rebalance failed: {}",
+                        self.worker_id,
+                        exc,
+                    )
+                try:
+                    await asyncio.wait_for(
+                        self._stopping.wait(),
+                        timeout=app_settings.USERBOT_WORKER_HEARTBEAT_SECONDS,
+                    )
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            commands.cancel()
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+            await self._shutdown()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def rebalance(self) -> None:
+        from .userbot_manager import UserBotManager, _clients
+
+        redis = self._redis
+        await heartbeat(redis, self.worker_id)
+        ring = HashRing(await live_workers(redis))
+        to_start, to_stop = plan_rebalance(
+            worker_id=self.worker_id,
+            ring=ring,
+            active_user_ids=await _active_user_ids(),
+            running_user_ids=list(_clients.keys()),
+        )
+
+        for user_id in to_stop:
+            await self._stop_account(user_id)
+
+        for user_id in list(_clients.keys()):
+            if not await renew_lease(redis, user_id, self.worker_id):
+                logger.warning(
+                    "Userbot shard worker {} lost lease for user {}",
+                    self.worker_id,
+                    user_id,
+                )
+                await UserBotManager.stop_client(user_id)
+
+        semaphore = asyncio.Semaphore(max(1, app_settings.USERBOT_START_CONCURRENCY))
+
+        async def start_one(user_id: int) -> None:
+            async with semaphore:
+                await self._start_account(user_id)
+
+        await asyncio.gather(*(start_one(uid) for uid in to_start))
+
+        logger.debug(
+            "Userbot shard worker {}: {} worker(s) live, {} client(s) here",
+            self.worker_id,
+            len(ring.workers),
+            len(_clients),
+        )
+
+    async def _start_account(self, user_id: int) -> bool:
+        from .userbot_manager import UserBotManager
+
+        if not UserBotManager.can_attempt_start(user_id):
+            return False
+        if not await acquire_lease(self._redis, user_id, self.worker_id):
+            return False
+        session_string = await _load_session_string(user_id)
+        if session_string:
+            await UserBotManager.start_with_backoff(user_id, session_string, self.bot)
+        if UserBotManager.get_client(user_id) is None:
+            await release_lease(self._redis, user_id, self.worker_id)
+            return False
+        return True
+
+    async def _stop_account(self, user_id: int) -> None:
+        from .userbot_manager import UserBotManager
+
+        await UserBotManager.stop_client(user_id)
+        await release_lease(self._redis, user_id, self.worker_id)
+
+    async def _command_loop(self) -> None:
+        key = command_key(self.worker_id)
+        while True:
+            try:
+                item = await self._redis.blpop(key, timeout=5)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.error("Userbot command loop error: {}", exc)
+                await asyncio.sleep(1)
+                continue
+            if item is None:
+                continue
+            task = asyncio.create_task(self._handle_command(item[1]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _handle_command(self, raw: str) -> None:
+        try:
+            command = json.loads(raw)
+        except (TypeError, json.JSONDecodeError):
+            return
+        result: Any = None
+        try:
+            result = await self._dispatch(
+                command.get("op"),
+                int(command.get("user_id")),
+                command.get("payload") or {},
+            )
+        except Exception as exc:
+            logger.error(
+                "Userbot command {} for user {} failed: {}",
+                command.get("op"),
+                command.get("user_id"),
+                exc,
+            )
+        key = reply_key(str(command.get("id")))
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.rpush(key, json.dumps({"result": result}))
+            pipe.expire(key, max(60, app_settings.USERBOT_COMMAND_TIMEOUT_SECONDS))
+            await pipe.execute()
+
+    async def _dispatch(self, op: str | None, user_id: int, payload: dict) -> Any:
+        from .userbot_manager import UserBotManager
+
+        if op == "status":
+            return await UserBotManager.is_client_connected(user_id)
+        if op == "start":
+            from .userbot_manager import _restart_state
+
+            _restart_state.pop(user_id, None)
+            await UserBotManager.stop_client(user_id)
+            return await self._start_account(user_id)
+        if op == "stop":
+            await self._stop_account(user_id)
+            return True
+        if op == "send_message":
+            from ..bot.routers.userbot import _send_message_locally
+
+            return await _send_message_locally(
+                user_id=user_id,
+                chat_id=int(payload["chat_id"]),
+                text=str(payload["text"]),
+                reply_to_msg_id=payload.get("reply_to_msg_id"),
+            )
+        logger.warning("Unknown userbot command {}", op)
+        return None
+
+    async def _shutdown(self) -> None:
+        from .userbot_manager import _clients
+
+        for user_id in list(_clients.keys()):
+            await self._stop_account(user_id)
+        await stop_reply_timer_poller()
+        try:
+            await unregister_worker(self._redis, self.worker_id)
+        finally:
+            await self._redis.aclose()
+        logger.info("Userbot shard worker {} stopped", self.worker_id)
+
+
+async def _active_user_ids() -> list[int]:
+    from sqlmodel import select
+
+    from ..db import get_session
+    from ..models.userbot_session import UserBotSession
+
+    async with get_session() as session:
+        result = await session.execute(
+            select(UserBotSession.user_id).where(UserBotSession.is_active == True)  # noqa: E712
+        )
+        return [int(uid) for uid in result.scalars().all()]
+
+
+async def _load_session_string(user_id: int) -> str | None:
+    from sqlmodel import select
+
+    from ..db import get_session
+    from ..models.userbot_session import UserBotSession
+
+    async with get_session() as session:
+        result = await session.execute(
+            select(UserBotSession).where(
+                UserBotSession.user_id == user_id,
+                UserBotSession.is_active == True,  # noqa: E712
+            )
+        )
+        row = result.scalar_one_or_none()
+        return (row.session_string or None) if row else None
@@ -2,14 +2,28 @@ from __future__ import annotations
 
 import json
 import time
+from dataclasses import dataclass
 
 from loguru import logger
-from telethon import TelegramClient
+from telethon import TelegramClient, utils as telethon_utils
 from telethon.tl.functions.messages import GetPeerDialogsRequest
 
 from ..config import settings as app_settings
 
 
+# Peers per GetPeerDialogsRequest when probing many chats of one account.
+PEER_DIALOGS_BATCH_SIZE = 50
+
+
+@dataclass
+class PeerDialogState:
+    """Read cursor and newest message of one dialog."""
+
+    read_inbox_max_id: int | None
+    top_message_id: int | None
+    top_message_out: bool = False
+
+
 def read_marker_ttl_seconds() -> int:
     """Keep read cursors long enough to cover delayed follow-up decisions."""
     followup_window = (
@@ -61,6 +75,146 @@ async def get_read_inbox_max_id(
     return None
 
 
+async def cache_read_markers(user_id: int, markers: dict[int, int]) -> None:
+    """Store several read cursors for one user in a single round-trip."""
+    markers = {chat_id: max_id for chat_id, max_id in markers.items() if max_id > 0}
+    if not markers:
+        return
+    redis = await _get_redis()
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            for chat_id, max_id in markers.items():
+                pipe.setex(
+                    read_marker_key(user_id, chat_id),
+                    read_marker_ttl_seconds(),
+                    str(max_id),
+                )
+            await pipe.execute()
+    finally:
+        await redis.aclose()
+
+
+async def load_thread_markers(
+    user_id: int,
+    chat_ids: list[int],
+) -> tuple[dict[int, int], dict[int, dict]]:
+    """
+    Read cached read cursors and manual-outgoing markers for many chats with one
+    pipelined pair of MGETs. Returns ``(read_markers, outgoing_markers)``.
+    """
+    if not chat_ids:
+        return {}, {}
+    redis = await _get_redis()
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.mget([read_marker_key(user_id, chat_id) for chat_id in chat_ids])
+            pipe.mget([manual_outgoing_key(user_id, chat_id) for chat_id in chat_ids])
+            raw_read, raw_outgoing = await pipe.execute()
+    finally:
+        await redis.aclose()
+
+    read_markers: dict[int, int] = {}
+    outgoing_markers: dict[int, dict] = {}
+    for chat_id, raw in zip(chat_ids, raw_read or []):
+        value = _coerce_int(raw)
+        if value is not None:
+            read_markers[chat_id] = value
+    for chat_id, raw in zip(chat_ids, raw_outgoing or []):
+        if not raw:
+            continue
+        try:
+            data = json.loads(raw)
+        except (TypeError, json.JSONDecodeError):
+            continue
+        if isinstance(data, dict):
+            outgoing_markers[chat_id] = data
+    return read_markers, outgoing_markers
+
+
+def outgoing_marker_after(
+    marker: dict | None,
+    message_id: int,
+    message_ts: int = 0,
+) -> bool:
+    if not isinstance(marker, dict):
+        return False
+    outgoing_id = _coerce_int(marker.get("message_id"))
+    if outgoing_id is not None and outgoing_id > message_id:
+        return True
+    outgoing_ts = _coerce_int(marker.get("ts"))
+    return bool(outgoing_ts and message_ts and outgoing_ts > message_ts)
+
+
+async def get_peer_dialog_states(
+    client: TelegramClient,
+    chat_ids: list[int],
+) -> dict[int, PeerDialogState]:
+    """
+    Fetch read cursors and top messages for many dialogs of one account,
+    using one GetPeerDialogsRequest per PEER_DIALOGS_BATCH_SIZE chats.
+    A batch that fails (e.g. one unresolvable peer) is retried chat by chat.
+    """
+    states: dict[int, PeerDialogState] = {}
+    unique_ids = list(dict.fromkeys(chat_ids))
+    for start in range(0, len(unique_ids), PEER_DIALOGS_BATCH_SIZE):
+        batch = unique_ids[start:start + PEER_DIALOGS_BATCH_SIZE]
+        try:
+            states.update(await _fetch_peer_dialog_states(client, batch))
+        except Exception as exc:
+            logger.debug(
+                "Batched read cursor fetch failed for {} chat(s): {}", len(batch), exc
+            )
+            for chat_id in batch:
+                try:
+                    states.update(await _fetch_peer_dialog_states(client, [chat_id]))
+                except Exception as inner_exc:
+                    logger.debug(
+                        "Could not fetch read cursor for chat {}: {}",
+                        chat_id,
+                        inner_exc,
+                    )
+    return states
+
+
+async def _fetch_peer_dialog_states(
+    client: TelegramClient,
+    chat_ids: list[int],
+) -> dict[int, PeerDialogState]:
+    result = await client(GetPeerDialogsRequest(peers=list(chat_ids)))
+    messages: dict[tuple[int | None, int], object] = {}
+    for message in getattr(result, "messages", []) or []:
+        message_id = _coerce_int(getattr(message, "id", None))
+        if message_id is None:
+            continue
+        messages[(_peer_id(getattr(message, "peer_id", None)), message_id)] = message
+
+    states: dict[int, PeerDialogState] = {}
+    dialogs = list(getattr(result, "dialogs", []) or [])
+    for index, dialog in enumerate(dialogs):
+        chat_id = _peer_id(getattr(dialog, "peer", None))
+        if chat_id is None and len(dialogs) == len(chat_ids):
+            chat_id = chat_ids[index]
+        if chat_id is None:
+            continue
+        top_id = _coerce_int(getattr(dialog, "top_message", None))
+        top_message = messages.get((chat_id, top_id)) if top_id is not None else None
+        states[chat_id] = PeerDialogState(
+            read_inbox_max_id=_coerce_int(getattr(dialog, "read_inbox_max_id", None)),
+            top_message_id=top_id,
+            top_message_out=bool(getattr(top_message, "out", False)),
+        )
+    return states
+
+
+def _peer_id(peer) -> int | None:
+    if peer is None:
+        return None
+    try:
+        return telethon_utils.get_peer_id(peer)
+    except Exception:
+        return None
+
+
 async def cache_manual_outgoing(
     *,
     user_id: int,
@@ -102,11 +256,7 @@ async def has_cached_manual_outgoing_after(
         data = json.loads(raw)
     except (TypeError, json.JSONDecodeError):
         return False
-    outgoing_id = _coerce_int(data.get("message_id"))
-    if outgoing_id is not None and outgoing_id > message_id:
-        return True
-    outgoing_ts = _coerce_int(data.get("ts"))
-    return bool(outgoing_ts and message_ts and outgoing_ts > message_ts)
+    return outgoing_marker_after(data, message_id, message_ts)
 
 
 async def has_live_outgoing_after(
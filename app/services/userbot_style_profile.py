@@ -0,0 +1,210 @@
+"""
+Compiled writing-style profile for userbot reply suggestions.
+
+Outgoing messages are kept as raw samples in the ``ub_style:{user_id}`` ring
+buffer. Instead of pasting up to USERBOT_STYLE_SAMPLES_MAX raw messages into
+every prompt, a compact descriptor is computed from the buffer:
+
+    typical length, emoji rate, formality, language mix, a few short exemplars
+
+The profile is stored as JSON in ``ub_style_profile:{user_id}`` and rebuilt in
+the background after every USERBOT_STYLE_PROFILE_REFRESH_EVERY new samples
+(counted in ``ub_style_new:{user_id}``). Raw samples stay the fallback until a
+profile exists.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+import statistics
+import time
+
+from loguru import logger
+
+from ..config import settings as app_settings
+
+_EMOJI_RE = re.compile(
+    "[\U0001F300-\U0001FAFF\U00002600-\U000027BF\U0001F1E6-\U0001F1FF]"
+)
+_CYRILLIC_RE = re.compile("[а-яА-ЯёЁ]")
+_LATIN_RE = re.compile("[a-zA-Z]")
+_INFORMAL_RE = re.compile(
+    r"(\){2,}|\bl+o+l+\b|\bha(ha)+\b|\bа?ха(ха)+\b|\bok\b|\bок\b|\bспс\b|\bнорм\b|\bpls\b|\bthx\b)",
+    re.IGNORECASE,
+)
+
+_refresh_tasks: dict[int, asyncio.Task] = {}
+
+
+def style_samples_key(user_id: int) -> str:
+    return f"ub_style:{user_id}"
+
+
+def style_profile_key(user_id: int) -> str:
+    return f"ub_style_profile:{user_id}"
+
+
+def style_counter_key(user_id: int) -> str:
+    return f"ub_style_new:{user_id}"
+
+
+def build_style_profile(samples: list[str]) -> dict | None:
+    """Condense raw outgoing messages (most recent first) into a style profile."""
+    texts = [text.strip() for text in samples if text and text.strip()]
+    if not texts:
+        return None
+
+    total = len(texts)
+    lengths = [len(text) for text in texts]
+    median_chars = int(statistics.median(lengths))
+    emoji_counts = [len(_EMOJI_RE.findall(text)) for text in texts]
+    letters_cyrillic = sum(len(_CYRILLIC_RE.findall(text)) for text in texts)
+    letters_latin = sum(len(_LATIN_RE.findall(text)) for text in texts)
+    letters = letters_cyrillic + letters_latin
+
+    def share(predicate) -> float:
+        return round(sum(1 for text in texts if predicate(text)) / total, 2)
+
+    lowercase_start = share(lambda t: t[0].isalpha() and t[0].islower())
+    ends_with_period = share(lambda t: t.endswith("."))
+    informal = share(lambda t: bool(_INFORMAL_RE.search(t)))
+    emoji_share = round(sum(1 for count in emoji_counts if count) / total, 2)
+
+    formality_score = 0
+    formality_score += 1 if ends_with_period >= 0.5 else 0
+    formality_score += 1 if lowercase_start <= 0.2 else 0
+    formality_score -= 1 if lowercase_start >= 0.5 else 0
+    formality_score -= 1 if informal >= 0.2 else 0
+    formality_score -= 1 if emoji_share >= 0.3 else 0
+    if formality_score >= 1:
+        formality = "formal"
+    elif formality_score <= -1:
+        formality = "casual"
+    else:
+        formality = "neutral"
+
+    exemplars: list[str] = []
+    for text in texts:
+        if len(exemplars) >= app_settings.USERBOT_STYLE_PROFILE_EXEMPLARS:
+            break
+        if not median_chars / 2 <= len(text) <= max(median_chars * 2, 20):
+            continue
+        snippet = text[:120]
+        if snippet not in exemplars:
+            exemplars.append(snippet)
+
+    return {
+        "sample_count": total,
+        "built_at": int(time.time()),
+        "median_chars": median_chars,
+        "avg_words": round(sum(len(text.split()) for text in texts) / total, 1),
+        "emoji_per_message": round(sum(emoji_counts) / total, 2),
+        "emoji_share": emoji_share,
+        "lowercase_start_share": lowercase_start,
+        "ends_with_period_share": ends_with_period,
+        "question_share": share(lambda t: "?" in t),
+        "exclamation_share": share(lambda t: "!" in t),
+        "informal_share": informal,
+        "formality": formality,
+        "languages": {
+            "cyrillic": round(letters_cyrillic / letters, 2) if letters else 0.0,
+            "latin": round(letters_latin / letters, 2) if letters else 0.0,
+        },
+        "exemplars": exemplars,
+    }
+
+
+def format_style_profile(profile: dict) -> str:
+    """Render a profile as a short prompt block."""
+    languages = profile.get("languages") or {}
+    language_parts = [
+        f"{label} {int(round(languages.get(key, 0) * 100))}%"
+        for key, label in (("cyrillic", "Cyrillic"), ("latin", "Latin"))
+        if languages.get(key)
+    ]
+    lines = [
+        f"- Typical message: ~{profile.get('median_chars', 0)} characters, "
+        f"~{profile.get('avg_words', 0)} words",
+        f"- Formality: {profile.get('formality', 'neutral')}; starts lowercase in "
+        f"{int(profile.get('lowercase_start_share', 0) * 100)}% of messages, ends with "
+        f"a period in {int(profile.get('ends_with_period_share', 0) * 100)}%",
+        f"- Emoji: {profile.get('emoji_per_message', 0)} per message "
+        f"(in {int(profile.get('emoji_share', 0) * 100)}% of messages)",
+        f"- Questions in {int(profile.get('question_share', 0) * 100)}%, "
+        f"exclamations in {int(profile.get('exclamation_share', 0) * 100)}% of messages",
+    ]
+    if language_parts:
+        lines.append("- Script mix: " + ", ".join(language_parts))
+    exemplars = profile.get("exemplars") or []
+    if exemplars:
+        lines.append("- Examples:")
+        lines.extend(f'  "{example}"' for example in exemplars)
+    return "\n".join(lines)
+
+
+async def load_style_profile(user_id: int) -> dict | None:
+    redis = await _get_redis()
+    try:
+        raw = await redis.get(style_profile_key(user_id))
+    finally:
+        await redis.aclose()
+    if not raw:
+        return None
+    try:
+        profile = json.loads(raw)
+    except (TypeError, json.JSONDecodeError):
+        return None
+    return profile if isinstance(profile, dict) else None
+
+
+async def refresh_style_profile(user_id: int) -> dict | None:
+    """Rebuild the profile from the current ring buffer and reset the counter."""
+    redis = await _get_redis()
+    try:
+        raw_list = await redis.lrange(style_samples_key(user_id), 0, -1)
+        samples: list[str] = []
+        for raw in raw_list:
+            try:
+                samples.append(json.loads(raw)["text"])
+            except (TypeError, json.JSONDecodeError, KeyError):
+                continue
+        profile = build_style_profile(samples)
+        async with redis.pipeline(transaction=True) as pipe:
+            if profile is not None:
+                pipe.set(
+                    style_profile_key(user_id),
+                    json.dumps(profile, ensure_ascii=False),
+                )
+            pipe.delete(style_counter_key(user_id))
+            await pipe.execute()
+        return profile
+    finally:
+        await redis.aclose()
+
+
+def schedule_style_profile_refresh(user_id: int) -> None:
+    """Rebuild the profile in the background; at most one rebuild per user at a time."""
+    task = _refresh_tasks.get(user_id)
+    if task is not None and not task.done():
+        return
+
+    async def run() -> None:
+        try:
+            await refresh_style_profile(user_id)
+        except Exception as exc:
+            logger.debug("Style profile refresh failed for user {}: {}", user_id, exc)
+        finally:
+            _refresh_tasks.pop(user_id, None)
+
+    _refresh_tasks[user_id] = asyncio.create_task(run())
+
+
+def needs_refresh(new_samples: int) -> bool:
+    return new_samples >= max(1, app_settings.USERBOT_STYLE_PROFILE_REFRESH_EVERY)
+
+
+async def _get_redis():
+    from redis.asyncio import Redis
+
+    return Redis.from_url(app_settings.REDIS_URL)
@@ -1,14 +1,17 @@
 from __future__ import annotations
 
+import asyncio
 import html
 import json
 import re
+import time
 from datetime import date, datetime, timedelta, timezone
 from typing import Any
 
 from aiogram import Bot
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from loguru import logger
-from sqlalchemy import or_
+from sqlalchemy import and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
@@ -17,12 +20,14 @@ from ..llm.client import async_client
 from ..models.settings import UserSettings
 from ..models.users import User
 from ..utils.telegram_topics import topic_kwargs_for_user
+from . import telegram_delivery
 from .userbot_state_probe import (
-    cache_read_marker,
-    get_cached_read_marker,
-    get_read_inbox_max_id,
+    cache_read_markers,
+    get_peer_dialog_states,
     has_cached_manual_outgoing_after,
     has_live_outgoing_after,
+    load_thread_markers,
+    outgoing_marker_after,
 )
 
 
@@ -361,7 +366,12 @@ class UserBotThreadService:
         *,
         user_id: int | None = None,
         limit: int = 100,
+        after: tuple[int, datetime, int] | None = None,
     ) -> list[Any]:
+        """
+        One page of due threads ordered by (importance DESC, deadline, id).
+        ``after`` is the keyset cursor of the previous page's last row.
+        """
         cls = self._thread_model()
         now = datetime.now(timezone.utc)
         cooldown_cutoff = now - timedelta(
@@ -376,10 +386,28 @@ class UserBotThreadService:
         ]
         if user_id is not None:
             filters.append(cls.user_id == user_id)
+        if after is not None:
+            importance, deadline, last_id = after
+            filters.append(
+                or_(
+                    cls.importance < importance,
+                    and_(
+                        cls.importance == importance,
+                        cls.response_deadline_at > deadline,
+                    ),
+                    and_(
+                        cls.importance == importance,
+                        cls.response_deadline_at == deadline,
+                        cls.id > last_id,
+                    ),
+                )
+            )
         result = await session.execute(
             select(cls)
             .where(*filters)
-            .order_by(cls.importance.desc(), cls.response_deadline_at.asc())
+            .order_by(
+                cls.importance.desc(), cls.response_deadline_at.asc(), cls.id.asc()
+            )
             .limit(limit)
         )
         return list(result.scalars().all())
@@ -390,11 +418,19 @@ class UserBotThreadService:
         bot: Bot | None,
         *,
         user_id: int | None = None,
-        limit: int = 200,
+        limit: int | None = None,
+        deadline: float | None = None,
     ) -> int:
-        """Catch up missed read/outgoing events before sending reminders."""
+        """
+        Catch up missed read/outgoing events before sending reminders.
+
+        Open threads are walked newest-first in keyset pages of ``limit`` rows
+        (id DESC), committing after each page, until none are left or the
+        monotonic ``deadline`` passes.
+        """
         cls = self._thread_model()
-        filters = [
+        page_size = limit or max(1, app_settings.USERBOT_FOLLOWUP_SWEEP_PAGE_SIZE)
+        base_filters = [
             cls.status.in_(OPEN_STATUSES),
             cls.message_id.is_not(None),
             or_(
@@ -403,49 +439,85 @@ class UserBotThreadService:
             ),
         ]
         if user_id is not None:
-            filters.append(cls.user_id == user_id)
-
-        result = await session.execute(
-            select(cls)
-            .where(*filters)
-            .order_by(cls.last_incoming_at.desc())
-            .limit(limit)
-        )
+            base_filters.append(cls.user_id == user_id)
 
         reconciled = 0
-        now = datetime.now(timezone.utc)
-        for thread in result.scalars().all():
-            chat_id = _coerce_int(getattr(thread, "chat_id", None))
-            message_id = _coerce_int(getattr(thread, "message_id", None))
-            if chat_id is None or message_id is None:
-                continue
+        scanned = 0
+        before_id: int | None = None
+        while True:
+            filters = list(base_filters)
+            if before_id is not None:
+                filters.append(cls.id < before_id)
+            result = await session.execute(
+                select(cls).where(*filters).order_by(cls.id.desc()).limit(page_size)
+            )
+            threads = list(result.scalars().all())
+            scanned += len(threads)
+            if not threads:
+                break
+            before_id = threads[-1].id
+            reconciled += await self._reconcile_page(session, bot, threads)
+            await session.commit()
+            if len(threads) < page_size or before_id is None:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                logger.info("Follow-up reconcile stopped at its time budget")
+                break
+
+        logger.debug(
+            "Follow-up reconcile: {} thread(s) scanned, {} reconciled",
+            scanned,
+            reconciled,
+        )
+        return reconciled
 
-            if await self._has_thread_outgoing_after(
-                thread.user_id,
-                chat_id,
-                message_id,
+    async def _reconcile_page(
+        self,
+        session: AsyncSession,
+        bot: Bot | None,
+        page: list,
+    ) -> int:
+        threads_by_user: dict[int, list] = {}
+        for thread in page:
+            if (
+                _coerce_int(getattr(thread, "chat_id", None)) is None
+                or _coerce_int(getattr(thread, "message_id", None)) is None
             ):
-                cleanup_target = _notification_cleanup_target(thread)
-                thread.status = "replied"
-                thread.last_outgoing_at = now
-                thread.response_deadline_at = None
-                _clear_notification_fields(thread)
-                if hasattr(thread, "updated_at"):
-                    thread.updated_at = now
-                session.add(thread)
-                await _cleanup_notification_target(
-                    bot=bot,
-                    cleanup_target=cleanup_target,
-                    reason="outgoing_reconcile",
-                )
-                reconciled += 1
                 continue
+            threads_by_user.setdefault(thread.user_id, []).append(thread)
 
-            if await self._is_thread_message_read(thread.user_id, chat_id, message_id):
-                cleanup_target = _notification_cleanup_target(thread)
-                if cleanup_target.get("notification_message_id") or cleanup_target.get(
-                    "pending_key"
-                ):
+        # Probe every user's threads at once (bounded); apply results serially
+        # because the DB session is not safe for concurrent use.
+        semaphore = asyncio.Semaphore(
+            max(1, app_settings.USERBOT_RECONCILE_USER_CONCURRENCY)
+        )
+
+        async def probe(owner_id: int, threads: list) -> dict[int, str]:
+            async with semaphore:
+                try:
+                    return await self._probe_user_threads(owner_id, threads)
+                except Exception as exc:
+                    logger.debug(
+                        "Follow-up reconcile probe failed for user {}: {}",
+                        owner_id,
+                        exc,
+                    )
+                    return {}
+
+        probes = await asyncio.gather(
+            *(probe(owner_id, threads) for owner_id, threads in threads_by_user.items())
+        )
+
+        reconciled = 0
+        now = datetime.now(timezone.utc)
+        for threads, states in zip(threads_by_user.values(), probes):
+            for thread in threads:
+                state = states.get(id(thread))
+                if state == "replied":
+                    cleanup_target = _notification_cleanup_target(thread)
+                    thread.status = "replied"
+                    thread.last_outgoing_at = now
+                    thread.response_deadline_at = None
                     _clear_notification_fields(thread)
                     if hasattr(thread, "updated_at"):
                         thread.updated_at = now
@@ -453,33 +525,86 @@ class UserBotThreadService:
                     await _cleanup_notification_target(
                         bot=bot,
                         cleanup_target=cleanup_target,
-                        reason="read_reconcile",
+                        reason="outgoing_reconcile",
                     )
                     reconciled += 1
+                    continue
 
+                if state == "read":
+                    cleanup_target = _notification_cleanup_target(thread)
+                    if cleanup_target.get(
+                        "notification_message_id"
+                    ) or cleanup_target.get("pending_key"):
+                        _clear_notification_fields(thread)
+                        if hasattr(thread, "updated_at"):
+                            thread.updated_at = now
+                        session.add(thread)
+                        await _cleanup_notification_target(
+                            bot=bot,
+                            cleanup_target=cleanup_target,
+                            reason="read_reconcile",
+                        )
+                        reconciled += 1
         return reconciled
 
-    async def _is_thread_message_read(
-        self, user_id: int, chat_id: int, message_id: int
-    ) -> bool:
-        """Check cached and live Telegram read state for this incoming message."""
-        try:
-            cached_max = await get_cached_read_marker(user_id, chat_id)
-            if cached_max is not None and cached_max >= message_id:
-                return True
-
-            from .userbot_manager import UserBotManager
-
-            client = UserBotManager.get_client(user_id)
-            if not client:
-                return False
-            read_max = await get_read_inbox_max_id(client, chat_id)
-            if read_max is not None:
-                await cache_read_marker(user_id, chat_id, read_max)
-                return read_max >= message_id
-        except Exception as exc:
-            logger.debug("Failed to check read status for follow-up: {}", exc)
-        return False
+    async def _probe_user_threads(self, user_id: int, threads: list) -> dict[int, str]:
+        """
+        Decide which of one user's open threads were answered ("replied") or
+        read ("read"), keyed by ``id(thread)``.
+
+        Redis markers for all chats are read in one pipelined round-trip and
+        live state comes from one GetPeerDialogsRequest covering every chat
+        that the cache could not settle. Messages are only scanned for chats
+        whose newest message is a newer incoming one.
+        """
+        chat_ids = list(
+            dict.fromkeys(_coerce_int(thread.chat_id) for thread in threads)
+        )
+        read_markers, outgoing_markers = await load_thread_markers(user_id, chat_ids)
+
+        states: dict[int, str] = {}
+        unresolved: list = []
+        for thread in threads:
+            chat_id = _coerce_int(thread.chat_id)
+            message_id = _coerce_int(thread.message_id)
+            if outgoing_marker_after(outgoing_markers.get(chat_id), message_id):
+                states[id(thread)] = "replied"
+            else:
+                unresolved.append(thread)
+        if not unresolved:
+            return states
+
+        from .userbot_manager import UserBotManager
+
+        client = UserBotManager.get_client(user_id)
+        dialog_states = {}
+        if client:
+            dialog_states = await get_peer_dialog_states(
+                client,
+                [_coerce_int(thread.chat_id) for thread in unresolved],
+            )
+            fresh_markers = {
+                chat_id: state.read_inbox_max_id
+                for chat_id, state in dialog_states.items()
+                if state.read_inbox_max_id is not None
+                and state.read_inbox_max_id > read_markers.get(chat_id, 0)
+            }
+            await cache_read_markers(user_id, fresh_markers)
+            read_markers.update(fresh_markers)
+
+        for thread in unresolved:
+            chat_id = _coerce_int(thread.chat_id)
+            message_id = _coerce_int(thread.message_id)
+            dialog = dialog_states.get(chat_id)
+            if dialog is not None and (dialog.top_message_id or 0) > message_id:
+                if dialog.top_message_out or await has_live_outgoing_after(
+                    client, chat_id, message_id
+                ):
+                    states[id(thread)] = "replied"
+                    continue
+            if read_markers.get(chat_id, 0) >= message_id:
+                states[id(thread)] = "read"
+        return states
 
     async def _has_thread_outgoing_after(
         self, user_id: int, chat_id: int, message_id: int
@@ -509,59 +634,186 @@ class UserBotThreadService:
         *,
         user_id: int | None = None,
     ) -> int:
-        await self.reconcile_open_threads(session, bot, user_id=user_id)
+        """
+        Reconcile open threads, then remind about due ones.
+
+        Due threads are read in keyset pages (bounded memory) with a commit after
+        every page; the run stops once USERBOT_FOLLOWUP_SWEEP_MAX_SECONDS is
+        spent and the next run picks up whatever is still due.
+        """
+        started = time.monotonic()
+        deadline = started + max(1, app_settings.USERBOT_FOLLOWUP_SWEEP_MAX_SECONDS)
+        page_size = max(1, app_settings.USERBOT_FOLLOWUP_SWEEP_PAGE_SIZE)
+        await self.reconcile_open_threads(
+            session, bot, user_id=user_id, deadline=deadline
+        )
+
+        limiter = asyncio.Semaphore(max(1, app_settings.USERBOT_FOLLOWUP_SEND_CONCURRENCY))
         sent = 0
-        for thread in await self.due_followups(session, user_id=user_id):
-            chat_id = _coerce_int(getattr(thread, "chat_id", None))
-            message_id = _coerce_int(getattr(thread, "message_id", None))
-            if chat_id is not None and message_id is not None:
-                if await self._has_thread_outgoing_after(
-                    thread.user_id,
-                    chat_id,
-                    message_id,
-                ):
-                    cleanup_target = _notification_cleanup_target(thread)
-                    now = datetime.now(timezone.utc)
-                    thread.status = "replied"
-                    thread.last_outgoing_at = now
-                    thread.response_deadline_at = None
-                    _clear_notification_fields(thread)
-                    if hasattr(thread, "updated_at"):
-                        thread.updated_at = now
-                    session.add(thread)
-                    await _cleanup_notification_target(
-                        bot=bot,
-                        cleanup_target=cleanup_target,
-                        reason="outgoing_before_followup",
-                    )
-                    continue
+        scanned = 0
+        pages = 0
+        cursor: tuple[int, datetime, int] | None = None
+        while time.monotonic() < deadline:
+            threads = await self.due_followups(
+                session, user_id=user_id, limit=page_size, after=cursor
+            )
+            if not threads:
+                break
+            pages += 1
+            scanned += len(threads)
+            last = threads[-1]
+            # Capture the cursor before processing mutates deadlines.
+            cursor = (last.importance, last.response_deadline_at, last.id)
+            sent += await self._deliver_followup_page(session, bot, threads, limiter)
+            await session.commit()
+            if len(threads) < page_size:
+                break
+
+        logger.info(
+            "Follow-up sweep: {} due row(s) scanned in {} page(s), {} reminder(s) sent in {:.1f}s",
+            scanned,
+            pages,
+            sent,
+            time.monotonic() - started,
+        )
+        return sent
 
-            if not await self._can_send_followup(session, thread.user_id):
+    async def _deliver_followup_page(
+        self,
+        session: AsyncSession,
+        bot: Bot,
+        threads: list,
+        limiter: asyncio.Semaphore,
+    ) -> int:
+        """
+        Remind about one page of due threads.
+
+        Users and settings are prefetched in two queries, threads are grouped per
+        user into a single reminder, and the per-user sends run concurrently
+        (``limiter`` bounds them; pacing is the shared delivery rate limit). ORM state is applied serially afterwards because the
+        session is not safe for concurrent use.
+        """
+        answered = await asyncio.gather(
+            *(self._thread_answered_elsewhere(thread) for thread in threads)
+        )
+        due: list = []
+        for thread, is_answered in zip(threads, answered):
+            if not is_answered:
+                due.append(thread)
                 continue
-            user = await session.get(User, thread.user_id)
+            cleanup_target = _notification_cleanup_target(thread)
+            now = datetime.now(timezone.utc)
+            thread.status = "replied"
+            thread.last_outgoing_at = now
+            thread.response_deadline_at = None
+            _clear_notification_fields(thread)
+            if hasattr(thread, "updated_at"):
+                thread.updated_at = now
+            session.add(thread)
+            await _cleanup_notification_target(
+                bot=bot,
+                cleanup_target=cleanup_target,
+                reason="outgoing_before_followup",
+            )
+        if not due:
+            return 0
+
+        user_ids = sorted({thread.user_id for thread in due})
+        users = {
+            user.id: user
+            for user in (
+                await session.execute(select(User).where(User.id.in_(user_ids)))
+            ).scalars().all()
+        }
+        settings_by_user = {
+            row.user_id: row
+            for row in (
+                await session.execute(
+                    select(UserSettings).where(UserSettings.user_id.in_(user_ids))
+                )
+            ).scalars().all()
+        }
+
+        batches: list[tuple[Any, Any, list]] = []
+        for owner_id in user_ids:
+            user = users.get(owner_id)
             if not user:
                 continue
-            user_settings = await self._get_user_settings(session, thread.user_id)
+            user_settings = settings_by_user.get(owner_id)
             if user_settings and self._is_break_mode_active(user_settings):
                 continue
             if user_settings and not getattr(
                 user_settings, "enable_userbot_followups", True
             ):
                 continue
+            allowance = await self._followup_allowance(owner_id, user_settings)
+            if allowance <= 0:
+                continue
+            owned = [thread for thread in due if thread.user_id == owner_id]
+            batches.append((user, user_settings, owned[:allowance]))
 
+        async def send(user, user_settings, owned):
+            async with limiter:
+                return await self._send_user_followups(bot, user, user_settings, owned)
+
+        results = await asyncio.gather(
+            *(send(user, user_settings, owned) for user, user_settings, owned in batches),
+            return_exceptions=True,
+        )
+
+        sent = 0
+        for (user, _user_settings, owned), result in zip(batches, results):
+            if isinstance(result, BaseException):
+                logger.error(
+                    "Follow-up reminder to user {} failed: {}", user.id, result
+                )
+                continue
+            sent_message, pending_keys = result
+            reminded_at = datetime.now(timezone.utc)
+            combined = len(owned) > 1
+            for thread in owned:
+                thread.reminded_at = reminded_at
+                thread.status = "reminded"
+                thread.notification_chat_id = user.tg_chat_id
+                # A combined reminder is shared; per-thread cleanup must not
+                # delete it, so only single-thread reminders track the message.
+                thread.notification_message_id = (
+                    None if combined else getattr(sent_message, "message_id", None)
+                )
+                thread.notification_sent_at = reminded_at
+                thread.pending_key = pending_keys.get(id(thread))
+                if hasattr(thread, "updated_at"):
+                    thread.updated_at = reminded_at
+                session.add(thread)
+            await self._increment_followup_counter(user.id, len(owned))
+            sent += len(owned)
+        return sent
+
+    async def _thread_answered_elsewhere(self, thread: Any) -> bool:
+        chat_id = _coerce_int(getattr(thread, "chat_id", None))
+        message_id = _coerce_int(getattr(thread, "message_id", None))
+        if chat_id is None or message_id is None:
+            return False
+        return await self._has_thread_outgoing_after(thread.user_id, chat_id, message_id)
+
+    async def _send_user_followups(
+        self,
+        bot: Bot,
+        user: User,
+        user_settings: UserSettings | None,
+        threads: list,
+    ) -> tuple[Any, dict[int, str]]:
+        """Send one reminder covering ``threads``; returns (message, pending keys)."""
+        approval = not user_settings or getattr(
+            user_settings, "enable_reply_approval", True
+        )
+        entries: list[tuple[Any, list[str], str | None]] = []
+        for thread in threads:
             suggestions = _as_list(thread.suggested_replies_json)[:3]
-            text = self._format_followup(thread, suggestions)
-            keyboard = None
             pending_key = None
-            if suggestions and (
-                not user_settings
-                or getattr(user_settings, "enable_reply_approval", True)
-            ):
+            if suggestions and approval:
                 try:
-                    from .userbot_monitor import (
-                        _build_approval_keyboard,
-                        _store_pending_reply,
-                    )
+                    from .userbot_monitor import _store_pending_reply
 
                     pending_key = await _store_pending_reply(
                         user_id=thread.user_id,
@@ -573,29 +825,37 @@ class UserBotThreadService:
                         suggestions=suggestions,
                         thread_id=getattr(thread, "id", None),
                     )
-                    keyboard = _build_approval_keyboard(pending_key, len(suggestions))
                 except Exception as exc:
-                    logger.debug("Could not attach userbot approval keyboard: {}", exc)
-
-            sent_message = await bot.send_message(
-                user.tg_chat_id,
-                text,
-                parse_mode="HTML",
-                reply_markup=keyboard,
-                **topic_kwargs_for_user(user),
-            )
-            thread.reminded_at = datetime.now(timezone.utc)
-            thread.status = "reminded"
-            thread.notification_chat_id = user.tg_chat_id
-            thread.notification_message_id = getattr(sent_message, "message_id", None)
-            thread.notification_sent_at = thread.reminded_at
-            thread.pending_key = pending_key
-            if hasattr(thread, "updated_at"):
-                thread.updated_at = thread.reminded_at
-            session.add(thread)
-            await self._increment_followup_counter(thread.user_id)
-            sent += 1
-        return sent
+                    logger.debug("Could not store userbot pending reply: {}", exc)
+            entries.append((thread, suggestions, pending_key))
+
+        keyboard = None
+        if len(entries) == 1:
+            thread, suggestions, pending_key = entries[0]
+            text = self._format_followup(thread, suggestions)
+            if pending_key:
+                from .userbot_monitor import _build_approval_keyboard
+
+                keyboard = _build_approval_keyboard(pending_key, len(suggestions))
+        else:
+            text = self._format_combined_followup(entries)
+            keyboard = _combined_followup_keyboard(entries)
+
+        sent_message = await telegram_delivery.send_message(
+            bot,
+            user.tg_chat_id,
+            text,
+            priority=telegram_delivery.Priority.REMINDER,
+            parse_mode="HTML",
+            reply_markup=keyboard,
+            **topic_kwargs_for_user(user),
+        )
+        pending_keys = {
+            id(thread): pending_key
+            for thread, _suggestions, pending_key in entries
+            if pending_key
+        }
+        return sent_message, pending_keys
 
     async def ingest_memory_if_needed(self, session: AsyncSession, thread: Any) -> bool:
         if not getattr(thread, "memory_worthy", False):
@@ -646,11 +906,17 @@ class UserBotThreadService:
             user_settings, "enable_userbot_followups", True
         ):
             return False
+        return await self._followup_allowance(user_id, user_settings) > 0
+
+    async def _followup_allowance(
+        self, user_id: int, user_settings: UserSettings | None
+    ) -> int:
+        """How many more follow-ups the user may receive today."""
         current = await self._get_followup_counter(user_id)
         max_per_day = getattr(user_settings, "userbot_followup_max_per_day", None)
         if max_per_day is None:
             max_per_day = app_settings.USERBOT_MAX_FOLLOWUPS_PER_DAY
-        return current < max_per_day
+        return max(0, max_per_day - current)
 
     @staticmethod
     def _is_break_mode_active(user_settings: UserSettings) -> bool:
@@ -671,13 +937,13 @@ class UserBotThreadService:
         finally:
             await redis.aclose()
 
-    async def _increment_followup_counter(self, user_id: int) -> None:
+    async def _increment_followup_counter(self, user_id: int, amount: int = 1) -> None:
         from redis.asyncio import Redis
 
         redis = Redis.from_url(app_settings.REDIS_URL)
         try:
             async with redis.pipeline(transaction=True) as pipe:
-                pipe.incr(_rate_key(user_id))
+                pipe.incrby(_rate_key(user_id), amount)
                 pipe.execute_command("EXPIRE", _rate_key(user_id), 90_000, "NX")
                 await pipe.execute()
         finally:
@@ -698,6 +964,25 @@ class UserBotThreadService:
             )
         return "\n".join(lines)
 
+    def _format_combined_followup(
+        self, entries: list[tuple[Any, list[str], str | None]]
+    ) -> str:
+        lines = [f"<b>Follow-up reminder: {len(entries)} conversations waiting</b>"]
+        for number, (thread, suggestions, _pending_key) in enumerate(entries, 1):
+            sender = html.escape(getattr(thread, "sender_name", None) or "Someone")
+            summary = html.escape(
+                getattr(thread, "message_summary", None)
+                or "They may be waiting for your reply."
+            )
+            lines.append("")
+            lines.append(f"<b>{number}. {sender}</b>")
+            lines.append(summary)
+            lines.extend(
+                f"  {number}.{idx} {html.escape(text)}"
+                for idx, text in enumerate(suggestions, 1)
+            )
+        return "\n".join(lines)
+
     def _parse_deadline(self, raw: Any) -> datetime:
         if isinstance(raw, datetime):
             return raw if raw.tzinfo else raw.replace(tzinfo=timezone.utc)
@@ -716,6 +1001,33 @@ class UserBotThreadService:
         )
 
 
+def _combined_followup_keyboard(
+    entries: list[tuple[Any, list[str], str | None]],
+) -> InlineKeyboardMarkup | None:
+    """One row per thread: its suggestion buttons plus edit and dismiss."""
+    rows: list[list[InlineKeyboardButton]] = []
+    for number, (_thread, suggestions, pending_key) in enumerate(entries, 1):
+        if not pending_key:
+            continue
+        row = [
+            InlineKeyboardButton(
+                text=f"✅ {number}.{idx + 1}",
+                callback_data=f"ub_send:{pending_key}:{idx}",
+            )
+            for idx in range(len(suggestions))
+        ]
+        row.append(
+            InlineKeyboardButton(text=f"✏️ {number}", callback_data=f"ub_edit:{pending_key}")
+        )
+        row.append(
+            InlineKeyboardButton(
+                text=f"🚫 {number}", callback_data=f"ub_dismiss:{pending_key}"
+            )
+        )
+        rows.append(row)
+    return InlineKeyboardMarkup(inline_keyboard=rows) if rows else None
+
+
 def _clean_json(raw: str) -> str:
     return re.sub(r"^```(?:json)?|```$", "", raw.strip(), flags=re.MULTILINE).strip()
 
@@ -0,0 +1,203 @@
+"""
+Bounded work scheduler for userbot LLM pipelines.
+
+Every fired DM/group reply batch and every channel post runs a pipeline of
+several LLM calls. Instead of starting them all at once, pipelines are queued
+here and started under two limits:
+
+* USERBOT_WORK_PER_USER_CONCURRENCY — one noisy account cannot occupy more
+  than a slot or two;
+* USERBOT_WORK_GLOBAL_CONCURRENCY — total LLM pipelines per process.
+
+Queued work is ordered DM → group → channel, then FIFO. Work submitted with a
+key (the reply batch key) replaces a still-queued item with the same key, so a
+newer batch for the same chat supersedes the stale one. When the queue is full
+the oldest lowest-priority item is dropped.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+from loguru import logger
+
+from ..config import settings as app_settings
+
+PRIORITIES = {"dm": 0, "group": 1, "channel": 2}
+
+
+@dataclass(order=True)
+class _WorkItem:
+    priority: int
+    seq: int
+    user_id: int = field(compare=False)
+    kind: str = field(compare=False)
+    key: str | None = field(compare=False)
+    factory: Callable[[], Awaitable[None]] = field(compare=False, repr=False)
+    enqueued_at: float = field(compare=False)
+    cancelled: bool = field(default=False, compare=False)
+
+
+class UserBotWorkScheduler:
+    """Priority queue with per-user and global concurrency limits."""
+
+    def __init__(self, *, per_user_limit: int, global_limit: int, max_queued: int) -> None:
+        self.per_user_limit = max(1, per_user_limit)
+        self.global_limit = max(1, global_limit)
+        self.max_queued = max(1, max_queued)
+        self._heap: list[_WorkItem] = []
+        self._by_key: dict[str, _WorkItem] = {}
+        self._running_per_user: Counter[int] = Counter()
+        self._running = 0
+        self._queued: Counter[str] = Counter()
+        self._seq = itertools.count()
+        self._tasks: set[asyncio.Task] = set()
+        self._counters: Counter[str] = Counter()
+        self._wait_avg: dict[str, float] = {}
+        self._wait_max: dict[str, float] = {}
+
+    # ------------------------------------------------------------------ #
+    # Public API                                                           #
+    # ------------------------------------------------------------------ #
+
+    def submit(
+        self,
+        user_id: int,
+        kind: str,
+        factory: Callable[[], Awaitable[None]],
+        *,
+        key: str | None = None,
+    ) -> bool:
+        """Queue a pipeline; returns False if it was dropped immediately."""
+        item = _WorkItem(
+            priority=PRIORITIES.get(kind, len(PRIORITIES)),
+            seq=next(self._seq),
+            user_id=user_id,
+            kind=kind,
+            key=key,
+            factory=factory,
+            enqueued_at=time.monotonic(),
+        )
+        self._counters["submitted"] += 1
+
+        if key is not None:
+            previous = self._by_key.pop(key, None)
+            if previous is not None and not previous.cancelled:
+                self._cancel(previous)
+                self._counters["dropped_stale"] += 1
+
+        if sum(self._queued.values()) >= self.max_queued:
+            victim = self._overflow_victim()
+            if victim is None or victim.priority < item.priority:
+                self._counters["dropped_overflow"] += 1
+                return False
+            self._cancel(victim)
+            self._counters["dropped_overflow"] += 1
+
+        heapq.heappush(self._heap, item)
+        self._queued[kind] += 1
+        if key is not None:
+            self._by_key[key] = item
+        self._dispatch()
+        return True
+
+    def snapshot(self) -> dict:
+        return {
+            "queued": dict(self._queued),
+            "running": self._running,
+            "users_running": len(self._running_per_user),
+            "wait_avg_seconds": {k: round(v, 2) for k, v in self._wait_avg.items()},
+            "wait_max_seconds": {k: round(v, 2) for k, v in self._wait_max.items()},
+            **dict(self._counters),
+        }
+
+    # ------------------------------------------------------------------ #
+    # Internals                                                            #
+    # ------------------------------------------------------------------ #
+
+    def _cancel(self, item: _WorkItem) -> None:
+        item.cancelled = True
+        self._queued[item.kind] -= 1
+        if self._queued[item.kind] <= 0:
+            del self._queued[item.kind]
+        if item.key is not None and self._by_key.get(item.key) is item:
+            del self._by_key[item.key]
+
+    def _overflow_victim(self) -> _WorkItem | None:
+        """Oldest item of the lowest priority currently queued."""
+        live = [item for item in self._heap if not item.cancelled]
+        if not live:
+            return None
+        worst = max(item.priority for item in live)
+        return min(
+            (item for item in live if item.priority == worst),
+            key=lambda item: item.seq,
+        )
+
+    def _dispatch(self) -> None:
+        blocked: list[_WorkItem] = []
+        while self._heap and self._running < self.global_limit:
+            item = heapq.heappop(self._heap)
+            if item.cancelled:
+                continue
+            if self._running_per_user[item.user_id] >= self.per_user_limit:
+                blocked.append(item)
+                continue
+            self._start(item)
+        for item in blocked:
+            heapq.heappush(self._heap, item)
+
+    def _start(self, item: _WorkItem) -> None:
+        self._queued[item.kind] -= 1
+        if self._queued[item.kind] <= 0:
+            del self._queued[item.kind]
+        if item.key is not None and self._by_key.get(item.key) is item:
+            del self._by_key[item.key]
+
+        waited = time.monotonic() - item.enqueued_at
+        previous = self._wait_avg.get(item.kind)
+        self._wait_avg[item.kind] = (
+            waited if previous is None else previous * 0.9 + waited * 0.1
+        )
+        self._wait_max[item.kind] = max(self._wait_max.get(item.kind, 0.0), waited)
+
+        self._running += 1
+        self._running_per_user[item.user_id] += 1
+        task = asyncio.create_task(self._run(item))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, item: _WorkItem) -> None:
+        try:
+            await item.factory()
+            self._counters["completed"] += 1
+        except Exception as exc:
+            self._counters["failed"] += 1
+            logger.error(
+                "Userbot {} pipeline failed (user {}): {}", item.kind, item.user_id, exc
+            )
+        finally:
+            self._running -= 1
+            self._running_per_user[item.user_id] -= 1
+            if self._running_per_user[item.user_id] <= 0:
+                del self._running_per_user[item.user_id]
+            self._dispatch()
+
+
+_scheduler: UserBotWorkScheduler | None = None
+
+
+def get_work_scheduler() -> UserBotWorkScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = UserBotWorkScheduler(
+            per_user_limit=app_settings.USERBOT_WORK_PER_USER_CONCURRENCY,
+            global_limit=app_settings.USERBOT_WORK_GLOBAL_CONCURRENCY,
+            max_queued=app_settings.USERBOT_WORK_QUEUE_MAX,
+        )
+    return _scheduler
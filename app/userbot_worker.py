@@ -0,0 +1,47 @@
+"""
+Dedicated userbot worker process.
+
+Run with ``python -m app.userbot_worker`` (any number of replicas) together with
+USERBOT_RUN_IN_APP=False on the web process. Each worker connects the shard of
+userbot accounts assigned to it — see ``app.services.userbot_sharding``.
+"""
+from __future__ import annotations
+
+import asyncio
+import signal
+from contextlib import suppress
+
+from loguru import logger
+
+from .bot.bot_provider import create_bot, set_bot_instance
+from .config import settings
+from .services.userbot_sharding import UserBotShardWorker
+
+
+async def main() -> None:
+    logger.remove()
+    logger.add(lambda msg: print(msg, end=""), level=settings.LOG_LEVEL)
+
+    if not settings.TELEGRAM_API_ID or not settings.TELEGRAM_API_HASH:
+        logger.warning("TELEGRAM_API_ID / TELEGRAM_API_HASH not configured — userbot disabled")
+        return
+
+    bot = create_bot()
+    set_bot_instance(bot)
+    worker = UserBotShardWorker(bot)
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with suppress(NotImplementedError):
+            loop.add_signal_handler(sig, worker.stop)
+
+    try:
+        await worker.run()
+    finally:
+        set_bot_instance(None)
+        with suppress(Exception):
+            await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
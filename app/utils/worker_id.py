@@ -0,0 +1,9 @@
+from __future__ import annotations
+
+import os
+import socket
+
+
+def default_worker_id() -> str:
+    """Identify this process in Redis leases and shard ownership: ``host:pid``."""
+    return f"{socket.gethostname()}:{os.getpid()}"
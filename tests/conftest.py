@@ -1,7 +1,16 @@
 import os
 import sys
 
+import fakeredis
+import pytest
+
 # Добавляем корень репозитория в sys.path, чтобы импортировать пакет app
 ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
 if ROOT_DIR not in sys.path:
     sys.path.insert(0, ROOT_DIR)
+
+
+@pytest.fixture
+def redis():
+    """In-memory Redis with a Lua runtime, so services run their real scripts."""
+    return fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer(), decode_responses=True)
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import app.services.broadcast_service as bs
+
+
+def _install(monkeypatch, redis, user_ids, fail_chats=(), defer_chats=()):
+    sent: list[int] = []
+    deferred = set(defer_chats)
+
+    async def get_redis():
+        return redis
+
+    async def fake_stream(after_id):
+        remaining = [(uid, uid * 10) for uid in user_ids if uid > after_id]
+        for start in range(0, len(remaining), 2):
+            yield remaining[start:start + 2]
+
+    async def fake_send(bot, chat_id, text, *, priority, slot_timeout=None):
+        assert priority is bs.telegram_delivery.Priority.BROADCAST
+        assert slot_timeout == bs.app_settings.BROADCAST_SEND_TIMEOUT_SECONDS
+        if chat_id in deferred:
+            deferred.discard(chat_id)
+            raise bs.telegram_delivery.DeliveryDeferred("no slot")
+        if chat_id in fail_chats:
+            raise RuntimeError("blocked")
+        sent.append(chat_id)
+
+    monkeypatch.setattr(bs, "_get_redis", get_redis)
+    monkeypatch.setattr(bs, "_stream_recipients", fake_stream)
+    monkeypatch.setattr(bs.telegram_delivery, "send_message", fake_send)
+    monkeypatch.setattr(bs.app_settings, "BROADCAST_PROGRESS_SECONDS", 0)
+    return sent
+
+
+async def _start(redis, **overrides):
+    await redis.hset(
+        bs.state_key("b1"),
+        mapping={
+            "text": "hello",
+            "admin_chat_id": 1,
+            "status_message_id": 77,
+            "total": 5,
+            "cursor": 0,
+            "sent": 0,
+            "failed": 0,
+            "status": "running",
+            **overrides,
+        },
+    )
+    await redis.sadd(bs.ACTIVE_KEY, "b1")
+
+
+def test_broadcast_checkpoints_chunks_and_reports_progress(monkeypatch, redis):
+    sent = _install(monkeypatch, redis, [1, 2, 3, 4, 5], fail_chats={30})
+    bot = SimpleNamespace(edit_message_text=AsyncMock())
+    supervisor = bs.BroadcastSupervisor(bot, owner="w1")
+
+    async def run():
+        await _start(redis)
+        assert await supervisor.tick(redis) == 1
+        await asyncio.gather(*supervisor._runs.values())
+        assert await redis.smembers(bs.ACTIVE_KEY) == set()
+        assert not await redis.exists(bs.owner_key("b1"))
+        return await redis.hgetall(bs.state_key("b1"))
+
+    state = asyncio.run(run())
+    assert sent == [10, 20, 40, 50]
+    assert (state["cursor"], state["sent"], state["failed"], state["status"]) == ("5", "4", "1", "done")
+    edits = [call.args[0] for call in bot.edit_message_text.await_args_list]
+    assert "осталось: 3" in edits[0]
+    assert "завершена" in edits[-1]
+    assert bot.edit_message_text.await_args.kwargs == {"chat_id": 1, "message_id": 77}
+
+
+def test_broadcast_resumes_from_checkpoint_only_when_lease_is_free(monkeypatch, redis):
+    sent = _install(monkeypatch, redis, [1, 2, 3, 4, 5])
+    bot = SimpleNamespace(edit_message_text=AsyncMock())
+    supervisor = bs.BroadcastSupervisor(bot, owner="w2")
+
+    async def run():
+        await _start(redis, cursor=2, sent=2)
+        await redis.set(bs.owner_key("b1"), "w-dead", ex=60)
+        # The previous runner's lease has not expired yet.
+        assert await supervisor.tick(redis) == 0
+        await redis.delete(bs.owner_key("b1"))
+        assert await supervisor.tick(redis) == 1
+        await asyncio.gather(*supervisor._runs.values())
+        return await redis.hget(bs.state_key("b1"), "sent")
+
+    assert asyncio.run(run()) == "5"
+    assert sent == [30, 40, 50]
+
+
+def test_deferred_sends_are_retried_within_their_chunk(monkeypatch, redis):
+    sent = _install(monkeypatch, redis, [1, 2, 3], defer_chats={10})
+    bot = SimpleNamespace(edit_message_text=AsyncMock())
+    supervisor = bs.BroadcastSupervisor(bot, owner="w1")
+
+    async def run():
+        await _start(redis, total=3)
+        assert await supervisor.tick(redis) == 1
+        await asyncio.gather(*supervisor._runs.values())
+        return await redis.hgetall(bs.state_key("b1"))
+
+    state = asyncio.run(run())
+    assert sent == [20, 10, 30]
+    assert (state["sent"], state["failed"], state["status"]) == ("3", "0", "done")
+
+
+def test_heartbeat_cancels_a_stalled_run_once_the_lease_is_lost(monkeypatch, redis):
+    _install(monkeypatch, redis, [1, 2, 3])
+    monkeypatch.setattr(bs.app_settings, "BROADCAST_LEASE_SECONDS", 1)
+    stalled = asyncio.Event()
+
+    async def stalled_send(bot, chat_id, text, *, priority, slot_timeout=None):
+        # Another runner took over while this chunk was stuck.
+        await redis.set(bs.owner_key("b1"), "w2")
+        stalled.set()
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(bs.telegram_delivery, "send_message", stalled_send)
+    bot = SimpleNamespace(edit_message_text=AsyncMock())
+    supervisor = bs.BroadcastSupervisor(bot, owner="w1")
+
+    async def run():
+        await _start(redis, total=3)
+        assert await supervisor.tick(redis) == 1
+        task = supervisor._runs["b1"]
+        await asyncio.wait_for(asyncio.wait([task]), timeout=5)
+        assert task.cancelled()
+        assert await redis.get(bs.owner_key("b1")) == "w2"
+        return await redis.hgetall(bs.state_key("b1"))
+
+    state = asyncio.run(run())
+    assert stalled.is_set()
+    assert (state["cursor"], state["status"]) == ("0", "running")
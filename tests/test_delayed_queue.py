@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timezone
+
+import app.scheduler.delayed_queue as dq
+
+
+def _install(monkeypatch, redis):
+    async def get_redis():
+        return redis
+
+    monkeypatch.setattr(dq, "_get_redis", get_redis)
+
+
+def test_enqueue_is_idempotent_and_indexed_per_user(monkeypatch, redis):
+    _install(monkeypatch, redis)
+    due = datetime(2026, 10, 20, 9, 0, tzinfo=timezone.utc)
+
+    async def run():
+        assert await dq.enqueue("reminder", 7, "reminder_7_a", due, {"chat_id": 1, "message_text": "hi"})
+        assert not await dq.enqueue("reminder", 7, "reminder_7_a", due, {"chat_id": 1, "message_text": "hi"})
+        await dq.enqueue("reminder", 8, "reminder_8_b", due, {"chat_id": 2, "message_text": "yo"})
+        return await dq.list_user_jobs(7, "reminder"), await redis.zrange(dq.DUE_KEY, 0, -1)
+
+    jobs, due_ids = asyncio.run(run())
+    assert [job["job_id"] for job in jobs] == ["reminder_7_a"]
+    assert jobs[0]["due_at"] == due
+    assert jobs[0]["args"]["message_text"] == "hi"
+    assert set(due_ids) == {"reminder_7_a", "reminder_8_b"}
+
+
+def test_claim_runs_due_jobs_acks_and_redelivers_failures(monkeypatch, redis):
+    _install(monkeypatch, redis)
+    monkeypatch.setattr(dq.app_settings, "DELAYED_QUEUE_LEASE_SECONDS", 60)
+    ran: list[tuple[str, int]] = []
+    fail = {"reminder_1_x"}
+
+    async def fake_run_job(kind, user_id, args):
+        ran.append((args["message_text"], user_id))
+        if args["message_text"] in fail:
+            raise RuntimeError("boom")
+
+    monkeypatch.setattr(dq, "_run_job", fake_run_job)
+    due = datetime.fromtimestamp(1_000, tz=timezone.utc)
+    later = datetime.fromtimestamp(5_000, tz=timezone.utc)
+
+    async def run():
+        await dq.enqueue("reminder", 1, "reminder_1_ok", due, {"message_text": "ok"})
+        await dq.enqueue("reminder", 1, "reminder_1_x", due, {"message_text": "reminder_1_x"})
+        await dq.enqueue("reminder", 1, "reminder_1_late", later, {"message_text": "late"})
+
+        poller = dq.DelayedJobPoller()
+        assert await poller.tick(redis, now=1_010) == 2
+        await asyncio.gather(*poller._tasks)
+
+        # The failed job stays leased; nothing is due until the lease expires.
+        assert await poller.tick(redis, now=1_020) == 0
+        fail.clear()
+        assert await poller.tick(redis, now=1_071) == 1
+        await asyncio.gather(*poller._tasks)
+
+        # Acked jobs cannot be enqueued again while the done marker lives.
+        assert not await dq.enqueue("reminder", 1, "reminder_1_ok", due, {"message_text": "ok"})
+        return await dq.list_user_jobs(1, "reminder"), await redis.zcard(dq.PROCESSING_KEY)
+
+    remaining, processing = asyncio.run(run())
+    assert sorted(ran) == [("ok", 1), ("reminder_1_x", 1), ("reminder_1_x", 1)]
+    assert [job["job_id"] for job in remaining] == ["reminder_1_late"]
+    assert processing == 0
+
+
+def test_concurrent_pollers_claim_each_job_once(monkeypatch, redis):
+    _install(monkeypatch, redis)
+    ran: list[str] = []
+
+    async def fake_run_job(kind, user_id, args):
+        ran.append(args["message_text"])
+
+    monkeypatch.setattr(dq, "_run_job", fake_run_job)
+    due = datetime.fromtimestamp(1_000, tz=timezone.utc)
+
+    async def run():
+        for index in range(10):
+            await dq.enqueue("reminder", 1, f"reminder_1_{index}", due, {"message_text": str(index)})
+        pollers = [dq.DelayedJobPoller() for _ in range(3)]
+        claimed = await asyncio.gather(*(poller.tick(redis, now=1_010) for poller in pollers))
+        await asyncio.gather(*(task for poller in pollers for task in poller._tasks))
+        return sum(claimed)
+
+    assert asyncio.run(run()) == 10
+    assert sorted(ran, key=int) == [str(index) for index in range(10)]
+
+
+def test_cancel_user_jobs_only_touches_that_user(monkeypatch, redis):
+    _install(monkeypatch, redis)
+    due = datetime(2026, 10, 20, 9, 0, tzinfo=timezone.utc)
+
+    async def run():
+        for job_id, user_id in (("proactive_touch_3_a", 3), ("proactive_touch_3_b", 3), ("proactive_touch_4_a", 4)):
+            await dq.enqueue("proactive_touch", user_id, job_id, due, {"touch_type": "check_in"})
+        assert not await dq.cancel_job(4, "proactive_touch", "proactive_touch_3_a")
+        assert await dq.cancel_user_jobs(3, "proactive_touch") == 2
+        assert await redis.zrange(dq.DUE_KEY, 0, -1) == ["proactive_touch_4_a"]
+        assert not await redis.exists(dq.job_key("proactive_touch_3_a"))
+
+    asyncio.run(run())
+
+
+def test_debounce_jobs_moves_only_on_large_shift(monkeypatch, redis):
+    _install(monkeypatch, redis)
+    base = datetime.fromtimestamp(10_000, tz=timezone.utc)
+
+    def at(offset):
+        return datetime.fromtimestamp(10_000 + offset, tz=timezone.utc)
+
+    async def run():
+        first = await dq.debounce_jobs(
+            "planner_refresh",
+            [(1, "proactive_planner_refresh_1", base, {}), (2, "proactive_planner_refresh_2", base, {})],
+            300,
+        )
+        small = await dq.debounce_jobs(
+            "planner_refresh", [(1, "proactive_planner_refresh_1", at(120), {})], 300
+        )
+        large = await dq.debounce_jobs(
+            "planner_refresh", [(1, "proactive_planner_refresh_1", at(600), {})], 300
+        )
+        due = await redis.zrange(dq.DUE_KEY, 0, -1, withscores=True)
+        index = await redis.zrange(dq.user_index_key(1, "planner_refresh"), 0, -1, withscores=True)
+        return (first, small, large), dict(due), dict(index)
+
+    written, due, index = asyncio.run(run())
+    assert written == (2, 0, 1)
+    assert due == {
+        "proactive_planner_refresh_1": 10_600.0,
+        "proactive_planner_refresh_2": 10_000.0,
+    }
+    assert index == {"proactive_planner_refresh_1": 10_600.0}
@@ -1,4 +1,4 @@
-from datetime import datetime, time, timezone
+from datetime import datetime, time, timedelta, timezone
 import asyncio
 from unittest.mock import AsyncMock, MagicMock
 
@@ -6,13 +6,16 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from pytz import utc
 
 from app.scheduler.job_manager import JobManager
+from app.scheduler.planner_fanout import planner_jitter_seconds
 
 
-def test_schedule_user_jobs_registers_cron_jobs(monkeypatch):
+def test_schedule_user_jobs_sets_next_fire_columns_instead_of_cron_jobs(monkeypatch):
     # Prepare test scheduler and monkeypatch global scheduler to avoid side effects
     test_scheduler = AsyncIOScheduler(timezone=utc)
     import app.scheduler.job_manager as jm
     monkeypatch.setattr(jm, 'scheduler', test_scheduler)
+    monkeypatch.setattr(jm, 'cancel_user_jobs', AsyncMock(return_value=0))
+    test_scheduler.add_job(print, 'cron', hour=8, id='proactive_planner_999')
 
     # create simple test user and settings (avoid SQLModel instantiation complexities)
     class SimpleUser:
@@ -20,7 +23,7 @@ def test_schedule_user_jobs_registers_cron_jobs(monkeypatch):
             self.id = 999
             self.tg_user_id = 999
             self.tg_chat_id = 999
-            self.user_timezone = 'UTC'
+            self.user_timezone = 'Europe/Moscow'
             self.wake_time = time(hour=8, minute=30)
             self.bed_time = time(hour=23, minute=0)
 
@@ -30,26 +33,29 @@ def test_schedule_user_jobs_registers_cron_jobs(monkeypatch):
             self.enable_smart_proactivity = True
             self.enable_news_digest = False
             self.enable_channel_monitoring = False
+            self.planner_next_fire_utc = None
+            self.news_digest_next_fire_utc = None
 
     user = SimpleUser()
     settings = SimpleSettings()
-
-    JobManager.schedule_user_jobs(user, settings)
-
-    planner_job = test_scheduler.get_job('proactive_planner_999')
-    assert planner_job is not None
-    assert planner_job.trigger is not None
-    # Planner runs at wake time, but the planner LLM decides whether to send anything.
-    now = datetime.now(timezone.utc)
-    next_run = planner_job.trigger.get_next_fire_time(previous_fire_time=None, now=now)
-    # ensure next_run is not None and has correct hour/minute in user's local timezone
-    assert next_run is not None
-    assert next_run.hour == 8 and next_run.minute == 30
-
-    assert test_scheduler.get_job('morning_999') is None
-    assert test_scheduler.get_job('evening_999') is None
-    assert test_scheduler.get_job('weekly_999') is None
-    assert test_scheduler.get_job('monthly_999') is None
+    empty = MagicMock()
+    empty.scalars.return_value.all.return_value = []
+    session = MagicMock()
+    session.execute = AsyncMock(return_value=empty)
+    session.commit = AsyncMock()
+
+    asyncio.run(JobManager.schedule_user_jobs(session, user, settings))
+
+    # Planner runs at local wake time (08:30 Moscow = 05:30 UTC) plus the
+    # user's fixed spread offset, via the dispatcher.
+    planner_at = settings.planner_next_fire_utc
+    assert planner_at is not None and planner_at.tzinfo is not None
+    wake_at = planner_at - timedelta(seconds=planner_jitter_seconds(999))
+    assert (wake_at.hour, wake_at.minute, wake_at.second) == (5, 30, 0)
+    assert planner_at > datetime.now(timezone.utc)
+    assert settings.news_digest_next_fire_utc is None
+    session.commit.assert_awaited_once()
+    assert test_scheduler.get_jobs() == []
 
     # cleanup
     if test_scheduler.running:
@@ -76,3 +82,137 @@ def test_proactive_touch_job_calls_generic_flow_when_not_in_break_mode(monkeypat
 
     flows_mock._run_flow.assert_awaited_once()
     fake_session.commit.assert_awaited()
+
+
+class _SetRedis:
+    def __init__(self):
+        self.sets: dict[str, set[str]] = {}
+
+    def sadd(self, key, *members):
+        self.sets.setdefault(key, set()).update(members)
+
+    def srem(self, key, *members):
+        self.sets.get(key, set()).difference_update(members)
+
+    def smembers(self, key):
+        return set(self.sets.get(key, set()))
+
+    def delete(self, key):
+        self.sets.pop(key, None)
+
+    def scan_iter(self, match=None, count=None):
+        return list(self.sets)
+
+    def pipeline(self, transaction=False):
+        redis = self
+
+        class _Pipe:
+            def __init__(self):
+                self.calls = []
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def __getattr__(self, name):
+                return lambda *args: self.calls.append((name, args))
+
+            def execute(self):
+                return [getattr(redis, name)(*args) for name, args in self.calls]
+
+        return _Pipe()
+
+
+def test_job_registry_indexes_user_jobs_and_repairs_drift(monkeypatch):
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from apscheduler.triggers.date import DateTrigger
+
+    from app.scheduler import job_registry
+
+    redis = _SetRedis()
+    monkeypatch.setattr(job_registry, "_get_redis", lambda: redis)
+    test_scheduler = BackgroundScheduler(timezone=utc)
+    job_registry.register_job_listener(test_scheduler)
+    test_scheduler.start(paused=True)
+    try:
+        run_at = DateTrigger(run_date=datetime(2099, 1, 1, tzinfo=timezone.utc))
+        for job_id in ("reminder_5_a", "reminder_5_b", "reminder_51_a",
+                       "proactive_planner_refresh_5", "habit_reminder_5"):
+            test_scheduler.add_job(print, trigger=run_at, id=job_id)
+
+        assert job_registry.parse_job_id("proactive_planner_refresh_5") == (
+            "proactive_planner_refresh", 5,
+        )
+        assert job_registry.parse_job_id("habit_reminder_5") is None
+        assert redis.sets["sched_user_jobs:5"] == {
+            "reminder_5_a", "reminder_5_b", "proactive_planner_refresh_5",
+        }
+
+        removed = job_registry.remove_user_jobs_by_prefix(test_scheduler, 5, "reminder")
+        assert sorted(removed) == ["reminder_5_a", "reminder_5_b"]
+        assert test_scheduler.get_job("reminder_51_a") is not None
+        assert redis.sets["sched_user_jobs:5"] == {"proactive_planner_refresh_5"}
+
+        # Drift: a stale id and a missing one are both fixed by one full scan.
+        redis.sets["sched_user_jobs:5"].add("reminder_5_gone")
+        redis.sets["sched_user_jobs:51"].clear()
+        counts = job_registry.reconcile_job_registry(test_scheduler)
+        assert counts == {"users": 2, "repaired": 2}
+        assert redis.sets["sched_user_jobs:51"] == {"reminder_51_a"}
+        assert job_registry.get_user_jobs(test_scheduler, 5, "reminder") == []
+    finally:
+        test_scheduler.shutdown(wait=False)
+
+
+def test_schedule_global_jobs_leaves_identical_jobs_untouched(monkeypatch):
+    test_scheduler = AsyncIOScheduler(timezone=utc)
+    import app.scheduler.job_manager as jm
+    monkeypatch.setattr(jm, "scheduler", test_scheduler)
+
+    first = JobManager.schedule_global_jobs()
+    assert first == {"written": 5, "unchanged": 0}
+
+    existing = {job.id: job for job in test_scheduler.get_jobs()}
+    assert JobManager.schedule_global_jobs(existing=existing) == {"written": 0, "unchanged": 5}
+
+    monkeypatch.setattr(jm.app_settings, "USERBOT_CHANNEL_SWEEP_INTERVAL_MINUTES", 7)
+    assert JobManager.schedule_global_jobs(existing=existing) == {"written": 1, "unchanged": 4}
+
+
+def test_memory_decay_warning_job_prefetches_and_queues_one_batch(monkeypatch):
+    from datetime import timedelta
+    from types import SimpleNamespace
+
+    import app.scheduler.jobs as jobs
+
+    def user(user_id):
+        return SimpleNamespace(id=user_id, tg_chat_id=user_id * 10, telegram_topic_id=None)
+
+    paused = SimpleNamespace(
+        break_mode_active=True,
+        break_mode_until=datetime.now(timezone.utc) + timedelta(days=1),
+    )
+    expired = SimpleNamespace(
+        break_mode_active=True,
+        break_mode_until=datetime.now(timezone.utc) - timedelta(days=1),
+    )
+    ids_result = MagicMock()
+    ids_result.scalars.return_value.all.return_value = [3, 1, 2]
+    rows_result = MagicMock()
+    rows_result.all.return_value = [(user(1), None), (user(2), paused), (user(3), expired)]
+    session = MagicMock()
+    session.execute = AsyncMock(side_effect=[ids_result, rows_result])
+    session.close = AsyncMock()
+
+    deliver_many = AsyncMock(side_effect=lambda messages: [str(i) for i, _ in enumerate(messages)])
+    monkeypatch.setattr(jobs, "AsyncSessionLocal", lambda: session)
+    monkeypatch.setattr(jobs, "deliver_many", deliver_many)
+    monkeypatch.setattr(jobs.settings, "FEATURE_FLAGS_JSON", '{"F028_MEMORY_DECAY_WARNING": true}')
+
+    asyncio.run(jobs.memory_decay_warning_job())
+
+    assert session.execute.await_count == 2
+    deliver_many.assert_awaited_once()
+    assert sorted(chat_id for chat_id, _, _ in deliver_many.await_args.args[0]) == [10, 30]
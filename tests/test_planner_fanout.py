@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import date, datetime, time, timedelta, timezone
+from types import SimpleNamespace
+
+import app.scheduler.planner_fanout as planner_fanout
+from app.scheduler.planner_fanout import PlannerFanout, activity_priority, planner_jitter_seconds
+from app.scheduler.recurring_dispatcher import planner_next_fire
+
+
+def test_jitter_is_stable_spread_and_keeps_todays_slot(monkeypatch):
+    monkeypatch.setattr(planner_fanout.app_settings, "PLANNER_SPREAD_WINDOW_SECONDS", 1800)
+    offsets = [planner_jitter_seconds(user_id) for user_id in range(1, 201)]
+    assert offsets == [planner_jitter_seconds(user_id) for user_id in range(1, 201)]
+    assert all(0 <= offset < 1800 for offset in offsets)
+    # Users sharing a wake time land in every 5-minute slice of the window.
+    assert {offset // 300 for offset in offsets} == set(range(6))
+
+    user_id = next(uid for uid, offset in enumerate(offsets, 1) if offset > 600)
+    user = SimpleNamespace(id=user_id, user_timezone="UTC", wake_time=time(7, 0))
+    user_settings = SimpleNamespace(enable_smart_proactivity=True)
+    # Settings saved at 07:05, before this user's jittered run: today's run stays.
+    fire = planner_next_fire(user, user_settings, datetime(2026, 3, 10, 7, 5, tzinfo=timezone.utc))
+    assert fire == datetime(2026, 3, 10, 7, 0, tzinfo=timezone.utc) + timedelta(
+        seconds=planner_jitter_seconds(user_id)
+    )
+
+
+def test_fanout_caps_concurrency_prefers_recent_users_and_coalesces(monkeypatch):
+    monkeypatch.setattr(planner_fanout.app_settings, "PLANNER_MAX_CONCURRENCY", 2)
+    running = 0
+    peak = 0
+    order: list[int] = []
+
+    async def runner(user_id):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        order.append(user_id)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    async def run():
+        fanout = PlannerFanout(runner=runner)
+        today = date(2026, 3, 10)
+        futures = [
+            fanout.submit(1, activity_priority(None, today)),
+            fanout.submit(2, activity_priority(date(2026, 3, 1), today)),
+            fanout.submit(3, activity_priority(date(2026, 3, 10), today)),
+            fanout.submit(4, activity_priority(date(2026, 3, 9), today)),
+        ]
+        assert fanout.submit(3, 0) is futures[2]
+        await asyncio.gather(*futures)
+
+    asyncio.run(run())
+    assert peak == 2
+    assert order == [3, 4, 2, 1]
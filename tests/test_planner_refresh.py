@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import asyncio
+
+import app.scheduler.planner_refresh as planner_refresh
+from app.scheduler.planner_refresh import PlannerRefreshDebouncer
+
+
+def test_requests_are_debounced_in_memory_and_flushed_in_one_batch(monkeypatch):
+    monkeypatch.setattr(planner_refresh.app_settings, "PLANNER_REFRESH_MIN_SHIFT_SECONDS", 300)
+    monkeypatch.setattr(planner_refresh.app_settings, "PLANNER_REFRESH_FLUSH_SECONDS", 0)
+    calls = []
+
+    async def fake_debounce_jobs(kind, jobs, min_shift):
+        calls.append((kind, [(user_id, job_id, due.timestamp()) for user_id, job_id, due, _ in jobs]))
+        return len(jobs)
+
+    monkeypatch.setattr(planner_refresh, "debounce_jobs", fake_debounce_jobs)
+    debouncer = PlannerRefreshDebouncer()
+
+    async def run():
+        accepted = [
+            debouncer.request(1, 900, now=1_000),
+            debouncer.request(1, 900, now=1_060),  # moves the due time by 60s only
+            debouncer.request(2, 900, now=1_060),
+        ]
+        await debouncer._flush_task
+        # Written recently: still suppressed; far enough later: accepted again.
+        accepted.append(debouncer.request(1, 900, now=1_200))
+        accepted.append(debouncer.request(1, 900, now=1_400))
+        await debouncer._flush_task
+        return accepted
+
+    assert asyncio.run(run()) == [True, False, True, False, True]
+    assert calls == [
+        (
+            "planner_refresh",
+            [(1, "proactive_planner_refresh_1", 1_900.0), (2, "proactive_planner_refresh_2", 1_960.0)],
+        ),
+        ("planner_refresh", [(1, "proactive_planner_refresh_1", 2_300.0)]),
+    ]
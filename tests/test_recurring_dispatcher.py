@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, time, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from app.models.core_memory import CoreMemory  # noqa: F401
+from app.models.episode import Episode, EpisodeEmbedding  # noqa: F401
+from app.models.habit import Habit, HabitLog  # noqa: F401
+from app.models.oauth_token import OAuthToken  # noqa: F401
+from app.models.payment import Payment  # noqa: F401
+from app.models.plan import Plan  # noqa: F401
+from app.models.profile_completeness import ProfileCompleteness  # noqa: F401
+from app.models.working_memory import WorkingMemory  # noqa: F401
+from app.scheduler import jobs, recurring_dispatcher
+from app.scheduler.recurring_dispatcher import (
+    dispatch_due_recurring,
+    next_cron_fire,
+    reconcile_recurring_schedules,
+)
+
+
+def test_next_cron_fire_follows_local_time_across_dst_and_weekdays():
+    # Berlin switches to CEST on 2026-03-29: 09:00 local is 08:00 UTC before, 07:00 after.
+    before = next_cron_fire("Europe/Berlin", 9, 0, datetime(2026, 3, 28, 8, 0, tzinfo=timezone.utc))
+    after = next_cron_fire("Europe/Berlin", 9, 0, before)
+    assert before == datetime(2026, 3, 29, 7, 0, tzinfo=timezone.utc)
+    assert after == datetime(2026, 3, 30, 7, 0, tzinfo=timezone.utc)
+
+    # 2026-03-28 is a Saturday; the next Mon/Wed slot is Monday.
+    weekly = next_cron_fire(
+        "UTC", 18, 30, datetime(2026, 3, 28, 12, 0, tzinfo=timezone.utc), day_of_week="mon,wed"
+    )
+    assert weekly == datetime(2026, 3, 30, 18, 30, tzinfo=timezone.utc)
+    assert next_cron_fire(None, 9, 0, before) is None
+    assert next_cron_fire("Not/AZone", 9, 0, before) is None
+
+
+class _Result:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+class _Session:
+    def __init__(self, habit_rows):
+        self.habit_rows = habit_rows
+        self.added = []
+        self.commits = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement):
+        entity = statement.column_descriptions[0]["entity"]
+        rows, self.habit_rows = (self.habit_rows, []) if entity is Habit else ([], self.habit_rows)
+        return _Result(rows)
+
+    def add(self, item):
+        self.added.append(item)
+
+    async def commit(self):
+        self.commits += 1
+
+
+def test_dispatch_advances_due_rows_and_skips_stale_ones(monkeypatch):
+    now = datetime(2026, 3, 10, 6, 0, 20, tzinfo=timezone.utc)
+    user = SimpleNamespace(id=7, user_timezone="UTC")
+    due = SimpleNamespace(
+        id=1, active=True, reminder_enabled=True, reminder_time=time(6, 0),
+        next_fire_utc=datetime(2026, 3, 10, 6, 0, tzinfo=timezone.utc),
+    )
+    stale = SimpleNamespace(
+        id=2, active=True, reminder_enabled=True, reminder_time=time(5, 0),
+        next_fire_utc=now - timedelta(hours=1),
+    )
+    session = _Session([(due, user), (stale, user)])
+    monkeypatch.setattr("app.db.AsyncSessionLocal", lambda: session)
+    sent = AsyncMock()
+    monkeypatch.setattr(jobs, "habit_reminder_job", sent)
+    monkeypatch.setattr(recurring_dispatcher, "_semaphore", None)
+
+    async def scenario():
+        counts = await dispatch_due_recurring(now=now)
+        await asyncio.gather(*recurring_dispatcher._inflight)
+        return counts
+
+    counts = asyncio.run(scenario())
+
+    assert counts == {"habit_reminder": 1, "missed": 1}
+    sent.assert_awaited_once_with(1)
+    assert due.next_fire_utc == datetime(2026, 3, 11, 6, 0, tzinfo=timezone.utc)
+    assert stale.next_fire_utc == datetime(2026, 3, 11, 5, 0, tzinfo=timezone.utc)
+    assert session.commits == 4
+
+
+class _StreamResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    async def partitions(self):
+        yield self._rows
+
+
+class _ReconcileSession:
+    def __init__(self, rows_by_entity):
+        self.rows_by_entity = rows_by_entity
+        self.updates = []
+
+    async def stream(self, statement):
+        entity = statement.column_descriptions[0]["entity"]
+        return _StreamResult(self.rows_by_entity.get(entity, []))
+
+    async def execute(self, statement, params):
+        self.updates.append((statement.table.name, params))
+
+
+def test_reconcile_writes_only_rows_whose_schedule_changed():
+    now = datetime(2026, 3, 10, 12, 0, tzinfo=timezone.utc)
+    tomorrow_nine = datetime(2026, 3, 11, 9, 0, tzinfo=timezone.utc)
+    user = SimpleNamespace(id=7, user_timezone="UTC")
+
+    def habit(habit_id, next_fire, active=True):
+        return SimpleNamespace(
+            id=habit_id, active=active, reminder_enabled=True,
+            reminder_time=time(9, 0), next_fire_utc=next_fire,
+        )
+
+    unchanged = habit(1, tomorrow_nine)
+    missing = habit(2, None)
+    archived = habit(3, tomorrow_nine, active=False)
+    drifted = habit(4, tomorrow_nine + timedelta(hours=1))
+    due = habit(5, now - timedelta(seconds=30))
+    session = _ReconcileSession(
+        {Habit: [(h, user) for h in (unchanged, missing, archived, drifted, due)]}
+    )
+
+    counts = asyncio.run(reconcile_recurring_schedules(session, now=now))
+
+    assert counts == {"added": 1, "removed": 1, "moved": 1, "unchanged": 2}
+    assert session.updates == [
+        (
+            "habits",
+            [
+                {"id": 2, "next_fire_utc": tomorrow_nine},
+                {"id": 3, "next_fire_utc": None},
+                {"id": 4, "next_fire_utc": tomorrow_nine},
+            ],
+        )
+    ]
@@ -97,15 +97,12 @@ def test_send_one_off_reminder_job_sends_message(monkeypatch):
     monkeypatch.setattr("app.scheduler.jobs.AsyncSessionLocal", lambda: fake_session)
     monkeypatch.setattr("app.scheduler.jobs._is_break_mode_active", AsyncMock(return_value=False))
 
-    send_message_mock = AsyncMock()
-    monkeypatch.setattr(
-        "app.scheduler.jobs.get_bot_instance",
-        lambda: MagicMock(send_message=send_message_mock),
-    )
+    deliver_mock = AsyncMock()
+    monkeypatch.setattr("app.scheduler.jobs.deliver", deliver_mock)
 
     asyncio.run(send_one_off_reminder_job(user_id=1, chat_id=42, message_text="Hello"))
 
-    send_message_mock.assert_awaited_once_with(42, "Hello")
+    deliver_mock.assert_awaited_once_with(42, "Hello")
 
 
 def test_habit_reminder_job_sends_when_active_and_not_logged(monkeypatch):
@@ -141,16 +138,13 @@ def test_habit_reminder_job_sends_when_active_and_not_logged(monkeypatch):
 
     monkeypatch.setattr("app.scheduler.jobs.AsyncSessionLocal", lambda: fake_session)
 
-    send_message_mock = AsyncMock()
-    monkeypatch.setattr(
-        "app.scheduler.jobs.get_bot_instance",
-        lambda: MagicMock(send_message=send_message_mock),
-    )
+    deliver_mock = AsyncMock()
+    monkeypatch.setattr("app.scheduler.jobs.deliver", deliver_mock)
 
     asyncio.run(habit_reminder_job(habit_id=10))
 
-    send_message_mock.assert_awaited_once()
-    args, kwargs = send_message_mock.await_args
+    deliver_mock.assert_awaited_once()
+    args, kwargs = deliver_mock.await_args
     assert args[0] == 100500
     assert "Habit Reminder" in args[1]
 
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import asyncio
+
+import app.scheduler.leader as leader_module
+from app.scheduler.leader import LEADER_KEY, SchedulerLeader
+
+
+class FakeLeaseRedis:
+    def __init__(self):
+        self.values: dict[str, str] = {}
+        self.down = False
+
+    async def set(self, key, value, nx=False, ex=None):
+        if self.down:
+            raise ConnectionError("redis down")
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    async def eval(self, script, numkeys, key, owner, *args):
+        if self.down:
+            raise ConnectionError("redis down")
+        if self.values.get(key) != owner:
+            return 0
+        if script is leader_module._RELEASE_SCRIPT:
+            del self.values[key]
+        return 1
+
+
+def _leader(name: str, events: list[str]) -> SchedulerLeader:
+    async def elected():
+        events.append(f"{name}:up")
+
+    async def demoted():
+        events.append(f"{name}:down")
+
+    return SchedulerLeader(name, on_elected=elected, on_demoted=demoted)
+
+
+def test_only_one_worker_leads_and_standby_takes_over(monkeypatch):
+    monkeypatch.setattr(leader_module.app_settings, "SCHEDULER_LEADER_LEASE_SECONDS", 30)
+    redis = FakeLeaseRedis()
+    events: list[str] = []
+    a, b = _leader("a", events), _leader("b", events)
+
+    async def run():
+        await a.tick(redis, now=0)
+        await b.tick(redis, now=0)
+        await asyncio.sleep(0)
+        assert (a.is_leader, b.is_leader) == (True, False)
+
+        # Leader dies: its lease expires and the standby takes it.
+        del redis.values[LEADER_KEY]
+        await b.tick(redis, now=40)
+        await asyncio.sleep(0)
+        assert b.is_leader
+
+        # The old leader notices on its next renew and stops its jobs.
+        await a.tick(redis, now=40)
+        assert not a.is_leader
+
+    asyncio.run(run())
+    assert events == ["a:up", "b:up", "a:down"]
+
+
+def test_leader_steps_down_when_lease_cannot_be_renewed(monkeypatch):
+    monkeypatch.setattr(leader_module.app_settings, "SCHEDULER_LEADER_LEASE_SECONDS", 30)
+    redis = FakeLeaseRedis()
+    events: list[str] = []
+    a = _leader("a", events)
+
+    async def run():
+        await a.tick(redis, now=0)
+        await asyncio.sleep(0)
+        redis.down = True
+        # Still inside the lease: keep running through a Redis blip.
+        await a.tick(redis, now=10)
+        assert a.is_leader
+        await a.tick(redis, now=31)
+        assert not a.is_leader
+
+    asyncio.run(run())
+    assert events == ["a:up", "a:down"]
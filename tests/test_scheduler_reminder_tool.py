@@ -1,20 +1,54 @@
 import asyncio
-from unittest.mock import AsyncMock, MagicMock
+from unittest.mock import AsyncMock
 from datetime import datetime, timedelta, timezone
 
+import app.scheduler.delayed_queue as delayed_queue
 from app.services.tool_executor import ToolExecutor
-from app.scheduler.scheduler_instance import scheduler, start_scheduler, shutdown_scheduler
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from pytz import utc
+
+
+class FakeQueue:
+    """In-memory stand-in for the delayed queue's public functions."""
+
+    def __init__(self):
+        self.jobs = {}
+
+    async def enqueue(self, kind, user_id, job_id, due_at, args):
+        if job_id in self.jobs:
+            return False
+        self.jobs[job_id] = {"kind": kind, "user_id": user_id, "due_at": due_at, "args": args}
+        return True
+
+    async def list_user_jobs(self, user_id, kind):
+        return [
+            {"job_id": job_id, "due_at": job["due_at"], "args": job["args"]}
+            for job_id, job in sorted(self.jobs.items(), key=lambda item: item[1]["due_at"])
+            if job["user_id"] == user_id and job["kind"] == kind
+        ]
+
+    async def cancel_job(self, user_id, kind, job_id):
+        job = self.jobs.get(job_id)
+        if not job or job["user_id"] != user_id or job["kind"] != kind:
+            return False
+        del self.jobs[job_id]
+        return True
+
+
+def _install_fake_queue(monkeypatch):
+    queue = FakeQueue()
+    monkeypatch.setattr(delayed_queue, "enqueue", queue.enqueue)
+    monkeypatch.setattr(delayed_queue, "list_user_jobs", queue.list_user_jobs)
+    monkeypatch.setattr(delayed_queue, "cancel_job", queue.cancel_job)
+    # No legacy APScheduler reminders
+    monkeypatch.setattr("app.scheduler.job_registry.get_user_jobs", lambda *a: [])
+    return queue
 
 
 def test_schedule_list_and_cancel_reminder(monkeypatch):
     """Test that ToolExecutor can schedule a reminder, list it, and cancel it."""
     fake_session = AsyncMock()
-    
-    tool_executor = ToolExecutor(fake_session)
+    queue = _install_fake_queue(monkeypatch)
 
-    # Do not start scheduler in test; we'll just use jobstore and scheduler utilities
+    tool_executor = ToolExecutor(fake_session)
 
     # Use user's timezone if not provided (simulate user in Europe/Moscow = UTC+3)
     # We'll schedule for 2 minutes from now in user's timezone
@@ -45,13 +79,14 @@ def test_schedule_list_and_cancel_reminder(monkeypatch):
     assert result.get("scheduled_for_utc") is not None
     assert result.get("timezone") is not None
 
-    # Job should be present in scheduler
-    job = scheduler.get_job(job_id)
-    assert job is not None
+    # Job should be present in the delayed queue
+    job = queue.jobs[job_id]
+    assert job["kind"] == "reminder"
+    assert job["args"] == {"chat_id": 42, "message_text": "Reminder from test"}
 
-    # Verify scheduled run_date converted from local timezone to UTC
+    # Verify scheduled due time converted from local timezone to UTC
     expected_utc = run_dt_local.astimezone(timezone.utc)
-    actual_run = job.trigger.run_date
+    actual_run = job["due_at"]
     # Should be very close (less than 2 seconds difference)
     assert abs((actual_run - expected_utc).total_seconds()) < 2
 
@@ -67,7 +102,7 @@ def test_schedule_list_and_cancel_reminder(monkeypatch):
     assert cancel_result["success"] is True
 
     # After cancellation job should be gone
-    assert scheduler.get_job(job_id) is None
+    assert job_id not in queue.jobs
 
 
 def test_schedule_reminder_in_past_is_rejected():
@@ -87,8 +122,9 @@ def test_schedule_reminder_in_past_is_rejected():
     assert "past" in result["error"].lower()
 
 
-def test_schedule_with_explicit_timezone_works():
+def test_schedule_with_explicit_timezone_works(monkeypatch):
     fake_session = AsyncMock()
+    queue = _install_fake_queue(monkeypatch)
     tool_executor = ToolExecutor(fake_session)
 
     # Choose a timezone and schedule a naive datetime but provide timezone explicitly
@@ -106,33 +142,25 @@ def test_schedule_with_explicit_timezone_works():
 
     result = asyncio.run(tool_executor._schedule_reminder(args, chat_id=123, user_id=321))
     assert result['success'] is True
-    job = scheduler.get_job(result['job_id'])
+    job = queue.jobs[result['job_id']]
     expected_utc = run_dt_local.astimezone(timezone.utc)
-    actual_run = job.trigger.run_date
+    actual_run = job['due_at']
     assert abs((actual_run - expected_utc).total_seconds()) < 2
 
 
-def test_scheduler_job_runs_async(monkeypatch):
-    """Start an in-memory scheduler and verify a scheduled job fires and calls send_message."""
-    # We'll run an async helper inside asyncio.run to properly start the scheduler
+def test_queued_reminder_runs_async(monkeypatch):
+    """Run a queued reminder through the delayed queue handler and verify it is handed to delivery."""
     async def run_test():
         fake_session = AsyncMock()
+        queue = _install_fake_queue(monkeypatch)
         tool_executor = ToolExecutor(fake_session)
 
-        test_scheduler = AsyncIOScheduler(timezone=utc)
-        test_scheduler.start()
-
-        # Monkeypatch the global scheduler to our test scheduler
-        import app.scheduler.scheduler_instance as inst
-        monkeypatch.setattr(inst, 'scheduler', test_scheduler)
-
-        # Setup fake bot to capture send_message
-        event = asyncio.Event()
-        async def fake_send_message(chat_id, message):
-            event.set()
+        # Capture messages handed to the delivery outbox
+        sent = []
+        async def fake_deliver(chat_id, message, **kwargs):
+            sent.append((chat_id, message))
 
-        fake_bot = MagicMock(send_message=fake_send_message)
-        monkeypatch.setattr('app.scheduler.jobs.get_bot_instance', lambda: fake_bot)
+        monkeypatch.setattr('app.scheduler.jobs.deliver', fake_deliver)
         # Prevent DB queries inside job by monkeypatching AsyncSessionLocal and break mode checker
         fake_session_for_job = AsyncMock()
         class FakeUserSmall:
@@ -149,8 +177,6 @@ def test_scheduler_job_runs_async(monkeypatch):
         monkeypatch.setattr('app.scheduler.jobs.AsyncSessionLocal', lambda: fake_session_for_job)
         monkeypatch.setattr('app.scheduler.jobs._is_break_mode_active', AsyncMock(return_value=False))
 
-        # Set a short-run job 3 seconds from now
-        user_tz = 'UTC'
         run_dt = datetime.now(timezone.utc) + timedelta(seconds=3)
         args = {
             'message_text': 'Async test reminder',
@@ -161,11 +187,9 @@ def test_scheduler_job_runs_async(monkeypatch):
         result = await tool_executor._schedule_reminder(args, chat_id=42, user_id=999)
         assert result['success'] is True
 
-        # Wait for job execution
-        try:
-            await asyncio.wait_for(event.wait(), timeout=10)
-        finally:
-            # Ensure to stop scheduler
-            test_scheduler.shutdown(wait=False)
+        job = queue.jobs[result['job_id']]
+        await delayed_queue._run_job(job['kind'], job['user_id'], job['args'])
+        assert len(sent) == 1
+        assert sent[0][0] == 42
 
     asyncio.run(run_test())
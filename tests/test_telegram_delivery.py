@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+import app.services.telegram_delivery as td
+from app.services.telegram_delivery import Priority
+
+
+def _install(monkeypatch, redis) -> None:
+    monkeypatch.setattr(td, "_get_redis_client", lambda: redis)
+    monkeypatch.setattr(td, "_metrics", None)
+
+
+def _acquire_all(redis, *requests):
+    """Run ``(chat_id, priority)`` acquires in order; returns their waits."""
+
+    async def run():
+        return [await td._acquire(redis, chat_id, priority) for chat_id, priority in requests]
+
+    return asyncio.run(run())
+
+
+def test_worker_sends_highest_priority_first_and_restores_markup(monkeypatch, redis):
+    _install(monkeypatch, redis)
+    monkeypatch.setattr(td.app_settings, "DELIVERY_CONCURRENCY", 2)
+    keyboard = InlineKeyboardMarkup(
+        inline_keyboard=[[InlineKeyboardButton(text="Go", callback_data="premium:go")]]
+    )
+    bot = SimpleNamespace(send_message=AsyncMock())
+
+    async def run():
+        await td.deliver_many([(1, "news", {}), (2, "news", {})], priority=Priority.BROADCAST)
+        await td.deliver(3, "habit", message_thread_id=9)
+        await td.deliver(4, "reply", priority=Priority.INTERACTIVE, reply_markup=keyboard)
+
+        worker = td.DeliveryWorker(bot)
+        assert await worker.tick(redis, now=1_000) == 2
+        await asyncio.gather(*worker._tasks)
+        return await td.queue_depths(redis), await redis.keys("tg_msg:*")
+
+    depths, stored = asyncio.run(run())
+    calls = {call.args[0]: call for call in bot.send_message.await_args_list}
+    assert sorted(calls) == [3, 4]
+    assert calls[3].kwargs == {"message_thread_id": 9}
+    assert calls[4].kwargs["reply_markup"] == keyboard
+    assert depths == {"interactive": 0, "reminder": 0, "broadcast": 2, "inflight": 0}
+    assert len(stored) == 2
+    counts = td.get_delivery_metrics().snapshot()["counts"]
+    assert counts["interactive"] == {"queued": 1, "sent": 1}
+    assert counts["broadcast"] == {"queued": 2}
+
+
+def test_flood_wait_pauses_buckets_and_requeues_while_rejections_drop(monkeypatch, redis):
+    _install(monkeypatch, redis)
+    monkeypatch.setattr(td.app_settings, "DELIVERY_CONCURRENCY", 1)
+    method = SendMessage(chat_id=1, text="x")
+
+    async def send_message(chat_id, text, **kwargs):
+        if chat_id == 1:
+            raise TelegramRetryAfter(method, "Flood control", retry_after=7)
+        raise TelegramForbiddenError(method, "bot was blocked by the user")
+
+    bot = SimpleNamespace(send_message=send_message)
+
+    async def run():
+        blocked_id, flood_id = await td.deliver_many([(2, "b", {}), (1, "a", {})])
+        worker = td.DeliveryWorker(bot)
+        for _ in range(2):
+            assert await worker.tick(redis, now=1_000) == 1
+            await asyncio.gather(*worker._tasks)
+        assert await redis.lrange(td.queue_key(Priority.REMINDER), 0, -1) == [flood_id]
+        assert await redis.exists(td.message_key(flood_id))
+        assert not await redis.exists(td.message_key(blocked_id))
+        assert await redis.zcard(td.INFLIGHT_KEY) == 0
+        # The flood wait holds every chat, not only the one that hit it.
+        return [await td._acquire(redis, chat_id, Priority.INTERACTIVE) for chat_id in (1, 3)]
+
+    waits = asyncio.run(run())
+    assert waits == [pytest.approx(7.0, abs=0.1)] * 2
+    counts = td.get_delivery_metrics().snapshot()["counts"]["reminder"]
+    assert counts == {"queued": 2, "rejected": 1, "retry_after": 1}
+
+
+def test_expired_lease_is_redelivered(monkeypatch, redis):
+    _install(monkeypatch, redis)
+    monkeypatch.setattr(td.app_settings, "DELIVERY_LEASE_SECONDS", 60)
+    bot = SimpleNamespace(send_message=AsyncMock())
+
+    async def run():
+        await td.deliver(5, "hi")
+        crashed = td.DeliveryWorker(bot)
+        # Claimed by a worker that died before sending.
+        await redis.eval(
+            td._CLAIM_SCRIPT, 4, *(td.queue_key(p) for p in Priority), td.INFLIGHT_KEY,
+            1_000, 1_060, 1, 100,
+        )
+        assert await crashed.tick(redis, now=1_030) == 0
+        worker = td.DeliveryWorker(bot)
+        assert await worker.tick(redis, now=1_061) == 1
+        await asyncio.gather(*worker._tasks)
+
+        return await redis.keys("tg_msg:*")
+
+    assert asyncio.run(run()) == []
+    bot.send_message.assert_awaited_once_with(5, "hi")
+
+
+def test_broadcast_waits_for_the_global_rate_while_interactive_uses_the_burst(monkeypatch, redis):
+    monkeypatch.setattr(td.app_settings, "DELIVERY_GLOBAL_RATE", 1.0)
+    monkeypatch.setattr(td.app_settings, "DELIVERY_GLOBAL_BURST_SECONDS", 1.0)
+
+    waits = _acquire_all(
+        redis,
+        (1, Priority.INTERACTIVE),
+        (2, Priority.BROADCAST),
+        (3, Priority.INTERACTIVE),
+        (4, Priority.INTERACTIVE),
+    )
+
+    # The broadcast gets no burst and is held for one global interval; the
+    # next interactive send still fits in the burst, the one after does not.
+    assert waits[0] == 0 and waits[2] == 0
+    assert waits[1] == pytest.approx(1.0, abs=0.1)
+    assert waits[3] == pytest.approx(1.0, abs=0.1)
+
+
+def test_second_send_to_a_chat_is_held_for_the_chat_interval(monkeypatch, redis):
+    monkeypatch.setattr(td.app_settings, "DELIVERY_CHAT_RATE", 0.5)
+
+    waits = _acquire_all(
+        redis, (1, Priority.INTERACTIVE), (1, Priority.INTERACTIVE), (2, Priority.INTERACTIVE)
+    )
+
+    assert waits[0] == 0
+    assert waits[1] == pytest.approx(1 / 0.5, abs=0.1)
+    # Other chats are not held by it.
+    assert waits[2] == 0
+
+
+def test_send_with_slot_timeout_is_deferred_without_sending(monkeypatch, redis):
+    _install(monkeypatch, redis)
+    bot = SimpleNamespace(send_message=AsyncMock())
+
+    async def run():
+        await td._pause(redis, 1, 60)
+        try:
+            await td.send_message(bot, 1, "news", priority=Priority.BROADCAST, slot_timeout=0.05)
+        except td.DeliveryDeferred:
+            return True
+        return False
+
+    assert asyncio.run(run())
+    bot.send_message.assert_not_awaited()
+    assert td.get_delivery_metrics().snapshot()["counts"]["broadcast"] == {"deferred": 1}
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock
+
+from app.services import userbot_channel_batch, userbot_monitor
+from app.services.userbot_channel_batch import (
+    CHANNEL_BATCH_PENDING_KEY,
+    latest_flush_boundary,
+    sweep_channel_batches,
+)
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.lists: dict[str, list[str]] = {}
+        self.pending: dict[str, float] = {}
+
+    async def zrange(self, key, start, end, withscores=False):
+        return sorted(self.pending.items(), key=lambda item: item[1])
+
+    async def zrem(self, key, *members):
+        for member in members:
+            self.pending.pop(member, None)
+
+    async def eval(self, script, numkeys, list_key, pending_key, member):
+        assert pending_key == CHANNEL_BATCH_PENDING_KEY
+        self.pending.pop(member, None)
+        return self.lists.pop(list_key, [])
+
+    async def aclose(self):
+        pass
+
+
+def test_latest_flush_boundary_uses_local_hours():
+    now = datetime(2026, 3, 10, 10, 30, tzinfo=timezone.utc)
+    # 10:30 UTC is 13:30 in Moscow; the last */4 boundary there is 12:00 (09:00 UTC).
+    boundary = latest_flush_boundary(now, "Europe/Moscow", 4)
+    assert boundary == datetime(2026, 3, 10, 9, 0, tzinfo=timezone.utc).timestamp()
+    assert latest_flush_boundary(now, "Not/AZone", 4) == (
+        datetime(2026, 3, 10, 8, 0, tzinfo=timezone.utc).timestamp()
+    )
+
+
+def test_sweep_flushes_due_batches_and_untracks_disabled_users(monkeypatch):
+    now = datetime(2026, 3, 10, 10, 30, tzinfo=timezone.utc)
+    before_boundary = datetime(2026, 3, 10, 7, 0, tzinfo=timezone.utc).timestamp()
+    after_boundary = datetime(2026, 3, 10, 9, 30, tzinfo=timezone.utc).timestamp()
+    post = json.dumps({"channel_name": "News", "summary": "s", "post_link": "", "score": 2})
+
+    redis = _FakeRedis()
+    redis.pending = {"1": before_boundary, "2": after_boundary, "3": before_boundary,
+                     "4": before_boundary}
+    redis.lists = {f"ub_channel_batch:{uid}": [post] for uid in (1, 2, 3, 4)}
+    targets = {
+        1: {"timezone": "UTC", "monitoring": True, "break_mode": False, "delivery": (11, {})},
+        2: {"timezone": "UTC", "monitoring": True, "break_mode": False, "delivery": (22, {})},
+        3: {"timezone": "UTC", "monitoring": False, "break_mode": False, "delivery": (33, {})},
+        4: {"timezone": "UTC", "monitoring": True, "break_mode": True, "delivery": (44, {})},
+    }
+    deliver = AsyncMock(return_value=True)
+    monkeypatch.setattr(userbot_channel_batch, "_get_redis", AsyncMock(return_value=redis))
+    monkeypatch.setattr(
+        userbot_channel_batch, "_load_sweep_targets", AsyncMock(return_value=targets)
+    )
+    monkeypatch.setattr(userbot_monitor, "deliver_channel_digest", deliver)
+    monkeypatch.setattr(userbot_channel_batch.app_settings, "USERBOT_CHANNEL_DIGEST_SEND_RATE", 1000.0)
+
+    flushed = asyncio.run(sweep_channel_batches("bot", now=now))
+
+    assert flushed == 1
+    deliver.assert_awaited_once()
+    assert deliver.await_args.args[0] == 1
+    assert deliver.await_args.kwargs["tg"] == (11, {})
+    # Not yet due (2) and paused (4) stay tracked; disabled monitoring (3) is dropped.
+    assert set(redis.pending) == {"2", "4"}
+    assert "ub_channel_batch:1" not in redis.lists
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from app.services import userbot_channel_dedupe, userbot_monitor
+from app.services.userbot_channel_dedupe import (
+    hamming_distance,
+    merge_into_batch,
+    normalize_post_text,
+    simhash,
+)
+
+_POST = (
+    "The central bank raised its key rate by 200 basis points to 18 percent on "
+    "Friday, citing persistent inflation and a weaker ruble. Analysts had expected "
+    "a smaller hike and markets reacted with a sharp selloff in government bonds."
+)
+
+
+def test_simhash_ignores_links_and_light_edits_but_not_other_news():
+    repost = (
+        "⚡️ " + _POST.upper().replace("Friday", "friday")
+        + " https://t.me/news/123 @newschannel"
+    )
+    edited = _POST.replace("sharp selloff", "sharp sell-off")
+    other = (
+        "A new open-source database engine was released today with support for "
+        "vector search, columnar storage and a redesigned query planner."
+    )
+
+    assert normalize_post_text(repost) == normalize_post_text(_POST)
+    assert simhash(repost) == simhash(_POST)
+    assert hamming_distance(simhash(edited), simhash(_POST)) <= 10
+    assert hamming_distance(simhash(other), simhash(_POST)) > 20
+
+
+class _BatchRedis:
+    def __init__(self, items):
+        self.items = [json.dumps(item) for item in items]
+
+    async def eval(self, script, numkeys, key, signature, channel_name, post_link, max_links):
+        assert script is userbot_channel_dedupe._MERGE_SCRIPT
+        for index, raw in enumerate(self.items):
+            item = json.loads(raw)
+            if item.get("sig") != signature:
+                continue
+            extra = item.setdefault("extra_links", [])
+            links = {item.get("post_link")} | {e.get("post_link") for e in extra}
+            if post_link not in links and len(extra) < max_links:
+                extra.append({"channel_name": channel_name, "post_link": post_link})
+                self.items[index] = json.dumps(item)
+            return 1
+        return 0
+
+    async def aclose(self):
+        pass
+
+
+def test_duplicate_link_is_merged_into_batched_original(monkeypatch):
+    redis = _BatchRedis([
+        {"channel_name": "A", "summary": "s", "post_link": "https://t.me/a/1", "sig": "ff"},
+    ])
+    monkeypatch.setattr(userbot_channel_dedupe, "_get_redis", AsyncMock(return_value=redis))
+
+    merged = asyncio.run(
+        merge_into_batch(1, "ff", channel_name="B", post_link="https://t.me/b/7")
+    )
+    missing = asyncio.run(
+        merge_into_batch(1, "00", channel_name="B", post_link="https://t.me/b/8")
+    )
+
+    assert merged and not missing
+    item = json.loads(redis.items[0])
+    assert item["extra_links"] == [{"channel_name": "B", "post_link": "https://t.me/b/7"}]
+    digest = userbot_monitor._format_batch_digest([item])
+    assert "also: <a href='https://t.me/b/7'>B</a>" in digest
+
+
+def test_channel_handler_skips_classification_for_near_duplicates(monkeypatch):
+    monkeypatch.setattr(
+        userbot_monitor,
+        "_get_user_settings",
+        AsyncMock(return_value=SimpleNamespace(enable_channel_monitoring=True)),
+    )
+    monkeypatch.setattr(userbot_monitor, "_is_break_mode_active", lambda _s: False)
+    monkeypatch.setattr(userbot_monitor, "find_near_duplicate", AsyncMock(return_value="ff"))
+    merge = AsyncMock(return_value=True)
+    monkeypatch.setattr(userbot_monitor, "merge_into_batch", merge)
+    classify = AsyncMock(side_effect=AssertionError("duplicate must not be classified"))
+    monkeypatch.setattr(userbot_monitor, "_classify_post_relevance", classify)
+    chat = SimpleNamespace(title="Mirror", username="mirror", megagroup=False)
+    event = SimpleNamespace(
+        chat_id=-100,
+        message=SimpleNamespace(message=_POST, id=42),
+        get_chat=AsyncMock(return_value=chat),
+    )
+
+    asyncio.run(userbot_monitor._handle_channel_post(event, 1, bot=None))
+
+    merge.assert_awaited_once_with(
+        1, "ff", channel_name="Mirror", post_link="https://t.me/mirror/42"
+    )
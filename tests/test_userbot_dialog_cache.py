@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+from app.services import userbot_dialog_cache, userbot_monitor
+from app.services.userbot_dialog_cache import UserBotDialogCache
+
+
+class _Client:
+    def __init__(self, dialogs):
+        self.dialogs = dialogs
+        self.iter_calls = 0
+
+    async def iter_dialogs(self, limit=None):
+        self.iter_calls += 1
+        for dialog in self.dialogs[:limit]:
+            yield dialog
+
+
+def _dialog(chat_id, first_name, *, is_user=True, bot=False, username=None):
+    entity = SimpleNamespace(
+        id=chat_id, first_name=first_name, last_name="", username=username, bot=bot
+    )
+    return SimpleNamespace(id=chat_id, is_user=is_user, entity=entity, name=first_name)
+
+
+def test_dialog_cache_refresh_filters_and_touch_reorders():
+    client = _Client(
+        [
+            _dialog(10, "Anna", username="anna"),
+            _dialog(11, "Helper", bot=True),
+            _dialog(-100, "Group", is_user=False),
+            _dialog(12, "Boris"),
+        ]
+    )
+    cache = UserBotDialogCache(ttl_seconds=60, max_size=4)
+
+    asyncio.run(cache.refresh(client))
+    assert [d["chat_id"] for d in cache.snapshot(10)] == [10, 12]
+    assert cache.snapshot(1)[0]["username"] == "anna"
+    assert not cache.is_stale()
+
+    cache.touch(SimpleNamespace(id=12, first_name="Boris", last_name=""), 12)
+    cache.touch(SimpleNamespace(id=13, first_name="Vera", last_name=""), 13)
+    cache.touch(SimpleNamespace(id=14, first_name="Gleb", last_name=""), 14)
+    cache.touch(SimpleNamespace(id=15, first_name="Dina", last_name=""), 15)
+
+    assert [d["chat_id"] for d in cache.snapshot(10)] == [15, 14, 13, 12]
+
+
+def test_action_targets_use_snapshot_and_refresh_in_background():
+    client = _Client([_dialog(20, "Anna"), _dialog(21, "Boris")])
+    sender = SimpleNamespace(id=21, first_name="Boris", last_name="", username=None)
+    event = SimpleNamespace(is_private=True, chat_id=21)
+
+    async def scenario():
+        first = await userbot_monitor._fetch_action_target_candidates(
+            client=client,
+            event=event,
+            sender=sender,
+            sender_name="Boris",
+            assistant_bot_id=None,
+        )
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        second = await userbot_monitor._fetch_action_target_candidates(
+            client=client,
+            event=event,
+            sender=sender,
+            sender_name="Boris",
+            assistant_bot_id=None,
+        )
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    # Cold snapshot: only the sender, with the dialog list loading in the background.
+    assert [c["ref"] for c in first] == ["sender"]
+    assert [(c["ref"], c["chat_id"]) for c in second] == [
+        ("sender", 21),
+        ("contact_1", 20),
+    ]
+    assert client.iter_calls == 1
+    userbot_dialog_cache.drop_dialog_cache(client)
+
+
+def test_failed_refresh_retries_with_exponential_backoff(monkeypatch):
+    now = [1_000.0]
+    monkeypatch.setattr(userbot_dialog_cache.time, "monotonic", lambda: now[0])
+
+    class _BrokenClient:
+        async def iter_dialogs(self, limit=None):
+            raise ConnectionError("flood wait")
+            yield
+
+    cache = UserBotDialogCache(ttl_seconds=300, max_size=10)
+
+    async def scenario():
+        delays = []
+        for _ in range(4):
+            await cache._safe_refresh(_BrokenClient())
+            delays.append(cache.retry_at - now[0])
+            assert not cache.is_stale()
+            now[0] = cache.retry_at
+            assert cache.is_stale()
+        await cache._safe_refresh(_Client([_dialog(1, "Ann")]))
+        return delays
+
+    assert asyncio.run(scenario()) == [60, 120, 240, 300]
+    assert cache.retry_at is None and not cache.is_stale()
+    assert len(cache) == 1
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from app.services import userbot_entity_cache, userbot_monitor
+from app.services.userbot_entity_cache import UserBotEntityCache
+
+
+class _Client:
+    def __init__(self, messages):
+        self.get_me = AsyncMock(return_value=SimpleNamespace(id=1, first_name="Me"))
+        self.get_messages = AsyncMock(return_value=messages)
+
+
+class _Message:
+    def __init__(self, *, sender_id, text, sender=None):
+        self.sender_id = sender_id
+        self.message = text
+        self.sender = sender
+        self.get_sender = AsyncMock(
+            side_effect=AssertionError("get_sender must not hit MTProto")
+        )
+
+
+def test_entity_cache_is_bounded_and_expires(monkeypatch):
+    cache = UserBotEntityCache(ttl_seconds=10, max_size=2)
+    now = [100.0]
+    monkeypatch.setattr(userbot_entity_cache.time, "monotonic", lambda: now[0])
+
+    cache.remember(SimpleNamespace(id=1))
+    cache.remember(SimpleNamespace(id=2))
+    assert cache.get(1) is not None  # refreshes recency of id=1
+    cache.remember(SimpleNamespace(id=3))
+
+    assert cache.get(2) is None
+    assert cache.get(1) is not None
+    assert len(cache) == 2
+
+    now[0] += 11
+    assert cache.get(1) is None
+
+
+def test_thread_fetch_uses_message_senders_and_cached_me():
+    alex = SimpleNamespace(id=2, first_name="Alex", last_name="")
+    messages = [
+        _Message(sender_id=1, text="see you"),
+        _Message(sender_id=2, text="hi", sender=alex),
+        _Message(sender_id=2, text="are you there?"),
+    ]
+    client = _Client(messages)
+
+    thread = asyncio.run(userbot_monitor._fetch_conversation_thread(client, 100))
+    asyncio.run(userbot_monitor._fetch_conversation_thread(client, 100))
+
+    assert [item["name"] for item in thread] == ["Alex", "Alex", "Me"]
+    assert [item["is_me"] for item in thread] == [False, False, True]
+    client.get_me.assert_awaited_once()
+    assert client.get_messages.await_count == 2
+
+
+def test_resolve_event_sender_prefers_cached_entity():
+    client = _Client([])
+    cached = SimpleNamespace(id=5, first_name="Lena")
+    userbot_entity_cache.get_entity_cache(client).remember(cached)
+    event = SimpleNamespace(
+        sender=None,
+        sender_id=5,
+        get_sender=AsyncMock(side_effect=AssertionError("should use cache")),
+    )
+
+    sender = asyncio.run(userbot_entity_cache.resolve_event_sender(client, event))
+
+    assert sender is cached
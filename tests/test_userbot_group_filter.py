@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from app.services import userbot_monitor
+from app.services.userbot_group_filter import (
+    GroupPrefilter,
+    build_keyword_pattern,
+    keyword_alternatives,
+)
+from app.services.userbot_metrics import IngestMetrics
+
+
+def test_keyword_automaton_matches_names_and_inflected_interests():
+    me = SimpleNamespace(first_name="Timur", last_name=None, username="timur_dev")
+    fragments = keyword_alternatives(me, "стартапы, AI; machine learning\nGo")
+    pattern = build_keyword_pattern(fragments)
+
+    assert len(fragments) == 4  # "AI" and "Go" are too short to be safe keywords
+    assert pattern.search("ask TIMUR about it")
+    assert pattern.search("ask Timura")
+    assert pattern.search("кто идёт на встречу про стартапов?")
+    assert pattern.search("new machine learning paper")
+    assert not pattern.search("timurlane was a conqueror")
+    assert build_keyword_pattern([]) is None
+
+
+def _group_event(text: str, chat_id: int = -100):
+    return SimpleNamespace(
+        out=False,
+        chat_id=chat_id,
+        sender_id=55,
+        is_private=False,
+        message=SimpleNamespace(message=text, id=7, reply_to=None, entities=None),
+    )
+
+
+def test_group_prefilter_routes_matches_and_counts_removed(monkeypatch):
+    metrics = IngestMetrics()
+    me = SimpleNamespace(id=1, username="owner", first_name="Owner", last_name=None)
+    prefilter = GroupPrefilter(
+        pattern=build_keyword_pattern(keyword_alternatives(None, "football")),
+        overrides={-200: "off", -300: "all"},
+    )
+    enqueue = AsyncMock()
+    monkeypatch.setattr(userbot_monitor, "get_ingest_metrics", lambda: metrics)
+    monkeypatch.setattr(userbot_monitor, "get_cached_me", AsyncMock(return_value=me))
+    monkeypatch.setattr(userbot_monitor, "get_group_prefilter", AsyncMock(return_value=prefilter))
+    monkeypatch.setattr(
+        userbot_monitor, "resolve_event_sender", AsyncMock(return_value=SimpleNamespace(id=55, bot=False))
+    )
+    monkeypatch.setattr(userbot_monitor, "should_sample", lambda: False)
+    monkeypatch.setattr(userbot_monitor, "_enqueue_reply_batch_message", enqueue)
+
+    async def scenario():
+        for event in (
+            _group_event("hey @Owner, thoughts?"),
+            _group_event("football tonight?"),
+            _group_event("nothing relevant here"),
+            _group_event("football tonight?", chat_id=-200),
+            _group_event("nothing relevant here", chat_id=-300),
+        ):
+            await userbot_monitor._handle_group_message(event, 1, bot=None, client=object())
+
+    asyncio.run(scenario())
+
+    reasons = [call.kwargs["match_reason"] for call in enqueue.await_args_list]
+    assert reasons == ["mention", "keyword", "group_override"]
+    events = metrics.snapshot()["events"]["group"]
+    assert events["prefilter_removed"] == 1
+    assert events["filtered"] == 1
+    assert events["queued"] == 3
+
+
+def test_keyword_matching_is_opt_in(monkeypatch):
+    from app.services import userbot_group_filter
+
+    me = SimpleNamespace(id=1, username="owner", first_name="Owner", last_name=None)
+    monkeypatch.setattr(userbot_group_filter, "_prefilters", {})
+    monkeypatch.setattr(userbot_group_filter, "list_group_overrides", AsyncMock(return_value={}))
+    monkeypatch.setattr(
+        userbot_monitor,
+        "_get_user_settings",
+        AsyncMock(return_value=SimpleNamespace(userbot_channel_interests="football")),
+    )
+
+    async def build(enabled):
+        monkeypatch.setattr(
+            userbot_group_filter.app_settings, "USERBOT_GROUP_PREFILTER_KEYWORDS", enabled
+        )
+        userbot_group_filter.invalidate_group_prefilter(1)
+        return await userbot_group_filter.get_group_prefilter(1, me)
+
+    assert asyncio.run(build(False)).keyword_match("football tonight?") is None
+    assert asyncio.run(build(True)).keyword_match("football tonight?") == "football"
+
+
+def test_sampled_group_message_is_classified_but_never_notified(monkeypatch):
+    metrics = IngestMetrics()
+    persist = AsyncMock()
+    rate_limit = AsyncMock(return_value=True)
+    bot = SimpleNamespace(send_message=AsyncMock())
+    monkeypatch.setattr(userbot_monitor, "get_ingest_metrics", lambda: metrics)
+    monkeypatch.setattr(
+        userbot_monitor,
+        "_drain_reply_batch_if_current",
+        AsyncMock(return_value=[{"text": "anyone free to help me move?", "message_id": 7}]),
+    )
+    monkeypatch.setattr(userbot_monitor, "_get_user_settings", AsyncMock(return_value=None))
+    monkeypatch.setattr(userbot_monitor, "_check_if_message_read", AsyncMock(return_value=False))
+    monkeypatch.setattr(userbot_monitor, "_has_manual_outgoing_after", AsyncMock(return_value=False))
+    monkeypatch.setattr(userbot_monitor, "_check_group_notification_rate_limit", rate_limit)
+    monkeypatch.setattr(userbot_monitor, "_fetch_conversation_thread", AsyncMock(return_value=[]))
+    monkeypatch.setattr(
+        userbot_monitor,
+        "_classify_incoming_message",
+        AsyncMock(return_value={"requires_response": True, "summary": "asks for help"}),
+    )
+    monkeypatch.setattr(userbot_monitor, "_persist_incoming_thread", persist)
+
+    asyncio.run(
+        userbot_monitor._process_group_debounced(
+            _group_event("anyone free to help me move?"),
+            1,
+            bot,
+            client=object(),
+            match_reason="sample",
+            sender=SimpleNamespace(id=55, bot=False, first_name="Ann"),
+            batch_key="batch",
+            expected_batch_version=1,
+        )
+    )
+
+    events = metrics.snapshot()["events"]["group"]
+    assert events["classified"] == 1
+    assert events["prefilter_miss"] == 1
+    assert events["sampled"] == 1
+    persist.assert_not_awaited()
+    rate_limit.assert_not_awaited()
+    bot.send_message.assert_not_awaited()
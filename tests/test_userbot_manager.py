@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.services import userbot_manager
+from app.services.userbot_manager import UserBotManager
+
+
+def _configure(monkeypatch, **overrides):
+    values = {
+        "USERBOT_START_CONCURRENCY": 2,
+        "USERBOT_START_JITTER_SECONDS": 0.0,
+        "USERBOT_RESTART_BACKOFF_BASE_SECONDS": 30,
+        "USERBOT_RESTART_BACKOFF_MAX_SECONDS": 1800,
+        "USERBOT_QUARANTINE_FAILURES": 3,
+        "USERBOT_QUARANTINE_SECONDS": 3600,
+    }
+    values.update(overrides)
+    for name, value in values.items():
+        monkeypatch.setattr(userbot_manager.app_settings, name, value)
+    monkeypatch.setattr(userbot_manager, "_restart_state", {})
+
+
+def test_start_many_bounds_concurrency(monkeypatch):
+    _configure(monkeypatch)
+    in_flight = 0
+    peak = 0
+
+    async def fake_start(*, user_id, session_string, bot):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return user_id != 3
+
+    monkeypatch.setattr(UserBotManager, "start_client", staticmethod(fake_start))
+
+    counts = asyncio.run(
+        UserBotManager.start_many([(uid, "s") for uid in range(1, 7)], bot=None)
+    )
+
+    assert peak == 2
+    assert counts == {"started": 5, "failed": 1, "deferred": 0}
+    assert not UserBotManager.can_attempt_start(3)
+    assert UserBotManager.can_attempt_start(1)
+
+
+def test_repeated_failures_back_off_then_quarantine(monkeypatch):
+    _configure(monkeypatch)
+    now = [1000.0]
+    monkeypatch.setattr(userbot_manager.time, "monotonic", lambda: now[0])
+
+    async def failing_start(*, user_id, session_string, bot):
+        raise ConnectionError("network down")
+
+    monkeypatch.setattr(UserBotManager, "start_client", staticmethod(failing_start))
+
+    delays = []
+    for _ in range(3):
+        counts = asyncio.run(UserBotManager.start_many([(9, "s")], bot=None))
+        assert counts["failed"] == 1
+        state = userbot_manager._restart_state[9]
+        delays.append(state.retry_at - now[0])
+        # Deferred while still in backoff.
+        assert asyncio.run(UserBotManager.start_many([(9, "s")], bot=None)) == {
+            "started": 0,
+            "failed": 0,
+            "deferred": 1,
+        }
+        now[0] = state.retry_at
+
+    assert 24 <= delays[0] <= 36
+    assert 48 <= delays[1] <= 72
+    assert delays[2] == pytest.approx(3600)
+    assert userbot_manager._restart_state[9].quarantined
+
+
+def test_concurrent_starts_do_not_exceed_client_cap(monkeypatch):
+    _configure(monkeypatch, USERBOT_MAX_ACTIVE_CLIENTS=2)
+    monkeypatch.setattr(userbot_manager, "_clients", {})
+    monkeypatch.setattr(userbot_manager, "_starting", set())
+
+    class FakeClient:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        async def connect(self):
+            await asyncio.sleep(0.01)
+
+        async def is_user_authorized(self):
+            return True
+
+    class FakeDialogCache:
+        def schedule_refresh(self, client):
+            return None
+
+    monkeypatch.setattr(userbot_manager, "TelegramClient", FakeClient)
+    monkeypatch.setattr(userbot_manager, "StringSession", lambda value: value)
+    monkeypatch.setattr(userbot_manager, "get_dialog_cache", lambda client: FakeDialogCache())
+    monkeypatch.setattr("app.services.userbot_monitor.setup_handlers", lambda *args: None)
+
+    async def run():
+        return await asyncio.gather(
+            *(UserBotManager.start_client(uid, "s", None) for uid in range(1, 5))
+        )
+
+    assert sorted(asyncio.run(run())) == [False, False, True, True]
+    assert len(userbot_manager._clients) == 2
+    assert userbot_manager._starting == set()
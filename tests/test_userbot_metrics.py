@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.services import userbot_metrics, userbot_monitor
+from app.services.userbot_metrics import IngestMetrics
+
+
+def test_ingest_metrics_records_outcomes_spans_lag_and_user_rates():
+    metrics = IngestMetrics()
+    event_date = datetime.now(timezone.utc) - timedelta(seconds=30)
+
+    for _ in range(3):
+        metrics.received("dm", 1, event_date)
+    metrics.received("channel", 2, event_date.replace(tzinfo=None))
+    metrics.count("dm", "queued")
+    with metrics.span("dm", "llm", 1):
+        pass
+    with pytest.raises(RuntimeError):
+        with metrics.span("dm", "bot_api", 1):
+            raise RuntimeError("boom")
+
+    snapshot = metrics.snapshot(top_users=1)
+
+    assert snapshot["events"]["dm"] == {"queued": 1, "received": 3}
+    assert snapshot["events"]["channel"] == {"received": 1}
+    assert snapshot["stages"]["dm.llm"]["count"] == 1
+    assert snapshot["stages"]["dm.bot_api"]["errors"] == 1
+    assert 29 <= snapshot["lag_seconds"]["dm"]["avg_s"] <= 35
+    assert [row["user_id"] for row in snapshot["top_users_events_per_minute"]] == [1]
+    assert snapshot["top_users_events_per_minute"][0]["rate"] == pytest.approx(3, abs=0.1)
+
+
+def test_channel_handler_counts_filtered_and_error_outcomes(monkeypatch):
+    metrics = IngestMetrics()
+    monkeypatch.setattr(userbot_monitor, "get_ingest_metrics", lambda: metrics)
+    monkeypatch.setattr(
+        userbot_monitor,
+        "_get_user_settings",
+        AsyncMock(return_value=SimpleNamespace(enable_channel_monitoring=False)),
+    )
+    event = SimpleNamespace(chat_id=-100, message=SimpleNamespace(message="x" * 40))
+
+    asyncio.run(userbot_monitor._handle_channel_post(event, 1, bot=None))
+
+    monkeypatch.setattr(
+        userbot_monitor, "_get_user_settings", AsyncMock(side_effect=RuntimeError("db down"))
+    )
+    asyncio.run(userbot_monitor._handle_channel_post(event, 1, bot=None))
+
+    snapshot = metrics.snapshot()
+    assert snapshot["events"]["channel"] == {"error": 1, "filtered": 1}
+    assert snapshot["stages"]["channel.db"]["errors"] == 1
+
+
+def test_get_ingest_metrics_is_process_wide(monkeypatch):
+    monkeypatch.setattr(userbot_metrics, "_metrics", None)
+    assert userbot_metrics.get_ingest_metrics() is userbot_metrics.get_ingest_metrics()
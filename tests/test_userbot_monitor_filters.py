@@ -270,3 +270,76 @@ def test_contact_action_step_sends_only_after_callback(monkeypatch):
         text="Please confirm the price.",
     )
     increment.assert_awaited_once_with(1)
+
+
+class _LeaseRedis:
+    def __init__(self):
+        self.values: dict[str, str] = {}
+        self.ttls: dict[str, int] = {}
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        self.ttls[key] = ex
+        return True
+
+    async def delete(self, key):
+        self.values.pop(key, None)
+
+    async def expire(self, key, ttl):
+        self.ttls[key] = ttl
+
+    async def aclose(self):
+        pass
+
+
+def test_sender_relationship_inference_is_singleflight_with_negative_cache(monkeypatch):
+    redis = _LeaseRedis()
+    monkeypatch.setattr(userbot_monitor, "_get_redis", AsyncMock(return_value=redis))
+    calls = []
+
+    async def infer(**kwargs):
+        calls.append(kwargs["sender_tg_id"])
+        await asyncio.sleep(0.01)
+        return "work colleague" if kwargs["sender_tg_id"] == 5 else None
+
+    monkeypatch.setattr(userbot_monitor, "_infer_and_cache_sender_relationship", infer)
+    kwargs = {"user_id": 1, "sender_name": "Ann", "conversation_thread": []}
+
+    async def scenario():
+        first = await asyncio.gather(
+            *(userbot_monitor._ensure_sender_relationship(sender_tg_id=5, **kwargs)
+              for _ in range(3))
+        )
+        failed = await userbot_monitor._ensure_sender_relationship(sender_tg_id=6, **kwargs)
+        retried = await userbot_monitor._ensure_sender_relationship(sender_tg_id=6, **kwargs)
+        return first, failed, retried
+
+    first, failed, retried = asyncio.run(scenario())
+
+    assert first == ["work colleague"] * 3
+    assert failed is None and retried is None
+    assert calls == [5, 6]
+    assert "ub_sender_infer:1:5" not in redis.values
+    assert redis.ttls["ub_sender_infer:1:6"] == (
+        userbot_monitor.app_settings.USERBOT_SENDER_NEGATIVE_CACHE_TTL
+    )
+    assert not userbot_monitor._relationship_inflight
+
+
+def test_sender_relationship_inference_survives_redis_errors(monkeypatch):
+    monkeypatch.setattr(
+        userbot_monitor, "_get_redis", AsyncMock(side_effect=ConnectionError("redis down"))
+    )
+    infer = AsyncMock(return_value="friend")
+    monkeypatch.setattr(userbot_monitor, "_infer_and_cache_sender_relationship", infer)
+
+    result = asyncio.run(
+        userbot_monitor._ensure_sender_relationship(
+            user_id=1, sender_tg_id=7, sender_name="Ann", conversation_thread=[]
+        )
+    )
+
+    assert result is None
+    infer.assert_not_awaited()
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from app.services import userbot_manager, userbot_monitor
+from app.services.userbot_reply_timer import REPLY_DUE_KEY, ReplyTimerPoller
+
+
+class _FakeRedis:
+    """Sorted set + string store emulating the claim script."""
+
+    def __init__(self):
+        self.zset: dict[str, float] = {}
+        self.values: dict[str, str] = {}
+
+    async def zrangebyscore(self, key, low, high, start=0, num=None, withscores=False):
+        items = sorted(
+            (member, score) for member, score in self.zset.items() if score <= high
+        )
+        items = items[start:start + num] if num else items
+        return items if withscores else [member for member, _ in items]
+
+    async def zrem(self, key, *members):
+        for member in members:
+            self.zset.pop(member, None)
+
+    async def eval(self, script, numkeys, key, now, *members):
+        claimed = []
+        for member in members:
+            score = self.zset.get(member)
+            if score is not None and score <= now:
+                del self.zset[member]
+                claimed += [
+                    member,
+                    self.values.get(f"{member}:version", ""),
+                    self.values.get(f"{member}:meta", ""),
+                ]
+        return claimed
+
+
+def test_poller_claims_only_local_due_batches_and_drops_orphans():
+    redis = _FakeRedis()
+    local_key = "ub_reply_batch:1:dm:100:100"
+    remote_key = "ub_reply_batch:2:dm:200:200"
+    orphan_key = "ub_reply_batch:3:dm:300:300"
+    future_key = "ub_reply_batch:1:dm:101:101"
+    redis.zset = {local_key: 90.0, remote_key: 95.0, orphan_key: -10_000.0, future_key: 200.0}
+    redis.values = {
+        f"{local_key}:version": "4",
+        f"{local_key}:meta": json.dumps({"user_id": 1, "chat_type": "dm"}),
+    }
+    handled = []
+
+    async def handler(batch_key, version, meta):
+        handled.append((batch_key, version, meta["user_id"]))
+
+    poller = ReplyTimerPoller(handler, is_local=lambda uid: uid == 1)
+
+    async def scenario():
+        claimed = await poller.tick(redis, now=100.0)
+        await asyncio.sleep(0)
+        return claimed
+
+    assert asyncio.run(scenario()) == 1
+    assert handled == [(local_key, 4, 1)]
+    # Remote batch waits for its owner, the orphan is dropped, the future one stays.
+    assert set(redis.zset) == {remote_key, future_key}
+
+
+def test_poller_pages_past_other_accounts_to_find_its_own_batches(monkeypatch):
+    from app.services import userbot_reply_timer
+
+    monkeypatch.setattr(userbot_reply_timer.app_settings, "USERBOT_REPLY_TIMER_CLAIM_BATCH", 5)
+    redis = _FakeRedis()
+    # 60 recent batches of accounts served by other workers come first.
+    redis.zset = {f"ub_reply_batch:2:dm:{n}:{n}": 50.0 + n / 100 for n in range(60)}
+    local_key = "ub_reply_batch:1:dm:100:100"
+    redis.zset[local_key] = 90.0
+    redis.values = {
+        f"{local_key}:version": "1",
+        f"{local_key}:meta": json.dumps({"user_id": 1, "chat_type": "dm"}),
+    }
+    handled = []
+
+    async def handler(batch_key, version, meta):
+        handled.append(batch_key)
+
+    poller = ReplyTimerPoller(handler, is_local=lambda uid: uid == 1)
+
+    async def scenario():
+        claimed = await poller.tick(redis, now=100.0)
+        await asyncio.sleep(0)
+        return claimed
+
+    assert asyncio.run(scenario()) == 1
+    assert handled == [local_key]
+    assert len(redis.zset) == 60
+
+
+def test_fired_group_batch_runs_processor_with_stored_context(monkeypatch):
+    client = SimpleNamespace(get_entity=AsyncMock(return_value="chat-entity"))
+    process_group = AsyncMock()
+    monkeypatch.setattr(userbot_monitor, "_process_group_debounced", process_group)
+    monkeypatch.setattr(
+        userbot_manager.UserBotManager, "get_client", staticmethod(lambda _uid: client)
+    )
+    meta = {
+        "user_id": 1,
+        "chat_id": -100500,
+        "sender_tg_id": 77,
+        "chat_type": "group",
+        "message_id": 12,
+        "assistant_bot_id": 999,
+        "is_reply_to_me": True,
+    }
+
+    asyncio.run(userbot_monitor._fire_reply_batch("bot", "batch-key", 3, meta))
+
+    kwargs = process_group.await_args.kwargs
+    event = kwargs["event"]
+    assert kwargs["is_reply_to_me"] is True
+    assert kwargs["expected_batch_version"] == 3
+    assert kwargs["sender_tg_id"] == 77
+    assert kwargs["assistant_bot_id"] == 999
+    assert (event.chat_id, event.message.id, event.is_private) == (-100500, 12, False)
+    assert asyncio.run(event.get_chat()) == "chat-entity"
+    client.get_entity.assert_awaited_with(-100500)
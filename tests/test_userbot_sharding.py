@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import AsyncMock
+
+from app.bot.routers import userbot as userbot_router
+from app.services.userbot_sharding import HashRing, plan_rebalance
+
+
+def test_hash_ring_moves_only_a_fraction_of_accounts():
+    user_ids = range(1, 2001)
+    before = HashRing(["w1", "w2", "w3"], vnodes=64)
+    after = HashRing(["w1", "w2", "w3", "w4"], vnodes=64)
+
+    owners_before = {uid: before.owner(uid) for uid in user_ids}
+    owners_after = {uid: after.owner(uid) for uid in user_ids}
+    moved = [uid for uid in user_ids if owners_before[uid] != owners_after[uid]]
+
+    assert set(owners_before.values()) == {"w1", "w2", "w3"}
+    # Only accounts claimed by the new worker move.
+    assert all(owners_after[uid] == "w4" for uid in moved)
+    assert 0.1 < len(moved) / len(owners_before) < 0.4
+    assert HashRing([], vnodes=8).owner(1) is None
+
+
+def test_plan_rebalance_starts_owned_and_stops_foreign_or_inactive():
+    ring = HashRing(["w1", "w2"], vnodes=32)
+    active = list(range(1, 51))
+    mine = {uid for uid in active if ring.owner(uid) == "w1"}
+    foreign = next(uid for uid in active if uid not in mine)
+    running = [min(mine), foreign, 999]
+
+    to_start, to_stop = plan_rebalance(
+        worker_id="w1",
+        ring=ring,
+        active_user_ids=active,
+        running_user_ids=running,
+    )
+
+    assert set(to_start) == mine - {min(mine)}
+    assert set(to_stop) == {foreign, 999}
+
+
+def test_send_message_is_forwarded_to_shard_worker(monkeypatch):
+    send_command = AsyncMock(return_value=True)
+    monkeypatch.setattr(userbot_router, "sharding_enabled", lambda: True)
+    monkeypatch.setattr(userbot_router, "send_command", send_command)
+    monkeypatch.setattr(
+        userbot_router.UserBotManager, "get_client", staticmethod(lambda _uid: None)
+    )
+
+    ok = asyncio.run(
+        userbot_router._send_message_with_human_simulation(
+            user_id=7, chat_id=42, text="hello", reply_to_msg_id=3
+        )
+    )
+
+    assert ok is True
+    args = send_command.await_args.args
+    assert args[:2] == (7, "send_message")
+    assert args[2] == {"chat_id": 42, "text": "hello", "reply_to_msg_id": 3}
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import AsyncMock
+
+from app.services import userbot_monitor
+from app.services.userbot_style_profile import build_style_profile, format_style_profile
+
+
+def test_build_style_profile_condenses_casual_samples():
+    samples = [
+        "ок, буду через 5 минут",
+        "ахахах норм 😂",
+        "давай завтра?",
+        "спс))",
+        "",
+        "ну посмотрим",
+    ]
+
+    profile = build_style_profile(samples)
+
+    assert profile["sample_count"] == 5
+    assert profile["formality"] == "casual"
+    assert profile["lowercase_start_share"] == 1.0
+    assert profile["question_share"] == 0.2
+    assert profile["languages"]["cyrillic"] == 1.0
+    assert 0 < len(profile["exemplars"]) <= 4
+
+    text = format_style_profile(profile)
+    assert "Formality: casual" in text
+    assert "Cyrillic 100%" in text
+    assert '"ок, буду через 5 минут"' in text
+
+
+def test_build_style_profile_handles_empty_buffer():
+    assert build_style_profile([]) is None
+    assert build_style_profile(["   "]) is None
+
+
+def test_style_context_prefers_profile_and_falls_back_to_samples(monkeypatch):
+    scheduled: list[int] = []
+    monkeypatch.setattr(userbot_monitor, "schedule_style_profile_refresh", scheduled.append)
+    monkeypatch.setattr(
+        userbot_monitor, "_get_style_samples", AsyncMock(return_value=["hey there"])
+    )
+
+    monkeypatch.setattr(userbot_monitor, "load_style_profile", AsyncMock(return_value=None))
+    profile_text, samples = asyncio.run(userbot_monitor._get_style_context(7))
+    assert profile_text is None
+    assert samples == ["hey there"]
+    assert scheduled == [7]
+
+    profile = build_style_profile(["Good morning. I will call you later."])
+    monkeypatch.setattr(userbot_monitor, "load_style_profile", AsyncMock(return_value=profile))
+    profile_text, samples = asyncio.run(userbot_monitor._get_style_context(7))
+    assert "Formality: formal" in profile_text
+    assert samples == []
@@ -54,6 +54,7 @@ class _FakeSession:
         self.execute = AsyncMock(return_value=result)
         self.get = AsyncMock(return_value=get_result)
         self.flush = AsyncMock()
+        self.commit = AsyncMock()
         self.added = []
 
     def add(self, item):
@@ -204,9 +205,10 @@ def test_reconcile_read_deletes_notification_and_pending(monkeypatch):
     delete_pending = AsyncMock()
 
     monkeypatch.setattr(
-        service, "_has_thread_outgoing_after", AsyncMock(return_value=False)
+        service,
+        "_probe_user_threads",
+        AsyncMock(return_value={id(thread): "read"}),
     )
-    monkeypatch.setattr(service, "_is_thread_message_read", AsyncMock(return_value=True))
     monkeypatch.setattr(userbot_monitor, "delete_pending_reply", delete_pending)
 
     count = asyncio.run(service.reconcile_open_threads(session, bot))
@@ -238,13 +240,10 @@ def test_reconcile_outgoing_marks_replied_and_deletes_notification(monkeypatch):
     bot = SimpleNamespace(delete_message=AsyncMock())
     delete_pending = AsyncMock()
 
-    monkeypatch.setattr(
-        service, "_has_thread_outgoing_after", AsyncMock(return_value=True)
-    )
     monkeypatch.setattr(
         service,
-        "_is_thread_message_read",
-        AsyncMock(side_effect=AssertionError("read check should not run")),
+        "_probe_user_threads",
+        AsyncMock(return_value={id(thread): "replied"}),
     )
     monkeypatch.setattr(userbot_monitor, "delete_pending_reply", delete_pending)
 
@@ -262,6 +261,52 @@ def test_reconcile_outgoing_marks_replied_and_deletes_notification(monkeypatch):
     assert session.added == [thread]
 
 
+def test_probe_user_threads_batches_markers_and_peer_dialogs(monkeypatch):
+    from app.services import userbot_manager, userbot_thread_service
+    from app.services.userbot_state_probe import PeerDialogState
+
+    service = UserBotThreadService()
+    threads = [
+        UserBotThread(id=1, user_id=1, chat_id=100, status="open", message_id=10),
+        UserBotThread(id=2, user_id=1, chat_id=101, status="open", message_id=20),
+        UserBotThread(id=3, user_id=1, chat_id=102, status="open", message_id=30),
+        UserBotThread(id=4, user_id=1, chat_id=103, status="open", message_id=40),
+    ]
+    load_markers = AsyncMock(return_value=({}, {100: {"message_id": 11}}))
+    peer_states = AsyncMock(
+        return_value={
+            101: PeerDialogState(read_inbox_max_id=20, top_message_id=20),
+            102: PeerDialogState(
+                read_inbox_max_id=0, top_message_id=31, top_message_out=True
+            ),
+            103: PeerDialogState(read_inbox_max_id=0, top_message_id=40),
+        }
+    )
+    cache_markers = AsyncMock()
+    live_scan = AsyncMock(side_effect=AssertionError("no newer incoming messages"))
+    monkeypatch.setattr(userbot_thread_service, "load_thread_markers", load_markers)
+    monkeypatch.setattr(userbot_thread_service, "get_peer_dialog_states", peer_states)
+    monkeypatch.setattr(userbot_thread_service, "cache_read_markers", cache_markers)
+    monkeypatch.setattr(userbot_thread_service, "has_live_outgoing_after", live_scan)
+    monkeypatch.setattr(
+        userbot_manager.UserBotManager,
+        "get_client",
+        staticmethod(lambda _uid: object()),
+    )
+
+    states = asyncio.run(service._probe_user_threads(1, threads))
+
+    assert states == {
+        id(threads[0]): "replied",
+        id(threads[1]): "read",
+        id(threads[2]): "replied",
+    }
+    load_markers.assert_awaited_once_with(1, [100, 101, 102, 103])
+    peer_states.assert_awaited_once()
+    assert peer_states.await_args.args[1] == [101, 102, 103]
+    cache_markers.assert_awaited_once_with(1, {101: 20})
+
+
 def test_send_due_followup_skips_thread_answered_outside_bot(monkeypatch):
     service = UserBotThreadService()
     thread = UserBotThread(
@@ -313,3 +358,107 @@ def test_user_followup_max_zero_blocks_reminders(monkeypatch):
     allowed = asyncio.run(service._can_send_followup(_FakeSession(), user_id=1))
 
     assert allowed is False
+
+
+def test_send_due_followups_pages_with_keyset_cursor_and_commits(monkeypatch):
+    service = UserBotThreadService()
+    deadline = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    page_one = [
+        UserBotThread(id=1, user_id=1, chat_id=100, importance=5, response_deadline_at=deadline),
+        UserBotThread(id=7, user_id=1, chat_id=100, importance=4, response_deadline_at=deadline),
+    ]
+    page_two = [
+        UserBotThread(id=3, user_id=2, chat_id=200, importance=2, response_deadline_at=deadline),
+    ]
+    due = AsyncMock(side_effect=[page_one, page_two])
+    deliver_page = AsyncMock(side_effect=[1, 1])
+    session = _FakeSession()
+
+    monkeypatch.setattr(service, "reconcile_open_threads", AsyncMock(return_value=0))
+    monkeypatch.setattr(service, "due_followups", due)
+    monkeypatch.setattr(service, "_deliver_followup_page", deliver_page)
+    monkeypatch.setattr(
+        "app.services.userbot_thread_service.app_settings.USERBOT_FOLLOWUP_SWEEP_PAGE_SIZE", 2
+    )
+
+    sent = asyncio.run(service.send_due_followups(session, SimpleNamespace()))
+
+    assert sent == 2
+    assert [call.kwargs["after"] for call in due.await_args_list] == [
+        None,
+        (4, deadline, 7),
+    ]
+    assert session.commit.await_count == 2
+
+
+def test_followup_page_combines_threads_per_user_with_prefetched_rows(monkeypatch):
+    from app.services import telegram_delivery
+
+    service = UserBotThreadService()
+    threads = [
+        UserBotThread(
+            id=1, user_id=1, chat_id=100, message_id=10, sender_name="Ann",
+            suggested_replies_json=["Yes", "No"],
+        ),
+        UserBotThread(
+            id=2, user_id=1, chat_id=101, message_id=11, sender_name="Bob",
+            suggested_replies_json=["Soon"],
+        ),
+        UserBotThread(
+            id=3, user_id=2, chat_id=200, message_id=12, sender_name="Cid",
+            suggested_replies_json=["Ok"],
+        ),
+    ]
+    users = [
+        SimpleNamespace(id=1, tg_chat_id=501, private_topic_id=None),
+        SimpleNamespace(id=2, tg_chat_id=502, private_topic_id=None),
+    ]
+    session = _FakeSession()
+    session.execute = AsyncMock(side_effect=[_ListResult(users), _ListResult([])])
+    bot = SimpleNamespace(
+        send_message=AsyncMock(
+            side_effect=lambda chat_id, *args, **kwargs: SimpleNamespace(
+                message_id=chat_id + 1000
+            )
+        )
+    )
+    pending_keys = iter(["pk1", "pk2", "pk3"])
+
+    monkeypatch.setattr(service, "_has_thread_outgoing_after", AsyncMock(return_value=False))
+    monkeypatch.setattr(service, "_get_followup_counter", AsyncMock(return_value=0))
+    monkeypatch.setattr(service, "_increment_followup_counter", AsyncMock())
+    monkeypatch.setattr(
+        userbot_monitor,
+        "_store_pending_reply",
+        AsyncMock(side_effect=lambda **kwargs: next(pending_keys)),
+    )
+
+    class _OpenBuckets:
+        async def eval(self, *args):
+            return 0
+
+    monkeypatch.setattr(telegram_delivery, "_get_redis_client", lambda: _OpenBuckets())
+
+    async def run():
+        return await service._deliver_followup_page(session, bot, threads, asyncio.Semaphore(4))
+
+    sent = asyncio.run(run())
+
+    assert sent == 3
+    assert session.execute.await_count == 2
+    assert bot.send_message.await_count == 2
+    combined = next(
+        call for call in bot.send_message.await_args_list if call.args[0] == 501
+    )
+    assert "2 conversations waiting" in combined.args[1]
+    rows = combined.kwargs["reply_markup"].inline_keyboard
+    assert [button.callback_data for button in rows[1]] == [
+        "ub_send:pk2:0",
+        "ub_edit:pk2",
+        "ub_dismiss:pk2",
+    ]
+    # Shared reminders are not deleted by per-thread cleanup.
+    assert threads[0].notification_message_id is None
+    assert threads[0].pending_key == "pk1"
+    assert threads[2].notification_message_id == 1502
+    assert {thread.status for thread in threads} == {"reminded"}
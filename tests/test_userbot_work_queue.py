@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import asyncio
+
+from app.services.userbot_work_queue import UserBotWorkScheduler
+
+
+def test_scheduler_limits_per_user_and_orders_by_priority():
+    scheduler = UserBotWorkScheduler(per_user_limit=1, global_limit=2, max_queued=10)
+    started: list[str] = []
+    gates: dict[str, asyncio.Event] = {}
+
+    def job(name):
+        async def run():
+            started.append(name)
+            await gates[name].wait()
+
+        gates[name] = asyncio.Event()
+        return run
+
+    async def scenario():
+        scheduler.submit(1, "channel", job("u1-channel"))
+        scheduler.submit(1, "dm", job("u1-dm"))
+        scheduler.submit(2, "group", job("u2-group"))
+        scheduler.submit(3, "channel", job("u3-channel"))
+        scheduler.submit(2, "dm", job("u2-dm"))
+        await asyncio.sleep(0)
+        first_wave = list(started)
+        snapshot = scheduler.snapshot()
+
+        gates["u1-channel"].set()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        second_wave = list(started)
+        for gate in gates.values():
+            gate.set()
+        for _ in range(5):
+            await asyncio.sleep(0)
+        return first_wave, snapshot, second_wave
+
+    first_wave, snapshot, second_wave = asyncio.run(scenario())
+
+    # The first submit starts at once; user 1's DM must wait for its own slot.
+    assert first_wave == ["u1-channel", "u2-group"]
+    assert snapshot["running"] == 2
+    assert snapshot["queued"] == {"dm": 2, "channel": 1}
+    # Freed slot goes to the highest-priority runnable item (DM over channel).
+    assert second_wave[2] == "u1-dm"
+    assert scheduler.snapshot()["completed"] == 5
+
+
+def test_scheduler_replaces_stale_keyed_work_and_drops_overflow():
+    scheduler = UserBotWorkScheduler(per_user_limit=1, global_limit=1, max_queued=2)
+    ran: list[str] = []
+    blocker = asyncio.Event()
+
+    def job(name, wait=False):
+        async def run():
+            ran.append(name)
+            if wait:
+                await blocker.wait()
+
+        return run
+
+    async def scenario():
+        scheduler.submit(9, "dm", job("busy", wait=True))
+        scheduler.submit(1, "dm", job("old-batch"), key="chat-1")
+        scheduler.submit(1, "dm", job("new-batch"), key="chat-1")
+        scheduler.submit(2, "channel", job("post"))
+        accepted = scheduler.submit(3, "channel", job("late-post"))
+        dm_accepted = scheduler.submit(4, "dm", job("urgent-dm"))
+        blocker.set()
+        for _ in range(10):
+            await asyncio.sleep(0)
+        return accepted, dm_accepted
+
+    accepted, dm_accepted = asyncio.run(scenario())
+
+    assert ran == ["busy", "new-batch", "urgent-dm"]
+    assert accepted is True and dm_accepted is True
+    snapshot = scheduler.snapshot()
+    assert snapshot["dropped_stale"] == 1
+    assert snapshot["dropped_overflow"] == 2